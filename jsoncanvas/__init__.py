@@ -0,0 +1,9 @@
+"""
+JSON Canvas AI - Python tools for the headless API
+
+    python -m jsoncanvas --help
+"""
+
+from .client import BASE_URL, APIError, JSONCanvasClient
+
+__all__ = ["BASE_URL", "APIError", "JSONCanvasClient"]
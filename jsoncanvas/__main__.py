@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+# Worker processes started with spawn (Windows) import this module again
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+Load testing and latency benchmarks for the headless API
+
+Each scenario is one endpoint with one request body. It is driven either
+closed-loop (a fixed number of workers, each sending its next request as
+soon as the last one answers) or open-loop at a fixed request rate. In
+open-loop runs latency is measured from the time a request was due, not
+from when a worker got round to sending it, so a server that falls behind
+shows up in the percentiles instead of slowing the load down.
+
+The manipulate and documents routes are also swept over payload sizes.
+Results are written as a JSON report with stable key order, so reports
+from two builds can be diffed, or compared with compare_reports.
+"""
+
+import itertools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from .client import APIError
+
+Scenario = namedtuple("Scenario", "endpoint path body")
+
+REPORT_VERSION = 1
+KB = 1024
+MB = 1024 * KB
+PAYLOAD_SIZES = (1 * KB, 10 * KB, 100 * KB, 1 * MB, 10 * MB, 100 * MB)
+SWEPT_ENDPOINTS = ("manipulate", "documents")
+AI_ENDPOINTS = ("convert-text", "enhance-field", "format-json")
+ENDPOINTS = SWEPT_ENDPOINTS + AI_ENDPOINTS
+# Bytes sent per sweep scenario before the request count is cut down
+DEFAULT_BYTE_BUDGET = 1024 * MB
+MIN_SWEEP_REQUESTS = 3
+
+_PATHS = {
+    "manipulate": "/json/manipulate",
+    "documents": "/documents",
+    "convert-text": "/ai/convert-text",
+    "enhance-field": "/ai/enhance-field",
+    "format-json": "/ai/format-json",
+}
+
+# Fixed bodies for the AI routes, the samples test-api.py sends
+_AI_BODIES = {
+    "convert-text": {
+        "rawText": "Product: iPhone 15\nPrice: $999\nStorage: 128GB, 256GB, 512GB\nColors: Blue, Pink, Black, White",
+        "instructions": "Create a product object with arrays for storage and color options",
+    },
+    "enhance-field": {
+        "fieldContent": "Good software",
+        "userPrompt": "Rewrite as a professional product description",
+    },
+    "format-json": {
+        "jsonString": '{name:"Alice",age:28,skills:["python","javascript",],active:true,}',
+        "instructions": "Fix syntax errors",
+    },
+}
+
+
+def parse_size(text):
+    """Parse "512", "1KB", "10MB" or "1GB" into bytes"""
+    text = text.strip().upper()
+    for suffix, factor in (("GB", 1024 * MB), ("MB", MB), ("KB", KB), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[: -len(suffix)]) * factor)
+    return int(text)
+
+
+def format_size(size):
+    for suffix, factor in (("MB", MB), ("KB", KB)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return f"{size}B"
+
+
+def make_document(size):
+    """
+    A deterministic document of records, returned as compact JSON bytes
+    exactly size bytes long (or a little over, for sizes below one record)
+    """
+    items = []
+    length = len(b'{"items":[],"padding":""}')
+    for i in itertools.count():
+        # Formatted directly; json.dumps per record is the slow part at 100 MB
+        tags = '["alpha","beta"]' if i % 2 else '["gamma"]'
+        active = "true" if i % 3 != 0 else "false"
+        item = f'{{"id":{i},"name":"Item {i}","price":{(i * 37) % 1000 + 0.99!r},"tags":{tags},"active":{active}}}'
+        added = len(item) + (1 if items else 0)
+        if items and length + added > size:
+            break
+        items.append(item)
+        length += added
+    padding = "x" * max(0, size - length)
+    return f'{{"items":[{",".join(items)}],"padding":"{padding}"}}'.encode("utf-8")
+
+
+def build_scenario(endpoint, size=None):
+    """
+    The request body for an endpoint, encoded once and sent every time.
+    For the swept routes the whole body, not just the document, is size bytes.
+    """
+    if endpoint == "manipulate":
+        envelope = {"operation": "setValue", "jsonData": {}, "path": ["items", 0, "name"], "value": "Renamed"}
+    elif endpoint == "documents":
+        envelope = {"data": {}, "name": f"bench-{format_size(size)}"}
+    elif endpoint in _AI_BODIES:
+        envelope = _AI_BODIES[endpoint]
+    else:
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    body = json.dumps(envelope, separators=(",", ":")).encode("utf-8")
+    if endpoint in SWEPT_ENDPOINTS:
+        # The empty document is the only {} in the envelope
+        body = body.replace(b"{}", make_document(max(1, size - len(body) + 2)), 1)
+    return Scenario(endpoint, _PATHS[endpoint], body)
+
+
+def _error_kind(error):
+    if isinstance(error, APIError):
+        return f"HTTP {error.status}" if error.status is not None else "connection"
+    if isinstance(error, ValueError):
+        return "invalid response"
+    return type(error).__name__
+
+
+def send(client, scenario):
+    """Send scenario's body once; returns the id of the document it created, if any"""
+    if scenario.endpoint == "documents":
+        return client.post(scenario.path, scenario.body, select="data.id")
+    client.post(scenario.path, scenario.body)
+    return None
+
+
+def delete_documents(client, document_ids):
+    """Delete documents a run created; returns how many could not be deleted"""
+    failed = 0
+    for document_id in document_ids:
+        try:
+            client.delete_document(document_id)
+        except APIError:
+            failed += 1
+    return failed
+
+
+def run_load(client, scenario, requests=100, concurrency=4, rate=None, duration=None, created=None):
+    """
+    Send scenario's body up to requests times (and for at most duration
+    seconds) from concurrency threads; with rate, requests are due at
+    rate per second. The ids of documents created are appended to created.
+    Returns (latencies in ms, {error kind: count}, seconds).
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    errors = {}
+    started = time.monotonic()
+    deadline = started + duration if duration else None
+
+    def worker():
+        while True:
+            index = next(counter)
+            if index >= requests:
+                return
+            due = started + index / rate if rate else time.monotonic()
+            if deadline is not None and due >= deadline:
+                return
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            document_id = None
+            try:
+                document_id = send(client, scenario)
+                error = None
+            except Exception as e:
+                error = _error_kind(e)
+            elapsed = (time.monotonic() - due) * 1000
+            with lock:
+                if document_id is not None and created is not None:
+                    created.append(document_id)
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - started
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, errors, seconds, payload_bytes):
+    latencies = sorted(latencies)
+    sent = len(latencies) + sum(errors.values())
+
+    def ms(value):
+        return None if value is None else round(value, 2)
+
+    return {
+        "requests": sent,
+        "ok": len(latencies),
+        "errors": dict(sorted(errors.items())),
+        "seconds": round(seconds, 3),
+        "throughput": {
+            "requestsPerSecond": round(len(latencies) / seconds, 2) if seconds > 0 else 0.0,
+            "megabytesPerSecond": round(len(latencies) * payload_bytes / MB / seconds, 3) if seconds > 0 else 0.0,
+        },
+        "latencyMs": {
+            "min": ms(latencies[0] if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def result_key(result):
+    """Identifies the same measurement across two reports"""
+    return (result["endpoint"], result["payloadBytes"], result["concurrency"], result["rate"])
+
+
+def run_benchmark(
+    client,
+    endpoints=SWEPT_ENDPOINTS,
+    sizes=PAYLOAD_SIZES,
+    concurrency=(4,),
+    rates=(None,),
+    requests=50,
+    duration=None,
+    warmup=2,
+    byte_budget=DEFAULT_BYTE_BUDGET,
+    progress=sys.stderr,
+):
+    """
+    Run every endpoint (at every payload size, for the swept routes) at
+    every combination of concurrency and rate, and return the report.
+    Documents created by the documents scenarios are deleted after each one.
+    """
+    results = []
+    for endpoint in endpoints:
+        for size in sizes if endpoint in SWEPT_ENDPOINTS else (None,):
+            scenario = build_scenario(endpoint, size)
+            payload_bytes = len(scenario.body)
+            # Large payloads get fewer requests, so a sweep finishes in reasonable time
+            count = max(MIN_SWEEP_REQUESTS, min(requests, byte_budget // payload_bytes)) if size else requests
+            created = []
+            try:
+                for _ in range(warmup):
+                    try:
+                        document_id = send(client, scenario)
+                    except Exception:
+                        continue
+                    if document_id is not None:
+                        created.append(document_id)
+
+                for workers, rate in itertools.product(concurrency, rates):
+                    if progress:
+                        label = format_size(payload_bytes) if size else "fixed"
+                        load = f"{rate}/s" if rate else "closed loop"
+                        progress.write(f"{endpoint} {label} x{count} c={workers} {load} ... ")
+                        progress.flush()
+                    latencies, errors, seconds = run_load(client, scenario, count, workers, rate, duration, created)
+                    result = {
+                        "endpoint": endpoint,
+                        "path": scenario.path,
+                        "payloadBytes": payload_bytes,
+                        "concurrency": workers,
+                        "rate": rate,
+                        **summarize(latencies, errors, seconds, payload_bytes),
+                    }
+                    results.append(result)
+                    if progress:
+                        latency = result["latencyMs"]
+                        progress.write(
+                            f"p50 {latency['p50']} ms  p99 {latency['p99']} ms  "
+                            f"{result['throughput']['requestsPerSecond']} req/s  errors {sum(errors.values())}\n"
+                        )
+            finally:
+                failed = delete_documents(client, created)
+                if failed and progress:
+                    progress.write(f"could not delete {failed} of {len(created)} documents created by {endpoint}\n")
+            del scenario
+
+    return {
+        "version": REPORT_VERSION,
+        "baseUrl": client.base_url,
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "build": os.environ.get("JSONCANVAS_BUILD"),
+        },
+        "settings": {
+            "requests": requests,
+            "duration": duration,
+            "warmup": warmup,
+            "byteBudget": byte_budget,
+        },
+        "results": results,
+    }
+
+
+def write_report(report, path):
+    with open(path, "w", encoding="utf-8") as out:
+        json.dump(report, out, indent=2, sort_keys=True)
+        out.write("\n")
+
+
+def compare_reports(baseline, current, threshold=0.1):
+    """
+    Measurements in current that are worse than baseline by more than
+    threshold (a fraction) in p95 latency or throughput, or that now fail.
+    Returns a list of human-readable lines.
+    """
+    previous = {result_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in current.get("results", []):
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        label = (
+            f"{result['endpoint']} {format_size(result['payloadBytes'])} c={result['concurrency']}"
+            + (f" {result['rate']}/s" if result["rate"] else "")
+        )
+        old_p95, new_p95 = before["latencyMs"]["p95"], result["latencyMs"]["p95"]
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + threshold):
+            regressions.append(f"{label}: p95 {old_p95} ms -> {new_p95} ms (+{(new_p95 / old_p95 - 1) * 100:.0f}%)")
+        old_rps = before["throughput"]["requestsPerSecond"]
+        new_rps = result["throughput"]["requestsPerSecond"]
+        if old_rps and new_rps < old_rps * (1 - threshold):
+            regressions.append(f"{label}: throughput {old_rps} -> {new_rps} req/s ({(new_rps / old_rps - 1) * 100:.0f}%)")
+        old_errors, new_errors = sum(before["errors"].values()), sum(result["errors"].values())
+        if new_errors > old_errors:
+            regressions.append(f"{label}: errors {old_errors} -> {new_errors}")
+    return regressions
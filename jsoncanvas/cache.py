@@ -0,0 +1,312 @@
+"""
+On-disk cache of AI responses
+
+Keeps the data of successful /ai/* responses in a SQLite file, keyed by a
+hash of the endpoint and the request payload in canonical form (sorted
+keys, no whitespace), so a job re-run over inputs it has already sent
+answers from disk instead of the model:
+
+    cache = ResponseCache("~/.cache/jsoncanvas/ai.sqlite3", ttl=7 * 86400)
+    client = JSONCanvasClient(cache=cache)
+
+Entries older than ttl seconds are not served. When the stored responses
+grow past max_bytes, the least recently used are dropped. The file may be
+shared by any number of threads and processes: each thread opens its own
+connection, the database runs in WAL mode so readers never wait on a
+writer, and writes retry while another process holds the lock. Counters
+for hits, misses, stores, expiries and evictions are kept in the file, so
+stats() covers every process that used it.
+
+Lookups only read. Their hits, misses, expiries and access times are kept
+in memory and written in batches, skipping a batch if another process is
+writing at that moment, so a busy file never holds up a get(). put(),
+stats() and close() write out what is pending.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+DEFAULT_CACHE_PATH = os.path.join("~", ".cache", "jsoncanvas", "ai-responses.sqlite3")
+DEFAULT_TTL = 30 * 86400
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Seconds a write waits for another process to release the database
+LOCK_TIMEOUT = 30.0
+# Eviction frees this much below max_bytes, so it does not run on every store
+EVICT_TO = 0.9
+# Lookups whose bookkeeping is written in one transaction, and the longest it waits
+FLUSH_EVERY = 64
+FLUSH_INTERVAL = 1.0
+
+_MISSING = object()
+_COUNTERS = ("hits", "misses", "stores", "expired", "evictions")
+# Running total of responses.size, kept with the counters so stores need not sum the table
+_BYTES = "bytes"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def cache_key(endpoint, payload, namespace=""):
+    """Hash of the endpoint and the payload's canonical JSON"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{namespace}\0{endpoint}\0{canonical}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    A SQLite cache of response data. namespace is mixed into every key;
+    set it to the model or prompt version to start afresh when those
+    change. ttl=None keeps entries until they are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, namespace=""):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        # Counts for this process only; stats() has the totals
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Lookups not yet written: counter increments, access times by key, expired (key, created)
+        self._pending = Counter()
+        self._accessed = {}
+        self._expired = []
+        self._flushed = time.monotonic()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db.executescript(_SCHEMA)
+        with self._write() as db:
+            # Files written before the total was kept start from the sum
+            db.execute("INSERT OR IGNORE INTO counters (name, value) SELECT ?, COALESCE(SUM(size), 0) FROM responses",
+                       (_BYTES,))
+
+    @property
+    def _db(self):
+        # A connection must not cross threads, nor a fork into a worker process
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _write(self, wait=True):
+        return _Transaction(self._db, wait)
+
+    def _count(self, db, name, amount=1):
+        db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + ?",
+            (name, amount, amount),
+        )
+
+    def get(self, endpoint, payload, default=None):
+        """The cached data for a request, or default"""
+        key = cache_key(endpoint, payload, self.namespace)
+        now = time.time()
+        row = self._db.execute("SELECT data, created FROM responses WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._expired.append((key, row[1]))
+                row = None
+            if row is None:
+                self.misses += 1
+                self._pending["misses"] += 1
+            else:
+                self.hits += 1
+                self._pending["hits"] += 1
+                self._accessed[key] = now
+            due = (self._pending["hits"] + self._pending["misses"] >= FLUSH_EVERY
+                   or time.monotonic() - self._flushed >= FLUSH_INTERVAL)
+        if due:
+            self._flush(wait=False)
+        return default if row is None else json.loads(row[0])
+
+    def _flush(self, wait=True, db=None):
+        """
+        Write out pending lookups, in db's transaction if given. Without
+        wait, gives up at once if another connection is writing and keeps
+        them for the next try.
+        """
+        with self._lock:
+            pending, accessed, expired = self._pending, self._accessed, self._expired
+            self._pending, self._accessed, self._expired = Counter(), {}, []
+            self._flushed = time.monotonic()
+        if not (pending or accessed or expired):
+            return
+        try:
+            if db is not None:
+                self._record(db, pending, accessed, expired)
+                return
+            with self._write(wait) as db:
+                self._record(db, pending, accessed, expired)
+        except sqlite3.OperationalError as e:
+            if wait or "locked" not in str(e):
+                raise
+            with self._lock:
+                self._pending.update(pending)
+                for key, when in accessed.items():
+                    self._accessed[key] = max(when, self._accessed.get(key, when))
+                self._expired.extend(expired)
+
+    def _record(self, db, pending, accessed, expired):
+        db.executemany("UPDATE responses SET accessed = MAX(accessed, ?) WHERE key = ?",
+                       [(when, key) for key, when in accessed.items()])
+        for key, created in expired:
+            # Only the entry that was read; a fresh one stored since stays
+            row = db.execute("SELECT size FROM responses WHERE key = ? AND created = ?", (key, created)).fetchone()
+            if row is not None:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                pending["expired"] += 1
+                self._count(db, _BYTES, -row[0])
+        for name, amount in pending.items():
+            self._count(db, name, amount)
+
+    def flush(self):
+        """Write out the bookkeeping of lookups not yet recorded in the file"""
+        self._flush()
+
+    def put(self, endpoint, payload, data):
+        """Store the data for a request, evicting the least recently used entries if over max_bytes"""
+        key = cache_key(endpoint, payload, self.namespace)
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        size = len(text.encode("utf-8"))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        now = time.time()
+        with self._write() as db:
+            # Access times read since the last flush count for eviction
+            self._flush(db=db)
+            replaced = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, data, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, text, size, now, now),
+            )
+            self._count(db, "stores")
+            self._count(db, _BYTES, size - (replaced[0] if replaced else 0))
+            if self.max_bytes is not None:
+                self._evict(db)
+
+    def _evict(self, db):
+        total = db.execute("SELECT value FROM counters WHERE name = ?", (_BYTES,)).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * EVICT_TO)
+        evicted, freed = [], 0
+        rows = db.execute("SELECT key, size FROM responses ORDER BY accessed")
+        for key, size in rows:
+            if freed >= excess:
+                break
+            evicted.append((key,))
+            freed += size
+        rows.close()
+        db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._count(db, "evictions", len(evicted))
+        self._count(db, _BYTES, -freed)
+
+    def fetch(self, endpoint, payload, call, parse=None):
+        """
+        The cached data for a request, or call()'s, which is stored first.
+        parse, if given, turns the data into the value returned; data it
+        raises on is not stored, so a bad answer is asked for again next time.
+        """
+        data = self.get(endpoint, payload, _MISSING)
+        if data is not _MISSING:
+            return parse(data) if parse else data
+        data = call()
+        value = parse(data) if parse else data
+        self.put(endpoint, payload, data)
+        return value
+
+    def purge(self):
+        """Delete expired entries; returns how many"""
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        with self._write() as db:
+            removed, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created < ?",
+                                       (cutoff,)).fetchone()
+            db.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+            self._count(db, "expired", removed)
+            self._count(db, _BYTES, -size)
+        return removed
+
+    def clear(self):
+        """Delete every entry and reset the counters"""
+        with self._lock:
+            self._pending, self._accessed, self._expired = Counter(), {}, []
+        with self._write() as db:
+            db.execute("DELETE FROM responses")
+            db.execute("DELETE FROM counters")
+            self._count(db, _BYTES, 0)
+        self._db.execute("VACUUM")
+
+    def stats(self):
+        """Entries, bytes and counters across every process using the file"""
+        self._flush()
+        db = self._db
+        entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        size = counters.get(_BYTES, 0)
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "path": self.path,
+            "entries": entries,
+            "megabytes": round(size / 1e6, 3),
+            **{name: counters.get(name, 0) for name in _COUNTERS},
+            "hitRate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+    def close(self):
+        self._flush()
+        db = getattr(self._local, "db", None)
+        if db is not None and self._local.pid == os.getpid():
+            db.close()
+        self._local.db = None
+
+
+class _Transaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT, so concurrent writers queue on the lock
+    instead of failing mid-transaction. With wait=False, BEGIN fails at once
+    ("database is locked") if another connection is writing.
+    """
+
+    def __init__(self, db, wait=True):
+        self.db = db
+        self.wait = wait
+
+    def __enter__(self):
+        if self.wait:
+            self.db.execute("BEGIN IMMEDIATE")
+            return self.db
+        self.db.execute("PRAGMA busy_timeout = 0")
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        finally:
+            self.db.execute(f"PRAGMA busy_timeout = {int(LOCK_TIMEOUT * 1000)}")
+        return self.db
+
+    def __exit__(self, kind, error, traceback):
+        self.db.execute("COMMIT" if kind is None else "ROLLBACK")
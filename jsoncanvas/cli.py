@@ -0,0 +1,320 @@
+"""
+Command-line entry point: python -m jsoncanvas <command> ...
+"""
+
+import argparse
+import json
+import sys
+
+from .cache import DEFAULT_CACHE_PATH, DEFAULT_TTL, ResponseCache
+from .client import BASE_URL, DEFAULT_TIMEOUT, JSONCanvasClient
+from .resilience import DEFAULT_POLICIES, BreakerPolicy, EndpointPolicy, HedgePolicy
+
+
+def _add_client_arguments(parser):
+    parser.add_argument("--base-url", default=BASE_URL, help=f"API base URL (default {BASE_URL})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request timeout in seconds")
+
+
+def _run_ingest(args):
+    from .ingest import Checkpoint, ingest, read_records
+
+    if args.checkpoint and args.output == "-":
+        print("error: --checkpoint needs --output, since a resumed run rewrites the output file", file=sys.stderr)
+        return 2
+    checkpoint_path = args.checkpoint or (None if args.output == "-" else f"{args.output}.checkpoint")
+    checkpoint = None if args.no_checkpoint or not checkpoint_path else Checkpoint(checkpoint_path)
+
+    # ingest retries records itself, so the client only hedges and breaks the circuit
+    convert_policy = EndpointPolicy(hedge=HedgePolicy() if args.hedge else None, breaker=BreakerPolicy())
+    cache = ResponseCache(args.cache, ttl=_days(args.cache_ttl)) if args.cache else None
+    client = JSONCanvasClient(args.base_url, timeout=args.timeout,
+                              policies={**DEFAULT_POLICIES, "POST /ai/convert-text": convert_policy}, cache=cache)
+    records = read_records(args.inputs, args.format, args.instructions)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = ingest(
+            client,
+            records,
+            output,
+            checkpoint=checkpoint,
+            concurrency=args.concurrency,
+            retries=args.retries,
+            backoff=args.backoff,
+            progress=None if args.quiet else sys.stderr,
+        )
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun the same command to resume from {checkpoint_path}" if checkpoint else "\nInterrupted", file=sys.stderr)
+        return 130
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if cache:
+            cache.flush()
+
+    summary = {**stats.summary(), "endpoints": client.metrics()}
+    if cache:
+        summary["cache"] = {"hits": cache.hits, "misses": cache.misses}
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    if checkpoint and stats.failed == 0 and not args.keep_checkpoint:
+        checkpoint.remove()
+    return 1 if stats.failed else 0
+
+
+def _comma_list(convert):
+    def parse(text):
+        try:
+            return [convert(item) for item in text.split(",") if item.strip()]
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e)) from e
+    return parse
+
+
+def _rate(text):
+    return None if text.strip() in ("0", "none") else float(text)
+
+
+def _days(days):
+    return None if days <= 0 else days * 86400
+
+
+def _run_cache(args):
+    cache = ResponseCache(args.path, ttl=_days(args.ttl))
+    if args.action == "purge":
+        print(f"Removed {cache.purge()} expired entries", file=sys.stderr)
+    elif args.action == "clear":
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
+    return 0
+
+
+def _run_bench(args):
+    from .bench import ENDPOINTS, compare_reports, run_benchmark, write_report
+
+    endpoints = list(ENDPOINTS) if "all" in args.endpoints else args.endpoints
+    unknown = [endpoint for endpoint in endpoints if endpoint not in ENDPOINTS]
+    if unknown:
+        print(f"error: unknown endpoint {', '.join(unknown)}; choose from {', '.join(ENDPOINTS)} or all", file=sys.stderr)
+        return 2
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    # No retries or hedging: the report should show the API's own latency and errors
+    client = JSONCanvasClient(args.base_url, timeout=args.timeout, policies={})
+    try:
+        report = run_benchmark(
+            client,
+            endpoints=endpoints,
+            sizes=args.sizes,
+            concurrency=args.concurrency,
+            rates=args.rate,
+            requests=args.requests,
+            duration=args.duration,
+            warmup=args.warmup,
+            byte_budget=args.byte_budget,
+            progress=None if args.quiet else sys.stderr,
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted", file=sys.stderr)
+        return 130
+
+    if args.output == "-":
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        write_report(report, args.output)
+        print(f"Report written to {args.output}", file=sys.stderr)
+
+    if baseline is not None:
+        regressions = compare_reports(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+def _run_mcp(args):
+    from .mcp_server import create_server
+
+    server = create_server(
+        args.base_url,
+        timeout=args.timeout,
+        cache_size=args.cache_size,
+        max_connections=args.max_connections,
+        host=args.host,
+        port=args.port,
+    )
+    server.run(args.transport)
+    return 0
+
+
+def _run_conformance(args):
+    from .conformance import run_conformance
+
+    mismatches = run_conformance(args.base_url, timeout=args.timeout, verbose=args.verbose, stream=sys.stderr)
+    return 1 if mismatches else 0
+
+
+def _run_validate(args):
+    from jsonschema import SchemaError
+
+    from .validate import read_documents, validate_all
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = validate_all(
+            read_documents(args.inputs, args.format),
+            args.schema,
+            output,
+            ref_paths=args.ref,
+            jobs=args.jobs,
+            chunk_size=args.chunk_size,
+            include_valid=args.all,
+            progress=None if args.quiet else sys.stderr,
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted", file=sys.stderr)
+        return 130
+    except (OSError, ValueError, SchemaError) as e:
+        print(f"error: {getattr(e, 'message', e)}", file=sys.stderr)
+        return 2
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(json.dumps(stats.summary(), indent=2), file=sys.stderr)
+    return 1 if stats.invalid or stats.unreadable else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="jsoncanvas", description="Tools for the JSON Canvas AI headless API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser(
+        "ingest",
+        help="Convert raw text records to JSON through /ai/convert-text",
+        description="Stream records through /ai/convert-text and write the results as NDJSON in input order.",
+    )
+    ingest.add_argument("inputs", nargs="*", default=["-"], help='Input files; "-" or none reads stdin')
+    ingest.add_argument("-o", "--output", default="-", help="NDJSON output file (default stdout)")
+    ingest.add_argument("-f", "--format", choices=["ndjson", "text", "blocks"], default="ndjson",
+                        help="ndjson: strings or {text, id, instructions}; text: one record per line; "
+                             "blocks: records separated by blank lines")
+    ingest.add_argument("-i", "--instructions", default="", help="Instructions for records that have none")
+    ingest.add_argument("-c", "--concurrency", type=int, default=4, help="Requests in flight (default 4)")
+    ingest.add_argument("--retries", type=int, default=3, help="Retries for rate limits and server errors")
+    ingest.add_argument("--backoff", type=float, default=1.0, help="First retry delay in seconds, doubled each time")
+    ingest.add_argument("--hedge", action="store_true",
+                        help="Resend conversions slower than the recent p95 and keep the first answer (can double model usage)")
+    ingest.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH,
+                        help=f"Answer records converted before from an on-disk cache (default file {DEFAULT_CACHE_PATH})")
+    ingest.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL / 86400,
+                        help=f"Days a cached answer is served; 0 for no limit (default {DEFAULT_TTL // 86400})")
+    ingest.add_argument("--checkpoint", help="Checkpoint journal (default OUTPUT.checkpoint)")
+    ingest.add_argument("--no-checkpoint", action="store_true", help="Do not record or resume progress")
+    ingest.add_argument("--keep-checkpoint", action="store_true", help="Keep the journal after a clean run")
+    ingest.add_argument("-q", "--quiet", action="store_true", help="No live progress")
+    _add_client_arguments(ingest)
+    ingest.set_defaults(run=_run_ingest)
+
+    from .bench import DEFAULT_BYTE_BUDGET, PAYLOAD_SIZES, SWEPT_ENDPOINTS, format_size, parse_size
+
+    bench = commands.add_parser(
+        "bench",
+        help="Measure latency and throughput of the API under load",
+        description="Drive API endpoints under load and write a JSON latency and throughput report. "
+                    "The manipulate and documents routes are swept over payload sizes.",
+    )
+    bench.add_argument("-e", "--endpoints", type=_comma_list(str), default=list(SWEPT_ENDPOINTS),
+                       help="Comma-separated endpoints, or all (default manipulate,documents); "
+                            "convert-text, enhance-field and format-json call the configured model")
+    bench.add_argument("-s", "--sizes", type=_comma_list(parse_size), default=list(PAYLOAD_SIZES),
+                       help=f"Payload sizes for swept routes (default {','.join(format_size(size) for size in PAYLOAD_SIZES)})")
+    bench.add_argument("-c", "--concurrency", type=_comma_list(int), default=[4],
+                       help="Comma-separated worker counts to run each scenario at (default 4)")
+    bench.add_argument("-r", "--rate", type=_comma_list(_rate), default=[None],
+                       help="Comma-separated request rates per second; 0 sends as fast as answers come back (default)")
+    bench.add_argument("-n", "--requests", type=int, default=50, help="Requests per scenario (default 50)")
+    bench.add_argument("--duration", type=float, help="Stop each scenario after this many seconds")
+    bench.add_argument("--warmup", type=int, default=2, help="Unmeasured requests before each scenario (default 2)")
+    bench.add_argument("--byte-budget", type=parse_size, default=DEFAULT_BYTE_BUDGET,
+                       help=f"Bytes sent per sweep scenario before fewer requests are made (default {format_size(DEFAULT_BYTE_BUDGET)})")
+    bench.add_argument("-o", "--output", default="bench-report.json", help='Report file; "-" for stdout (default bench-report.json)')
+    bench.add_argument("--baseline", help="Earlier report to compare with; exits 1 on a regression")
+    bench.add_argument("--threshold", type=float, default=0.1,
+                       help="Slowdown, as a fraction, that counts as a regression (default 0.1)")
+    bench.add_argument("-q", "--quiet", action="store_true", help="No per-scenario progress")
+    _add_client_arguments(bench)
+    bench.set_defaults(run=_run_bench)
+
+    mcp = commands.add_parser(
+        "mcp",
+        help="Run an MCP server with document, path and AI tools",
+        description="Serve JSON Canvas tools over MCP. Path edits apply to cached documents in-process; "
+                    "put_document saves them through the API. Needs the mcp and httpx packages (mcp-venv).",
+    )
+    mcp.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio",
+                     help="MCP transport (default stdio)")
+    mcp.add_argument("--host", default="127.0.0.1", help="Host for the HTTP transports")
+    mcp.add_argument("--port", type=int, default=8765, help="Port for the HTTP transports (default 8765)")
+    mcp.add_argument("--cache-size", type=int, default=64, help="Unedited documents kept in memory (default 64)")
+    mcp.add_argument("--max-connections", type=int, default=10, help="Pooled connections to the API (default 10)")
+    _add_client_arguments(mcp)
+    mcp.set_defaults(run=_run_mcp)
+
+    validate = commands.add_parser(
+        "validate",
+        help="Validate JSON files or NDJSON records against a JSON Schema",
+        description="Validate documents against a JSON Schema on a pool of worker processes and write "
+                    "{source, valid, errors} NDJSON lines for the invalid ones, in input order. "
+                    "Needs the jsonschema package (mcp-venv). Exits 1 if any document fails.",
+    )
+    validate.add_argument("inputs", nargs="*", default=["-"],
+                          help='Files or directories; "-" or none reads NDJSON from stdin')
+    validate.add_argument("-s", "--schema", required=True, help="JSON Schema file")
+    validate.add_argument("--ref", action="append", default=[],
+                          help="Another schema that $refs point to by its $id; repeatable")
+    validate.add_argument("-f", "--format", choices=["auto", "json", "ndjson"], default="auto",
+                          help="auto: .ndjson and .jsonl files are NDJSON, others one document each")
+    validate.add_argument("-o", "--output", default="-", help="NDJSON results file (default stdout)")
+    validate.add_argument("-j", "--jobs", type=int, help="Worker processes (default one per CPU)")
+    validate.add_argument("--chunk-size", type=int, default=256, help="Documents per chunk sent to a worker (default 256)")
+    validate.add_argument("--all", action="store_true", help="Write a line for valid documents too")
+    validate.add_argument("-q", "--quiet", action="store_true", help="No live progress")
+    validate.set_defaults(run=_run_validate)
+
+    cache = commands.add_parser(
+        "cache",
+        help="Show, purge or clear the on-disk AI response cache",
+        description="Print the cache's entry count, size and hit/miss counters across every process that used it. "
+                    "purge first deletes entries older than --ttl; clear deletes everything.",
+    )
+    cache.add_argument("action", nargs="?", choices=["stats", "purge", "clear"], default="stats")
+    cache.add_argument("--path", default=DEFAULT_CACHE_PATH, help=f"Cache file (default {DEFAULT_CACHE_PATH})")
+    cache.add_argument("--ttl", type=float, default=DEFAULT_TTL / 86400,
+                       help=f"Days an entry is kept by purge; 0 for no limit (default {DEFAULT_TTL // 86400})")
+    cache.set_defaults(run=_run_cache)
+
+    conformance = commands.add_parser(
+        "conformance",
+        help="Check that in-process manipulate_json answers as the API does",
+        description="Send each conformance case to /api/json/manipulate, run it through the in-process "
+                    "path operations too, and exit 1 if any result or error differs.",
+    )
+    conformance.add_argument("-v", "--verbose", action="store_true", help="List the cases that agree too")
+    _add_client_arguments(conformance)
+    conformance.set_defaults(run=_run_conformance)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.run(args)
@@ -0,0 +1,311 @@
+"""
+JSON Canvas AI - Python client for the headless API
+"""
+
+import copy
+import json
+import threading
+from collections import OrderedDict
+
+from . import path_ops
+from .errors import APIError, CircuitOpenError, VersionConflictError
+from .resilience import Resilience
+from .stream import STREAM_CHUNK_SIZE, extract, iter_items
+
+try:
+    import requests
+except ImportError:
+    # The MCP server runs in mcp-venv, which talks to the API through httpx
+    requests = None
+
+BASE_URL = "http://localhost:9002/api"
+DEFAULT_TIMEOUT = 120
+# Bytes of documents (as compact JSON) kept, with their ETags, to revalidate instead of downloading again
+DOCUMENT_CACHE_BYTES = 64 * 1024 * 1024
+
+_MISSING = object()
+
+
+def _retry_after(response):
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+class JSONCanvasClient:
+    """Complete Python client for JSON Canvas AI"""
+
+    def __init__(self, base_url=BASE_URL, timeout=DEFAULT_TIMEOUT, local_manipulation=True, policies=None,
+                 metrics_listener=None, cache=None, document_cache_bytes=DOCUMENT_CACHE_BYTES):
+        """
+        policies maps endpoints to retry, hedging and circuit breaker
+        settings (see jsoncanvas.resilience; default DEFAULT_POLICIES, {} for
+        none). metrics_listener(event, route, fields) hears each retry,
+        hedge and breaker change. cache, a jsoncanvas.cache.ResponseCache,
+        answers AI calls already made with the same input. get_document
+        keeps the documents it fetched last, up to document_cache_bytes of
+        them as JSON, and asks the server only whether they changed (0 to
+        keep none).
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # manipulate_json runs in-process unless told otherwise
+        self.local_manipulation = local_manipulation
+        self.resilience = Resilience(policies, metrics_listener)
+        self.cache = cache
+        self.document_cache_bytes = document_cache_bytes
+        # (etag, data, size) by request path, least recently used first
+        self._documents = OrderedDict()
+        self._documents_bytes = 0
+        self._documents_lock = threading.Lock()
+        # requests sessions are not thread-safe, so each thread gets its own
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            if requests is None:
+                raise ImportError("JSONCanvasClient needs the requests package")
+            session = self._local.session = requests.Session()
+        return session
+
+    def _open(self, method, path, payload=None, headers=None):
+        """
+        Send a request and return the response with its body still unread.
+        payload may be bytes already encoded as JSON, to send the same large
+        body many times without encoding it each time. A 304 is returned,
+        not raised, for a request that sent If-None-Match.
+        """
+        headers = dict(headers or {})
+        if payload is None:
+            kwargs = {}
+        elif isinstance(payload, bytes):
+            kwargs = {"data": payload}
+            headers["Content-Type"] = "application/json"
+        else:
+            kwargs = {"json": payload}
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, stream=True,
+                                            headers=headers or None, **kwargs)
+        except requests.RequestException as e:
+            raise APIError(f"API Error: {e}") from e
+
+        if response.status_code == 304 and "If-None-Match" in headers:
+            return response
+        if response.status_code != 200:
+            error = VersionConflictError if response.status_code == 409 else APIError
+            with response:
+                raise error(f"API Error: {response.text}", response.status_code, _retry_after(response))
+        return response
+
+    def metrics(self):
+        """Calls, retries, hedges, breaker state and latency per endpoint"""
+        return self.resilience.snapshot()
+
+    def _request(self, method, path, payload=None, select="data", exclude=(), default=_MISSING):
+        """
+        Send a request and decode only the member of a successful response at
+        select, leaving out the exclude paths under it. The body is decoded as
+        it arrives and the rest of it is left unread, so echoes and history
+        the caller does not need are never held in memory.
+        """
+        def attempt():
+            with self._open(method, path, payload) as response:
+                try:
+                    return extract(response.iter_content(STREAM_CHUNK_SIZE), ["success", select], exclude, _MISSING)
+                except requests.RequestException as e:
+                    raise APIError(f"API Error: {e}") from e
+
+        success, value = self.resilience.call(method, path, attempt)
+        if success is _MISSING or not success:
+            raise APIError("API Error: the response does not report success", 200)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise APIError(f"API Error: the response has no {select}", 200)
+            return default
+        return value
+
+    def _post(self, path, payload, **kwargs):
+        """POST a JSON body and return the "data" member of a successful response"""
+        return self._request("POST", path, payload, **kwargs)
+
+    def post(self, path, payload, select="data"):
+        """
+        POST payload to an API path such as "/json/manipulate" and return
+        the member of a successful response at select (a dotted path).
+        payload may be bytes already encoded as JSON.
+        """
+        return self._post(path, payload, select=select)
+
+    def _iter(self, path, items):
+        """GET path and yield the elements of the array at items one at a time"""
+        # Never hedged: the duplicate's open response would be left unread
+        response = self.resilience.call("GET", path, lambda: self._open("GET", path), hedge=False)
+        with response:
+            try:
+                yield from iter_items(response.iter_content(STREAM_CHUNK_SIZE), items)
+            except requests.RequestException as e:
+                raise APIError(f"API Error: {e}") from e
+
+    def _ai(self, path, payload, parse):
+        """POST to an AI endpoint, through the cache if there is one; returns parse(data)"""
+        if self.cache is None:
+            return parse(self._post(path, payload))
+        return self.cache.fetch(path, payload, lambda: self._post(path, payload), parse)
+
+    def convert_text_to_json(self, text, instructions=""):
+        """Convert text to structured JSON"""
+        return self._ai("/ai/convert-text", {
+            "rawText": text,
+            "instructions": instructions
+        }, lambda data: json.loads(data["generatedJson"]))
+
+    def enhance_field(self, content, prompt):
+        """Enhance a field using AI"""
+        return self._ai("/ai/enhance-field", {
+            "fieldContent": content,
+            "userPrompt": prompt
+        }, lambda data: data["enhancedContent"])
+
+    def format_json(self, json_string, instructions=""):
+        """Format and fix JSON"""
+        return self._ai("/ai/format-json", {
+            "jsonString": json_string,
+            "instructions": instructions
+        }, lambda data: data["formattedJson"])
+
+    def create_document(self, data, name=None):
+        """Create a new document"""
+        return self._post("/documents", {
+            "data": data,
+            "name": name
+        })
+
+    def _get_revalidated(self, path, exclude=()):
+        """
+        GET path and return the "data" member of the response. The data is
+        kept with its ETag, and the next GET of path sends that ETag, so an
+        unchanged resource comes back as an empty 304 and is answered from
+        the copy kept. Callers get their own copy either way.
+        """
+        with self._documents_lock:
+            cached = self._documents.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else None
+
+        def attempt():
+            with self._open("GET", path, headers=headers) as response:
+                if response.status_code == 304:
+                    return cached[0], True, cached[1], cached[2]
+                try:
+                    success, value = extract(response.iter_content(STREAM_CHUNK_SIZE), ["success", "data"], exclude, _MISSING)
+                except requests.RequestException as e:
+                    raise APIError(f"API Error: {e}") from e
+                return response.headers.get("ETag"), success, value, None
+
+        etag, success, value, size = self.resilience.call("GET", path, attempt)
+        if success is _MISSING or not success:
+            raise APIError("API Error: the response does not report success", 200)
+        if value is _MISSING:
+            raise APIError("API Error: the response has no data", 200)
+        if etag and self.document_cache_bytes > 0:
+            if size is None:
+                size = len(json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+            self._keep_document(path, etag, value, size)
+        return copy.deepcopy(value)
+
+    def _keep_document(self, path, etag, value, size):
+        """Keep a document for revalidation, dropping the least recently used past document_cache_bytes"""
+        with self._documents_lock:
+            self._forget_document(path)
+            if size > self.document_cache_bytes:
+                return
+            self._documents[path] = (etag, value, size)
+            self._documents_bytes += size
+            while self._documents_bytes > self.document_cache_bytes:
+                self._forget_document(next(iter(self._documents)))
+
+    def _forget_document(self, path):
+        # Callers hold _documents_lock
+        kept = self._documents.pop(path, None)
+        if kept is not None:
+            self._documents_bytes -= kept[2]
+
+    def get_document(self, document_id, include_history=False):
+        """Get a document; its history, which holds a full copy per entry, only when asked"""
+        if include_history:
+            return self._get_revalidated(f"/documents/{document_id}")
+        # The server leaves the history out; servers that predate
+        # includeHistory send it and it is skipped while decoding
+        return self._get_revalidated(f"/documents/{document_id}?includeHistory=false", exclude=["history"])
+
+    def update_document(self, document_id, data=None, name=None, add_to_history=False, version=None):
+        """
+        Replace a document's data and/or name. With version (the "version"
+        of the document as last read), raises VersionConflictError instead
+        of overwriting a newer write.
+        """
+        payload = {"data": data, "name": name, "addToHistory": add_to_history}
+        if version is not None:
+            payload["baseVersion"] = version
+        return self._request("PUT", f"/documents/{document_id}", payload)
+
+    def patch_document(self, document_id, operations, version, name=None, add_to_history=False):
+        """
+        Apply JSON Patch operations (e.g. from path_ops.diff_json) to the
+        data of the document at version; raises VersionConflictError if it
+        has changed since. Returns {id, name, version, metadata}.
+        """
+        payload = {"operations": operations, "baseVersion": version, "addToHistory": add_to_history}
+        if name is not None:
+            payload["name"] = name
+        return self._request("PATCH", f"/documents/{document_id}", payload)
+
+    def delete_document(self, document_id):
+        """Delete a document"""
+        self._request("DELETE", f"/documents/{document_id}", select="message", default=None)
+        prefix = f"/documents/{document_id}"
+        with self._documents_lock:
+            for path in [path for path in self._documents if path.split("?", 1)[0] == prefix]:
+                self._forget_document(path)
+
+    def iter_document_history(self, document_id):
+        """Yield a document's history entries one at a time, oldest first"""
+        return self._iter(f"/documents/{document_id}", "data.history")
+
+    def manipulate_json(self, operation, json_data, local=None, response_shape="result", **kwargs):
+        """
+        Perform JSON manipulation. Runs in-process with path_ops, which answers
+        as /api/json/manipulate does, unless local is False (or the client was
+        made with local_manipulation=False). Returns {isValid, errors} for
+        validate; otherwise, by response_shape, the edited document
+        ("result"), the JSON Patch from json_data to it ("patch"), or the
+        changed subtree as {path, value} ("subtree"; path is None when
+        nothing changed).
+        """
+        payload = {
+            "operation": operation,
+            "jsonData": json_data,
+            "responseShape": response_shape,
+            **kwargs
+        }
+        if self.local_manipulation if local is None else local:
+            try:
+                data = path_ops.manipulate(payload)
+            except path_ops.ManipulateError as e:
+                raise APIError(f"API Error: {e.text}", e.status) from e
+        elif operation == "validate":
+            data = self._post("/json/manipulate", payload, exclude=["originalData"])
+        elif response_shape in ("result", "full"):
+            # A full response echoes the input after the result, so stop reading at the result
+            return self._post("/json/manipulate", payload, select="data.result", default=None)
+        else:
+            data = self._post("/json/manipulate", payload)
+        if operation == "validate":
+            return {"isValid": data["isValid"], "errors": data["errors"]}
+        if response_shape == "patch":
+            return data["patch"]
+        if response_shape == "subtree":
+            return {"path": data["path"], "value": data.get("value")}
+        return data.get("result")
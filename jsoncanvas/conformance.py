@@ -0,0 +1,181 @@
+"""
+Conformance suite for the in-process manipulate operations
+
+Sends every case to /api/json/manipulate and runs it through
+path_ops.manipulate, and reports any case where the two disagree on the
+status, the result, or the error message. Run it against a build with:
+
+    python -m jsoncanvas conformance --base-url http://localhost:9002/api
+"""
+
+import json
+
+import requests
+
+from . import path_ops
+from .client import DEFAULT_TIMEOUT
+
+HOUSE = {
+    "name": "House",
+    "floors": 2,
+    "rooms": [
+        {"name": "Kitchen", "area": 12.5, "items": ["stove", "sink"]},
+        {"name": "Hall", "area": 4, "items": []},
+    ],
+    "owner": {"first": "Ada", "last": "Lovelace", "tags": None},
+    "": "empty key",
+}
+
+# Request bodies, as a client would send them
+CASES = [
+    # addProperty
+    {"operation": "addProperty", "jsonData": HOUSE, "path": [], "key": "garage", "value": True},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["owner"], "key": "age", "value": 36},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["owner"], "key": "first", "value": "x"},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["rooms"], "key": "x", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["missing"], "key": "x", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["owner"], "key": "toString", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["owner"], "key": "__proto__", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["owner"], "key": "10", "value": "ten"},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["owner"], "key": 7, "value": "seven"},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["rooms", "0"], "key": "door", "value": None},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["rooms", " 1"], "key": "door", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["rooms", "1abc"], "key": "door", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["rooms", 1.5], "key": "door", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": ["owner", "constructor"], "key": "x", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": "owner", "key": "x", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": 5, "key": "x", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": [], "key": "", "value": 1},
+    {"operation": "addProperty", "jsonData": HOUSE, "path": [], "key": "x"},
+    {"operation": "addProperty", "jsonData": HOUSE, "key": "x", "value": 1},
+    # addItem
+    {"operation": "addItem", "jsonData": HOUSE, "path": ["rooms"], "value": {"name": "Study"}},
+    {"operation": "addItem", "jsonData": HOUSE, "path": ["rooms", 0, "items"], "value": "oven"},
+    {"operation": "addItem", "jsonData": HOUSE, "path": ["owner"], "value": 1},
+    {"operation": "addItem", "jsonData": [1, 2], "path": [], "value": None},
+    {"operation": "addItem", "jsonData": HOUSE, "path": ["rooms", -1, "items"], "value": 1},
+    {"operation": "addItem", "jsonData": HOUSE, "path": ["rooms", "length"], "value": 1},
+    {"operation": "addItem", "jsonData": HOUSE, "path": ["rooms"]},
+    # delete
+    {"operation": "delete", "jsonData": HOUSE, "path": ["floors"]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["rooms", 0]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["rooms", "1"]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["rooms", 5]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["rooms", "x"]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["rooms", 0.5]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["nothing", "here"]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["owner", "nope"]},
+    {"operation": "delete", "jsonData": HOUSE, "path": ["owner", "first"], "key": "ignored"},
+    {"operation": "delete", "jsonData": HOUSE, "path": [""]},
+    {"operation": "delete", "jsonData": HOUSE, "path": []},
+    {"operation": "delete", "jsonData": HOUSE, "path": True},
+    {"operation": "delete", "jsonData": HOUSE},
+    # renameProperty
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": [], "key": "name", "newKey": "title"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["owner"], "key": "first", "newKey": "given"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["owner"], "key": "first", "newKey": "last"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["owner"], "key": "middle", "newKey": "x"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["owner"], "key": "first", "newKey": "first"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["owner"], "key": "first", "newKey": "3"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["owner"], "key": "toString", "newKey": "x"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["owner"], "key": "first", "newKey": "valueOf"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": ["rooms"], "key": "0", "newKey": "x"},
+    {"operation": "renameProperty", "jsonData": HOUSE, "path": [], "key": "name"},
+    # setValue
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["name"], "value": "Home"},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["rooms", 1, "area"], "value": 5},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["owner", "tags", "x"], "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["owner", "nickname"], "value": "AL"},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["owner", "12"], "value": "twelve"},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["rooms", 4], "value": {"name": "Attic"}},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["rooms", "01"], "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["rooms", "01", "name"], "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["rooms", "length"], "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["rooms", "length"], "value": -1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["rooms", 0, "items", -1], "value": "x"},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["missing", "deeper"], "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["owner", "toString", "x"], "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["owner", "__proto__"], "value": {"polluted": True}},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["name"]},
+    {"operation": "setValue", "jsonData": HOUSE, "path": [], "value": [1, 2, 3]},
+    {"operation": "setValue", "jsonData": HOUSE, "path": [], "value": None},
+    {"operation": "setValue", "jsonData": HOUSE, "path": "name", "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": "zz", "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": 3, "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": None, "value": 1},
+    {"operation": "setValue", "jsonData": "text", "path": ["x"], "value": 1},
+    {"operation": "setValue", "jsonData": HOUSE, "path": [None, 1], "value": 1},
+    # validate and request errors
+    {"operation": "validate", "jsonData": HOUSE},
+    {"operation": "transmogrify", "jsonData": HOUSE},
+    {"operation": "addItem", "jsonData": 0, "path": [], "value": 1},
+    {"operation": "addItem", "jsonData": [], "path": [], "value": 1},
+    {"operation": "", "jsonData": HOUSE},
+    {"jsonData": HOUSE},
+]
+
+# Every case again in each slim response shape, then bad shapes and a body
+# large enough to leave out the echo by default
+CASES += [{**body, "responseShape": shape} for shape in ("result", "patch", "subtree") for body in CASES]
+CASES += [
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["name"], "value": "Home", "responseShape": "full"},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["name"], "value": "Home", "responseShape": None},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["name"], "value": "Home", "responseShape": "diff"},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["name"], "value": "Home", "responseShape": ["patch"]},
+    {"operation": "setValue", "jsonData": HOUSE, "path": ["name"], "value": "Home", "responseShape": False},
+    {"operation": "transmogrify", "jsonData": HOUSE, "responseShape": "diff"},
+    {"operation": "setValue", "jsonData": {**HOUSE, "notes": ["x" * 1000] * 1100}, "path": ["floors"], "value": 3},
+    {"operation": "validate", "jsonData": {**HOUSE, "notes": ["x" * 1000] * 1100}},
+]
+
+
+def _canonical(value):
+    """JSON text as the server would serialize it, so key order is compared too"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _request_text(body):
+    # ASCII, so the route's character count is the same as Python's
+    return json.dumps(body)
+
+
+def run_local(body):
+    """(status, canonical body) of the in-process answer"""
+    try:
+        data = path_ops.manipulate(body, len(_request_text(body)))
+    except path_ops.ManipulateError as e:
+        return e.status, e.text
+    return 200, _canonical({"success": True, "data": data})
+
+
+def run_remote(session, base_url, body, timeout=DEFAULT_TIMEOUT):
+    response = session.post(f"{base_url.rstrip('/')}/json/manipulate", data=_request_text(body).encode(),
+                            headers={"Content-Type": "application/json"}, timeout=timeout)
+    try:
+        # Parse and re-serialize so whitespace differences do not count
+        return response.status_code, _canonical(response.json())
+    except ValueError:
+        return response.status_code, response.text
+
+
+def run_conformance(base_url, cases=CASES, timeout=DEFAULT_TIMEOUT, verbose=False, stream=None):
+    """Returns the number of cases where the route and manipulate() disagree"""
+    session = requests.Session()
+    mismatches = 0
+    for number, body in enumerate(cases, 1):
+        remote = run_remote(session, base_url, body, timeout)
+        local = run_local(body)
+        label = f"#{number} {body.get('operation')!s} path={json.dumps(body.get('path'))[:80]}"
+        if "responseShape" in body:
+            label += f" shape={json.dumps(body['responseShape'])}"
+        if remote == local:
+            if verbose and stream:
+                stream.write(f"ok    {label}\n")
+            continue
+        mismatches += 1
+        if stream:
+            stream.write(f"FAIL  {label}\n  route: {remote[0]} {remote[1][:500]}\n  local: {local[0]} {local[1][:500]}\n")
+    if stream:
+        stream.write(f"{len(cases) - mismatches}/{len(cases)} cases agree\n")
+    return mismatches
@@ -0,0 +1,29 @@
+"""
+Errors raised for API calls
+
+Kept apart from the client so that modules the client builds on, such as
+resilience, can raise them too.
+"""
+
+
+class APIError(Exception):
+    """Raised when the API answers with an error or an unexpected body"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        # Seconds the server asked us to wait (Retry-After), if it said
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        """True for rate limiting, server errors and connection failures"""
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+class CircuitOpenError(APIError):
+    """Raised without a request while an endpoint's circuit breaker is open"""
+
+
+class VersionConflictError(APIError):
+    """Raised when a document changed since the version a write was based on"""
@@ -0,0 +1,335 @@
+"""
+Bulk conversion of raw text records through /api/ai/convert-text
+
+Records are read lazily from files or stdin and converted with a bounded
+number of requests in flight. Results are written as NDJSON in input order,
+whatever order the requests finish in. Every finished record is also
+appended to a checkpoint journal, so an interrupted run resumes without
+converting a finished record again.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .client import APIError
+
+Record = namedtuple("Record", "seq id text instructions")
+
+FORMATS = ("ndjson", "text", "blocks")
+PROGRESS_INTERVAL = 0.5
+# Completed records held back waiting for a slow earlier one, per worker
+REORDER_WINDOW = 64
+
+
+def _open_input(path):
+    if path == "-":
+        return sys.stdin
+    return open(path, encoding="utf-8")
+
+
+def read_records(paths, fmt="ndjson", instructions=""):
+    """
+    Yield Records from each path in turn ("-" is stdin).
+
+    ndjson: one JSON value per line, either a string or an object with
+            "text" (or "rawText") and optional "id" and "instructions"
+    text:   one record per non-empty line
+    blocks: records separated by blank lines
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown input format: {fmt}")
+
+    seq = 0
+    for path in paths:
+        stream = _open_input(path)
+        try:
+            block = []
+            for line_number, line in enumerate(stream, 1):
+                line = line.rstrip("\r\n")
+                if fmt == "blocks":
+                    if line.strip():
+                        block.append(line)
+                        continue
+                    if not block:
+                        continue
+                    text, block = "\n".join(block), []
+                    yield Record(seq, None, text, instructions)
+                    seq += 1
+                    continue
+
+                if not line.strip():
+                    continue
+                if fmt == "text":
+                    yield Record(seq, None, line, instructions)
+                    seq += 1
+                    continue
+
+                try:
+                    value = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({e.msg})") from e
+                if isinstance(value, str):
+                    yield Record(seq, None, value, instructions)
+                elif isinstance(value, dict) and isinstance(value.get("text", value.get("rawText")), str):
+                    yield Record(
+                        seq,
+                        value.get("id"),
+                        value.get("text", value.get("rawText")),
+                        value.get("instructions", instructions),
+                    )
+                else:
+                    raise ValueError(f'{path}:{line_number}: expected a string or an object with "text"')
+                seq += 1
+
+            if block:
+                yield Record(seq, None, "\n".join(block), instructions)
+                seq += 1
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def record_key(record):
+    """Fingerprint of a record's input, so a checkpoint is never applied to different input"""
+    digest = hashlib.sha1()
+    digest.update(record.text.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((record.instructions or "").encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class Checkpoint:
+    """Append-only journal of finished records, one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """Return {seq: entry} for every record already finished"""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by the interruption
+                    continue
+                entries[entry["seq"]] = entry
+        return entries
+
+    def append(self, entry):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class IngestStats:
+    """Counters and latencies for the live progress line and the summary"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.converted = 0
+        self.failed = 0
+        self.resumed = 0
+        self.retries = 0
+        self.latencies = []
+        self.errors = {}
+
+    def record(self, entry):
+        if entry["ok"]:
+            self.converted += 1
+        else:
+            self.failed += 1
+            kind = entry["error"].split(":", 1)[0]
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+        self.retries += entry["attempts"] - 1
+        self.latencies.append(entry["ms"])
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def line(self, in_flight=0):
+        rate = (self.converted + self.failed) / self.elapsed if self.elapsed > 0 else 0.0
+        latency = sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+        return (
+            f"converted {self.converted}  failed {self.failed}  resumed {self.resumed}  "
+            f"in flight {in_flight}  {rate:.1f} rec/s  avg {latency:.0f} ms  retries {self.retries}"
+        )
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+        return {
+            "converted": self.converted,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "retries": self.retries,
+            "seconds": round(self.elapsed, 3),
+            "recordsPerSecond": round((self.converted + self.failed) / self.elapsed, 2) if self.elapsed > 0 else 0.0,
+            "latencyMs": {"p50": percentile(50), "p95": percentile(95), "max": latencies[-1] if latencies else 0.0},
+            "errors": self.errors,
+        }
+
+
+def convert_record(client, record, retries=3, backoff=1.0):
+    """Convert one record, retrying retryable failures with exponential backoff"""
+    started = time.monotonic()
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            data = client.convert_text_to_json(record.text, record.instructions or "")
+            entry = {"ok": True, "data": data}
+            break
+        except APIError as e:
+            if not e.retryable or attempts > retries:
+                entry = {"ok": False, "error": f"APIError: {e}"}
+                break
+            time.sleep(e.retry_after or backoff * 2 ** (attempts - 1))
+        except ValueError as e:
+            # The model returned text that is not JSON
+            entry = {"ok": False, "error": f"InvalidJSON: {e}"}
+            break
+        except (KeyError, TypeError) as e:
+            # The response is missing the field we read, or is not an object
+            entry = {"ok": False, "error": f"BadResponse: {type(e).__name__}: {e}"}
+            break
+    entry.update({"seq": record.seq, "id": record.id, "attempts": attempts, "ms": round((time.monotonic() - started) * 1000, 1)})
+    return entry
+
+
+class Progress:
+    """A live progress line for a run, drawn from its stats' line(in_flight)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.interactive = bool(stream) and stream.isatty()
+        self.last = 0.0
+
+    def update(self, stats, in_flight, force=False):
+        if not self.stream:
+            return
+        now = time.monotonic()
+        # Redraw in place on a terminal; log a line every few seconds otherwise
+        interval = PROGRESS_INTERVAL if self.interactive else PROGRESS_INTERVAL * 10
+        if not force and now - self.last < interval:
+            return
+        self.last = now
+        if self.interactive:
+            self.stream.write("\r\033[K" + stats.line(in_flight))
+        else:
+            self.stream.write(stats.line(in_flight) + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        if self.stream and self.interactive:
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def ingest(client, records, output, checkpoint=None, concurrency=4, retries=3, backoff=1.0, progress=sys.stderr):
+    """
+    Convert records and write one NDJSON line per record to output, in
+    input order. Records found in the checkpoint with the same input are
+    written from it instead of being converted again; failed ones are
+    retried. Returns IngestStats.
+    """
+    concurrency = max(1, concurrency)
+    finished = checkpoint.load() if checkpoint else {}
+    stats = IngestStats()
+    meter = Progress(progress)
+
+    ready = {}
+    next_seq = [0]
+
+    def write_ready():
+        while next_seq[0] in ready:
+            entry = ready.pop(next_seq[0])
+            entry.pop("key", None)
+            output.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            next_seq[0] += 1
+
+    def complete(future):
+        record, key = in_flight.pop(future)
+        entry = future.result()
+        stats.record(entry)
+        if checkpoint:
+            checkpoint.append({**entry, "key": key})
+        ready[record.seq] = entry
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for record in records:
+                key = record_key(record)
+                previous = finished.get(record.seq)
+                # Failed records are tried again
+                if previous is not None and previous.get("key") == key and previous.get("ok"):
+                    stats.resumed += 1
+                    ready[record.seq] = previous
+                    write_ready()
+                    continue
+
+                # Bound both the requests in flight and the results waiting on a slow record
+                while in_flight and (len(in_flight) >= concurrency or len(ready) >= concurrency * REORDER_WINDOW):
+                    done, _ = wait(list(in_flight), timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        complete(future)
+                    write_ready()
+                    meter.update(stats, len(in_flight))
+
+                future = pool.submit(convert_record, client, record, retries, backoff)
+                in_flight[future] = (record, key)
+                meter.update(stats, len(in_flight))
+
+            while in_flight:
+                done, _ = wait(list(in_flight), timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    complete(future)
+                write_ready()
+                meter.update(stats, len(in_flight))
+        except BaseException:
+            # Let requests already sent finish into the checkpoint before stopping
+            for future in list(in_flight):
+                future.cancel()
+            for future in list(in_flight):
+                if not future.cancelled():
+                    try:
+                        complete(future)
+                    except Exception:
+                        pass
+            raise
+        finally:
+            write_ready()
+            output.flush()
+            meter.update(stats, len(in_flight), force=True)
+            meter.finish()
+            if checkpoint:
+                checkpoint.close()
+
+    return stats
@@ -0,0 +1,295 @@
+"""
+MCP server for JSON Canvas
+
+Exposes documents, path edits and the AI helpers as MCP tools. Documents
+are fetched once into an in-process cache and path edits are applied to
+the cached copy with jsoncanvas.path_ops, so an agent's edit loop makes no
+network round trips; put_document sends the edits back as a JSON Patch
+against the version that was fetched, so saving a small edit to a large
+document is a small request and never overwrites someone else's write.
+Calls that do need the API share one pooled HTTP client.
+
+Run from mcp-venv, which has the mcp and httpx packages:
+
+    python -m jsoncanvas mcp                       # stdio
+    python -m jsoncanvas mcp --transport streamable-http --port 8765
+"""
+
+import asyncio
+import json
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import partial
+
+import httpx
+from mcp.server.fastmcp import FastMCP
+
+from . import path_ops
+from .client import BASE_URL, DEFAULT_TIMEOUT, APIError, VersionConflictError
+
+# Clean documents kept in the cache; documents with unsent edits are never evicted
+DEFAULT_CACHE_SIZE = 64
+DEFAULT_MAX_CONNECTIONS = 10
+
+
+class AsyncAPI:
+    """Pooled async HTTP client for the endpoints the server calls"""
+
+    def __init__(self, base_url=BASE_URL, timeout=DEFAULT_TIMEOUT, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self._http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def _request(self, method, path, payload=None):
+        try:
+            response = await self._http.request(method, path, json=payload)
+        except httpx.HTTPError as e:
+            raise APIError(f"API Error: {e}") from e
+        if response.status_code == 200:
+            result = response.json()
+            if result.get("success"):
+                return result["data"]
+        error = VersionConflictError if response.status_code == 409 else APIError
+        raise error(f"API Error: {response.text}", response.status_code)
+
+    async def get_document(self, document_id):
+        # Only the current data is cached, so leave the history on the server
+        return await self._request("GET", f"/documents/{document_id}?includeHistory=false")
+
+    async def create_document(self, data, name=None):
+        return await self._request("POST", "/documents", {"data": data, "name": name})
+
+    async def update_document(self, document_id, data, name=None):
+        return await self._request("PUT", f"/documents/{document_id}", {"data": data, "name": name, "addToHistory": True})
+
+    async def patch_document(self, document_id, operations, version, name=None):
+        payload = {"operations": operations, "baseVersion": version, "addToHistory": True}
+        if name is not None:
+            payload["name"] = name
+        return await self._request("PATCH", f"/documents/{document_id}", payload)
+
+    async def convert_text(self, text, instructions=""):
+        data = await self._request("POST", "/ai/convert-text", {"rawText": text, "instructions": instructions})
+        return json.loads(data["generatedJson"])
+
+    async def enhance_field(self, content, prompt):
+        data = await self._request("POST", "/ai/enhance-field", {"fieldContent": content, "userPrompt": prompt})
+        return data["enhancedContent"]
+
+    async def format_json(self, json_string, instructions=""):
+        data = await self._request("POST", "/ai/format-json", {"jsonString": json_string, "instructions": instructions})
+        return data["formattedJson"]
+
+
+class CachedDocument:
+    def __init__(self, document_id, name, data, version=None):
+        self.id = document_id
+        self.name = name
+        self.data = data
+        # The data and version as last fetched or put; servers before
+        # versioned documents send no version
+        self.base = data
+        self.version = version
+        # Edits made since the document was fetched or last put
+        self.edits = 0
+
+
+class DocumentCache:
+    """Documents held by the server, least recently used first"""
+
+    def __init__(self, api, max_size=DEFAULT_CACHE_SIZE):
+        self.api = api
+        self.max_size = max_size
+        self._documents = OrderedDict()
+        self._locks = {}
+
+    def _lock(self, document_id):
+        return self._locks.setdefault(document_id, asyncio.Lock())
+
+    def _store(self, document):
+        self._documents[document.id] = document
+        self._documents.move_to_end(document.id)
+        clean = [key for key, cached in self._documents.items() if cached.edits == 0 and key != document.id]
+        for key in clean[: max(0, len(self._documents) - self.max_size)]:
+            del self._documents[key]
+            self._locks.pop(key, None)
+
+    async def get(self, document_id, refresh=False):
+        async with self._lock(document_id):
+            document = self._documents.get(document_id)
+            if document is not None and not refresh:
+                self._documents.move_to_end(document_id)
+                return document
+            remote = await self.api.get_document(document_id)
+            document = CachedDocument(document_id, remote.get("name"), remote.get("data"), remote.get("version"))
+            self._store(document)
+            return document
+
+    async def edit(self, document_id, edit):
+        """Apply edit(data) -> data to the cached document"""
+        document = await self.get(document_id)
+        document.data = edit(document.data)
+        document.edits += 1
+        return document
+
+    async def put(self, document_id=None, data=None, name=None):
+        """Send a document to the API: a new one, new data, or the cached edits"""
+        if document_id is None:
+            if data is None:
+                raise ValueError("put_document needs data to create a document")
+            remote = await self.api.create_document(data, name)
+            document = CachedDocument(remote["id"], remote.get("name"), remote.get("data"), remote.get("version"))
+            self._store(document)
+            return document
+
+        async with self._lock(document_id):
+            document = self._documents.get(document_id)
+            if data is None and document is None:
+                raise ValueError(f"Document {document_id} is not cached; pass data to replace it")
+            if data is None and document.version is not None:
+                # path_ops edits share unedited subtrees, so the diff costs the size of the edits
+                operations = path_ops.diff_json(document.base, document.data)
+                if not operations and (name is None or name == document.name):
+                    # The edits cancelled out, so there is nothing to send
+                    document.base = document.data
+                    document.edits = 0
+                    return document
+                try:
+                    remote = await self.api.patch_document(document_id, operations, document.version, name)
+                except VersionConflictError as e:
+                    raise VersionConflictError(
+                        f"Document {document_id} changed on the server since it was fetched; "
+                        "call get_document with refresh to fetch it again (dropping these edits) and redo them",
+                        e.status,
+                    ) from e
+                data = document.data
+            else:
+                remote = await self.api.update_document(
+                    document_id,
+                    document.data if data is None else data,
+                    name or (document.name if document else None),
+                )
+                data = remote.get("data")
+            document = CachedDocument(document_id, remote.get("name"), data, remote.get("version"))
+            self._store(document)
+            return document
+
+    def discard(self, document_id):
+        self._documents.pop(document_id, None)
+        self._locks.pop(document_id, None)
+
+
+def _summary(document, **extra):
+    return {"documentId": document.id, "name": document.name, "unsentEdits": document.edits, **extra}
+
+
+def create_server(base_url=BASE_URL, timeout=DEFAULT_TIMEOUT, cache_size=DEFAULT_CACHE_SIZE,
+                  max_connections=DEFAULT_MAX_CONNECTIONS, **settings):
+    """A FastMCP server with the JSON Canvas tools; settings go to FastMCP (host, port, ...)"""
+    state = {}
+
+    @asynccontextmanager
+    async def lifespan(server):
+        api = AsyncAPI(base_url, timeout, max_connections)
+        state["documents"] = DocumentCache(api, cache_size)
+        try:
+            yield state
+        finally:
+            await api.close()
+
+    mcp = FastMCP(
+        "jsoncanvas",
+        instructions=(
+            "Edit JSON Canvas documents. Path tools edit a cached copy of the document in this server "
+            "without calling the API; call put_document to save the edits. Paths are JSONPath-style "
+            "strings such as $.rooms[0].name, JSON Pointers such as /rooms/0/name, or lists of segments."
+        ),
+        lifespan=lifespan,
+        **settings,
+    )
+
+    def documents():
+        return state["documents"]
+
+    @mcp.tool()
+    async def get_document(document_id: str, refresh: bool = False) -> dict:
+        """Get a document's data, from the cache unless refresh is set or it is not cached yet"""
+        document = await documents().get(document_id, refresh)
+        return _summary(document, data=document.data)
+
+    @mcp.tool()
+    async def put_document(document_id: str | None = None, data: object = None, name: str | None = None) -> dict:
+        """
+        Save a document. With only document_id, sends the edits made to the cached copy;
+        fails, keeping them, if the document changed on the server since it was fetched.
+        With data, replaces the document's data; with data and no document_id, creates one.
+        """
+        document = await documents().put(document_id, data, name)
+        return _summary(document)
+
+    @mcp.tool()
+    async def discard_edits(document_id: str) -> dict:
+        """Drop the cached copy, and any edits not yet saved, of a document"""
+        documents().discard(document_id)
+        return {"documentId": document_id, "discarded": True}
+
+    @mcp.tool()
+    async def get_path(document_id: str, path: str | list[str | int]) -> dict:
+        """Get the value at a path in a document"""
+        document = await documents().get(document_id)
+        if not path_ops.has_path(document.data, path):
+            raise path_ops.PathError(f"Nothing at path: {path}")
+        return _summary(document, path=path, value=path_ops.get_value_at_path(document.data, path))
+
+    @mcp.tool()
+    async def set_path(document_id: str, path: str | list[str | int], value: object) -> dict:
+        """Replace the value at an existing path (cached copy; save with put_document)"""
+        document = await documents().edit(document_id, lambda data: path_ops.set_value_at_path(data, path, value))
+        return _summary(document, path=path)
+
+    @mcp.tool()
+    async def add_at_path(document_id: str, path: str | list[str | int], value: object, key: str | None = None) -> dict:
+        """
+        Add a property named key to the object at path, or, without key, append
+        value to the array at path (cached copy; save with put_document)
+        """
+        if key is None:
+            edit = partial(path_ops.add_item_at_path, path=path, value=value)
+        else:
+            edit = partial(path_ops.add_property_at_path, path=path, key=key, value=value)
+        document = await documents().edit(document_id, edit)
+        return _summary(document, path=path)
+
+    @mcp.tool()
+    async def delete_path(document_id: str, path: str | list[str | int]) -> dict:
+        """Delete the property or array item at path (cached copy; save with put_document)"""
+        document = await documents().edit(document_id, lambda data: path_ops.delete_at_path(data, path))
+        return _summary(document, path=path)
+
+    @mcp.tool()
+    async def rename_key(document_id: str, path: str | list[str | int], key: str, new_key: str) -> dict:
+        """Rename a property of the object at path (cached copy; save with put_document)"""
+        document = await documents().edit(document_id, lambda data: path_ops.rename_property_at_path(data, path, key, new_key))
+        return _summary(document, path=path)
+
+    @mcp.tool()
+    async def convert_text(text: str, instructions: str = "") -> object:
+        """Convert raw text (lists, CSV, notes) to structured JSON with AI"""
+        return await documents().api.convert_text(text, instructions)
+
+    @mcp.tool()
+    async def enhance_field(content: str, prompt: str) -> str:
+        """Rewrite a field's text with AI according to prompt"""
+        return await documents().api.enhance_field(content, prompt)
+
+    @mcp.tool()
+    async def format_json(json_string: str, instructions: str = "") -> str:
+        """Fix and pretty-print a JSON string with AI"""
+        return await documents().api.format_json(json_string, instructions)
+
+    return mcp
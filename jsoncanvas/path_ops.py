@@ -0,0 +1,637 @@
+"""
+In-process JSON path operations
+
+The edits /api/json/manipulate makes, as pure Python functions, so callers
+that hold a document can edit it without sending it over the network. Like
+the TypeScript versions in src/lib/json-utils.ts, every edit returns a new
+document in which only the containers along the path are copied; all other
+subtrees are shared with the input.
+
+The functions follow the JavaScript they port rather than Python habit:
+path segments go through String() and parseInt() as they do there, `key in
+object` also sees the properties every JavaScript object inherits (so
+adding a "toString" property fails as it does on the server), and objects
+built by an edit keep JavaScript's property order, integer-like keys first.
+manipulate() takes a request body and answers exactly as the route does.
+"""
+
+import json
+import math
+import re
+
+_MISSING = object()
+
+# Property names JavaScript objects and arrays inherit, which the server's
+# `key in value` checks treat as present
+_OBJECT_PROTOTYPE = frozenset([
+    "constructor", "__defineGetter__", "__defineSetter__", "hasOwnProperty", "__lookupGetter__",
+    "__lookupSetter__", "isPrototypeOf", "propertyIsEnumerable", "toString", "valueOf", "__proto__",
+    "toLocaleString",
+])
+_ARRAY_PROTOTYPE = _OBJECT_PROTOTYPE | frozenset([
+    "length", "at", "concat", "copyWithin", "fill", "find", "findIndex", "findLast", "findLastIndex",
+    "lastIndexOf", "pop", "push", "reverse", "shift", "unshift", "slice", "sort", "splice", "includes",
+    "indexOf", "join", "keys", "entries", "values", "forEach", "filter", "flat", "flatMap", "map", "every",
+    "some", "reduce", "reduceRight", "toReversed", "toSorted", "toSpliced", "with",
+])
+_MAX_ARRAY_INDEX = 2 ** 32 - 2
+RESPONSE_SHAPES = ("full", "result", "patch", "subtree")
+# Requests longer than this (in characters) default to the "result" shape,
+# which leaves out the originalData echo
+LARGE_PAYLOAD_CHARS = 1_000_000
+_ARRAY_INDEX_KEY = re.compile(r"0|[1-9][0-9]*")
+_LEADING_INT = re.compile(r"\s*([+-]?[0-9]+)")
+
+
+class _Inherited:
+    """An inherited method: found by `in`, but neither an object nor serialized"""
+
+    def __repr__(self):
+        return "<inherited>"
+
+
+_INHERITED = _Inherited()
+
+
+class PathError(ValueError):
+    """An edit that cannot be applied at the given path"""
+
+
+class ManipulateError(Exception):
+    """The error response the manipulate route would give"""
+
+    def __init__(self, status, body):
+        super().__init__(body.get("message", body.get("error")))
+        self.status = status
+        self.body = body
+
+    @property
+    def text(self):
+        """The response body, serialized as the route serializes it"""
+        return json.dumps(self.body, separators=(",", ":"), ensure_ascii=False)
+
+
+def js_string(value):
+    """String(value) in JavaScript, for messages that must read as the TypeScript ones do"""
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        return repr(value).replace("e-0", "e-").replace("e+0", "e+")
+    if isinstance(value, list):
+        return ",".join("" if item is None else js_string(item) for item in value)
+    if isinstance(value, dict):
+        return "[object Object]"
+    return str(value)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _to_array_index(segment):
+    """toArrayIndex in json-utils.ts: numbers as they are, anything else through parseInt"""
+    if _is_number(segment):
+        return segment
+    match = _LEADING_INT.match(js_string(segment))
+    return int(match.group(1)) if match else None
+
+
+def _in_bounds(index, length):
+    return index is not None and 0 <= index < length
+
+
+def _describe_index(index):
+    return "NaN" if index is None else js_string(index)
+
+
+def _is_index_key(key):
+    return bool(_ARRAY_INDEX_KEY.fullmatch(key)) and int(key) <= _MAX_ARRAY_INDEX
+
+
+def _js_object(items):
+    """A dict in JavaScript property order: integer-like keys ascending, then the rest as given"""
+    items = list(items)
+    indexed = sorted((item for item in items if _is_index_key(item[0])), key=lambda item: int(item[0]))
+    if not indexed:
+        return dict(items)
+    return dict(indexed + [item for item in items if not _is_index_key(item[0])])
+
+
+def _has(container, key):
+    """`key in container`"""
+    if isinstance(container, dict):
+        return key in container or key in _OBJECT_PROTOTYPE
+    return (_is_index_key(key) and int(key) < len(container)) or key in _ARRAY_PROTOTYPE
+
+
+def _member(container, key):
+    """container[key], for a key _has found"""
+    if isinstance(container, dict):
+        return container[key] if key in container else _INHERITED
+    if _is_index_key(key) and int(key) < len(container):
+        return container[int(key)]
+    return len(container) if key == "length" else _INHERITED
+
+
+def _element(array, index):
+    """array[index] for an index already checked to be in bounds"""
+    if isinstance(index, float) and not index.is_integer():
+        return _MISSING
+    return array[int(index)]
+
+
+def parse_path(path):
+    """
+    Normalize a path to a list of segments. Accepts a list, a JSON Pointer
+    ("/rooms/0/name"), or a JSONPath-style string ("$.rooms[0].name",
+    "rooms.0.name", "$['odd key']"). "" and "$" are the root.
+    """
+    if path is None:
+        return []
+    if isinstance(path, (list, tuple)):
+        return list(path)
+    if not isinstance(path, str):
+        raise PathError(f"Invalid path: {path!r}")
+    if path in ("", "$"):
+        return []
+    if path.startswith("/"):
+        return [segment.replace("~1", "/").replace("~0", "~") for segment in path[1:].split("/")]
+
+    segments = []
+    position = 1 if path.startswith("$") else 0
+    token = re.compile(r"""\.?([^.\[\]]+)|\[(\d+)\]|\[(['"])((?:\\.|(?!\3).)*)\3\]""")
+    while position < len(path):
+        match = token.match(path, position)
+        if not match or match.end() == position:
+            raise PathError(f"Invalid path: {path}")
+        name, index, quote, quoted = match.groups()
+        if index is not None:
+            segments.append(int(index))
+        elif quoted is not None:
+            segments.append(re.sub(r"\\(.)", r"\1", quoted))
+        else:
+            segments.append(name)
+        position = match.end()
+    return segments
+
+
+def _get(data, path):
+    """getValueAtPath: the value, _MISSING, or _INHERITED for an inherited method"""
+    current = data
+    for segment in path:
+        if isinstance(current, list):
+            index = _to_array_index(segment)
+            if not _in_bounds(index, len(current)):
+                return _MISSING
+            current = _element(current, index)
+        elif isinstance(current, dict):
+            key = js_string(segment)
+            if not _has(current, key):
+                return _MISSING
+            current = _member(current, key)
+        else:
+            return _MISSING
+    return current
+
+
+def get_value_at_path(data, path, default=None):
+    """The value at path, or default when there is none"""
+    value = _get(data, parse_path(path))
+    return default if value is _MISSING or value is _INHERITED else value
+
+
+def has_path(data, path):
+    """True when there is a value at path, even if that value is null"""
+    value = _get(data, parse_path(path))
+    return value is not _MISSING and value is not _INHERITED
+
+
+def replace_at_path(data, path, value):
+    """
+    A copy of data with the value at path replaced, copying only the
+    containers along the path. The path must already exist.
+    """
+    path = parse_path(path)
+
+    def replace(node, depth):
+        if depth == len(path):
+            return value
+        segment = path[depth]
+        if isinstance(node, list):
+            index = _to_array_index(segment)
+            copy = list(node)
+            # A fractional index names a property JSON never shows
+            if not (isinstance(index, float) and not index.is_integer()):
+                copy[int(index)] = replace(node[int(index)], depth + 1)
+            return copy
+        key = js_string(segment)
+        if key in node:
+            copy = dict(node)
+            copy[key] = replace(node[key], depth + 1)
+            return copy
+        return _js_object([*node.items(), (key, replace(_MISSING, depth + 1))])
+
+    return replace(data, 0)
+
+
+def set_value_at_path(data, path, value):
+    """Replace the value at an existing path"""
+    path = parse_path(path)
+    if not path:
+        return value
+
+    current = data
+    for segment in path[:-1]:
+        if isinstance(current, list):
+            index = _to_array_index(segment)
+            if not _in_bounds(index, len(current)):
+                raise PathError(f"Array index out of bounds: {_describe_index(index)}")
+            current = _element(current, index)
+        elif isinstance(current, dict):
+            key = js_string(segment)
+            if not _has(current, key):
+                raise PathError(f"Property not found: {key}")
+            current = _member(current, key)
+        else:
+            raise PathError(f"Cannot access path at segment: {js_string(segment)}")
+
+    if isinstance(current, list):
+        index = _to_array_index(path[-1])
+        if not _in_bounds(index, len(current)):
+            raise PathError(f"Array index out of bounds: {_describe_index(index)}")
+    elif not isinstance(current, dict):
+        raise PathError("Cannot set value on non-object")
+    return replace_at_path(data, path, value)
+
+
+def add_property_at_path(data, path, key, value):
+    """Add a new property to the object at path"""
+    path = parse_path(path)
+    parent = _get(data, path)
+    if not isinstance(parent, dict):
+        raise PathError("Cannot add property to non-object")
+    key = js_string(key)
+    if _has(parent, key):
+        raise PathError(f"Property '{key}' already exists")
+    return replace_at_path(data, path, _js_object([*parent.items(), (key, value)]))
+
+
+def add_item_at_path(data, path, value):
+    """Append an item to the array at path"""
+    path = parse_path(path)
+    target = _get(data, path)
+    if not isinstance(target, list):
+        raise PathError("Cannot add item to non-array")
+    return replace_at_path(data, path, [*target, value])
+
+
+def delete_at_path(data, path):
+    """Remove the property or array item at path"""
+    path = parse_path(path)
+    if not path:
+        raise PathError("Cannot delete root element")
+
+    parent_path, last = path[:-1], path[-1]
+    parent = _get(data, parent_path)
+    if isinstance(parent, list):
+        index = _to_array_index(last)
+        if not _in_bounds(index, len(parent)):
+            raise PathError(f"Array index out of bounds: {_describe_index(index)}")
+        # splice truncates a fractional index
+        index = int(index)
+        return replace_at_path(data, parent_path, parent[:index] + parent[index + 1:])
+    if isinstance(parent, dict):
+        copy = dict(parent)
+        copy.pop(js_string(last), None)
+        return replace_at_path(data, parent_path, copy)
+    raise PathError("Cannot delete from non-object/non-array")
+
+
+def _strictly_equal(a, b):
+    if _is_number(a) and _is_number(b):
+        return a == b
+    if isinstance(a, (list, dict)) or isinstance(b, (list, dict)):
+        return a is b
+    return type(a) is type(b) and a == b
+
+
+def rename_property_at_path(data, path, old_key, new_key):
+    """Rename a property of the object at path; it moves to the end of the object"""
+    if _strictly_equal(old_key, new_key):
+        return data
+    path = parse_path(path)
+    target = _get(data, path)
+    if not isinstance(target, dict):
+        raise PathError("Cannot rename property on non-object")
+    old_key, new_key = js_string(old_key), js_string(new_key)
+    if not _has(target, old_key):
+        raise PathError(f"Property '{old_key}' does not exist")
+    if _has(target, new_key):
+        raise PathError(f"Property '{new_key}' already exists")
+    renamed = [(key, value) for key, value in target.items() if key != old_key]
+    # Renaming an inherited method gives a function-valued property, which JSON drops
+    if old_key in target:
+        renamed.append((new_key, target[old_key]))
+    return replace_at_path(data, path, _js_object(renamed))
+
+
+def to_pointer(path):
+    """Encode a path as a JSON Pointer (RFC 6901)"""
+    return "".join("/" + js_string(segment).replace("~", "~0").replace("/", "~1") for segment in path)
+
+
+def _diff_arrays(before, after, path, changes):
+    start, shortest = 0, min(len(before), len(after))
+    while start < shortest and _strictly_equal(before[start], after[start]):
+        start += 1
+    end = 0
+    while end < shortest - start and _strictly_equal(before[-1 - end], after[-1 - end]):
+        end += 1
+
+    removed = len(before) - start - end
+    added = len(after) - start - end
+    if removed == added:
+        for i in range(start, start + added):
+            _diff_values(before[i], after[i], [*path, i], changes)
+    elif removed and added:
+        changes.append(("replace", path, after))
+    else:
+        for i in range(start + removed - 1, start - 1, -1):
+            changes.append(("remove", [*path, i], _MISSING))
+        for i in range(start, start + added):
+            changes.append(("add", [*path, i], after[i]))
+
+
+def _diff_values(before, after, path, changes):
+    if _strictly_equal(before, after):
+        return
+    if isinstance(before, list) and isinstance(after, list):
+        _diff_arrays(before, after, path, changes)
+    elif isinstance(before, dict) and isinstance(after, dict):
+        for key in before:
+            if key not in after:
+                changes.append(("remove", [*path, key], _MISSING))
+        for key, item in after.items():
+            if key in before:
+                _diff_values(before[key], item, [*path, key], changes)
+            else:
+                changes.append(("add", [*path, key], item))
+    else:
+        changes.append(("replace", path, after))
+
+
+def _changes(before, after):
+    """(op, path, value) for each operation of the patch from before to after"""
+    changes = []
+    _diff_values(before, after, [], changes)
+    return changes
+
+
+def diff_json(before, after):
+    """
+    The RFC 6902 JSON Patch that turns before into after, as json-patch.ts
+    computes it. Subtrees that are the same object in both are skipped, so
+    diffing an edit made by this module costs the size of the edited path.
+    """
+    patch = []
+    for op, path, value in _changes(before, after):
+        operation = {"op": op, "path": to_pointer(path)}
+        if value is not _MISSING:
+            operation["value"] = value
+        patch.append(operation)
+    return patch
+
+
+def changed_subtree(before, after):
+    """
+    (path, value): the deepest subtree of after holding every change, so
+    that setting value at path in before gives after; None if nothing changed
+    """
+    common = None
+    for op, path, _ in _changes(before, after):
+        scope = path
+        if op == "remove" or op == "add" and _inserts(before, path):
+            scope = path[:-1]
+        if common is None:
+            common = scope
+        else:
+            length = 0
+            while length < min(len(common), len(scope)) and common[length] == scope[length]:
+                length += 1
+            common = common[:length]
+    if common is None:
+        return None
+    value = after
+    for segment in common:
+        value = value[segment]
+    return common, None if value is _MISSING else value
+
+
+def _inserts(before, path):
+    """Whether adding at path shifts later array items rather than appending"""
+    parent = before
+    for segment in path[:-1]:
+        parent = parent[segment]
+    return isinstance(parent, list) and path[-1] < len(parent)
+
+
+def _join(path):
+    """path.join('.')"""
+    return ".".join("" if segment is None else js_string(segment) for segment in path)
+
+
+def _assign(container, key, value):
+    """A copy of container after `container[key] = value`"""
+    if isinstance(container, dict):
+        if key == "__proto__" and key not in container:
+            # The prototype setter: nothing JSON would show
+            return dict(container)
+        if value is _MISSING:
+            # An undefined property is left out of JSON
+            return {name: item for name, item in container.items() if name != key}
+        if key in container:
+            copy = dict(container)
+            copy[key] = value
+            return copy
+        return _js_object([*container.items(), (key, value)])
+
+    copy = list(container)
+    item = None if value is _MISSING else value
+    if _is_index_key(key):
+        index = int(key)
+        if index >= len(copy):
+            # Holes up to the new index serialize as null
+            copy.extend([None] * (index - len(copy) + 1))
+        copy[index] = item
+    elif key == "length":
+        length = _to_js_number(value)
+        if length is None or length != int(length) or not 0 <= length <= _MAX_ARRAY_INDEX + 1:
+            raise _route_error("Invalid array length")
+        length = int(length)
+        copy = copy[:length] + [None] * max(0, length - len(copy))
+    return copy
+
+
+def _to_js_number(value):
+    if value is None or value is False:
+        return 0
+    if value is True:
+        return 1
+    if _is_number(value):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return 0
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return None
+
+
+def _route_set_value(data, path, value):
+    """setValueAtPath in the manipulate route, which can create properties and grow arrays"""
+    if not path:
+        return value
+
+    chain = [data]
+    for i, segment in enumerate(path[:-1]):
+        current = chain[-1]
+        key = js_string(segment)
+        if not (isinstance(current, (dict, list)) and _has(current, key)):
+            raise _route_error(f"Invalid path: {_join(path[: i + 1])}")
+        chain.append(_member(current, key))
+
+    current = chain[-1]
+    if not isinstance(current, (dict, list)):
+        raise _route_error(f"Cannot set value at path: {_join(path)}")
+    updated = _assign(current, js_string(path[-1]), value)
+    for container, segment in zip(reversed(chain[:-1]), reversed(path[:-1])):
+        updated = _assign(container, js_string(segment), updated)
+    return updated
+
+
+def _route_error(message):
+    return ManipulateError(500, {"error": "Failed to manipulate JSON", "message": message})
+
+
+def _bad_request(message):
+    return ManipulateError(400, {"error": message})
+
+
+def _truthy(value):
+    if value is _MISSING or value is None or value is False or value == "":
+        return False
+    if _is_number(value):
+        return value != 0 and not math.isnan(value)
+    return True
+
+
+def _iterable_path(path, operation):
+    """The segments a JavaScript loop over path would see"""
+    if isinstance(path, list):
+        return path
+    if isinstance(path, str):
+        return list(path)
+    # Numbers, booleans and objects have no length and cannot be iterated
+    raise _route_error("path.slice is not a function" if operation == "delete" else "path is not iterable")
+
+
+def manipulate(body, text_length=0):
+    """
+    Handle a /api/json/manipulate request body in-process. Returns the
+    response's "data" member, or raises ManipulateError with the status and
+    body the route would answer with. text_length is the length of the
+    request's JSON text, which picks the default response shape.
+    """
+    operation, json_data, path, value, key, new_key = (
+        body.get(name, _MISSING) for name in ("operation", "jsonData", "path", "value", "key", "newKey")
+    )
+
+    if not _truthy(operation) or not _truthy(json_data):
+        raise _bad_request("Missing operation or jsonData fields")
+    shape = body.get("responseShape")
+    if shape is None:
+        shape = "result" if text_length > LARGE_PAYLOAD_CHARS else "full"
+    if not isinstance(shape, str) or shape not in RESPONSE_SHAPES:
+        raise _bad_request(f"Unknown responseShape: {js_string(shape)} (expected {', '.join(RESPONSE_SHAPES)})")
+
+    try:
+        if operation == "addProperty":
+            if not _truthy(path) or not _truthy(key) or value is _MISSING:
+                raise _bad_request("addProperty requires path, key, and value")
+            result = add_property_at_path(json_data, _iterable_path(path, operation), key, value)
+        elif operation == "addItem":
+            if not _truthy(path) or value is _MISSING:
+                raise _bad_request("addItem requires path and value")
+            result = add_item_at_path(json_data, _iterable_path(path, operation), value)
+        elif operation == "delete":
+            if not _truthy(path):
+                raise _bad_request("delete requires path")
+            result = delete_at_path(json_data, _iterable_path(path, operation))
+        elif operation == "renameProperty":
+            if not _truthy(path) or not _truthy(key) or not _truthy(new_key):
+                raise _bad_request("renameProperty requires path, key (oldKey), and newKey")
+            if _strictly_equal(key, new_key):
+                result = json_data
+            else:
+                result = rename_property_at_path(json_data, _iterable_path(path, operation), key, new_key)
+        elif operation == "setValue":
+            result = _route_set_value_any_path(json_data, path, value)
+        elif operation == "validate":
+            # Anything that arrived as JSON serializes again and has no cycles
+            if shape == "full":
+                return {"isValid": True, "errors": [], "originalData": json_data}
+            return {"isValid": True, "errors": []}
+        else:
+            raise _bad_request(f"Unknown operation: {js_string(operation)}")
+    except PathError as e:
+        raise _route_error(str(e)) from e
+
+    return _shape_result(shape, operation, json_data, result)
+
+
+def _shape_result(shape, operation, json_data, result):
+    if shape == "patch":
+        return {"operation": operation, "patch": diff_json(json_data, result)}
+    if shape == "subtree":
+        subtree = changed_subtree(json_data, result)
+        if subtree is None:
+            return {"operation": operation, "path": None}
+        return {"operation": operation, "path": subtree[0], "value": subtree[1]}
+    data = {"operation": operation}
+    if shape == "full":
+        data["originalData"] = json_data
+    # An undefined result is left out of JSON
+    return data if result is _MISSING else {"result": result, **data}
+
+
+def _route_set_value_any_path(data, path, value):
+    if path is _MISSING or path is None:
+        kind = "undefined" if path is _MISSING else "null"
+        raise _route_error(f"Cannot read properties of {kind} (reading 'length')")
+    if isinstance(path, list):
+        return _route_set_value(data, path, value)
+    if isinstance(path, str):
+        try:
+            return _route_set_value(data, list(path), value)
+        except ManipulateError as e:
+            # A string has no join(), so building the message throws instead
+            if e.body.get("message", "").startswith("Invalid path:"):
+                raise _route_error("path.slice(...).join is not a function") from e
+            if e.body.get("message", "").startswith("Cannot set value at path:"):
+                raise _route_error("path.join is not a function") from e
+            raise
+    # Without a length the loop never runs and path[NaN] is undefined
+    if isinstance(data, (dict, list)):
+        return _assign(data, "undefined", value)
+    raise _route_error("path.join is not a function")
@@ -0,0 +1,290 @@
+"""
+Retries, hedged requests and circuit breaking for API calls
+
+Policies are set per endpoint. A policy key is a route prefix, optionally
+after a method ("POST /ai/", "/documents/"), and the longest key matching a
+call wins. Routes are paths with id segments replaced by ":id", so
+/documents/42 and /documents/43 share latency history, breaker and metrics.
+
+- RetryPolicy retries errors that are retryable (rate limits, server
+  errors, connection failures) up to attempts in all, sleeping a random
+  time up to backoff * 2**n, or the server's Retry-After; either way no
+  longer than max_backoff.
+- HedgePolicy sends a duplicate of a call that has run longer than the
+  route's recent latency percentile and keeps whichever answer comes
+  first. Only for calls that are safe to repeat: the slower request is not
+  cancelled, its answer is dropped.
+- BreakerPolicy fails calls at once after failures consecutive failures,
+  for reset_after seconds, then lets one trial call decide whether to
+  close again.
+
+    client = JSONCanvasClient(policies={
+        **DEFAULT_POLICIES,
+        "POST /ai/": EndpointPolicy(RetryPolicy(attempts=4), HedgePolicy(percentile=90), BreakerPolicy()),
+    })
+"""
+
+import random
+import re
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .errors import CircuitOpenError
+
+RetryPolicy = namedtuple("RetryPolicy", "attempts backoff max_backoff", defaults=(3, 0.5, 10.0))
+HedgePolicy = namedtuple("HedgePolicy", "percentile min_samples", defaults=(95, 20))
+BreakerPolicy = namedtuple("BreakerPolicy", "failures reset_after", defaults=(5, 30.0))
+EndpointPolicy = namedtuple("EndpointPolicy", "retry hedge breaker", defaults=(None, None, None))
+
+DEFAULT_POLICIES = {
+    # Model calls and JSON edits are safe to repeat. Hedging is left off
+    # by default since it can double model usage.
+    "POST /ai/": EndpointPolicy(RetryPolicy(), None, BreakerPolicy()),
+    "POST /json/": EndpointPolicy(RetryPolicy(), None, BreakerPolicy()),
+    "GET /": EndpointPolicy(RetryPolicy(), None, BreakerPolicy()),
+    # Creating or updating a document twice is not the same as once
+    "/": EndpointPolicy(None, None, BreakerPolicy()),
+}
+
+# Successful latencies kept per route for hedging delays and metrics
+LATENCY_WINDOW = 200
+HEDGE_THREADS = 32
+
+_ID_SEGMENT = re.compile(r"/[^/]*\d[^/]*")
+
+
+def route_of(path):
+    """The path with segments that hold digits, such as document ids, replaced by :id"""
+    return _ID_SEGMENT.sub("/:id", path.split("?", 1)[0])
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class _Route:
+    """Latency history, breaker state and counters for one route"""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = Counter()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def state(self, breaker, now):
+        if self.opened_at is None:
+            return "closed"
+        return "open" if now - self.opened_at < breaker.reset_after else "half-open"
+
+    def admit(self, breaker, now):
+        """Whether the breaker lets a call through; half-open admits one trial at a time"""
+        with self.lock:
+            state = self.state(breaker, now)
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def count(self, event):
+        with self.lock:
+            self.counts[event] += 1
+
+    def observe(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def hedge_delay(self, hedge):
+        with self.lock:
+            samples = list(self.latencies)
+        if len(samples) < hedge.min_samples:
+            return None
+        return _percentile(samples, hedge.percentile)
+
+    def succeeded(self):
+        """Returns True if this closed the breaker"""
+        with self.lock:
+            closed = self.opened_at is not None
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial = False
+            return closed
+
+    def failed(self, breaker, now):
+        """Returns True if this opened the breaker"""
+        with self.lock:
+            self.consecutive_failures += 1
+            trial, self.trial = self.trial, False
+            if breaker is None:
+                return False
+            # A failed trial re-opens at once
+            if trial or (self.opened_at is None and self.consecutive_failures >= breaker.failures):
+                self.opened_at = now
+                return True
+            return False
+
+
+class Resilience:
+    """
+    Runs calls under the policy for their endpoint and keeps per-route
+    metrics. listener, if given, is called as listener(event, route, fields)
+    for retry, hedge, hedge_win, circuit_open, circuit_close and rejected.
+    """
+
+    def __init__(self, policies=None, listener=None, sleep=time.sleep, clock=time.monotonic):
+        self.policies = DEFAULT_POLICIES if policies is None else policies
+        self.listener = listener
+        self._sleep = sleep
+        self._clock = clock
+        self._routes = {}
+        self._lock = threading.Lock()
+        self._hedge_pool = None
+
+    def policy_for(self, method, route):
+        best, best_length = EndpointPolicy(), -1
+        for key, policy in self.policies.items():
+            key_method, _, prefix = key.rpartition(" ")
+            if key_method and key_method != method:
+                continue
+            length = len(prefix) + (1 if key_method else 0)
+            if route.startswith(prefix) and length > best_length:
+                best, best_length = policy, length
+        return best
+
+    def _route(self, name):
+        with self._lock:
+            route = self._routes.get(name)
+            if route is None:
+                route = self._routes[name] = _Route(name)
+            return route
+
+    def _emit(self, event, route, **fields):
+        route.count(event)
+        if self.listener:
+            self.listener(event, route.name, fields)
+
+    def call(self, method, path, attempt, hedge=True):
+        """
+        Run attempt() under the endpoint's policy and return its result.
+        hedge=False for calls whose result holds resources, such as an open
+        response, that a dropped duplicate would leak.
+        """
+        path = route_of(path)
+        name = f"{method} {path}"
+        policy = self.policy_for(method, path)
+        route = self._route(name)
+        attempts = policy.retry.attempts if policy.retry else 1
+        route.count("calls")
+
+        for number in range(1, attempts + 1):
+            if policy.breaker and not route.admit(policy.breaker, self._clock()):
+                self._emit("rejected", route)
+                raise CircuitOpenError(f"API Error: circuit open for {name} after repeated failures")
+            try:
+                if hedge and policy.hedge:
+                    result = self._hedged(route, policy.hedge, attempt)
+                else:
+                    result = self._timed(route, attempt)
+            except Exception as error:
+                retryable = getattr(error, "retryable", False)
+                if not retryable:
+                    # The server answered; a bad request says nothing about its health
+                    if route.succeeded():
+                        self._emit("circuit_close", route)
+                    route.count("failures")
+                    raise
+                opened = route.failed(policy.breaker, self._clock())
+                if opened:
+                    self._emit("circuit_open", route, failures=route.consecutive_failures)
+                # A call that opens the breaker reports its own error, not the rejection
+                if opened or number == attempts:
+                    route.count("failures")
+                    raise
+                retry_after = getattr(error, "retry_after", None)
+                if retry_after is not None:
+                    # The server's wait, but never longer than the policy allows
+                    delay = min(retry_after, policy.retry.max_backoff)
+                else:
+                    delay = random.uniform(0, min(policy.retry.max_backoff, policy.retry.backoff * 2 ** (number - 1)))
+                self._emit("retry", route, attempt=number, delay=delay, error=str(error))
+                self._sleep(delay)
+                continue
+            if route.succeeded():
+                self._emit("circuit_close", route)
+            route.count("successes")
+            return result
+
+    def _timed(self, route, attempt):
+        started = self._clock()
+        route.count("attempts")
+        result = attempt()
+        route.observe(self._clock() - started)
+        return result
+
+    def _hedged(self, route, hedge, attempt):
+        delay = route.hedge_delay(hedge)
+        if delay is None:
+            return self._timed(route, attempt)
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(HEDGE_THREADS, thread_name_prefix="jsoncanvas-hedge")
+            pool = self._hedge_pool
+
+        first = pool.submit(self._timed, route, attempt)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        self._emit("hedge", route, delay=delay)
+        second = pool.submit(self._timed, route, attempt)
+        pending, error = [first, second], None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    if future is second:
+                        self._emit("hedge_win", route)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def snapshot(self):
+        """Counters, breaker state and latency percentiles per route"""
+        now = self._clock()
+        with self._lock:
+            routes = list(self._routes.values())
+        metrics = {}
+        for route in sorted(routes, key=lambda route: route.name):
+            method, _, path = route.name.partition(" ")
+            breaker = self.policy_for(method, path).breaker
+            with route.lock:
+                latencies = list(route.latencies)
+                counts = dict(route.counts)
+                state = route.state(breaker, now) if breaker else "none"
+            metrics[route.name] = {
+                "calls": counts.get("calls", 0),
+                "successes": counts.get("successes", 0),
+                "failures": counts.get("failures", 0),
+                "attempts": counts.get("attempts", 0),
+                "retries": counts.get("retry", 0),
+                "hedges": counts.get("hedge", 0),
+                "hedgeWins": counts.get("hedge_win", 0),
+                "rejected": counts.get("rejected", 0),
+                "circuitOpens": counts.get("circuit_open", 0),
+                "circuit": state,
+                "latencyMs": {
+                    "p50": round(_percentile(latencies, 50) * 1000, 1),
+                    "p95": round(_percentile(latencies, 95) * 1000, 1),
+                    "max": round(max(latencies, default=0.0) * 1000, 1),
+                },
+            }
+        return metrics
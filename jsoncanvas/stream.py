@@ -0,0 +1,320 @@
+"""
+Incremental decoding of JSON responses
+
+Reads a JSON body chunk by chunk and decodes only the parts a caller asks
+for. Everything else is scanned for its extent and dropped, so a response
+whose history or originalData echo dwarfs the wanted value costs little
+more memory than that value, and reading stops once the last wanted value
+has been seen. Each selected value is cut out of the stream and decoded by
+json.loads in one call; only the walk down to it runs in Python.
+
+Paths take the path_ops.parse_path forms ("data.result", "$.data.history",
+["data", "rooms", 0]). Exclude paths are relative to each selected value
+and may use "*" for any key or index:
+
+    result = select(response.iter_content(STREAM_CHUNK_SIZE), "data.result")
+    document = select(chunks, "data", exclude=["history"])
+    for entry in iter_items(chunks, "data.history", exclude=["*.photos"]):
+        ...
+"""
+
+import json
+import re
+
+from .path_ops import parse_path
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_MISSING = object()
+_QUOTE, _BACKSLASH = ord('"'), ord("\\")
+_OBJECT, _ARRAY = ord("{"), ord("[")
+_STRING_SPECIAL = re.compile(rb'["\\]')
+# Everything up to the next bracket or unterminated string, whole strings included
+_STRUCTURE = re.compile(rb'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_SCALAR_END = re.compile(rb"[ \t\n\r,\]}:]")
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+
+
+class JSONStreamError(ValueError):
+    """The body is not JSON, ended early, or has no value where one was required"""
+
+
+class _Scanner:
+    """A read position in a stream of bytes chunks, buffering only what is not yet consumed"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.buffer = bytearray()
+        self.position = 0
+        # Bytes dropped from the front of the buffer so far, for error offsets
+        self.dropped = 0
+        # Largest the buffer has grown, for callers checking memory use
+        self.peak = 0
+        # Containers entered by members() or elements() and not yet closed
+        self.open = 0
+
+    def _fill(self, keep):
+        """
+        Append the next chunk, first dropping the bytes before offset keep.
+        Returns how far offsets into the buffer moved, or None at the end.
+        """
+        for chunk in self._chunks:
+            if chunk:
+                break
+        else:
+            return None
+        del self.buffer[:keep]
+        self.buffer += chunk
+        self.position -= keep
+        self.dropped += keep
+        self.peak = max(self.peak, len(self.buffer))
+        return keep
+
+    def error(self, message, offset=None):
+        offset = self.position if offset is None else offset
+        return JSONStreamError(f"Invalid JSON at byte {self.dropped + offset}: {message}")
+
+    def peek(self):
+        """The next non-whitespace byte, not consumed, or None at the end of the input"""
+        while True:
+            self.position = _WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self._fill(self.position) is None:
+                return None
+
+    def expect(self, byte):
+        if self.peek() != byte:
+            raise self.error(f"expected {chr(byte)!r}")
+        self.position += 1
+
+    def value(self, keep):
+        """Consume the next value; returns it decoded when keep, otherwise None"""
+        if self.peek() is None:
+            raise self.error("unexpected end of input")
+        start = index = self.position
+        if self.buffer[start] in (_QUOTE, _OBJECT, _ARRAY):
+            depth, in_string = 0, self.buffer[start] == _QUOTE
+            index += in_string
+            while True:
+                buffer = self.buffer
+                if in_string:
+                    match = _STRING_SPECIAL.search(buffer, index)
+                    if match is None:
+                        index = len(buffer)
+                    elif buffer[match.start()] == _BACKSLASH:
+                        # Step over the escaped byte, once it has arrived
+                        if match.start() + 1 < len(buffer):
+                            index = match.start() + 2
+                            continue
+                        index = match.start()
+                    else:
+                        index, in_string = match.end(), False
+                        if depth == 0:
+                            break
+                        continue
+                else:
+                    index = _STRUCTURE.match(buffer, index).end()
+                    if index < len(buffer):
+                        byte = buffer[index]
+                        index += 1
+                        if byte == _QUOTE:
+                            # A string split across chunks
+                            in_string = True
+                        elif byte in (_OBJECT, _ARRAY):
+                            depth += 1
+                        else:
+                            depth -= 1
+                            if depth == 0:
+                                break
+                        continue
+                # A skipped value need not stay buffered while the rest of it arrives
+                moved = self._fill(start if keep else index)
+                if moved is None:
+                    raise self.error("unexpected end of input", len(self.buffer))
+                start, index = start - moved, index - moved
+        else:
+            while True:
+                match = _SCALAR_END.search(self.buffer, index)
+                if match is not None:
+                    index = match.start()
+                    break
+                index = len(self.buffer)
+                moved = self._fill(start)
+                if moved is None:
+                    # Only a top-level scalar may end with the input; inside a
+                    # container the number or literal may have been cut short
+                    if self.open:
+                        raise self.error("unexpected end of input", len(self.buffer))
+                    break
+                start, index = start - moved, index - moved
+            if index == start:
+                raise self.error("expected a value")
+        self.position = index
+        if not keep:
+            return None
+        try:
+            return json.loads(self.buffer[start:index])
+        except ValueError as e:
+            raise self.error(str(e), start) from e
+
+    def members(self):
+        """
+        Consume an object, yielding each key with the scanner at its value;
+        the caller consumes the value before asking for the next key.
+        """
+        self.expect(_OBJECT)
+        if self.peek() == ord("}"):
+            self.position += 1
+            return
+        self.open += 1
+        while True:
+            if self.peek() != _QUOTE:
+                raise self.error("expected a property name")
+            key = self.value(True)
+            self.expect(ord(":"))
+            yield key
+            if self.peek() == ord("}"):
+                self.position += 1
+                self.open -= 1
+                return
+            self.expect(ord(","))
+
+    def elements(self):
+        """Consume an array, yielding each index with the scanner at its element"""
+        self.expect(_ARRAY)
+        if self.peek() == ord("]"):
+            self.position += 1
+            return
+        self.open += 1
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ord("]"):
+                self.position += 1
+                self.open -= 1
+                return
+            self.expect(ord(","))
+
+    def children(self):
+        """members() or elements() for the container at the scanner, or None for a scalar"""
+        kind = self.peek()
+        if kind == _OBJECT:
+            return self.members()
+        if kind == _ARRAY:
+            return self.elements()
+        return None
+
+
+def _segments(path):
+    return tuple(str(segment) for segment in parse_path(path))
+
+
+def _excludes(exclude):
+    patterns = [_segments(path) for path in exclude]
+    if () in patterns:
+        raise ValueError("exclude paths must be below the selected value")
+    return patterns
+
+
+def _build(scanner, exclude):
+    """Decode the value at the scanner, leaving out the exclude patterns (relative to it)"""
+    children = scanner.children() if exclude else None
+    if children is None:
+        return scanner.value(True)
+    result = {} if scanner.buffer[scanner.position] == _OBJECT else []
+    for key in children:
+        name = str(key)
+        rest = [pattern[1:] for pattern in exclude if pattern[0] in ("*", name)]
+        if () in rest:
+            scanner.value(False)
+        elif isinstance(result, dict):
+            result[key] = _build(scanner, rest)
+        else:
+            result.append(_build(scanner, rest))
+    return result
+
+
+def _lookup(value, segments):
+    for segment in segments:
+        if isinstance(value, dict) and segment in value:
+            value = value[segment]
+        elif isinstance(value, list) and segment.isdigit() and int(segment) < len(value):
+            value = value[int(segment)]
+        else:
+            return _MISSING
+    return value
+
+
+def _find(scanner, prefix, wanted, exclude, found):
+    """Walk the value at the scanner, decoding the wanted paths under prefix into found"""
+    depth = len(prefix)
+    if prefix in wanted:
+        value = found[prefix] = _build(scanner, exclude)
+        # Wanted paths inside a wanted value come out of the decoded value
+        for path in wanted:
+            if len(path) > depth and path[:depth] == prefix:
+                inner = _lookup(value, path[depth:])
+                if inner is not _MISSING:
+                    found[path] = inner
+        return
+    below = {path[depth] for path in wanted if len(path) > depth and path[:depth] == prefix}
+    children = scanner.children() if below else None
+    if children is None:
+        scanner.value(False)
+        return
+    for key in children:
+        if str(key) not in below:
+            scanner.value(False)
+            continue
+        _find(scanner, prefix + (str(key),), wanted, exclude, found)
+        if len(found) == len(wanted):
+            # Leave the rest of the body unread
+            return
+
+
+def extract(chunks, paths, exclude=(), default=None):
+    """
+    Decode the values at paths from an iterable of JSON bytes chunks, reading
+    no further than the last of them. Returns the values in the order of
+    paths, with default for any path the document does not have.
+    """
+    scanner = _Scanner(chunks)
+    segments = [_segments(path) for path in paths]
+    found = {}
+    _find(scanner, (), set(segments), _excludes(exclude), found)
+    return [found.get(path, default) for path in segments]
+
+
+def select(chunks, path, exclude=(), default=None):
+    """Decode the value at path from an iterable of JSON bytes chunks"""
+    return extract(chunks, [path], exclude, default)[0]
+
+
+def _descend(scanner, segments):
+    """Move the scanner to the value at segments; False if the document has none"""
+    for segment in segments:
+        children = scanner.children()
+        if children is None:
+            return False
+        for key in children:
+            if str(key) == segment:
+                break
+            scanner.value(False)
+        else:
+            return False
+    return True
+
+
+def iter_items(chunks, path, exclude=()):
+    """
+    Yield the elements of the array at path one at a time, decoding each
+    only when it is reached. Exclude paths are relative to each element.
+    """
+    scanner = _Scanner(chunks)
+    patterns = _excludes(exclude)
+    if not _descend(scanner, _segments(path)) or scanner.peek() != _ARRAY:
+        raise JSONStreamError(f"No array at path: {path}")
+    for _ in scanner.elements():
+        yield _build(scanner, patterns)
@@ -0,0 +1,420 @@
+"""
+Bulk JSON Schema validation
+
+Validates JSON files and NDJSON records against one schema on a pool of
+worker processes. Each worker compiles the schema once, with $ref targets
+resolved from the schema's directory and any --ref schemas, then validates
+the chunks of records the parent hands out. Errors have the
+{path, message, schemaPath} shape src/lib/json-schema-validator.ts gives the
+editor, and results are written as NDJSON in input order.
+
+Needs the jsonschema package (mcp-venv has it):
+
+    python -m jsoncanvas validate -s product.schema.json data/ -o errors.ndjson
+    python -m jsoncanvas validate -s event.schema.json events.ndjson --jobs 8
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.request import url2pathname
+
+from jsonschema import Draft3Validator, Draft4Validator, Draft7Validator, FormatChecker
+from jsonschema.validators import validator_for
+from referencing import Registry, Resource
+from referencing.exceptions import NoSuchResource
+from referencing.jsonschema import DRAFT7, specification_with
+
+from .ingest import Progress
+from .path_ops import js_string
+
+FORMATS = ("auto", "json", "ndjson")
+JSON_SUFFIXES = (".json", ".jsoncanvas")
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+DEFAULT_CHUNK_SIZE = 256
+# NDJSON records are sent to workers, so chunks are also cut at this size
+CHUNK_BYTES = 4 * 1024 * 1024
+# Chunks queued per worker: enough that no worker waits on the reader
+CHUNKS_PER_WORKER = 4
+
+# ajv-formats checks these itself; jsonschema only with optional packages installed
+_DATE_TIME = re.compile(
+    r"^(\d{4})-(\d\d)-(\d\d)[tT ](?:[01]\d|2[0-3]):[0-5]\d:(?:[0-5]\d|60)(?:\.\d+)?"
+    r"(?:[zZ]|[+-](?:[01]\d|2[0-3]):?[0-5]\d)$"
+)
+_URI = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:[^\s]*$")
+_URI_REFERENCE = re.compile(r"^[^\s]*$")
+_HOSTNAME = re.compile(r"^(?=.{1,253}\.?$)[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(?:\.[a-zA-Z0-9](?:[-0-9a-zA-Z]{0,61}[0-9a-zA-Z])?)*\.?$")
+_JSON_POINTER = re.compile(r"^(?:/(?:[^~/]|~0|~1)*)*$")
+
+
+def _check_date_time(value):
+    if not isinstance(value, str):
+        return True
+    match = _DATE_TIME.match(value)
+    if not match:
+        return False
+    try:
+        date(*map(int, match.groups()))
+    except ValueError:
+        return False
+    return True
+
+
+def _pattern_check(pattern):
+    return lambda value: not isinstance(value, str) or pattern.match(value) is not None
+
+
+_FALLBACK_FORMATS = {
+    "date-time": _check_date_time,
+    "uri": _pattern_check(_URI),
+    "uri-reference": _pattern_check(_URI_REFERENCE),
+    "hostname": _pattern_check(_HOSTNAME),
+    "json-pointer": _pattern_check(_JSON_POINTER),
+}
+
+
+def format_checker():
+    """jsonschema's format checker, plus the ajv-formats checks it lacks here"""
+    checker = FormatChecker()
+    for name, check in _FALLBACK_FORMATS.items():
+        if name not in checker.checkers:
+            checker.checks(name)(check)
+    return checker
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def _retrieve(uri):
+    """Load $ref targets from disk; remote schemas are never fetched"""
+    if urlparse(uri).scheme != "file":
+        raise NoSuchResource(ref=uri)
+    return Resource.from_contents(_load(url2pathname(urlparse(uri).path)), default_specification=DRAFT7)
+
+
+def _refs(contents):
+    """Every $ref in a schema document"""
+    if isinstance(contents, dict):
+        for key, value in contents.items():
+            if key == "$ref" and isinstance(value, str):
+                yield value
+            else:
+                yield from _refs(value)
+    elif isinstance(contents, list):
+        for item in contents:
+            yield from _refs(item)
+
+
+def _with_ref_targets(registry, contents, base, unresolved):
+    """
+    Add the files contents' $refs point to, so validation never stops to
+    retrieve one. URIs that cannot be loaded are added to unresolved.
+    """
+    for ref in _refs(contents):
+        uri = urldefrag(urljoin(base, ref)).url
+        if not uri or uri in registry or uri in unresolved:
+            continue
+        try:
+            resource = _retrieve(uri)
+        except (NoSuchResource, OSError, ValueError):
+            unresolved.append(uri)
+            continue
+        registry = _with_ref_targets(registry.with_resource(uri, resource), resource.contents, uri, unresolved)
+    return registry
+
+
+def compile_schema(schema_path, ref_paths=()):
+    """
+    A validator for the schema at schema_path. Relative $refs resolve against
+    the schema's file; ref_paths are more schemas, found by their $id.
+    Schemas without $schema are draft-07, as in the editor. Raises
+    jsonschema.SchemaError for an invalid schema and ValueError for a $ref
+    to a schema that cannot be found.
+    """
+    schema = _load(schema_path)
+    cls = validator_for(schema, default=Draft7Validator)
+    cls.check_schema(schema)
+
+    id_keyword = "id" if cls in (Draft3Validator, Draft4Validator) else "$id"
+    if isinstance(schema, dict) and id_keyword not in schema:
+        schema = {**schema, id_keyword: Path(schema_path).resolve().as_uri()}
+
+    specification = specification_with(cls.META_SCHEMA.get("$schema", ""), default=DRAFT7)
+    registry = Registry(retrieve=_retrieve)
+    for path in ref_paths:
+        resource = Resource.from_contents(_load(path), default_specification=specification)
+        registry = registry.with_resource(Path(path).resolve().as_uri(), resource)
+        if resource.id():
+            registry = registry.with_resource(resource.id(), resource)
+    # Gathered and crawled once here; otherwise each document's $ref lookups do it again
+    root = specification.create_resource(schema)
+    unresolved = []
+    registry = _with_ref_targets(registry.with_resource(root.id(), root), schema, root.id(), unresolved).crawl()
+    # Like ajv, refuse a schema whose $refs lead nowhere (embedded $ids are known after the crawl)
+    missing = [uri for uri in unresolved if uri not in registry]
+    if missing:
+        raise ValueError(f"Cannot resolve $ref to {', '.join(missing)}; pass the schema with --ref")
+    return cls(schema, registry=registry, format_checker=format_checker())
+
+
+def _pointer(segments):
+    return "".join("/" + str(segment).replace("~", "~0").replace("/", "~1") for segment in segments)
+
+
+def _js_typeof(value):
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "object"
+
+
+def _error_items(error):
+    """The editor's errors for one jsonschema error; additionalProperties gives one per property"""
+    keyword, expected, instance = error.validator, error.validator_value, error.instance
+    path = _pointer(error.absolute_path) or "root"
+    schema_path = "#" + _pointer(error.absolute_schema_path)
+
+    if keyword == "additionalProperties" and expected is False and isinstance(instance, dict):
+        properties = error.schema.get("properties", {})
+        patterns = error.schema.get("patternProperties", {})
+        for name in instance:
+            if name not in properties and not any(re.search(pattern, name) for pattern in patterns):
+                yield {"path": path, "message": f"Additional property not allowed: {name}", "schemaPath": schema_path}
+        return
+
+    if keyword == "required":
+        missing = next((name for name in expected if error.message == f"{name!r} is a required property"), None)
+        message = error.message if missing is None else f"Missing required property: {missing}"
+    elif keyword == "type":
+        types = ",".join(expected) if isinstance(expected, list) else expected
+        message = f"Expected {types}, but got {_js_typeof(instance)}"
+    elif keyword == "enum":
+        message = "Value must be one of: " + ", ".join("" if value is None else js_string(value) for value in expected)
+    elif keyword == "minimum":
+        message = f"Value must be >= {js_string(expected)}"
+    elif keyword == "maximum":
+        message = f"Value must be <= {js_string(expected)}"
+    elif keyword == "minLength":
+        message = f"String must be at least {expected} characters long"
+    elif keyword == "maxLength":
+        message = f"String must be at most {expected} characters long"
+    elif keyword == "pattern":
+        message = "String does not match required pattern"
+    elif keyword == "format":
+        message = f"String does not match format: {expected}"
+    else:
+        message = error.message
+    yield {"path": path, "message": message, "schemaPath": schema_path}
+
+
+def validate_document(validator, document):
+    """All of a document's errors as {path, message, schemaPath} dicts"""
+    return [item for error in validator.iter_errors(document) for item in _error_items(error)]
+
+
+def _walk(directory):
+    """JSON and NDJSON files under directory, in name order"""
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            yield from _walk(entry.path)
+        elif entry.name.endswith(JSON_SUFFIXES + NDJSON_SUFFIXES):
+            yield entry.path
+
+
+def _lines(name, stream):
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            yield f"{name}:{line_number}", line
+
+
+def read_documents(paths, fmt="auto"):
+    """
+    Yield (source, document) for each document to validate, where document is
+    a file path for whole-file JSON or the bytes of one NDJSON record.
+    Directories are searched for .json, .jsoncanvas, .ndjson and .jsonl
+    files; "-" is stdin, read as NDJSON unless fmt is json.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown input format: {fmt}")
+    for path in paths:
+        if path == "-":
+            if fmt == "json":
+                yield "-", sys.stdin.buffer.read()
+            else:
+                yield from _lines("-", sys.stdin.buffer)
+            continue
+        for file in _walk(path) if os.path.isdir(path) else [path]:
+            if fmt == "ndjson" or (fmt == "auto" and file.endswith(NDJSON_SUFFIXES)):
+                with open(file, "rb") as stream:
+                    yield from _lines(file, stream)
+            else:
+                yield file, file
+
+
+def _chunks(documents, size):
+    chunk, chunk_bytes = [], 0
+    for source, document in documents:
+        chunk.append((source, document))
+        if isinstance(document, bytes):
+            chunk_bytes += len(document)
+        if len(chunk) >= size or chunk_bytes >= CHUNK_BYTES:
+            yield chunk
+            chunk, chunk_bytes = [], 0
+    if chunk:
+        yield chunk
+
+
+# The compiled schema, once per worker process
+_validator = None
+
+
+def _init_worker(schema_path, ref_paths):
+    global _validator
+    _validator = compile_schema(schema_path, ref_paths)
+
+
+def _validate_chunk(chunk):
+    """(source, bytes read, errors, unreadable) for each document of a chunk"""
+    results = []
+    for source, document in chunk:
+        try:
+            if isinstance(document, str):
+                with open(document, "rb") as f:
+                    document = f.read()
+            value = json.loads(document)
+        except OSError as e:
+            results.append((source, 0, [{"path": "root", "message": f"Cannot read file: {e.strerror}", "schemaPath": ""}], True))
+            continue
+        except ValueError as e:
+            results.append((source, len(document), [{"path": "root", "message": f"Invalid JSON: {e}", "schemaPath": ""}], True))
+            continue
+        results.append((source, len(document), validate_document(_validator, value), False))
+    return results
+
+
+class ValidationStats:
+    """Counters for the live progress line and the summary"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.valid = 0
+        self.invalid = 0
+        self.unreadable = 0
+        self.bytes = 0
+        self.errors = 0
+
+    @property
+    def documents(self):
+        return self.valid + self.invalid + self.unreadable
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def record(self, size, errors, unreadable):
+        self.bytes += size
+        if unreadable:
+            self.unreadable += 1
+        elif errors:
+            self.invalid += 1
+            self.errors += len(errors)
+        else:
+            self.valid += 1
+
+    def rates(self):
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return self.documents / elapsed, self.bytes / elapsed / 1e6
+
+    def line(self, in_flight=0):
+        documents_per_second, megabytes_per_second = self.rates()
+        return (
+            f"valid {self.valid}  invalid {self.invalid}  unreadable {self.unreadable}  "
+            f"chunks in flight {in_flight}  {documents_per_second:.0f} docs/s  {megabytes_per_second:.1f} MB/s"
+        )
+
+    def summary(self):
+        documents_per_second, megabytes_per_second = self.rates()
+        return {
+            "documents": self.documents,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "unreadable": self.unreadable,
+            "errors": self.errors,
+            "megabytes": round(self.bytes / 1e6, 3),
+            "seconds": round(self.elapsed, 3),
+            "documentsPerSecond": round(documents_per_second, 1),
+            "megabytesPerSecond": round(megabytes_per_second, 2),
+        }
+
+
+def validate_all(documents, schema_path, output, ref_paths=(), jobs=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 include_valid=False, progress=sys.stderr):
+    """
+    Validate documents from read_documents and write one NDJSON line per
+    invalid or unreadable document to output (every document with
+    include_valid), in input order. Compiles the schema here first, so an
+    invalid schema raises SchemaError before any worker starts. Returns
+    ValidationStats.
+    """
+    ref_paths = tuple(ref_paths)
+    validator = compile_schema(schema_path, ref_paths)
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    stats = ValidationStats()
+    meter = Progress(progress)
+
+    def write(results):
+        for source, size, errors, unreadable in results:
+            stats.record(size, errors, unreadable)
+            if errors or include_valid:
+                output.write(json.dumps({"source": source, "valid": not errors, "errors": errors}, ensure_ascii=False) + "\n")
+
+    try:
+        if jobs == 1:
+            # No pool to start or results to pickle
+            global _validator
+            _validator = validator
+            for chunk in _chunks(documents, chunk_size):
+                write(_validate_chunk(chunk))
+                meter.update(stats, 0)
+            return stats
+
+        pending = deque()
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(schema_path, ref_paths)) as pool:
+            try:
+                for chunk in _chunks(documents, chunk_size):
+                    # Results are written in order, so wait on the oldest chunk
+                    while len(pending) >= jobs * CHUNKS_PER_WORKER:
+                        write(pending.popleft().result())
+                        meter.update(stats, len(pending))
+                    pending.append(pool.submit(_validate_chunk, chunk))
+                while pending:
+                    write(pending.popleft().result())
+                    meter.update(stats, len(pending))
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        return stats
+    finally:
+        output.flush()
+        meter.update(stats, 0, force=True)
+        meter.finish()
@@ -1,7 +1,12 @@
 import {genkit} from 'genkit';
 import {googleAI} from '@genkit-ai/googleai';
+import {offline, OFFLINE_MODEL_NAME} from '@/ai/offline-model';
+
+// MODEL_PROVIDER=offline swaps Gemini for a deterministic local stand-in,
+// so flows can be benchmarked and tested without network access or quota
+const useOfflineModel = process.env.MODEL_PROVIDER === 'offline';
 
 export const ai = genkit({
-  plugins: [googleAI()],
-  model: 'googleai/gemini-2.0-flash',
+  plugins: useOfflineModel ? [offline()] : [googleAI()],
+  model: useOfflineModel ? OFFLINE_MODEL_NAME : 'googleai/gemini-2.0-flash',
 });
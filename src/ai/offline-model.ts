@@ -0,0 +1,68 @@
+/**
+ * @fileOverview Genkit plugin for the offline stand-in model.
+ *
+ * Enabled with MODEL_PROVIDER=offline (see src/ai/genkit.ts). Latency,
+ * token rate and failures are configured with the OFFLINE_MODEL_* variables
+ * read by offlineModelOptionsFromEnv in @/lib/offline-model.
+ */
+
+import {GenkitError} from 'genkit';
+import {genkitPlugin} from 'genkit/plugin';
+import {
+  OFFLINE_MODEL_NAME,
+  OfflineModel,
+  OfflineModelError,
+  offlineModelOptionsFromEnv,
+} from '@/lib/offline-model';
+import type {OfflineModelOptions} from '@/lib/offline-model';
+
+export {OFFLINE_MODEL_NAME};
+
+export function offline(options: Partial<OfflineModelOptions> = offlineModelOptionsFromEnv(process.env)) {
+  return genkitPlugin('offline', async ai => {
+    const model = new OfflineModel(options);
+
+    ai.defineModel(
+      {
+        name: OFFLINE_MODEL_NAME,
+        label: 'Offline stand-in (deterministic)',
+        supports: {
+          multiturn: true,
+          systemRole: true,
+          media: false,
+          tools: false,
+          output: ['text', 'json'],
+          // Answers always follow the schema, so Genkit need not add format instructions
+          constrained: 'all',
+        },
+      },
+      async (request, streamingCallback) => {
+        const prompt = request.messages
+          .map(message => `${message.role}: ${message.content.map(part => part.text ?? '').join('')}`)
+          .join('\n');
+        try {
+          const result = await model.generate(
+            prompt,
+            request.output?.schema,
+            streamingCallback ? text => streamingCallback({content: [{text}]}) : undefined
+          );
+          return {
+            message: {role: 'model', content: [{text: result.text}]},
+            finishReason: 'stop',
+            usage: {
+              inputTokens: result.inputTokens,
+              outputTokens: result.outputTokens,
+              totalTokens: result.inputTokens + result.outputTokens,
+            },
+            custom: {simulatedLatencyMs: result.latencyMs},
+          };
+        } catch (error) {
+          if (error instanceof OfflineModelError) {
+            throw new GenkitError({status: error.status, message: error.message});
+          }
+          throw error;
+        }
+      }
+    );
+  });
+}
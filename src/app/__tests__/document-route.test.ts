@@ -0,0 +1,114 @@
+/**
+ * @jest-environment node
+ */
+import { NextRequest } from 'next/server'
+import { PATCH, PUT } from '../api/documents/[id]/route'
+import { getDocumentStore } from '@/lib/document-store'
+import { createDocumentMetadata } from '@/lib/document-metadata'
+
+/**
+ * DOCUMENT ROUTE TESTS
+ * Versioned writes: preconditions on PUT and PATCH and their error answers
+ */
+
+const store = getDocumentStore()
+
+const seed = (id: string) => {
+  const data = { name: 'House', rooms: ['Kitchen'] }
+  return store.put({
+    id,
+    name: 'Doc',
+    data,
+    history: [data],
+    currentHistoryIndex: 0,
+    metadata: createDocumentMetadata(data, 0),
+  })
+}
+
+const write = (
+  handler: typeof PUT,
+  id: string,
+  body: unknown,
+  headers: Record<string, string> = {}
+) =>
+  handler(
+    new NextRequest(`http://localhost/api/documents/${id}`, {
+      method: handler === PUT ? 'PUT' : 'PATCH',
+      body: JSON.stringify(body),
+      headers: { 'Content-Type': 'application/json', ...headers },
+    }),
+    { params: Promise.resolve({ id }) }
+  )
+
+describe('PUT /api/documents/:id', () => {
+  test('writes against the current version and answers with the next', async () => {
+    const stored = seed('put-current')
+    const res = await write(PUT, 'put-current', { data: { name: 'Home' }, baseVersion: stored.version })
+    expect(res.status).toBe(200)
+    const body = await res.json()
+    expect(body.data.version).toBe(stored.version + 1)
+    expect(res.headers.get('ETag')).toBe(store.etag(store.get('put-current')!, 'json'))
+  })
+
+  test('refuses a stale version with 409 and the current ETag', async () => {
+    const stale = seed('put-stale')
+    const current = seed('put-stale')
+
+    for (const res of [
+      await write(PUT, 'put-stale', { data: { name: 'Home' }, baseVersion: stale.version }),
+      await write(PUT, 'put-stale', { data: { name: 'Home' } }, { 'If-Match': store.etag(stale, 'json') }),
+    ]) {
+      expect(res.status).toBe(409)
+      expect(res.headers.get('ETag')).toBe(store.etag(current, 'json'))
+      expect((await res.json()).version).toBe(current.version)
+    }
+    expect(store.get('put-stale')).toBe(current)
+  })
+
+  test('replaces whatever is there when no version is named', async () => {
+    const stored = seed('put-blind')
+    const res = await write(PUT, 'put-blind', { name: 'Renamed' })
+    expect(res.status).toBe(200)
+    expect(store.get('put-blind')?.version).toBe(stored.version + 1)
+  })
+})
+
+describe('PATCH /api/documents/:id', () => {
+  const operations = [{ op: 'add', path: '/rooms/-', value: 'Hall' }]
+
+  test('applies operations made from the current version', async () => {
+    const stored = seed('patch-current')
+    const res = await write(PATCH, 'patch-current', operations, { 'If-Match': store.etag(stored, 'json-current') })
+    expect(res.status).toBe(200)
+    expect((await res.json()).data.version).toBe(stored.version + 1)
+    expect(store.get('patch-current')?.document.data).toEqual({ name: 'House', rooms: ['Kitchen', 'Hall'] })
+  })
+
+  test('needs a precondition (428)', async () => {
+    const stored = seed('patch-unconditional')
+    const res = await write(PATCH, 'patch-unconditional', { operations })
+    expect(res.status).toBe(428)
+    expect(res.headers.get('ETag')).toBe(store.etag(stored, 'json'))
+    expect(store.get('patch-unconditional')).toBe(stored)
+  })
+
+  test('refuses a stale version with 409 and the current ETag', async () => {
+    const stale = seed('patch-stale')
+    const current = seed('patch-stale')
+    const res = await write(PATCH, 'patch-stale', { operations, baseVersion: stale.version })
+    expect(res.status).toBe(409)
+    expect(res.headers.get('ETag')).toBe(store.etag(current, 'json'))
+    expect(store.get('patch-stale')).toBe(current)
+  })
+
+  test('names the failing operation (422) and leaves the document as it was', async () => {
+    const stored = seed('patch-failing')
+    const res = await write(PATCH, 'patch-failing', {
+      operations: [...operations, { op: 'remove', path: '/rooms/5' }],
+      baseVersion: stored.version,
+    })
+    expect(res.status).toBe(422)
+    expect((await res.json()).operation).toBe(1)
+    expect(store.get('patch-failing')).toBe(stored)
+  })
+})
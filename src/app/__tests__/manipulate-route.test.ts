@@ -0,0 +1,40 @@
+/**
+ * @jest-environment node
+ */
+import fs from 'fs'
+import path from 'path'
+import { NextRequest } from 'next/server'
+import { POST } from '../api/json/manipulate/route'
+
+/**
+ * MANIPULATE ROUTE TESTS
+ * Answers to a table of requests, error messages included. The Python
+ * port (jsoncanvas/path_ops.py) is tested against the same table in
+ * tests/test_path_ops.py, so a change here must be made there too.
+ */
+
+interface ManipulateCase {
+  request: any
+  status: number
+  response: any
+}
+
+const cases: ManipulateCase[] = JSON.parse(
+  fs.readFileSync(path.join(__dirname, 'fixtures', 'manipulate-cases.json'), 'utf8')
+)
+
+describe('POST /api/json/manipulate', () => {
+  cases.forEach(({ request, status, response }, i) => {
+    test(`case ${i}: ${request.operation} answers ${status}`, async () => {
+      const res = await POST(
+        new NextRequest('http://localhost/api/json/manipulate', {
+          method: 'POST',
+          body: JSON.stringify(request),
+        })
+      )
+      expect(res.status).toBe(status)
+      // Key order is part of the answer the Python port has to match
+      expect(await res.text()).toBe(JSON.stringify(response))
+    })
+  })
+})
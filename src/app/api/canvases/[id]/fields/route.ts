@@ -0,0 +1,51 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getCanvasStore } from '@/lib/canvas-store';
+import { PageRequestError, parsePageRequest } from '@/lib/canvas-query-index';
+
+export const dynamic = 'force-dynamic';
+
+// GET - Fields below a confidence threshold, least confident first
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const { id } = await params;
+    const canvas = getCanvasStore().get(id);
+    if (!canvas) {
+      return NextResponse.json(
+        { error: 'Canvas not found' },
+        { status: 404 }
+      );
+    }
+
+    const search = request.nextUrl.searchParams;
+    const below = Number(search.get('below') ?? 100);
+    if (!Number.isFinite(below)) {
+      return NextResponse.json(
+        { error: 'below must be a number' },
+        { status: 400 }
+      );
+    }
+
+    const page = canvas.index.fields({
+      ...parsePageRequest(search),
+      below,
+      path: search.get('path') ?? undefined
+    });
+
+    return NextResponse.json({
+      success: true,
+      data: page
+    });
+  } catch (error) {
+    if (error instanceof PageRequestError) {
+      return NextResponse.json({ error: error.message }, { status: 400 });
+    }
+    console.error('Canvas fields API error:', error);
+    return NextResponse.json(
+      { error: 'Failed to query fields' },
+      { status: 500 }
+    );
+  }
+}
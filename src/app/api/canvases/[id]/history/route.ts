@@ -0,0 +1,51 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getCanvasStore } from '@/lib/canvas-store';
+import { PageRequestError, parsePageRequest } from '@/lib/canvas-query-index';
+
+export const dynamic = 'force-dynamic';
+
+// GET - Change log and learning history entries for a path, newest first
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const { id } = await params;
+    const canvas = getCanvasStore().get(id);
+    if (!canvas) {
+      return NextResponse.json(
+        { error: 'Canvas not found' },
+        { status: 404 }
+      );
+    }
+
+    const search = request.nextUrl.searchParams;
+    const path = search.get('path');
+    if (path === null) {
+      return NextResponse.json(
+        { error: 'Missing path parameter' },
+        { status: 400 }
+      );
+    }
+
+    const page = canvas.index.history({
+      ...parsePageRequest(search),
+      path,
+      includeDescendants: search.get('descendants') !== 'false'
+    });
+
+    return NextResponse.json({
+      success: true,
+      data: page
+    });
+  } catch (error) {
+    if (error instanceof PageRequestError) {
+      return NextResponse.json({ error: error.message }, { status: 400 });
+    }
+    console.error('Canvas history API error:', error);
+    return NextResponse.json(
+      { error: 'Failed to query history' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,45 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getCanvasStore } from '@/lib/canvas-store';
+import { PageRequestError, parsePageRequest } from '@/lib/canvas-query-index';
+import type { AIInsight } from '@/lib/jsoncanvas-types';
+
+export const dynamic = 'force-dynamic';
+
+// GET - Insights related to a path prefix, newest first
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const { id } = await params;
+    const canvas = getCanvasStore().get(id);
+    if (!canvas) {
+      return NextResponse.json(
+        { error: 'Canvas not found' },
+        { status: 404 }
+      );
+    }
+
+    const search = request.nextUrl.searchParams;
+    const page = canvas.index.insights({
+      ...parsePageRequest(search),
+      path: search.get('path') ?? undefined,
+      includeDescendants: search.get('descendants') !== 'false',
+      type: (search.get('type') as AIInsight['type'] | null) ?? undefined
+    });
+
+    return NextResponse.json({
+      success: true,
+      data: page
+    });
+  } catch (error) {
+    if (error instanceof PageRequestError) {
+      return NextResponse.json({ error: error.message }, { status: 400 });
+    }
+    console.error('Canvas insights API error:', error);
+    return NextResponse.json(
+      { error: 'Failed to query insights' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,89 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getCanvasStore, summarizeCanvas } from '@/lib/canvas-store';
+
+export const dynamic = 'force-dynamic';
+
+// GET - Summary of a stored canvas
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  const { id } = await params;
+  const canvas = getCanvasStore().get(id);
+  if (!canvas) {
+    return NextResponse.json(
+      { error: 'Canvas not found' },
+      { status: 404 }
+    );
+  }
+
+  return NextResponse.json({
+    success: true,
+    data: {
+      ...summarizeCanvas(canvas),
+      metadata: canvas.doc.metadata
+    }
+  });
+}
+
+// PUT - Replace a stored canvas with a new version of the file
+export async function PUT(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const { id } = await params;
+    const store = getCanvasStore();
+    const existing = store.get(id);
+    if (!existing) {
+      return NextResponse.json(
+        { error: 'Canvas not found' },
+        { status: 404 }
+      );
+    }
+
+    let canvas;
+    try {
+      canvas = store.put(new Uint8Array(await request.arrayBuffer()), {
+        id,
+        name: request.nextUrl.searchParams.get('name') ?? existing.name
+      });
+    } catch (error) {
+      return NextResponse.json(
+        { error: error instanceof Error ? error.message : 'Invalid .jsoncanvas file' },
+        { status: 400 }
+      );
+    }
+
+    return NextResponse.json({
+      success: true,
+      data: summarizeCanvas(canvas)
+    });
+
+  } catch (error) {
+    console.error('Replace canvas API error:', error);
+    return NextResponse.json(
+      { error: 'Failed to replace canvas' },
+      { status: 500 }
+    );
+  }
+}
+
+// DELETE - Remove a stored canvas
+export async function DELETE(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  const { id } = await params;
+  if (!getCanvasStore().delete(id)) {
+    return NextResponse.json(
+      { error: 'Canvas not found' },
+      { status: 404 }
+    );
+  }
+
+  return NextResponse.json({
+    success: true,
+    message: 'Canvas deleted successfully'
+  });
+}
@@ -0,0 +1,47 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getCanvasStore } from '@/lib/canvas-store';
+import { PageRequestError, parsePageRequest } from '@/lib/canvas-query-index';
+import type { AISuggestion } from '@/lib/jsoncanvas-types';
+
+export const dynamic = 'force-dynamic';
+
+// GET - Suggestions filtered by priority, type and path, highest priority first
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const { id } = await params;
+    const canvas = getCanvasStore().get(id);
+    if (!canvas) {
+      return NextResponse.json(
+        { error: 'Canvas not found' },
+        { status: 404 }
+      );
+    }
+
+    const search = request.nextUrl.searchParams;
+    const priority = search.get('priority');
+    const page = canvas.index.suggestions({
+      ...parsePageRequest(search),
+      path: search.get('path') ?? undefined,
+      includeDescendants: search.get('descendants') !== 'false',
+      priority: priority ? (priority.split(',') as AISuggestion['priority'][]) : undefined,
+      type: (search.get('type') as AISuggestion['type'] | null) ?? undefined
+    });
+
+    return NextResponse.json({
+      success: true,
+      data: page
+    });
+  } catch (error) {
+    if (error instanceof PageRequestError) {
+      return NextResponse.json({ error: error.message }, { status: 400 });
+    }
+    console.error('Canvas suggestions API error:', error);
+    return NextResponse.json(
+      { error: 'Failed to query suggestions' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,72 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getCanvasStore, summarizeCanvas } from '@/lib/canvas-store';
+import { JCB_MEDIA_TYPE } from '@/lib/jsoncanvas-binary';
+
+export const dynamic = 'force-dynamic';
+
+// POST - Upload a .jsoncanvas file (text or binary) for querying
+export async function POST(request: NextRequest) {
+  try {
+    const bytes = new Uint8Array(await request.arrayBuffer());
+    if (bytes.length === 0) {
+      return NextResponse.json(
+        { error: 'Request body must be a .jsoncanvas file' },
+        { status: 400 }
+      );
+    }
+
+    let canvas;
+    try {
+      canvas = getCanvasStore().put(bytes, { name: request.nextUrl.searchParams.get('name') ?? undefined });
+    } catch (error) {
+      return NextResponse.json(
+        { error: error instanceof Error ? error.message : 'Invalid .jsoncanvas file' },
+        { status: 400 }
+      );
+    }
+
+    return NextResponse.json({
+      success: true,
+      data: summarizeCanvas(canvas)
+    }, { status: 201 });
+
+  } catch (error) {
+    console.error('Upload canvas API error:', error);
+    return NextResponse.json(
+      { error: 'Failed to store canvas' },
+      { status: 500 }
+    );
+  }
+}
+
+// GET - List stored canvases and show API documentation
+export async function GET() {
+  return NextResponse.json({
+    endpoint: '/api/canvases',
+    canvases: getCanvasStore().list(),
+    methods: {
+      POST: {
+        description: 'Upload a .jsoncanvas file; it is parsed once and indexed for the query endpoints',
+        contentTypes: ['application/json', JCB_MEDIA_TYPE],
+        parameters: {
+          name: {
+            type: 'string',
+            required: false,
+            description: 'Query parameter; defaults to $metadata.title'
+          }
+        }
+      }
+    },
+    pagination: {
+      limit: 'Page size, 1-500 (default 50)',
+      cursor: 'nextCursor from the previous page'
+    },
+    relatedEndpoints: [
+      '/api/canvases/[id] - GET summary, PUT replace, DELETE',
+      '/api/canvases/[id]/insights?path=&type= - Insights related to a path prefix, newest first',
+      '/api/canvases/[id]/suggestions?priority=high,medium&type=&path= - Suggestions, highest priority first',
+      '/api/canvases/[id]/fields?below=70&path= - Fields below a confidence threshold, least confident first',
+      '/api/canvases/[id]/history?path=&descendants=true - Change log and learning history for a path'
+    ]
+  });
+}
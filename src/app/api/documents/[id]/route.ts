@@ -1,14 +1,91 @@
 import { NextRequest, NextResponse } from 'next/server';
 import type { JsonValue, Document } from '@/components/json-canvas/types';
+import { updateDocumentMetadata } from '@/lib/document-metadata';
+import { getDocumentStore, withVersion } from '@/lib/document-store';
+import type { DocumentStore, StoredDocument } from '@/lib/document-store';
+import { createJsonCanvas } from '@/lib/jsoncanvas-file';
+import { JCB_MEDIA_TYPE, writeJsonCanvasBinary } from '@/lib/jsoncanvas-binary';
+import { COMPRESSION_MIN_BYTES, compress, encodedEtag, etagMatches, negotiateEncoding } from '@/lib/http-cache';
+import { JsonPatchError, applyPatch } from '@/lib/json-patch';
 
 export const dynamic = 'force-dynamic';
 
-interface DocumentStore {
-  [key: string]: Document;
+const encoder = new TextEncoder();
+
+// Send one representation of a stored document: 304 if the client already
+// has it, otherwise the body (built once per version), compressed when the
+// client accepts it and it is large enough to be worth it
+function documentResponse(
+  request: NextRequest,
+  store: DocumentStore,
+  stored: StoredDocument,
+  representation: string,
+  contentType: string,
+  encode: () => Uint8Array
+) {
+  const identity = store.body(stored, representation, encode);
+  const encoding = identity.byteLength >= COMPRESSION_MIN_BYTES
+    ? negotiateEncoding(request.headers.get('accept-encoding'))
+    : null;
+  const headers: Record<string, string> = {
+    ETag: encodedEtag(store.etag(stored, representation), encoding),
+    'Cache-Control': 'private, no-cache',
+    Vary: 'Accept, Accept-Encoding'
+  };
+
+  if (etagMatches(request.headers.get('if-none-match'), headers.ETag)) {
+    return new NextResponse(null, { status: 304, headers });
+  }
+
+  const body = encoding
+    ? store.body(stored, representation, () => compress(identity, encoding), encoding)
+    : identity;
+  headers['Content-Type'] = contentType;
+  if (encoding) headers['Content-Encoding'] = encoding;
+  return new NextResponse(body as BodyInit, { headers });
 }
 
-// In-memory store for demo purposes - in production, use a proper database
-let documentStore: DocumentStore = {};
+// The 409 to send if a write names a version, by If-Match or baseVersion,
+// other than the stored one; null if it names the stored one or none
+function versionConflict(
+  request: NextRequest,
+  store: DocumentStore,
+  stored: StoredDocument,
+  baseVersion: unknown
+) {
+  const ifMatch = request.headers.get('if-match');
+  const current = (ifMatch === null || store.ifMatch(stored, ifMatch)) &&
+    (baseVersion === undefined || baseVersion === stored.version);
+  if (current) return null;
+  return NextResponse.json(
+    { error: `Version conflict: the document is at version ${stored.version}`, version: stored.version },
+    { status: 409, headers: { ETag: store.etag(stored, 'json') } }
+  );
+}
+
+// The document after a write: new data (if any) with its metadata, a history
+// entry for it if asked for, and a new name (if any)
+function updatedDocument(
+  existingDoc: Document,
+  data: JsonValue | undefined,
+  name: string | undefined,
+  addToHistory: boolean
+): Document {
+  return {
+    ...existingDoc,
+    data: data ?? existingDoc.data,
+    name: name || existingDoc.name,
+    history: addToHistory && data !== undefined
+      ? [...existingDoc.history.slice(0, existingDoc.currentHistoryIndex + 1), data]
+      : existingDoc.history,
+    currentHistoryIndex: addToHistory && data !== undefined
+      ? existingDoc.currentHistoryIndex + 1
+      : existingDoc.currentHistoryIndex,
+    metadata: data !== undefined
+      ? updateDocumentMetadata(existingDoc.metadata, data)
+      : existingDoc.metadata
+  };
+}
 
 // GET - Retrieve a specific document
 export async function GET(
@@ -17,19 +94,35 @@ export async function GET(
 ) {
   try {
     const { id } = await params;
-    const document = documentStore[id];
+    const store = getDocumentStore();
+    const stored = store.get(id);
     
-    if (!document) {
+    if (!stored) {
       return NextResponse.json(
         { error: 'Document not found' },
         { status: 404 }
       );
     }
+    const document = stored.document;
 
-    return NextResponse.json({
-      success: true,
-      data: document
-    });
+    // Clients that ask for the binary encoding get the document as a .jcb file
+    if (request.headers.get('accept')?.includes(JCB_MEDIA_TYPE)) {
+      return documentResponse(request, store, stored, 'jcb', JCB_MEDIA_TYPE, () =>
+        writeJsonCanvasBinary(createJsonCanvas(document.data, document.name))
+      );
+    }
+
+    // ?includeHistory=false leaves out the history, which holds a full copy of the data per entry
+    if (request.nextUrl.searchParams.get('includeHistory') === 'false') {
+      return documentResponse(request, store, stored, 'json-current', 'application/json', () => {
+        const { history, ...current } = withVersion(stored);
+        return encoder.encode(JSON.stringify({ success: true, data: current }));
+      });
+    }
+
+    return documentResponse(request, store, stored, 'json', 'application/json', () =>
+      encoder.encode(JSON.stringify({ success: true, data: withVersion(stored) }))
+    );
 
   } catch (error) {
     console.error('Get document API error:', error);
@@ -48,33 +141,31 @@ export async function PUT(
   try {
     const { id } = await params;
     const body = await request.json();
-    const existingDoc = documentStore[id];
+    const store = getDocumentStore();
+    const existing = store.get(id);
     
-    if (!existingDoc) {
+    if (!existing) {
       return NextResponse.json(
         { error: 'Document not found' },
         { status: 404 }
       );
     }
 
+    // Writes that name no version replace whatever is there
+    const conflict = versionConflict(request, store, existing, body.baseVersion);
+    if (conflict) return conflict;
+
     // Update document with new data
-    const updatedDoc: Document = {
-      ...existingDoc,
-      data: body.data || existingDoc.data,
-      name: body.name || existingDoc.name,
-      history: body.addToHistory && body.data 
-        ? [...existingDoc.history.slice(0, existingDoc.currentHistoryIndex + 1), body.data]
-        : existingDoc.history,
-      currentHistoryIndex: body.addToHistory && body.data 
-        ? existingDoc.currentHistoryIndex + 1 
-        : existingDoc.currentHistoryIndex
-    };
-
-    documentStore[id] = updatedDoc;
+    const stored = store.put(
+      updatedDocument(existing.document, body.data || undefined, body.name, Boolean(body.addToHistory))
+    );
 
+    // The body is the full JSON representation a GET would send
     return NextResponse.json({
       success: true,
-      data: updatedDoc
+      data: withVersion(stored)
+    }, {
+      headers: { ETag: store.etag(stored, 'json') }
     });
 
   } catch (error) {
@@ -86,6 +177,80 @@ export async function PUT(
   }
 }
 
+// PATCH - Apply JSON Patch (RFC 6902) operations to a document's data
+export async function PATCH(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const { id } = await params;
+    const body = await request.json();
+    const store = getDocumentStore();
+    const existing = store.get(id);
+
+    if (!existing) {
+      return NextResponse.json(
+        { error: 'Document not found' },
+        { status: 404 }
+      );
+    }
+
+    // application/json-patch+json bodies are the operations alone, with the version in If-Match
+    const { operations, baseVersion, name, addToHistory } = Array.isArray(body) ? { operations: body } as any : body;
+    if (!Array.isArray(operations)) {
+      return NextResponse.json(
+        { error: 'operations must be an array of JSON Patch operations' },
+        { status: 400 }
+      );
+    }
+
+    // Operations only make sense against the version they were made from
+    if (request.headers.get('if-match') === null && baseVersion === undefined) {
+      return NextResponse.json(
+        { error: 'PATCH needs the version it applies to, as If-Match or baseVersion', version: existing.version },
+        { status: 428, headers: { ETag: store.etag(existing, 'json') } }
+      );
+    }
+    const conflict = versionConflict(request, store, existing, baseVersion);
+    if (conflict) return conflict;
+
+    let data: JsonValue;
+    try {
+      data = applyPatch(existing.document.data, operations);
+    } catch (error) {
+      if (error instanceof JsonPatchError) {
+        return NextResponse.json(
+          { error: error.message, operation: error.index },
+          { status: 422 }
+        );
+      }
+      throw error;
+    }
+
+    const stored = store.put(updatedDocument(existing.document, data, name, Boolean(addToHistory)));
+
+    // Only what the client cannot work out itself, so a small edit stays small both ways
+    return NextResponse.json({
+      success: true,
+      data: {
+        id,
+        name: stored.document.name,
+        version: stored.version,
+        metadata: stored.document.metadata
+      }
+    }, {
+      headers: { ETag: store.etag(stored, 'json') }
+    });
+
+  } catch (error) {
+    console.error('Patch document API error:', error);
+    return NextResponse.json(
+      { error: 'Failed to patch document' },
+      { status: 500 }
+    );
+  }
+}
+
 // DELETE - Remove a document
 export async function DELETE(
   request: NextRequest,
@@ -93,15 +258,13 @@ export async function DELETE(
 ) {
   try {
     const { id } = await params;
-    if (!documentStore[id]) {
+    if (!getDocumentStore().delete(id)) {
       return NextResponse.json(
         { error: 'Document not found' },
         { status: 404 }
       );
     }
 
-    delete documentStore[id];
-
     return NextResponse.json({
       success: true,
       message: 'Document deleted successfully'
@@ -1,5 +1,8 @@
 import { NextRequest, NextResponse } from 'next/server';
 import type { JsonValue, Document } from '@/components/json-canvas/types';
+import { createDocumentMetadata } from '@/lib/document-metadata';
+import { getDocumentStore, withVersion } from '@/lib/document-store';
+import { JCB_MEDIA_TYPE, readJsonCanvasBinary } from '@/lib/jsoncanvas-binary';
 
 export const dynamic = 'force-dynamic';
 
@@ -12,13 +15,36 @@ function createNewDocument(data: JsonValue, name?: string): Document {
     data: data,
     history: [data],
     currentHistoryIndex: 0,
+    metadata: createDocumentMetadata(data),
   };
 }
 
 // POST - Create a new document
 export async function POST(request: NextRequest) {
   try {
-    const body = await request.json();
+    // A binary .jsoncanvas body carries its own name in $metadata.title
+    let body: { data?: JsonValue; name?: string };
+    if (request.headers.get('content-type')?.includes(JCB_MEDIA_TYPE)) {
+      let canvas;
+      try {
+        canvas = readJsonCanvasBinary(new Uint8Array(await request.arrayBuffer()));
+      } catch (error) {
+        // A body that does not decode is the client's error, not ours
+        return NextResponse.json(
+          {
+            error: 'Invalid JCB body',
+            message: error instanceof Error ? error.message : 'Could not decode the document'
+          },
+          { status: 400 }
+        );
+      }
+      body = {
+        data: canvas.data,
+        name: typeof canvas.metadata.title === 'string' ? canvas.metadata.title : undefined,
+      };
+    } else {
+      body = await request.json();
+    }
     
     // Validate required fields
     if (!body.data) {
@@ -29,10 +55,15 @@ export async function POST(request: NextRequest) {
     }
 
     const newDoc = createNewDocument(body.data, body.name);
+    const store = getDocumentStore();
+    const stored = store.put(newDoc);
 
+    // The body is the full JSON representation a GET would send
     return NextResponse.json({
       success: true,
-      data: newDoc
+      data: withVersion(stored)
+    }, {
+      headers: { ETag: store.etag(stored, 'json') }
     });
 
   } catch (error) {
@@ -54,6 +85,7 @@ export async function GET() {
     methods: {
       POST: {
         description: 'Create a new JSON document',
+        contentTypes: ['application/json', JCB_MEDIA_TYPE],
         parameters: {
           data: {
             type: 'any',
@@ -78,14 +110,19 @@ export async function GET() {
               name: "My Document",
               data: { "message": "Hello World", "created": "2024-01-01" },
               history: [{ "message": "Hello World", "created": "2024-01-01" }],
-              currentHistoryIndex: 0
+              currentHistoryIndex: 0,
+              metadata: { size: 48, nodeCount: 3, createdAt: 1704067200000, modifiedAt: 1704067200000 },
+              version: 1
             }
           }
         }
       }
     },
     relatedEndpoints: [
-      '/api/documents/[id] - GET/PUT/DELETE specific document',
+      '/api/documents/[id] - GET/PUT/DELETE specific document; GET sends an ETag, answers ' +
+        'If-None-Match with 304, compresses large bodies (br, gzip) and takes ?includeHistory=false',
+      '/api/documents/[id] - PATCH with JSON Patch (RFC 6902) operations; PATCH needs, and PUT ' +
+        'takes, the version written over as If-Match or baseVersion, and answers 409 if it is not current',
       '/api/documents/[id]/history - Manage document history'
     ]
   });
@@ -5,14 +5,23 @@ import {
   deleteAtPath, 
   renamePropertyAtPath 
 } from '@/lib/json-utils';
+import { changedSubtree, diffJson } from '@/lib/json-patch';
 import type { JsonValue, JsonPath } from '@/components/json-canvas/types';
 
 export const dynamic = 'force-dynamic';
 
+const RESPONSE_SHAPES = ['full', 'result', 'patch', 'subtree'] as const;
+type ResponseShape = typeof RESPONSE_SHAPES[number];
+
+// Requests larger than this (in characters) default to the 'result' shape,
+// which leaves out the originalData echo
+export const LARGE_PAYLOAD_CHARS = 1_000_000;
+
 // POST - Perform JSON manipulation operations
 export async function POST(request: NextRequest) {
   try {
-    const body = await request.json();
+    const text = await request.text();
+    const body = JSON.parse(text);
     
     // Validate required fields
     if (!body.operation || !body.jsonData) {
@@ -23,6 +32,14 @@ export async function POST(request: NextRequest) {
     }
 
     const { operation, jsonData, path, value, key, newKey } = body;
+    const responseShape: ResponseShape =
+      body.responseShape ?? (text.length > LARGE_PAYLOAD_CHARS ? 'result' : 'full');
+    if (!RESPONSE_SHAPES.includes(responseShape)) {
+      return NextResponse.json(
+        { error: `Unknown responseShape: ${responseShape} (expected ${RESPONSE_SHAPES.join(', ')})` },
+        { status: 400 }
+      );
+    }
     let result: JsonValue;
 
     switch (operation) {
@@ -79,7 +96,7 @@ export async function POST(request: NextRequest) {
           data: {
             isValid: validation.isValid,
             errors: validation.errors,
-            originalData: jsonData
+            ...(responseShape === 'full' && { originalData: jsonData })
           }
         });
 
@@ -92,11 +109,7 @@ export async function POST(request: NextRequest) {
 
     return NextResponse.json({
       success: true,
-      data: {
-        result,
-        operation,
-        originalData: jsonData
-      }
+      data: shapeResult(responseShape, operation, jsonData, result)
     });
 
   } catch (error) {
@@ -111,30 +124,55 @@ export async function POST(request: NextRequest) {
   }
 }
 
-// Helper function to set value at path
+// The response data for a successful edit in the requested shape. The edits
+// share unchanged subtrees with jsonData, so the patch and subtree shapes
+// cost the size of the edited path rather than of the document.
+function shapeResult(responseShape: ResponseShape, operation: string, jsonData: JsonValue, result: JsonValue) {
+  switch (responseShape) {
+    case 'result':
+      return { result, operation };
+    case 'patch':
+      return { operation, patch: diffJson(jsonData, result) };
+    case 'subtree': {
+      const subtree = changedSubtree(jsonData, result, diffJson(jsonData, result));
+      return { operation, path: subtree ? subtree.path : null, ...(subtree && { value: subtree.value }) };
+    }
+    default:
+      return { result, operation, originalData: jsonData };
+  }
+}
+
+// Helper function to set value at path. Like the json-utils edits, only the
+// containers along the path are copied.
 function setValueAtPath(data: JsonValue, path: JsonPath, value: JsonValue): JsonValue {
   if (path.length === 0) return value;
   
-  const result = JSON.parse(JSON.stringify(data)); // Deep clone
-  let current = result;
+  const containers: any[] = [data];
+  let current: any = data;
   
   for (let i = 0; i < path.length - 1; i++) {
     const segment = path[i];
     if (current && typeof current === 'object' && segment in current) {
-      current = (current as any)[segment];
+      current = current[segment];
+      containers.push(current);
     } else {
       throw new Error(`Invalid path: ${path.slice(0, i + 1).join('.')}`);
     }
   }
   
   const lastSegment = path[path.length - 1];
-  if (current && typeof current === 'object') {
-    (current as any)[lastSegment] = value;
-  } else {
+  if (!current || typeof current !== 'object') {
     throw new Error(`Cannot set value at path: ${path.join('.')}`);
   }
   
-  return result;
+  let updated: any = value;
+  for (let i = containers.length - 1; i >= 0; i--) {
+    const container = containers[i];
+    const copy = Array.isArray(container) ? container.slice() : { ...container };
+    copy[i === containers.length - 1 ? lastSegment : path[i]] = updated;
+    updated = copy;
+  }
+  return updated;
 }
 
 // Helper function to validate JSON structure
@@ -185,6 +223,16 @@ export async function GET() {
     endpoint: '/api/json/manipulate',
     method: 'POST',
     description: 'Perform various JSON manipulation operations',
+    responseShape: {
+      description: 'Optional. What a successful edit answers with; requests over ' +
+        `${LARGE_PAYLOAD_CHARS} characters default to result, others to full`,
+      values: {
+        full: '{ result, operation, originalData }',
+        result: '{ result, operation }',
+        patch: '{ operation, patch }: RFC 6902 operations from jsonData to the result',
+        subtree: '{ operation, path, value }: setting value at path in jsonData gives the result'
+      }
+    },
     operations: {
       addProperty: {
         description: 'Add a new property to an object at the specified path',
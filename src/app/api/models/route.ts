@@ -1,4 +1,5 @@
 import {NextResponse} from 'next/server';
+import {OFFLINE_MODEL_NAME} from '@/lib/offline-model';
 
 export const dynamic = 'force-dynamic';
 
@@ -32,6 +33,8 @@ export async function GET() {
           models = data.data.map((m: any) => m.id);
         }
       }
+    } else if (provider === 'offline') {
+      models = [OFFLINE_MODEL_NAME];
     } else if (provider === 'google') {
       const url = `https://generativelanguage.googleapis.com/v1/models?key=${process.env.GOOGLE_AI_API_KEY || ''}`;
       const res = await fetch(url, {cache: 'no-store'});
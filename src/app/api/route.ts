@@ -40,8 +40,29 @@ export async function GET() {
           },
           single: {
             path: '/documents/[id]',
+            methods: ['GET', 'PUT', 'PATCH', 'DELETE'],
+            description: 'Manage specific document; PATCH applies JSON Patch operations against a version'
+          },
+          binary: {
+            mediaType: 'application/vnd.jsoncanvas+jcb',
+            description: 'Send "Accept: application/vnd.jsoncanvas+jcb" to GET a document in the compact binary encoding, or use it as the Content-Type to POST one'
+          }
+        },
+        canvases: {
+          list: {
+            path: '/canvases',
+            methods: ['GET', 'POST'],
+            description: 'Upload a .jsoncanvas file for indexed metadata queries'
+          },
+          single: {
+            path: '/canvases/[id]',
             methods: ['GET', 'PUT', 'DELETE'],
-            description: 'Manage specific document'
+            description: 'Manage a stored canvas'
+          },
+          queries: {
+            paths: ['/canvases/[id]/insights', '/canvases/[id]/suggestions', '/canvases/[id]/fields', '/canvases/[id]/history'],
+            methods: ['GET'],
+            description: 'Paginated insights, suggestions, low-confidence fields and change history by path'
           }
         },
         json: {
@@ -110,7 +131,8 @@ const result = await response.json();`
         GOOGLE_AI_API_KEY: 'For AI features (required)',
         OPENROUTER_API_KEY: 'For OpenRouter models (optional)',
         REQUESTY_API_KEY: 'For Requesty models (optional)'
-      }
+      },
+      offline: 'MODEL_PROVIDER=offline answers AI requests with a deterministic local stand-in model; see .env.example'
     },
     rateLimit: 'No rate limiting currently implemented',
     cors: 'CORS headers may need configuration for cross-origin requests'
@@ -1,28 +1,40 @@
 
 "use client";
 
-import React, { useState, useEffect, useCallback, useMemo } from 'react';
+import React, { useState, useEffect, useCallback, useMemo, useRef } from 'react';
 import { JsonTreeEditor } from '@/components/json-canvas/json-tree-editor';
 import { Header } from '@/components/json-canvas/header';
+import type { ExportFormat } from '@/components/json-canvas/header';
 import { ApiKeyDialog } from '@/components/json-canvas/api-key-dialog';
 import { EditEntireJsonDialog } from '@/components/json-canvas/edit-entire-json-dialog';
 import { QuickImportDialog } from '@/components/json-canvas/quick-import-dialog';
 import { SchemaValidationDialog } from '@/components/json-canvas/schema-validation-dialog';
+import { FloorPlanView } from '@/components/json-canvas/floor-plan-view';
+import { TreemapView, forgetTreemapDocument } from '@/components/json-canvas/treemap-view';
 import { DocumentSidebar } from '@/components/json-canvas/document-sidebar';
 import { LoadingProvider } from '@/contexts/loading-context';
-import type { JsonValue, JsonObject, Document } from '@/components/json-canvas/types';
+import type { JsonValue, JsonObject, Document, DocumentSummary, JsonStructureEdit } from '@/components/json-canvas/types';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { useToast } from '@/hooks/use-toast';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { ErrorBoundary } from '@/components/ui/error-boundary';
+import { DocumentPersistence } from '@/lib/document-storage';
+import { createDocumentMetadata, updateDocumentMetadata, toDocumentSummary } from '@/lib/document-metadata';
+import { createJsonCanvas, fromCanvasRecord, isJsonCanvasFileName, readJsonCanvas, toCanvasRecord, writeJsonCanvas } from '@/lib/jsoncanvas-file';
+import type { JsonCanvasDocument, StoredCanvasRecord } from '@/lib/jsoncanvas-file';
+import { JCB_EXTENSION, JCB_MEDIA_TYPE, isJsonCanvasBinary, readJsonCanvasBinary, writeJsonCanvasBinary } from '@/lib/jsoncanvas-binary';
+import { measureHistoryMemory, pushHistory, shareStructure } from '@/lib/history';
+import { DOCUMENT_MEMORY_BUDGET_BYTES, estimateDocumentBytes, selectEvictions } from '@/lib/document-cache';
+import { createBrowserStorageBackend } from '@/lib/storage-worker-client';
+import { applyStructureEdit, buildFieldMetadataIndex, childFieldMetadata, fieldMetadataToRecord } from '@/lib/field-metadata-index';
+import type { FieldMetadataNode } from '@/lib/field-metadata-index';
+import { CanvasLogStore, describeChange } from '@/lib/canvas-log';
+import type { ChangeLogEntry, SpatialRoom } from '@/lib/jsoncanvas-types';
 import Image from 'next/image';
 import { ClipboardPaste, LayoutDashboard } from 'lucide-react';
 
 const LOCAL_STORAGE_KEYS = {
-  DOCUMENTS_META: 'jsonCanvas_documentsMeta',
-  DOCUMENT_PREFIX: 'jsonCanvas_document_',
-  ACTIVE_DOCUMENT_ID: 'jsonCanvas_activeDocumentId',
   API_KEY: 'google_ai_api_key',
   THEME: 'jsonCanvas_theme',
   MODEL: 'jsonCanvas_model',
@@ -90,10 +102,15 @@ const createNewDocument = (data: JsonValue, name?: string): Document => {
     data: data,
     history: [data],
     currentHistoryIndex: 0,
+    metadata: createDocumentMetadata(data),
   };
 };
 
 export default function Home() {
+  // Every document in the workspace, in sidebar order. Entries for hydrated
+  // documents may be stale; documentSummaries below has the live values.
+  const [documentIndex, setDocumentIndex] = useState<DocumentSummary[]>([]);
+  // Documents currently held in memory
   const [documents, setDocuments] = useState<Document[]>([]);
   const [activeDocumentId, setActiveDocumentId] = useState<string | null>(null);
   
@@ -107,7 +124,44 @@ export default function Home() {
   const [isSidebarOpen, setIsSidebarOpen] = useState(true);
   const [theme, setTheme] = useState<'light' | 'dark'>('light');
   const [selectedModel, setSelectedModel] = useState('');
+  const persistenceRef = useRef<DocumentPersistence | null>(null);
+  const [isWorkspaceLoaded, setIsWorkspaceLoaded] = useState(false);
+  const documentsRef = useRef<Document[]>([]);
+  const activeDocumentIdRef = useRef<string | null>(null);
+  const lastUsedRef = useRef(new Map<string, number>());
+  const hydratingRef = useRef(new Set<string>());
+  const isEvictingRef = useRef(false);
+  // .jsoncanvas metadata for documents opened from such files, kept for export.
+  // Stored with the document through storeCanvas and restored when it is
+  // hydrated; canvasRevision re-runs the memos that read it.
+  const canvasFilesRef = useRef(new Map<string, JsonCanvasDocument>());
+  const [canvasRevision, setCanvasRevision] = useState(0);
+  // The field metadata index last stored for each canvas
+  const storedFieldIndexesRef = useRef(new Map<string, FieldMetadataNode>());
+  // Field metadata index for each data snapshot of those documents. Keying by
+  // snapshot keeps the index in step with undo and redo for free.
+  const fieldIndexesRef = useRef(new WeakMap<object, FieldMetadataNode>());
+  // Change log for those documents. Entries are keyed by the data snapshot
+  // they produced and appended once that snapshot is committed. The stored
+  // log belongs to the document id, so it is exported again once the canvas
+  // is restored after a reload, and deleted with the document.
+  const changeLogStoreRef = useRef<CanvasLogStore | null>(null);
+  const pendingChangeLogRef = useRef(new WeakMap<object, ChangeLogEntry>());
+  documentsRef.current = documents;
 
+  // Keep a document's canvas and queue it for the next write; withLogs also
+  // stores the file's own logs, which only happens when it is imported
+  const storeCanvas = useCallback((docId: string, canvas: JsonCanvasDocument, withLogs = false) => {
+    canvasFilesRef.current.set(docId, canvas);
+    persistenceRef.current?.saveCanvas(toCanvasRecord(docId, canvas, withLogs));
+    setCanvasRevision(value => value + 1);
+  }, []);
+
+  const restoreCanvas = useCallback((record: StoredCanvasRecord, data: JsonValue) => {
+    canvasFilesRef.current.set(record.id, fromCanvasRecord(record, data));
+    setCanvasRevision(value => value + 1);
+  }, []);
+  activeDocumentIdRef.current = activeDocumentId;
 
   // Theme and model management
   useEffect(() => {
@@ -152,7 +206,7 @@ export default function Home() {
   };
 
 
-  // Load documents from local storage on initial mount
+  // Load documents from IndexedDB on initial mount
   useEffect(() => {
     setIsClient(true); 
 
@@ -168,43 +222,62 @@ export default function Home() {
       toast({ title: 'Local Storage Error', description: 'Could not read API key from local storage.', variant: 'destructive' });
     }
 
-    try {
-      const savedDocsMetaString = localStorage.getItem(LOCAL_STORAGE_KEYS.DOCUMENTS_META);
-      const loadedDocuments: Document[] = [];
-      if (savedDocsMetaString) {
-        const savedDocsMeta: { id: string; name: string }[] = JSON.parse(savedDocsMetaString);
-        for (const meta of savedDocsMeta) {
-          const docString = localStorage.getItem(`${LOCAL_STORAGE_KEYS.DOCUMENT_PREFIX}${meta.id}`);
-          if (docString) {
-            loadedDocuments.push(JSON.parse(docString));
-          }
-        }
-      }
+    const storageBackend = createBrowserStorageBackend();
+    changeLogStoreRef.current = new CanvasLogStore(storageBackend);
+    const persistence = new DocumentPersistence(storageBackend, {
+      onError: (error) => {
+        console.error("Error saving documents to IndexedDB:", error);
+        toast({ title: 'Storage Error', description: 'Could not save documents automatically.', variant: 'destructive' });
+      },
+    });
+    persistenceRef.current = persistence;
+    let cancelled = false;
 
-      if (loadedDocuments.length > 0) {
-        setDocuments(loadedDocuments);
-        const savedActiveId = localStorage.getItem(LOCAL_STORAGE_KEYS.ACTIVE_DOCUMENT_ID);
-        if (savedActiveId && loadedDocuments.some(doc => doc.id === savedActiveId)) {
-          setActiveDocumentId(savedActiveId);
+    persistence.load()
+      .then(({ index, documents: loadedDocuments, activeDocumentId: savedActiveId, canvases }) => {
+        if (cancelled) return;
+        if (index.length > 0) {
+          // Only the index and the active document are loaded; the rest hydrate on selection
+          for (const record of canvases) {
+            const doc = loadedDocuments.find(loaded => loaded.id === record.id);
+            if (doc) restoreCanvas(record, doc.data);
+          }
+          setDocumentIndex(index);
+          setDocuments(loadedDocuments);
+          setActiveDocumentId(savedActiveId ?? index[0].id);
         } else {
-          setActiveDocumentId(loadedDocuments[0].id);
+          // Saved on the first sync, like any other new document
+          const welcomeDoc = createNewDocument(initialJson, "Welcome Document");
+          setDocumentIndex([toDocumentSummary(welcomeDoc)]);
+          setDocuments([welcomeDoc]);
+          setActiveDocumentId(welcomeDoc.id);
         }
-      } else {
+        setIsWorkspaceLoaded(true);
+      })
+      .catch((error) => {
+        if (cancelled) return;
+        console.error("Error loading documents from IndexedDB:", error);
+        toast({ title: 'Storage Error', description: 'Could not open browser storage. Using default setup; changes will not be saved.', variant: 'destructive' });
         const welcomeDoc = createNewDocument(initialJson, "Welcome Document");
+        setDocumentIndex([toDocumentSummary(welcomeDoc)]);
         setDocuments([welcomeDoc]);
         setActiveDocumentId(welcomeDoc.id);
-        localStorage.setItem(LOCAL_STORAGE_KEYS.DOCUMENTS_META, JSON.stringify([{ id: welcomeDoc.id, name: welcomeDoc.name }]));
-        localStorage.setItem(`${LOCAL_STORAGE_KEYS.DOCUMENT_PREFIX}${welcomeDoc.id}`, JSON.stringify(welcomeDoc));
-        localStorage.setItem(LOCAL_STORAGE_KEYS.ACTIVE_DOCUMENT_ID, welcomeDoc.id);
+      });
+
+    // Don't lose the debounce window when the tab is hidden or closed
+    const flushOnHide = () => {
+      if (document.visibilityState === 'hidden') {
+        void persistence.flush();
       }
-    } catch (error) {
-      console.error("Error loading documents from localStorage:", error);
-      toast({ title: 'Local Storage Error', description: 'Could not load documents. Using default setup.', variant: 'destructive' });
-      const welcomeDoc = createNewDocument(initialJson, "Welcome Document");
-      setDocuments([welcomeDoc]);
-      setActiveDocumentId(welcomeDoc.id);
-    }
-  }, [toast]); 
+    };
+    document.addEventListener('visibilitychange', flushOnHide);
+
+    return () => {
+      cancelled = true;
+      document.removeEventListener('visibilitychange', flushOnHide);
+      void persistence.flush();
+    };
+  }, [toast, restoreCanvas]); 
 
   // Update API key status and theme in the active document if its userSettings exist
   useEffect(() => {
@@ -236,12 +309,15 @@ export default function Home() {
 
 
             if (changed) {
+              const data = {
+                ...doc.data,
+                userSettings: updatedUserSettings
+              };
+              // Settings sync is not a user edit, so keep modifiedAt as is
               return {
                 ...doc,
-                data: {
-                  ...doc.data,
-                  userSettings: updatedUserSettings
-                }
+                data,
+                metadata: updateDocumentMetadata(doc.metadata, data, doc.metadata.modifiedAt)
               };
             }
           }
@@ -251,61 +327,204 @@ export default function Home() {
     });
   }, [apiKey, activeDocumentId, isClient, theme]);
 
-  // Save documents to local storage whenever they change
+  const documentSummaries = useMemo(() => {
+    const loaded = new Map(documents.map(doc => [doc.id, doc]));
+    return documentIndex.map(entry => {
+      const doc = loaded.get(entry.id);
+      return doc ? toDocumentSummary(doc) : entry;
+    });
+  }, [documentIndex, documents]);
+
+  // Queue changed documents for the next batched IndexedDB write
   useEffect(() => {
-    if (!isClient || documents.length === 0) return; 
+    if (!isWorkspaceLoaded || documentSummaries.length === 0) return; 
+    persistenceRef.current?.sync(documentSummaries, documents, activeDocumentId);
+  }, [documentSummaries, documents, activeDocumentId, isWorkspaceLoaded]);
 
-    try {
-      const docsMeta = documents.map(doc => ({ id: doc.id, name: doc.name }));
-      localStorage.setItem(LOCAL_STORAGE_KEYS.DOCUMENTS_META, JSON.stringify(docsMeta));
-      documents.forEach(doc => {
-        localStorage.setItem(`${LOCAL_STORAGE_KEYS.DOCUMENT_PREFIX}${doc.id}`, JSON.stringify(doc));
+  // Hydrate the active document from storage if it is not in memory
+  useEffect(() => {
+    if (!activeDocumentId) return;
+    lastUsedRef.current.set(activeDocumentId, Date.now());
+
+    const persistence = persistenceRef.current;
+    const entry = documentIndex.find(summary => summary.id === activeDocumentId);
+    if (!isWorkspaceLoaded || !persistence || !entry) return;
+    if (documents.some(doc => doc.id === activeDocumentId) || hydratingRef.current.has(activeDocumentId)) return;
+
+    hydratingRef.current.add(activeDocumentId);
+    persistence.loadDocument(entry)
+      .then((hydrated) => {
+        if (!hydrated) {
+          toast({ title: 'Document Unavailable', description: `"${entry.name}" could not be found in browser storage.`, variant: 'destructive' });
+          return;
+        }
+        const { document: doc, canvas } = hydrated;
+        if (canvas) restoreCanvas(canvas, doc.data);
+        setDocuments(prevDocs => prevDocs.some(d => d.id === doc.id) ? prevDocs : [...prevDocs, doc]);
+      })
+      .catch((error) => {
+        console.error("Error loading document from IndexedDB:", error);
+        toast({ title: 'Storage Error', description: `Could not load "${entry.name}".`, variant: 'destructive' });
+      })
+      .finally(() => {
+        hydratingRef.current.delete(entry.id);
       });
-      if (activeDocumentId) {
-        localStorage.setItem(LOCAL_STORAGE_KEYS.ACTIVE_DOCUMENT_ID, activeDocumentId);
-      }
-    } catch (error) {
-      console.error("Error saving documents to localStorage:", error);
-      toast({ title: 'Local Storage Error', description: 'Could not save documents automatically.', variant: 'destructive' });
-    }
-  }, [documents, activeDocumentId, isClient, toast]);
+  }, [activeDocumentId, documentIndex, documents, isWorkspaceLoaded, toast, restoreCanvas]);
+
+  // Evict least recently used inactive documents once over the memory budget
+  useEffect(() => {
+    const persistence = persistenceRef.current;
+    if (!isWorkspaceLoaded || !persistence || isEvictingRef.current) return;
+
+    const candidates = selectEvictions(
+      documents.map(doc => ({ id: doc.id, bytes: estimateDocumentBytes(doc), lastUsed: lastUsedRef.current.get(doc.id) ?? 0 })),
+      DOCUMENT_MEMORY_BUDGET_BYTES,
+      activeDocumentId
+    );
+    if (candidates.length === 0) return;
+
+    isEvictingRef.current = true;
+    const candidateIds = new Set(candidates);
+    persistence.flush()
+      .then(() => {
+        // Only drop documents whose current version has reached storage
+        const evicted = documentsRef.current.filter(doc =>
+          candidateIds.has(doc.id) && doc.id !== activeDocumentIdRef.current && persistence.isPersisted(doc)
+        );
+        if (evicted.length === 0) return;
+        const summaries = new Map(evicted.map(doc => [doc.id, toDocumentSummary(doc)]));
+        // Their canvases are stored too and come back when they are hydrated
+        evicted.forEach(doc => canvasFilesRef.current.delete(doc.id));
+        setDocumentIndex(prevIndex => prevIndex.map(entry => summaries.get(entry.id) ?? entry));
+        setDocuments(prevDocs => prevDocs.filter(doc => !evicted.includes(doc)));
+      })
+      .finally(() => {
+        isEvictingRef.current = false;
+      });
+  }, [documents, activeDocumentId, isWorkspaceLoaded]);
 
 
   const activeDocument = useMemo(() => {
     return documents.find(doc => doc.id === activeDocumentId);
   }, [documents, activeDocumentId]);
 
-  const updateActiveDocumentData = useCallback((newJson: JsonValue, fromHistory = false) => {
+  const activeHistory = activeDocument?.history;
+  const historyMemory = useMemo(() => {
+    return activeHistory ? measureHistoryMemory(activeHistory) : null;
+  }, [activeHistory]);
+
+  const getFieldIndex = useCallback((docId: string, data: JsonValue): FieldMetadataNode | undefined => {
+    if (typeof data !== 'object' || data === null) return undefined;
+    let index = fieldIndexesRef.current.get(data);
+    if (!index) {
+      // Rehydrated from storage, so start again from the file's metadata
+      const canvas = canvasFilesRef.current.get(docId);
+      if (!canvas) return undefined;
+      index = buildFieldMetadataIndex(canvas.metadata.ai?.fieldMetadata);
+      fieldIndexesRef.current.set(data, index);
+      storedFieldIndexesRef.current.set(docId, index);
+    }
+    return index;
+  }, []);
+
+  const activeData = activeDocument?.data;
+  const activeFieldMetadata = useMemo(() => {
+    return activeDocumentId && activeData !== undefined ? getFieldIndex(activeDocumentId, activeData) : undefined;
+  }, [activeDocumentId, activeData, getFieldIndex, canvasRevision]);
+
+  // Field metadata follows keys renamed and items moved, so the stored
+  // canvas is updated whenever the index changes
+  useEffect(() => {
+    if (!activeDocumentId || !activeFieldMetadata) return;
+    const canvas = canvasFilesRef.current.get(activeDocumentId);
+    if (!canvas?.metadata.ai || storedFieldIndexesRef.current.get(activeDocumentId) === activeFieldMetadata) return;
+    storedFieldIndexesRef.current.set(activeDocumentId, activeFieldMetadata);
+    const ai = { ...canvas.metadata.ai, fieldMetadata: fieldMetadataToRecord(activeFieldMetadata) };
+    storeCanvas(activeDocumentId, { ...canvas, metadata: { ...canvas.metadata, ai } });
+  }, [activeDocumentId, activeFieldMetadata, storeCanvas]);
+
+  // Floor plans come from the structure section of imported .jsoncanvas files
+  const activeSpatial = useMemo(() => {
+    const spatial = activeDocumentId ? canvasFilesRef.current.get(activeDocumentId)?.metadata.structure?.spatial : undefined;
+    return spatial && spatial.rooms?.length > 0 ? spatial : undefined;
+  }, [activeDocumentId, canvasRevision]);
+
+  // Canvases whose display asks for a treemap get one above the editor
+  const activeTreemapConfig = useMemo(() => {
+    const display = activeDocumentId ? canvasFilesRef.current.get(activeDocumentId)?.metadata.display : undefined;
+    return display?.primaryLayout === 'spatial-treemap' ? display.layoutConfig?.treemap ?? {} : undefined;
+  }, [activeDocumentId, canvasRevision]);
+
+  const handleRoomsChange = useCallback((rooms: SpatialRoom[]) => {
+    const canvas = activeDocumentId ? canvasFilesRef.current.get(activeDocumentId) : undefined;
+    const structure = canvas?.metadata.structure;
+    if (!canvas || !structure?.spatial) return;
+    // Stored with the canvas so the new positions survive a reload and export
+    storeCanvas(activeDocumentId!, {
+      ...canvas,
+      metadata: { ...canvas.metadata, structure: { ...structure, spatial: { ...structure.spatial, rooms } } },
+    });
+  }, [activeDocumentId, storeCanvas]);
+
+  const updateActiveDocumentData = useCallback((newJson: JsonValue, edit?: JsonStructureEdit) => {
     if (!activeDocumentId) return; 
     setDocuments(prevDocs =>
       prevDocs.map(doc => {
         if (doc.id === activeDocumentId) {
-          const newHistory = fromHistory ? doc.history : [...doc.history.slice(0, doc.currentHistoryIndex + 1), newJson];
-          const newIndex = fromHistory ? doc.currentHistoryIndex : newHistory.length - 1;
-          
-          // Fix: Properly handle history capping to prevent negative indices
-          const cappedHistory = newHistory.length > 50 ? newHistory.slice(-50) : newHistory;
-          const historyOffset = newHistory.length - cappedHistory.length;
-          const cappedIndex = Math.max(0, Math.min(newIndex - historyOffset, cappedHistory.length - 1));
-
-          return { ...doc, data: newJson, history: cappedHistory, currentHistoryIndex: cappedIndex };
+          // Reuse unchanged subtrees of the current snapshot so history entries share memory
+          const data = shareStructure(doc.data, newJson);
+          if (data === doc.data) return doc;
+
+          const fieldIndex = getFieldIndex(doc.id, doc.data);
+          if (fieldIndex && typeof data === 'object' && data !== null) {
+            fieldIndexesRef.current.set(data, edit ? applyStructureEdit(fieldIndex, edit) : fieldIndex);
+          }
+          if (canvasFilesRef.current.has(doc.id) && typeof data === 'object' && data !== null) {
+            pendingChangeLogRef.current.set(data, describeChange(doc.data, data, edit));
+          }
+
+          const { history, currentHistoryIndex, lastEdit } = pushHistory(doc.history, doc.currentHistoryIndex, data, doc.lastEdit ?? null);
+          return {
+            ...doc,
+            data,
+            history,
+            currentHistoryIndex,
+            lastEdit,
+            metadata: updateDocumentMetadata(doc.metadata, data),
+          };
         }
         return doc;
       })
     );
-  }, [activeDocumentId]); 
+  }, [activeDocumentId, getFieldIndex]); 
+
+  useEffect(() => {
+    if (!activeDocumentId || typeof activeData !== 'object' || activeData === null) return;
+    const entry = pendingChangeLogRef.current.get(activeData);
+    if (!entry) return;
+    pendingChangeLogRef.current.delete(activeData);
+    changeLogStoreRef.current?.append(activeDocumentId, 'changeLog', entry).catch((error) => {
+      console.error('Error appending to the change log:', error);
+    });
+  }, [activeDocumentId, activeData]);
 
-  const handleJsonChange = (newJson: JsonValue) => { 
-    updateActiveDocumentData(newJson);
+  const handleJsonChange = (newJson: JsonValue, edit?: JsonStructureEdit) => { 
+    updateActiveDocumentData(newJson, edit);
   };
   
-  const handleSectionChange = (sectionKey: string, newSectionData: JsonValue) => {
+  const addDocument = (newDoc: Document) => {
+    setDocumentIndex(prevIndex => [...prevIndex, toDocumentSummary(newDoc)]);
+    setDocuments(prevDocs => [...prevDocs, newDoc]);
+    setActiveDocumentId(newDoc.id);
+  };
+
+  const handleSectionChange = (sectionKey: string, newSectionData: JsonValue, edit?: JsonStructureEdit) => {
     if (activeDocument && typeof activeDocument.data === 'object' && activeDocument.data !== null && !Array.isArray(activeDocument.data)) {
       const updatedFullJson = {
         ...activeDocument.data,
         [sectionKey]: newSectionData,
       };
-      updateActiveDocumentData(updatedFullJson);
+      updateActiveDocumentData(updatedFullJson, edit && { ...edit, path: [sectionKey, ...edit.path] });
     }
   };
 
@@ -314,10 +533,11 @@ export default function Home() {
     if (!file) return;
 
     // Validate file type and size
-    if (!file.type.includes('json') && !file.name.toLowerCase().endsWith('.json')) {
+    const isCanvasFile = isJsonCanvasFileName(file.name) || file.name.toLowerCase().endsWith(JCB_EXTENSION);
+    if (!isCanvasFile && !file.type.includes('json') && !file.name.toLowerCase().endsWith('.json')) {
       toast({ 
         title: 'Invalid File Type', 
-        description: 'Please select a .json file. Other file types are not supported.',
+        description: 'Please select a .json, .jsoncanvas or .jcb file. Other file types are not supported.',
         variant: 'destructive' 
       });
       event.target.value = '';
@@ -334,6 +554,40 @@ export default function Home() {
       return;
     }
 
+    if (isCanvasFile) {
+      // Only the data section is parsed here; the metadata logs stay as raw bytes
+      file.arrayBuffer()
+        .then((buffer) => {
+          const bytes = new Uint8Array(buffer);
+          const canvas = isJsonCanvasBinary(bytes) ? readJsonCanvasBinary(bytes) : readJsonCanvas(bytes);
+          const title = typeof canvas.metadata.title === 'string' ? canvas.metadata.title : undefined;
+          const newDoc = createNewDocument(canvas.data, title || file.name.replace(/\.(jsoncanvas|jcb)$/i, ''));
+          storeCanvas(newDoc.id, canvas, true);
+          if (typeof canvas.data === 'object' && canvas.data !== null) {
+            const fieldIndex = buildFieldMetadataIndex(canvas.metadata.ai?.fieldMetadata);
+            fieldIndexesRef.current.set(canvas.data, fieldIndex);
+            storedFieldIndexesRef.current.set(newDoc.id, fieldIndex);
+          }
+          addDocument(newDoc);
+          toast({ 
+            title: 'Canvas Imported', 
+            description: `"${newDoc.name}" (${(file.size / 1024).toFixed(1)} KB) loaded successfully.` 
+          });
+        })
+        .catch((error) => {
+          console.error('.jsoncanvas read error:', error);
+          toast({ 
+            title: 'Canvas Import Error', 
+            description: error instanceof Error ? error.message : 'Could not read the .jsoncanvas file.',
+            variant: 'destructive' 
+          });
+        })
+        .finally(() => {
+          event.target.value = '';
+        });
+      return;
+    }
+
     const reader = new FileReader();
     
     reader.onerror = () => {
@@ -370,8 +624,7 @@ export default function Home() {
         }
 
         const newDoc = createNewDocument(importedJson, file.name.replace(/\.json$/i, ''));
-        setDocuments(prevDocs => [...prevDocs, newDoc]);
-        setActiveDocumentId(newDoc.id);
+        addDocument(newDoc);
         
         const fileSize = (file.size / 1024).toFixed(1);
         toast({ 
@@ -408,14 +661,13 @@ export default function Home() {
   
   const handleQuickImportToNewDocument = (newJson: JsonValue, notes?: string) => {
     const newDoc = createNewDocument(newJson, `Quick Import ${Date.now().toString().slice(-4)}`);
-    setDocuments(prevDocs => [...prevDocs, newDoc]);
-    setActiveDocumentId(newDoc.id);
+    addDocument(newDoc);
     let description = 'Text successfully converted to new JSON document by AI.';
     if (notes) description += ` AI Notes: ${notes}`;
     toast({ title: 'Quick Import Successful', description });
   };
 
-  const handleExport = () => {
+  const handleExport = async (format: ExportFormat = 'json') => {
     if (!activeDocument) {
       toast({ title: 'No Active Document', description: 'Please select a document to export.', variant: 'destructive' });
       return;
@@ -425,13 +677,42 @@ export default function Home() {
     let link: HTMLAnchorElement | null = null;
     
     try {
-      const jsonString = JSON.stringify(activeDocument.data, null, 2);
-      const blob = new Blob([jsonString], { type: 'application/json' });
+      const canvas = canvasFilesRef.current.get(activeDocument.id);
+      let exported: JsonCanvasDocument | null = null;
+      if (canvas) {
+        // Unread metadata logs are copied from the original file as-is
+        // Field metadata follows any keys renamed or items moved since import
+        const ai = canvas.metadata.ai && activeFieldMetadata
+          ? { ...canvas.metadata.ai, fieldMetadata: fieldMetadataToRecord(activeFieldMetadata) }
+          : canvas.metadata.ai;
+        // Edits logged since import are appended after the file's own log without parsing it
+        const logged = await changeLogStoreRef.current?.query(activeDocument.id, 'changeLog') ?? [];
+        exported = {
+          ...canvas,
+          changeLog: canvas.changeLog.withAppended(logged as ChangeLogEntry[]),
+          data: activeDocument.data,
+          metadata: { ...canvas.metadata, ai, lastModified: new Date().toISOString() },
+        };
+      }
+
+      let blob: Blob;
+      let extension: string;
+      if (format === 'binary') {
+        const bytes = writeJsonCanvasBinary(exported ?? createJsonCanvas(activeDocument.data, activeDocument.name));
+        blob = new Blob([bytes as BlobPart], { type: JCB_MEDIA_TYPE });
+        extension = JCB_EXTENSION;
+      } else if (exported) {
+        blob = new Blob([writeJsonCanvas(exported) as BlobPart], { type: 'application/json' });
+        extension = '.jsoncanvas';
+      } else {
+        blob = new Blob([JSON.stringify(activeDocument.data, null, 2)], { type: 'application/json' });
+        extension = '.json';
+      }
       url = URL.createObjectURL(blob);
       
       link = document.createElement('a');
       link.href = url;
-      link.download = `${activeDocument.name.replace(/[^a-z0-9_.-]/gi, '_') || 'document'}.json`;
+      link.download = `${activeDocument.name.replace(/[^a-z0-9_.-]/gi, '_') || 'document'}${extension}`;
       link.style.display = 'none'; // Hide the element
       
       document.body.appendChild(link);
@@ -460,7 +741,9 @@ export default function Home() {
     if (activeDocument && activeDocument.currentHistoryIndex > 0) {
       const newIndex = activeDocument.currentHistoryIndex - 1;
       setDocuments(prevDocs => prevDocs.map(doc => 
-        doc.id === activeDocument.id ? { ...doc, data: doc.history[newIndex], currentHistoryIndex: newIndex } : doc
+        doc.id === activeDocument.id
+          ? { ...doc, data: doc.history[newIndex], currentHistoryIndex: newIndex, lastEdit: null, metadata: updateDocumentMetadata(doc.metadata, doc.history[newIndex]) }
+          : doc
       ));
       toast({ title: 'Undo Successful' });
     }
@@ -470,7 +753,9 @@ export default function Home() {
     if (activeDocument && activeDocument.currentHistoryIndex < activeDocument.history.length - 1) {
       const newIndex = activeDocument.currentHistoryIndex + 1;
       setDocuments(prevDocs => prevDocs.map(doc => 
-        doc.id === activeDocument.id ? { ...doc, data: doc.history[newIndex], currentHistoryIndex: newIndex } : doc
+        doc.id === activeDocument.id
+          ? { ...doc, data: doc.history[newIndex], currentHistoryIndex: newIndex, lastEdit: null, metadata: updateDocumentMetadata(doc.metadata, doc.history[newIndex]) }
+          : doc
       ));
       toast({ title: 'Redo Successful' });
     }
@@ -506,8 +791,7 @@ export default function Home() {
 
   const handleAddDocument = () => {
     const newDoc = createNewDocument({ message: "This is a new empty document. Start editing!" });
-    setDocuments(prevDocs => [...prevDocs, newDoc]);
-    setActiveDocumentId(newDoc.id);
+    addDocument(newDoc);
     toast({ title: "Document Added", description: `"${newDoc.name}" created.`});
   };
 
@@ -516,29 +800,29 @@ export default function Home() {
   };
 
   const handleRenameDocument = (docId: string, newName: string) => {
+    setDocumentIndex(prevIndex => prevIndex.map(entry => entry.id === docId ? { ...entry, name: newName } : entry));
     setDocuments(prevDocs => prevDocs.map(doc => doc.id === docId ? { ...doc, name: newName } : doc));
     toast({ title: "Document Renamed" });
   };
 
   const handleDeleteDocument = (docId: string) => {
-    setDocuments(prevDocs => {
-      const remainingDocs = prevDocs.filter(doc => doc.id !== docId);
-      try {
-        localStorage.removeItem(`${LOCAL_STORAGE_KEYS.DOCUMENT_PREFIX}${docId}`);
-      } catch (error) {
-        console.error("Error removing document from localStorage:", error);
-      }
+    changeLogStoreRef.current?.forget(docId);
+    const remainingIndex = documentIndex.filter(entry => entry.id !== docId);
+    setDocuments(prevDocs => prevDocs.filter(doc => doc.id !== docId));
 
-      if (remainingDocs.length === 0) {
-        const newFallbackDoc = createNewDocument({ message: "All documents deleted. This is a new one." });
-        setActiveDocumentId(newFallbackDoc.id);
-        return [newFallbackDoc];
-      }
+    if (remainingIndex.length === 0) {
+      const newFallbackDoc = createNewDocument({ message: "All documents deleted. This is a new one." });
+      addDocument(newFallbackDoc);
+    } else {
+      setDocumentIndex(remainingIndex);
       if (activeDocumentId === docId) {
-        setActiveDocumentId(remainingDocs[0].id);
+        setActiveDocumentId(remainingIndex[0].id);
       }
-      return remainingDocs;
-    });
+    }
+    lastUsedRef.current.delete(docId);
+    canvasFilesRef.current.delete(docId);
+    storedFieldIndexesRef.current.delete(docId);
+    forgetTreemapDocument(docId);
     toast({ title: "Document Deleted" });
   };
 
@@ -568,6 +852,7 @@ export default function Home() {
         canUndo={activeDocument ? activeDocument.currentHistoryIndex > 0 : false}
         onRedo={handleRedo}
         canRedo={activeDocument ? activeDocument.currentHistoryIndex < activeDocument.history.length - 1 : false}
+        historyMemory={historyMemory}
         onOpenApiKeyDialog={() => setIsApiKeyDialogOpen(true)}
         onOpenEditEntireJsonDialog={() => setIsEditEntireJsonDialogOpen(true)}
         onOpenQuickImportDialog={() => setIsQuickImportDialogOpen(true)}
@@ -586,7 +871,7 @@ export default function Home() {
         <ErrorBoundary>
           <DocumentSidebar
             isOpen={isSidebarOpen}
-            documents={documents}
+            documents={documentSummaries}
             activeDocumentId={activeDocumentId}
             onSelectDocument={handleSelectDocument}
             onAddDocument={handleAddDocument}
@@ -597,13 +882,19 @@ export default function Home() {
         </ErrorBoundary>
         <ScrollArea className="flex-grow">
           <main className="container mx-auto p-4">
-            {!activeDocument && documents.length > 0 && ( 
+            {!activeDocument && activeDocumentId && isWorkspaceLoaded && (
+              <Card className="my-4 shadow-lg">
+                <CardHeader><CardTitle>Loading Document</CardTitle></CardHeader>
+                <CardContent><p>Reading this document from browser storage...</p></CardContent>
+              </Card>
+            )}
+            {!activeDocument && !activeDocumentId && documentSummaries.length > 0 && ( 
               <Card className="my-4 shadow-lg">
                 <CardHeader><CardTitle>No Document Selected</CardTitle></CardHeader>
                 <CardContent><p>Please select a document from the sidebar, or add a new one to begin.</p></CardContent>
               </Card>
             )}
-            {documents.length === 1 && documents[0].name === "Welcome Document" && activeDocumentId === documents[0].id && (
+            {documentSummaries.length === 1 && documentSummaries[0].name === "Welcome Document" && activeDocumentId === documentSummaries[0].id && (
               <Card className="mt-8 mb-4">
                 <CardHeader>
                   <CardTitle className="text-lg text-primary">Welcome to JSON Canvas!</CardTitle>
@@ -656,6 +947,39 @@ export default function Home() {
               </Card>
             )}
 
+            {activeDocument && activeTreemapConfig && (
+              <Card className="mb-4 shadow-sm">
+                <CardHeader className="pb-2">
+                  <CardTitle className="text-lg">Structure</CardTitle>
+                  <CardDescription>Each rectangle is sized by how much of the document it holds.</CardDescription>
+                </CardHeader>
+                <CardContent>
+                  <ErrorBoundary>
+                    <TreemapView
+                      docId={activeDocument.id}
+                      data={activeDocument.data}
+                      aspectRatio={activeTreemapConfig.aspectRatio}
+                      padding={activeTreemapConfig.padding}
+                      minRoomSize={activeTreemapConfig.minRoomSize}
+                      showLabels={activeTreemapConfig.showLabels}
+                    />
+                  </ErrorBoundary>
+                </CardContent>
+              </Card>
+            )}
+            {activeDocument && activeSpatial && (
+              <Card className="mb-4 shadow-sm">
+                <CardHeader className="pb-2">
+                  <CardTitle className="text-lg">Floor Plan</CardTitle>
+                  <CardDescription>Drag rooms to move them, drag empty space to pan and scroll to zoom.</CardDescription>
+                </CardHeader>
+                <CardContent>
+                  <ErrorBoundary>
+                    <FloorPlanView key={activeDocumentId} spatial={activeSpatial} onRoomsChange={handleRoomsChange} />
+                  </ErrorBoundary>
+                </CardContent>
+              </Card>
+            )}
             {activeDocument && currentJsonData && (
               topLevelKeys.length > 0 ? (
                 <Tabs defaultValue={topLevelKeys[0]} key={activeDocumentId} className="w-full"> 
@@ -671,9 +995,10 @@ export default function Home() {
                       <ErrorBoundary>
                         <JsonTreeEditor
                           jsonData={(currentJsonData as JsonObject)[key]}
-                          onJsonChange={(newSectionData) => handleSectionChange(key, newSectionData)}
+                          onJsonChange={(newSectionData, edit) => handleSectionChange(key, newSectionData, edit)}
                           title={key}
                           getApiKey={getApiKey}
+                          fieldMetadata={childFieldMetadata(activeFieldMetadata, key)}
                         />
                       </ErrorBoundary>
                     </TabsContent>
@@ -698,6 +1023,7 @@ export default function Home() {
                               jsonData={currentJsonData}
                               onJsonChange={handleJsonChange}
                               getApiKey={getApiKey}
+                              fieldMetadata={activeFieldMetadata}
                               title={activeDocument.name || "Root Value"}
                           />
                         </ErrorBoundary>
@@ -711,7 +1037,7 @@ export default function Home() {
                     <CardContent><p className="text-muted-foreground">This document's data is empty, null, or not an object/array. Consider importing new data or editing it as raw JSON.</p></CardContent>
                 </Card>
             )}
-            {documents.length === 0 && isClient && ( 
+            {documentSummaries.length === 0 && isClient && ( 
                 <Card className="my-4 shadow-lg">
                   <CardHeader><CardTitle>No Documents</CardTitle></CardHeader>
                   <CardContent><p>Create or import a document using the sidebar to get started.</p></CardContent>
@@ -62,6 +62,7 @@ describe('JSON Canvas Types', () => {
         data: { test: 'data' },
         history: [{ test: 'data' }],
         currentHistoryIndex: 0,
+        metadata: { size: 15, nodeCount: 2, createdAt: 0, modifiedAt: 0 },
       }
       expect(doc.id).toBe('test-id')
       expect(doc.name).toBe('Test Document')
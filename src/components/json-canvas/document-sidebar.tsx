@@ -2,7 +2,7 @@
 "use client";
 
 import React, { useState, useRef, useEffect } from 'react';
-import type { Document } from './types';
+import type { DocumentSummary } from './types';
 import { Button } from '@/components/ui/button';
 import { useConfirmation } from '@/components/ui/confirmation-dialog';
 import { Input } from '@/components/ui/input';
@@ -10,10 +10,11 @@ import { ScrollArea } from '@/components/ui/scroll-area';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
 import { FilePlus, FileUp, Edit3, Trash2, Check, X } from 'lucide-react';
 import { cn } from '@/lib/utils';
+import { formatByteSize } from '@/lib/document-metadata';
 
 interface DocumentSidebarProps {
   isOpen: boolean;
-  documents: Document[];
+  documents: DocumentSummary[];
   activeDocumentId: string | null;
   onSelectDocument: (docId: string) => void;
   onAddDocument: () => void;
@@ -45,7 +46,7 @@ export const DocumentSidebar = React.memo(function DocumentSidebar({
     }
   }, [renamingDocId]);
 
-  const handleStartRename = (doc: Document) => {
+  const handleStartRename = (doc: DocumentSummary) => {
     setRenamingDocId(doc.id);
     setRenameValue(doc.name);
   };
@@ -63,17 +64,14 @@ export const DocumentSidebar = React.memo(function DocumentSidebar({
     setRenameValue('');
   };
 
-  const handleDeleteWithConfirmation = (doc: Document) => {
-    const jsonSize = new Blob([JSON.stringify(doc.data)]).size;
-    const sizeText = jsonSize > 1024 ? `${(jsonSize / 1024).toFixed(1)} KB` : `${jsonSize} bytes`;
-    
+  const handleDeleteWithConfirmation = (doc: DocumentSummary) => {
     confirm({
       title: `Delete "${doc.name}"?`,
       description: 'This action cannot be undone. All document data and history will be permanently lost.',
       variant: 'destructive',
       details: [
-        `Document size: ${sizeText}`,
-        `Version history: ${doc.history.length} versions`,
+        `Document size: ${formatByteSize(doc.metadata.size)}`,
+        `Version history: ${doc.versionCount} versions`,
         'All undo/redo history will be lost',
         'Document will be removed from browser storage'
       ],
@@ -102,7 +100,7 @@ export const DocumentSidebar = React.memo(function DocumentSidebar({
             <TooltipTrigger asChild>
               <Button variant="outline" size="icon" className="flex-1 h-8" onClick={() => importInputRef.current?.click()}>
                 <FileUp size={18} />
-                <input type="file" accept=".json,application/json" ref={importInputRef} onChange={onImportDocument} className="hidden" />
+                <input type="file" accept=".json,.jsoncanvas,application/json" ref={importInputRef} onChange={onImportDocument} className="hidden" />
               </Button>
             </TooltipTrigger>
             <TooltipContent side="bottom"><p>Import Document</p></TooltipContent>
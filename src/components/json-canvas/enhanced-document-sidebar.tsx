@@ -20,7 +20,7 @@ import {
   useSortable,
 } from '@dnd-kit/sortable'
 import { CSS } from '@dnd-kit/utilities'
-import type { Document } from './types'
+import type { DocumentSummary } from './types'
 import { Button } from '@/components/ui/button'
 import { Input } from '@/components/ui/input'
 import { ScrollArea } from '@/components/ui/scroll-area'
@@ -43,25 +43,29 @@ import {
   Filter
 } from 'lucide-react'
 import { cn } from '@/lib/utils'
+import { formatByteSize } from '@/lib/document-metadata'
 import { formatDistanceToNow } from 'date-fns'
 
 interface EnhancedDocumentSidebarProps {
   isOpen: boolean
-  documents: Document[]
+  documents: DocumentSummary[]
   activeDocumentId: string | null
   onSelectDocument: (docId: string) => void
   onAddDocument: () => void
   onImportDocument: (event: React.ChangeEvent<HTMLInputElement>) => void
   onRenameDocument: (docId: string, newName: string) => void
   onDeleteDocument: (docId: string) => void
-  onReorderDocuments?: (newOrder: Document[]) => void
+  onReorderDocuments?: (newOrder: DocumentSummary[]) => void
 }
 
 type SortOption = 'name' | 'modified' | 'created' | 'size' | 'manual'
 type FilterOption = 'all' | 'recent' | 'large' | 'empty'
 
+const RECENT_WINDOW_MS = 24 * 60 * 60 * 1000
+const LARGE_DOCUMENT_BYTES = 10240
+
 interface SortableDocumentItemProps {
-  document: Document
+  document: DocumentSummary
   isActive: boolean
   onSelect: () => void
   onRename: (newName: string) => void
@@ -107,18 +111,8 @@ const SortableDocumentItem = React.memo(({ document, isActive, onSelect, onRenam
     setRenameValue(document.name)
   }
 
-  const getDocumentSize = (data: any): string => {
-    const str = JSON.stringify(data)
-    const bytes = new Blob([str]).size
-    if (bytes < 1024) return `${bytes} B`
-    if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`
-    return `${(bytes / (1024 * 1024)).toFixed(1)} MB`
-  }
-
   const getLastModified = (): string => {
-    // In a real app, you'd have a lastModified timestamp
-    // For now, we'll use the current time as a placeholder
-    return formatDistanceToNow(new Date(), { addSuffix: true })
+    return formatDistanceToNow(new Date(document.metadata.modifiedAt), { addSuffix: true })
   }
 
   return (
@@ -170,16 +164,16 @@ const SortableDocumentItem = React.memo(({ document, isActive, onSelect, onRenam
             <div className="space-y-1">
               <div className="flex items-center gap-2">
                 <span className="font-medium text-sm truncate">{document.name}</span>
-                {document.history.length > 1 && (
+                {document.versionCount > 1 && (
                   <Badge variant="secondary" className="text-xs px-1.5 py-0">
-                    {document.history.length} versions
+                    {document.versionCount} versions
                   </Badge>
                 )}
               </div>
               <div className="flex items-center gap-3 text-xs text-muted-foreground">
                 <span className="flex items-center gap-1">
                   <FileText className="h-3 w-3" />
-                  {getDocumentSize(document.data)}
+                  {formatByteSize(document.metadata.size)}
                 </span>
                 <span className="flex items-center gap-1">
                   <Calendar className="h-3 w-3" />
@@ -261,24 +255,23 @@ export const EnhancedDocumentSidebar = React.memo(function EnhancedDocumentSideb
     })
   )
 
+  // Sorting and filtering only read document metadata, never document bodies
   const filteredAndSortedDocuments = useMemo(() => {
+    const now = Date.now()
+    const search = searchTerm.toLowerCase()
     let filtered = documents.filter(doc => {
-      if (searchTerm && !doc.name.toLowerCase().includes(searchTerm.toLowerCase())) {
+      if (search && !doc.name.toLowerCase().includes(search)) {
         return false
       }
 
       switch (filterBy) {
         case 'recent':
-          // In a real app, you'd check actual timestamps
-          return true
+          return now - doc.metadata.modifiedAt < RECENT_WINDOW_MS
         case 'large':
-          const size = new Blob([JSON.stringify(doc.data)]).size
-          return size > 10240 // > 10KB
+          return doc.metadata.size > LARGE_DOCUMENT_BYTES
         case 'empty':
-          const isEmpty = !doc.data || 
-            (typeof doc.data === 'object' && Object.keys(doc.data).length === 0) ||
-            (typeof doc.data === 'string' && doc.data.trim() === '')
-          return isEmpty
+          // Nothing below the root: {}, [], or a lone primitive
+          return doc.metadata.nodeCount <= 1
         default:
           return true
       }
@@ -290,13 +283,12 @@ export const EnhancedDocumentSidebar = React.memo(function EnhancedDocumentSideb
           case 'name':
             return a.name.localeCompare(b.name)
           case 'size':
-            const sizeA = new Blob([JSON.stringify(a.data)]).size
-            const sizeB = new Blob([JSON.stringify(b.data)]).size
-            return sizeB - sizeA
+            return b.metadata.size - a.metadata.size
           case 'modified':
+            return b.metadata.modifiedAt - a.metadata.modifiedAt
           case 'created':
+            return b.metadata.createdAt - a.metadata.createdAt
           default:
-            // In a real app, you'd sort by actual timestamps
             return a.name.localeCompare(b.name)
         }
       })
@@ -388,7 +380,7 @@ export const EnhancedDocumentSidebar = React.memo(function EnhancedDocumentSideb
               Import
               <input
                 type="file"
-                accept=".json,application/json"
+                accept=".json,.jsoncanvas,application/json"
                 ref={importInputRef}
                 onChange={onImportDocument}
                 className="hidden"
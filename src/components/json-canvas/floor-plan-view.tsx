@@ -0,0 +1,254 @@
+'use client'
+
+import React, { useCallback, useEffect, useMemo, useRef, useState } from 'react'
+import { Button } from '@/components/ui/button'
+import { RoomSpatialIndex, DEFAULT_FLOOR } from '@/lib/spatial-index'
+import type { Rect } from '@/lib/spatial-index'
+import type { CanvasStructure, RoomConnection, SpatialRoom } from '@/lib/jsoncanvas-types'
+
+type SpatialStructure = NonNullable<CanvasStructure['spatial']>
+
+interface FloorPlanViewProps {
+  spatial: SpatialStructure
+  // Called with the full room list after a room is dragged to a new position
+  onRoomsChange?: (rooms: SpatialRoom[]) => void
+  height?: number
+}
+
+interface Viewport {
+  x: number
+  y: number
+  scale: number
+}
+
+type Drag =
+  | { kind: 'pan'; startX: number; startY: number; view: Viewport }
+  | { kind: 'room'; id: string; offsetX: number; offsetY: number }
+
+// Room labels are unreadable below this zoom, so they are skipped
+const LABEL_MIN_SCALE = 0.25
+
+/**
+ * Pannable, zoomable floor plan. Only rooms overlapping the viewport are
+ * rendered, and hit-testing on pointer moves asks the spatial index rather
+ * than every room, so cost follows what is on screen.
+ */
+export const FloorPlanView = React.memo(function FloorPlanView({ spatial, onRoomsChange, height = 480 }: FloorPlanViewProps) {
+  const containerRef = useRef<HTMLDivElement>(null)
+  const [width, setWidth] = useState(800)
+  // Rebuilt only when the rooms come from elsewhere; after a drag the
+  // parent receives the list this index already reflects
+  const indexRef = useRef<{ rooms: SpatialRoom[]; index: RoomSpatialIndex } | null>(null)
+  if (!indexRef.current || indexRef.current.rooms !== spatial.rooms) {
+    indexRef.current = { rooms: spatial.rooms, index: new RoomSpatialIndex(spatial.rooms) }
+  }
+  const index = indexRef.current.index
+  const floors = useMemo(() => index.floors(), [index])
+  const [floor, setFloor] = useState(floors[0] ?? DEFAULT_FLOOR)
+  const [view, setView] = useState<Viewport>(() => ({
+    x: 0,
+    y: 0,
+    scale: Math.min(800 / Math.max(spatial.bounds.width, 1), height / Math.max(spatial.bounds.height, 1)),
+  }))
+  const [hoveredId, setHoveredId] = useState<string | null>(null)
+  const [selectedId, setSelectedId] = useState<string | null>(null)
+  // Bumped when a room moves; the index itself is updated in place
+  const [revision, setRevision] = useState(0)
+  const dragRef = useRef<Drag | null>(null)
+
+  useEffect(() => {
+    const element = containerRef.current
+    if (!element || typeof ResizeObserver === 'undefined') return
+    const observer = new ResizeObserver(([entry]) => setWidth(entry.contentRect.width))
+    observer.observe(element)
+    return () => observer.disconnect()
+  }, [])
+
+  useEffect(() => {
+    if (!floors.includes(floor) && floors.length > 0) setFloor(floors[0])
+  }, [floors, floor])
+
+  const viewportRect: Rect = useMemo(
+    () => ({ x: view.x, y: view.y, width: width / view.scale, height: height / view.scale }),
+    [view, width, height]
+  )
+
+  const visibleRooms = useMemo(
+    () => index.roomsInRect(floor, viewportRect),
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+    [index, floor, viewportRect, revision]
+  )
+
+  const connectionsByRoom = useMemo(() => {
+    const byRoom = new Map<string, RoomConnection[]>()
+    for (const connection of spatial.connections) {
+      for (const id of [connection.room1, connection.room2]) {
+        const list = byRoom.get(id)
+        if (list) list.push(connection)
+        else byRoom.set(id, [connection])
+      }
+    }
+    return byRoom
+  }, [spatial.connections])
+
+  // Connections are found from the visible rooms, not by scanning them all
+  const visibleConnections = useMemo(() => {
+    const seen = new Set<RoomConnection>()
+    const result: { connection: RoomConnection; from: SpatialRoom; to: SpatialRoom }[] = []
+    for (const room of visibleRooms) {
+      for (const connection of connectionsByRoom.get(room.id) ?? []) {
+        if (seen.has(connection)) continue
+        seen.add(connection)
+        const from = index.get(connection.room1)
+        const to = index.get(connection.room2)
+        if (!from || !to || (from.floor ?? DEFAULT_FLOOR) !== floor || (to.floor ?? DEFAULT_FLOOR) !== floor) continue
+        result.push({ connection, from, to })
+      }
+    }
+    return result
+  }, [connectionsByRoom, visibleRooms, index, floor])
+
+  const toWorld = useCallback(
+    (event: React.PointerEvent | React.WheelEvent) => {
+      const bounds = containerRef.current!.getBoundingClientRect()
+      return {
+        x: view.x + (event.clientX - bounds.left) / view.scale,
+        y: view.y + (event.clientY - bounds.top) / view.scale,
+      }
+    },
+    [view]
+  )
+
+  const handlePointerDown = (event: React.PointerEvent) => {
+    const point = toWorld(event)
+    const room = index.roomAt(floor, point.x, point.y)
+    event.currentTarget.setPointerCapture(event.pointerId)
+    if (room && onRoomsChange) {
+      setSelectedId(room.id)
+      dragRef.current = { kind: 'room', id: room.id, offsetX: point.x - room.x, offsetY: point.y - room.y }
+    } else {
+      setSelectedId(room?.id ?? null)
+      dragRef.current = { kind: 'pan', startX: event.clientX, startY: event.clientY, view }
+    }
+  }
+
+  const handlePointerMove = (event: React.PointerEvent) => {
+    const drag = dragRef.current
+    if (drag?.kind === 'pan') {
+      setView({
+        ...drag.view,
+        x: drag.view.x - (event.clientX - drag.startX) / drag.view.scale,
+        y: drag.view.y - (event.clientY - drag.startY) / drag.view.scale,
+      })
+      return
+    }
+    const point = toWorld(event)
+    if (drag?.kind === 'room') {
+      const room = index.get(drag.id)
+      if (room) {
+        index.update({ ...room, x: Math.round(point.x - drag.offsetX), y: Math.round(point.y - drag.offsetY) })
+        setRevision(value => value + 1)
+      }
+      return
+    }
+    const hovered = index.roomAt(floor, point.x, point.y)
+    setHoveredId(hovered?.id ?? null)
+  }
+
+  const handlePointerUp = () => {
+    const drag = dragRef.current
+    dragRef.current = null
+    if (drag?.kind === 'room' && onRoomsChange) {
+      const rooms = spatial.rooms.map(room => index.get(room.id) ?? room)
+      indexRef.current = { rooms, index }
+      onRoomsChange(rooms)
+    }
+  }
+
+  const handleWheel = (event: React.WheelEvent) => {
+    const point = toWorld(event)
+    const scale = Math.min(Math.max(view.scale * (event.deltaY < 0 ? 1.2 : 1 / 1.2), 0.01), 20)
+    // Keep the point under the cursor fixed
+    setView({
+      scale,
+      x: point.x - (point.x - view.x) * (view.scale / scale),
+      y: point.y - (point.y - view.y) * (view.scale / scale),
+    })
+  }
+
+  const hovered = hoveredId ? index.get(hoveredId) : undefined
+  const selected = selectedId ? index.get(selectedId) : undefined
+
+  return (
+    <div className="space-y-2">
+      <div className="flex items-center gap-2 text-sm">
+        {floors.length > 1 && floors.map(value => (
+          <Button key={value} size="sm" variant={value === floor ? 'default' : 'outline'} onClick={() => setFloor(value)}>
+            Floor {value}
+          </Button>
+        ))}
+        <span className="text-muted-foreground ml-auto">
+          {visibleRooms.length} of {index.size} rooms in view
+          {(selected ?? hovered) && ` · ${(selected ?? hovered)!.name}`}
+        </span>
+      </div>
+      <div
+        ref={containerRef}
+        className="relative overflow-hidden rounded-md border bg-muted/30 touch-none select-none"
+        style={{ height }}
+        onPointerDown={handlePointerDown}
+        onPointerMove={handlePointerMove}
+        onPointerUp={handlePointerUp}
+        onPointerLeave={() => setHoveredId(null)}
+        onWheel={handleWheel}
+        role="img"
+        aria-label={`Floor plan, floor ${floor}`}
+      >
+        <svg width={width} height={height} viewBox={`${viewportRect.x} ${viewportRect.y} ${viewportRect.width} ${viewportRect.height}`}>
+          {visibleConnections.map(({ connection, from, to }) => (
+            <line
+              key={`${connection.room1}-${connection.room2}`}
+              x1={from.x + from.width / 2}
+              y1={from.y + from.height / 2}
+              x2={to.x + to.width / 2}
+              y2={to.y + to.height / 2}
+              className="stroke-muted-foreground"
+              strokeDasharray={connection.type === 'door' ? undefined : '6 4'}
+              vectorEffect="non-scaling-stroke"
+            />
+          ))}
+          {visibleRooms.map(room => (
+            <g key={room.id}>
+              <rect
+                x={room.x}
+                y={room.y}
+                width={room.width}
+                height={room.height}
+                className={
+                  room.id === selectedId
+                    ? 'fill-primary/30 stroke-primary'
+                    : room.id === hoveredId
+                    ? 'fill-accent/40 stroke-accent-foreground'
+                    : 'fill-card stroke-border'
+                }
+                vectorEffect="non-scaling-stroke"
+              />
+              {view.scale >= LABEL_MIN_SCALE && (
+                <text
+                  x={room.x + room.width / 2}
+                  y={room.y + room.height / 2}
+                  textAnchor="middle"
+                  dominantBaseline="middle"
+                  className="fill-foreground"
+                  fontSize={12 / view.scale}
+                >
+                  {room.name}
+                </text>
+              )}
+            </g>
+          ))}
+        </svg>
+      </div>
+    </div>
+  )
+})
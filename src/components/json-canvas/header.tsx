@@ -4,17 +4,23 @@
 import React from 'react';
 import { Button } from '@/components/ui/button';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
+import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigger } from '@/components/ui/dropdown-menu';
 import { NavigationLandmark, VisuallyHidden } from '@/components/ui/accessibility';
 import { FileUp, FileDown, Undo2, Redo2, Settings, FileJson2, Github, ClipboardPaste, LayoutDashboard, Sun, Moon, Shield } from 'lucide-react';
 import { ModelSelector } from './model-selector';
+import { formatByteSize } from '@/lib/document-metadata';
+import type { HistoryMemory } from '@/lib/history';
+
+export type ExportFormat = 'json' | 'binary';
 
 interface HeaderProps {
   onImport: (event: React.ChangeEvent<HTMLInputElement>) => void;
-  onExport: () => void;
+  onExport: (format?: ExportFormat) => void;
   onUndo: () => void;
   canUndo: boolean;
   onRedo: () => void;
   canRedo: boolean;
+  historyMemory?: HistoryMemory | null;
   onOpenApiKeyDialog: () => void;
   onOpenEditEntireJsonDialog: () => void;
   onOpenQuickImportDialog: () => void;
@@ -34,6 +40,7 @@ export function Header({
   canUndo,
   onRedo,
   canRedo,
+  historyMemory,
   onOpenApiKeyDialog,
   onOpenEditEntireJsonDialog,
   onOpenQuickImportDialog,
@@ -108,25 +115,32 @@ export function Header({
                 >
                   <FileUp className="h-5 w-5" aria-hidden="true" />
                   <VisuallyHidden>Import File</VisuallyHidden>
-                  <input type="file" accept=".json,application/json" ref={importInputRef} onChange={onImport} className="hidden" />
+                  <input type="file" accept=".json,.jsoncanvas,.jcb,application/json" ref={importInputRef} onChange={onImport} className="hidden" />
                 </Button>
               </TooltipTrigger>
               <TooltipContent><p>Import JSON File to New Document</p></TooltipContent>
             </Tooltip>
-            <Tooltip>
-              <TooltipTrigger asChild>
-                <Button 
-                  variant="outline" 
-                  size="icon" 
-                  onClick={onExport}
-                  aria-label="Export active document as JSON file"
-                >
-                  <FileDown className="h-5 w-5" aria-hidden="true" />
-                  <VisuallyHidden>Export File</VisuallyHidden>
-                </Button>
-              </TooltipTrigger>
-              <TooltipContent><p>Export Active Document</p></TooltipContent>
-            </Tooltip>
+            <DropdownMenu>
+              <Tooltip>
+                <TooltipTrigger asChild>
+                  <DropdownMenuTrigger asChild>
+                    <Button 
+                      variant="outline" 
+                      size="icon" 
+                      aria-label="Export active document"
+                    >
+                      <FileDown className="h-5 w-5" aria-hidden="true" />
+                      <VisuallyHidden>Export File</VisuallyHidden>
+                    </Button>
+                  </DropdownMenuTrigger>
+                </TooltipTrigger>
+                <TooltipContent><p>Export Active Document</p></TooltipContent>
+              </Tooltip>
+              <DropdownMenuContent align="end">
+                <DropdownMenuItem onSelect={() => onExport('json')}>JSON (.json / .jsoncanvas)</DropdownMenuItem>
+                <DropdownMenuItem onSelect={() => onExport('binary')}>Compact binary (.jcb)</DropdownMenuItem>
+              </DropdownMenuContent>
+            </DropdownMenu>
              <Tooltip>
               <TooltipTrigger asChild>
                 <Button 
@@ -168,7 +182,15 @@ export function Header({
                   <VisuallyHidden>Undo</VisuallyHidden>
                 </Button>
               </TooltipTrigger>
-              <TooltipContent><p>Undo (Ctrl+Z) in Active Document</p></TooltipContent>
+              <TooltipContent>
+                <p>Undo (Ctrl+Z) in Active Document</p>
+                {historyMemory && (
+                  <p className="text-xs text-muted-foreground">
+                    History: {historyMemory.entries} {historyMemory.entries === 1 ? 'entry' : 'entries'}, {formatByteSize(historyMemory.bytes)}
+                    {' '}({formatByteSize(historyMemory.unsharedBytes)} without sharing)
+                  </p>
+                )}
+              </TooltipContent>
             </Tooltip>
             <Tooltip>
               <TooltipTrigger asChild>
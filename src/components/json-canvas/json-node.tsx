@@ -20,6 +20,7 @@ import { Label } from '../ui/label';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../ui/select';
 import { marked } from 'marked';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter, DialogClose } from '../ui/dialog';
+import { averageConfidence, childFieldMetadata, isVerifiedField, type FieldMetadataNode } from '@/lib/field-metadata-index';
 
 
 const getNestingLevelClasses = (depth: number) => {
@@ -64,6 +65,42 @@ const getHighlightedText = (text: string, highlight: string): React.ReactNode =>
   );
 };
 
+// Confidence from .jsoncanvas field metadata. Containers without their own
+// entry show the lowest confidence found beneath them.
+const FieldConfidenceBadge: React.FC<{ metadata: FieldMetadataNode }> = ({ metadata }) => {
+  const { field, summary } = metadata;
+  const confidence = field ? field.confidence : summary.minConfidence;
+  if (confidence === null) return null;
+
+  const verified = field ? isVerifiedField(field) : summary.unverified === 0;
+  const color = verified
+    ? 'bg-sky-100 text-sky-800 dark:bg-sky-900/40 dark:text-sky-200'
+    : confidence >= 80
+    ? 'bg-green-100 text-green-800 dark:bg-green-900/40 dark:text-green-200'
+    : confidence >= 50
+    ? 'bg-amber-100 text-amber-800 dark:bg-amber-900/40 dark:text-amber-200'
+    : 'bg-red-100 text-red-800 dark:bg-red-900/40 dark:text-red-200';
+  const average = averageConfidence(summary);
+
+  return (
+    <Tooltip>
+      <TooltipTrigger asChild>
+        <span className={cn("ml-1.5 px-1.5 rounded text-[10px] font-medium leading-4 flex-shrink-0", color)}>
+          {field ? '' : '≥'}{Math.round(confidence)}%
+        </span>
+      </TooltipTrigger>
+      <TooltipContent>
+        {field && <p>{field.source}, updated {field.lastUpdated}{field.notes ? ` — ${field.notes}` : ''}</p>}
+        {summary.fields > 1 && (
+          <p>
+            {summary.fields} fields, average {Math.round(average ?? 0)}%, lowest {Math.round(summary.minConfidence ?? 0)}%
+            {summary.unverified > 0 ? `, ${summary.unverified} unverified` : ''}
+          </p>
+        )}
+      </TooltipContent>
+    </Tooltip>
+  );
+};
 
 const JsonNodeComponent: React.FC<EditableJsonNodeProps> = ({
   path,
@@ -80,6 +117,7 @@ const JsonNodeComponent: React.FC<EditableJsonNodeProps> = ({
   searchTerm,
   onSetHoveredPath,
   isInCardViewTopLevel = false, 
+  fieldMetadata,
 }) => {
   const [isAddingProperty, setIsAddingProperty] = useState(false);
   const [newPropertyKey, setNewPropertyKey] = useState('');
@@ -501,6 +539,7 @@ const JsonNodeComponent: React.FC<EditableJsonNodeProps> = ({
                 </span>
               )
             )}
+            {fieldMetadata && <FieldConfidenceBadge metadata={fieldMetadata} />}
             
             <div className="flex items-center flex-grow min-w-0">
                 {typeof value === 'object' && value !== null && !isSummaryDisplayContext && !isStackedDisplayContext && !isDirectPrimitiveInCardContext && (
@@ -667,6 +706,7 @@ const JsonNodeComponent: React.FC<EditableJsonNodeProps> = ({
                     searchTerm={searchTerm}
                     onSetHoveredPath={onSetHoveredPath}
                     isInCardViewTopLevel={false} 
+                    fieldMetadata={childFieldMetadata(fieldMetadata, index)}
                   />
                 ))
               : Object.entries(value).map(([key, val]) => (
@@ -686,6 +726,7 @@ const JsonNodeComponent: React.FC<EditableJsonNodeProps> = ({
                     searchTerm={searchTerm}
                     onSetHoveredPath={onSetHoveredPath}
                     isInCardViewTopLevel={false} 
+                    fieldMetadata={childFieldMetadata(fieldMetadata, key)}
                   />
                 ))}
             {((onAddProperty && typeof value === 'object' && !Array.isArray(value)) || (onAddItem && Array.isArray(value))) && !isSummaryDisplayContext && !isInCardViewTopLevel && (
@@ -2,7 +2,7 @@
 "use client";
 
 import React, { useState, useCallback, useEffect } from 'react';
-import type { JsonValue, JsonPath, ExpansionTrigger, JsonObject, JsonArray } from './types';
+import type { JsonValue, JsonPath, ExpansionTrigger, JsonStructureEdit } from './types';
 import { JsonNode } from './json-node';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
@@ -11,17 +11,19 @@ import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/comp
 import { UnfoldVertical, FoldVertical, Search, Info, ListTree, LayoutGrid, ArrowLeft } from 'lucide-react';
 import { useToast } from '@/hooks/use-toast';
 import { usePerformanceMetrics } from '@/hooks/use-performance';
-import { fastCloneJson, addPropertyAtPath, addItemAtPath, deleteAtPath, renamePropertyAtPath } from '@/lib/json-utils';
+import { fastCloneJson, addPropertyAtPath, addItemAtPath, deleteAtPath, renamePropertyAtPath, setValueAtPath } from '@/lib/json-utils';
+import { childFieldMetadata, lookupFieldMetadata, type FieldMetadataNode } from '@/lib/field-metadata-index';
 
 
 interface JsonTreeEditorProps {
   jsonData: JsonValue;
-  onJsonChange: (newJson: JsonValue) => void;
+  onJsonChange: (newJson: JsonValue, edit?: JsonStructureEdit) => void;
   title?: string;
   getApiKey: () => string | null;
+  fieldMetadata?: FieldMetadataNode;
 }
 
-export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJsonChange, title, getApiKey }: JsonTreeEditorProps) {
+export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJsonChange, title, getApiKey, fieldMetadata }: JsonTreeEditorProps) {
   const [expansionTrigger, setExpansionTrigger] = useState<ExpansionTrigger | null>(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [hoveredPath, setHoveredPath] = useState<JsonPath | null>(null);
@@ -48,6 +50,7 @@ export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJ
   }, [jsonData, cardViewPath]);
 
   const currentCardData: JsonValue | undefined = getCurrentCardData();
+  const cardFieldMetadata = viewMode === 'cards' ? lookupFieldMetadata(fieldMetadata, cardViewPath) : undefined;
 
   useEffect(() => {
     if (viewMode === 'cards') {
@@ -62,111 +65,41 @@ export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJ
   }, [jsonData, title]);
 
 
+  // Edits copy only the objects along the edited path; everything else stays
+  // shared with the previous snapshot, which keeps undo history small.
   const handleUpdate = useCallback((path: JsonPath, newValue: JsonValue) => {
-    const newJson = JSON.parse(JSON.stringify(jsonData)); 
-    
-    let baseDataRef = newJson;
-
-    if (viewMode === 'cards' && cardViewPath.length > 0) {
-      let currentLevel = baseDataRef;
-      for (const segment of cardViewPath) {
-        if (typeof currentLevel !== 'object' || currentLevel === null || !(segment in (currentLevel as any))) {
-          toast({title: "Update Error", description: "Cannot update data at invalid card path.", variant: "destructive"});
-          return;
-        }
-        currentLevel = (currentLevel as any)[segment];
-      }
-      baseDataRef = currentLevel; 
-    }
-    
-    if (path.length === 0) { 
-        if (viewMode === 'cards' && cardViewPath.length > 0) {
-            let parent = newJson;
-            for (let i = 0; i < cardViewPath.length - 1; i++) {
-                parent = parent[cardViewPath[i]];
-            }
-            parent[cardViewPath[cardViewPath.length -1]] = newValue;
-            onJsonChange(newJson);
-        } else { 
-             onJsonChange(newValue); 
-        }
-        return;
-    }
-
-    let target = baseDataRef;
-    for (let i = 0; i < path.length - 1; i++) {
-      if (typeof target !== 'object' || target === null || !(path[i] in (target as any))) {
-         toast({title: "Update Error", description: "Cannot update data at invalid path.", variant: "destructive"});
-         return;
-      }
-      target = (target as any)[path[i]];
+    const basePath = viewMode === 'cards' ? cardViewPath : [];
+    let newJson: JsonValue;
+    try {
+      newJson = setValueAtPath(jsonData, basePath.concat(path), newValue);
+    } catch {
+      toast({title: "Update Error", description: "Cannot update data at invalid path.", variant: "destructive"});
+      return;
     }
-    
-    (target as any)[path[path.length - 1]] = newValue;
-    
     onJsonChange(newJson);
   }, [jsonData, onJsonChange, cardViewPath, viewMode, toast]);
 
   const handleDelete = useCallback((path: JsonPath, keyOrIndex?: string | number) => {
-    const newJson = JSON.parse(JSON.stringify(jsonData)); 
-    
-    let baseDataParentRef = null;
-    let lastSegmentOfBase = null;
-    let baseDataRef = newJson;
-
+    const basePath = viewMode === 'cards' ? cardViewPath : [];
 
-    if (viewMode === 'cards' && cardViewPath.length > 0) {
-        let currentLevel = newJson; 
-        let parentLevel = null;
-        let lastSeg = null;
-
-        for (let i = 0; i < cardViewPath.length; i++) {
-            const segment = cardViewPath[i];
-            if (typeof currentLevel !== 'object' || currentLevel === null || !(segment in (currentLevel as any))) {
-                toast({ title: "Delete Error", description: "Cannot delete data at invalid card path.", variant: "destructive" });
-                return;
-            }
-            parentLevel = currentLevel;
-            lastSeg = segment;
-            currentLevel = (currentLevel as any)[segment];
-        }
-        baseDataRef = currentLevel; 
-        baseDataParentRef = parentLevel; 
-        lastSegmentOfBase = lastSeg; 
-    }
-    
-    if (path.length === 0) { 
-        if (viewMode === 'cards' && cardViewPath.length > 0 && baseDataParentRef && lastSegmentOfBase !== null) {
-             if (Array.isArray(baseDataParentRef) && typeof lastSegmentOfBase === 'number') {
-                (baseDataParentRef as JsonArray).splice(lastSegmentOfBase, 1);
-            } else if (typeof baseDataParentRef === 'object' && baseDataParentRef !== null && typeof lastSegmentOfBase === 'string') {
-                delete (baseDataParentRef as JsonObject)[lastSegmentOfBase];
-            }
-            setCardViewPath(prev => prev.slice(0, -1)); 
-            onJsonChange(newJson);
-        } else if (viewMode === 'tree' || (viewMode === 'cards' && cardViewPath.length === 0)) { 
-            onJsonChange(Array.isArray(jsonData) ? [] : {});
-        }
-        return;
-    }
-    
-    let parentInCurrentContext = baseDataRef; 
-    for (let i = 0; i < path.length - 1; i++) {
-      if (typeof parentInCurrentContext !== 'object' || parentInCurrentContext === null || !(path[i] in (parentInCurrentContext as any))) {
-         toast({title: "Delete Error", description: "Cannot delete data at invalid path.", variant: "destructive"});
-         return;
-      }
-      parentInCurrentContext = (parentInCurrentContext as any)[path[i]];
+    if (path.length === 0 && basePath.length === 0) {
+      onJsonChange(Array.isArray(jsonData) ? [] : {}, { type: 'delete', path: [] });
+      return;
     }
 
-    const targetKeyOrIndex = path[path.length - 1];
-
-    if (Array.isArray(parentInCurrentContext)) {
-      parentInCurrentContext.splice(Number(targetKeyOrIndex), 1);
-    } else if (typeof parentInCurrentContext === 'object' && parentInCurrentContext !== null) {
-      delete (parentInCurrentContext as JsonObject)[targetKeyOrIndex as string];
+    const fullPath = basePath.concat(path);
+    let newJson: JsonValue;
+    try {
+      newJson = deleteAtPath(jsonData, fullPath);
+    } catch {
+      toast({ title: "Delete Error", description: "Cannot delete data at invalid path.", variant: "destructive" });
+      return;
     }
-    onJsonChange(newJson);
+    if (path.length === 0) {
+      // Deleted the card being viewed, so step back out of it
+      setCardViewPath(prev => prev.slice(0, -1));
+    }
+    onJsonChange(newJson, { type: 'delete', path: fullPath });
   }, [jsonData, onJsonChange, cardViewPath, viewMode, toast]);
 
   const handleAddProperty = useCallback((path: JsonPath, key: string, value: JsonValue) => {
@@ -216,78 +149,34 @@ export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJ
   }, [jsonData, onJsonChange, cardViewPath, viewMode, toast]);
 
   const handleAddItem = useCallback((path: JsonPath, value: JsonValue) => {
-    const newJson = JSON.parse(JSON.stringify(jsonData)); 
-    let baseDataRef = newJson;
-
-     if (viewMode === 'cards' && cardViewPath.length > 0) {
-      let currentLevel = baseDataRef;
-      for (const segment of cardViewPath) {
-         if (typeof currentLevel !== 'object' || currentLevel === null || !(segment in (currentLevel as any))) {
-          toast({title: "Add Error", description: "Cannot add item at invalid card path.", variant: "destructive"});
-          return;
-        }
-        currentLevel = (currentLevel as any)[segment];
-      }
-      baseDataRef = currentLevel;
-    }
-
-    let current = baseDataRef;
-    for (let i = 0; i < path.length; i++) {
-        if (typeof current !== 'object' || current === null || !(path[i] in (current as any))) {
-            toast({title: "Add Error", description: "Cannot add item at invalid path.", variant: "destructive"});
-            return;
-        }
-        current = (current as any)[path[i]];
-    }
-    if (Array.isArray(current)) {
-        current.push(value);
-        onJsonChange(newJson);
-    }
-    else {
-      toast({ title: "Cannot Add Item", description: "Can only add items to arrays.", variant: "destructive"});
+    const basePath = viewMode === 'cards' ? cardViewPath : [];
+    try {
+      onJsonChange(addItemAtPath(jsonData, basePath.concat(path), value));
+    } catch (error) {
+      toast({
+        title: "Cannot Add Item",
+        description: error instanceof Error ? error.message : "Can only add items to arrays.",
+        variant: "destructive"
+      });
     }
   }, [jsonData, onJsonChange, cardViewPath, viewMode, toast]);
 
   const handleRenameKey = useCallback((path: JsonPath, oldKey: string, newKey: string) => {
-    const newJson = JSON.parse(JSON.stringify(jsonData)); 
-    let baseDataRef = newJson;
-
-    if (viewMode === 'cards' && cardViewPath.length > 0) {
-      let currentLevel = baseDataRef;
-      for (const segment of cardViewPath) {
-        if (typeof currentLevel !== 'object' || currentLevel === null || !(segment in (currentLevel as any))) {
-          toast({title: "Rename Error", description: "Cannot rename key at invalid card path.", variant: "destructive"});
-          return;
-        }
-        currentLevel = (currentLevel as any)[segment];
-      }
-      baseDataRef = currentLevel;
-    }
-    
-    let current = baseDataRef;
-    for (let i = 0; i < path.length; i++) {
-       if (typeof current !== 'object' || current === null || !(path[i] in (current as any))) {
-            toast({title: "Rename Error", description: "Cannot rename key at invalid path.", variant: "destructive"});
-            return;
-        }
-        current = (current as any)[path[i]];
+    if (oldKey === newKey) return;
+    if (newKey.trim() === "") {
+      toast({title: "Rename Error", description: "New key name cannot be empty.", variant: "destructive"});
+      return;
     }
 
-    if (typeof current === 'object' && !Array.isArray(current) && current !== null && oldKey in current) {
-        if (newKey.trim() === "") {
-            toast({title: "Rename Error", description: "New key name cannot be empty.", variant: "destructive"});
-            return;
-        }
-        if (newKey in current && oldKey !== newKey) {
-            toast({title: "Rename Error", description: `New key "${newKey}" already exists in object.`, variant: "destructive"});
-            return;
-        }
-        if (oldKey === newKey) return;
-
-        const value = current[oldKey];
-        delete current[oldKey];
-        current[newKey] = value;
-        onJsonChange(newJson);
+    const fullPath = (viewMode === 'cards' ? cardViewPath : []).concat(path);
+    try {
+      onJsonChange(renamePropertyAtPath(jsonData, fullPath, oldKey, newKey), { type: 'rename', path: fullPath, oldKey, newKey });
+    } catch (error) {
+      toast({
+        title: "Rename Error",
+        description: error instanceof Error ? error.message : "Cannot rename key at invalid path.",
+        variant: "destructive"
+      });
     }
   }, [jsonData, onJsonChange, cardViewPath, viewMode, toast]);
 
@@ -462,6 +351,7 @@ export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJ
                 searchTerm={searchTerm}
                 onSetHoveredPath={handleSetHoveredPath} 
                 isInCardViewTopLevel={false}
+                fieldMetadata={fieldMetadata}
               />
           ) : ( 
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4 mt-4">
@@ -493,6 +383,7 @@ export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJ
                             expansionTrigger={expansionTrigger} 
                             searchTerm={searchTerm}
                             isInCardViewTopLevel={true} 
+                            fieldMetadata={childFieldMetadata(cardFieldMetadata, key)}
                           />
                         </CardContent>
                          {(typeof value === 'object' && value !== null) && (
@@ -531,6 +422,7 @@ export const JsonTreeEditor = React.memo(function JsonTreeEditor({ jsonData, onJ
                             expansionTrigger={expansionTrigger} 
                             searchTerm={searchTerm}
                             isInCardViewTopLevel={true} 
+                            fieldMetadata={childFieldMetadata(cardFieldMetadata, index)}
                           />
                         </CardContent>
                          {(typeof item === 'object' && item !== null) && (
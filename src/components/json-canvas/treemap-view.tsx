@@ -0,0 +1,155 @@
+'use client'
+
+import React, { useEffect, useRef, useState } from 'react'
+import { createTreemapClient } from '@/lib/treemap-worker-client'
+import type { TreemapClient } from '@/lib/treemap-worker-client'
+import type { TreemapLayout, TreemapOptions } from '@/lib/treemap-layout'
+import { formatJsonPath } from '@/lib/jsonpath'
+import { formatByteSize } from '@/lib/document-metadata'
+import type { JsonValue } from './types'
+
+interface TreemapViewProps {
+  docId: string
+  data: JsonValue
+  // Width divided by height
+  aspectRatio?: number
+  padding?: number
+  minRoomSize?: number
+  showLabels?: boolean
+  weight?: TreemapOptions['weight']
+}
+
+// Shared by every treemap on the page, so layouts cached for a document
+// survive switching away from it and back
+let sharedClient: TreemapClient | null = null
+function getClient(): TreemapClient {
+  if (!sharedClient) sharedClient = createTreemapClient()
+  return sharedClient
+}
+
+/** Drop a deleted document from the treemap worker, if one was started. */
+export function forgetTreemapDocument(docId: string) {
+  sharedClient?.forget(docId)
+}
+
+const DEPTH_COLORS = ['#eef2ff', '#e0e7ff', '#c7d2fe', '#a5b4fc', '#818cf8', '#6366f1']
+const LABEL_MIN_WIDTH = 48
+const LABEL_MIN_HEIGHT = 18
+
+function nodePath(layout: TreemapLayout, index: number): string[] {
+  const path: string[] = []
+  for (let i = index; layout.parents[i] >= 0; i = layout.parents[i]) path.unshift(layout.keys[i])
+  return path
+}
+
+/**
+ * Treemap of the document, laid out in a worker and drawn on a canvas
+ * straight from the layout's typed arrays.
+ */
+export const TreemapView = React.memo(function TreemapView({
+  docId,
+  data,
+  aspectRatio = 1.6,
+  padding = 4,
+  minRoomSize = 24,
+  showLabels = true,
+  weight = 'bytes',
+}: TreemapViewProps) {
+  const containerRef = useRef<HTMLDivElement>(null)
+  const canvasRef = useRef<HTMLCanvasElement>(null)
+  const [width, setWidth] = useState(800)
+  const [layout, setLayout] = useState<TreemapLayout | null>(null)
+  const [hovered, setHovered] = useState<number>(-1)
+  const height = Math.round(width / aspectRatio)
+
+  useEffect(() => {
+    const element = containerRef.current
+    if (!element || typeof ResizeObserver === 'undefined') return
+    const observer = new ResizeObserver(([entry]) => setWidth(Math.max(Math.floor(entry.contentRect.width), 1)))
+    observer.observe(element)
+    return () => observer.disconnect()
+  }, [])
+
+  useEffect(() => {
+    let cancelled = false
+    const client = getClient()
+    client.update(docId, data)
+    client
+      .layout(docId, width, height, { padding, minRoomSize, weight })
+      .then(result => {
+        if (!cancelled) setLayout(result)
+      })
+      .catch(error => console.error('Treemap layout failed:', error))
+    return () => {
+      cancelled = true
+    }
+  }, [docId, data, width, height, padding, minRoomSize, weight])
+
+  useEffect(() => {
+    const canvas = canvasRef.current
+    const context = canvas?.getContext('2d')
+    if (!canvas || !context || !layout) return
+
+    const ratio = window.devicePixelRatio || 1
+    canvas.width = width * ratio
+    canvas.height = height * ratio
+    context.setTransform(ratio, 0, 0, ratio, 0, 0)
+    context.clearRect(0, 0, width, height)
+    context.font = '11px sans-serif'
+    context.textBaseline = 'top'
+
+    const { rects, depths, keys, count } = layout
+    for (let i = 0; i < count; i++) {
+      const x = rects[i * 4]
+      const y = rects[i * 4 + 1]
+      const w = rects[i * 4 + 2]
+      const h = rects[i * 4 + 3]
+      context.fillStyle = i === hovered ? '#fde68a' : DEPTH_COLORS[Math.min(depths[i], DEPTH_COLORS.length - 1)]
+      context.fillRect(x, y, w, h)
+      context.strokeStyle = '#4338ca55'
+      context.strokeRect(x + 0.5, y + 0.5, w - 1, h - 1)
+      if (showLabels && i > 0 && w >= LABEL_MIN_WIDTH && h >= LABEL_MIN_HEIGHT) {
+        context.fillStyle = '#1e1b4b'
+        context.fillText(keys[i], x + 3, y + 3, w - 6)
+      }
+    }
+  }, [layout, hovered, width, height, showLabels])
+
+  const handlePointerMove = (event: React.PointerEvent<HTMLCanvasElement>) => {
+    if (!layout) return
+    const bounds = event.currentTarget.getBoundingClientRect()
+    const x = event.clientX - bounds.left
+    const y = event.clientY - bounds.top
+    // Children are drawn after parents, so the last hit is the innermost
+    let hit = -1
+    const { rects } = layout
+    for (let i = layout.count - 1; i >= 0; i--) {
+      if (x >= rects[i * 4] && x < rects[i * 4] + rects[i * 4 + 2] && y >= rects[i * 4 + 1] && y < rects[i * 4 + 1] + rects[i * 4 + 3]) {
+        hit = i
+        break
+      }
+    }
+    setHovered(hit)
+  }
+
+  const hoveredPath = layout && hovered >= 0 ? nodePath(layout, hovered) : null
+
+  return (
+    <div ref={containerRef} className="space-y-2">
+      <canvas
+        ref={canvasRef}
+        style={{ width, height }}
+        className="rounded-md border"
+        onPointerMove={handlePointerMove}
+        onPointerLeave={() => setHovered(-1)}
+        role="img"
+        aria-label="Treemap of the document structure"
+      />
+      <p className="text-xs text-muted-foreground h-4">
+        {hoveredPath && layout
+          ? `${formatJsonPath(hoveredPath)} · ${weight === 'bytes' ? formatByteSize(layout.weights[hovered]) : `${layout.weights[hovered]} values`}`
+          : layout && `${layout.count} nodes`}
+      </p>
+    </div>
+  )
+})
@@ -1,4 +1,6 @@
 
+import type { FieldMetadataNode } from '@/lib/field-metadata-index';
+
 export type JsonPrimitive = string | number | boolean | null;
 export type JsonObject = { [key: string]: JsonValue };
 export type JsonArray = JsonValue[];
@@ -8,6 +10,13 @@ export type JsonPath = (string | number)[];
 
 export type ExpansionTrigger = { type: 'expand' | 'collapse', path: JsonPath | null, timestamp: number } | null;
 
+// Structural edits reported alongside a change, so that data keyed by path
+// (such as .jsoncanvas field metadata) can follow renamed keys and shifted
+// array items. Paths are relative to the editor's data.
+export type JsonStructureEdit =
+  | { type: 'delete'; path: JsonPath }
+  | { type: 'rename'; path: JsonPath; oldKey: string; newKey: string }; // path of the parent object
+
 export interface EditableJsonNodeProps {
   path: JsonPath;
   value: JsonValue;
@@ -23,6 +32,28 @@ export interface EditableJsonNodeProps {
   searchTerm?: string; 
   onSetHoveredPath?: (path: JsonPath | null) => void; 
   isInCardViewTopLevel?: boolean; 
+  fieldMetadata?: FieldMetadataNode; // AI metadata for this node's subtree
+}
+
+export interface DocumentMetadata {
+  size: number; // UTF-8 bytes of the compact JSON serialization of data
+  nodeCount: number;
+  createdAt: number; // epoch milliseconds
+  modifiedAt: number; // epoch milliseconds
+}
+
+// What the sidebar needs to list a document without hydrating it
+export interface DocumentSummary {
+  id: string;
+  name: string;
+  metadata: DocumentMetadata;
+  versionCount: number;
+}
+
+// The last edit recorded in history, used to coalesce rapid edits to one field
+export interface HistoryEdit {
+  path: string; // JSON-encoded JsonPath of the edited value
+  at: number; // epoch milliseconds
 }
 
 export interface Document {
@@ -31,4 +62,6 @@ export interface Document {
   data: JsonValue;
   history: JsonValue[];
   currentHistoryIndex: number;
+  metadata: DocumentMetadata;
+  lastEdit?: HistoryEdit | null; // in-memory only, never persisted
 }
@@ -0,0 +1,211 @@
+import {
+  SegmentedLog, CanvasLogStore, describeChange, hashJsonValue, LOG_SEGMENT_SIZE, LOG_MAX_SEGMENTS,
+} from '../canvas-log'
+import type { LogEntryRecord, LogKind, LogManifest, LogStorage, LogValueRecord, LogWrite } from '../canvas-log'
+import type { ChangeLogEntry } from '../jsoncanvas-types'
+import { setValueAtPath } from '../json-utils'
+
+/**
+ * CANVAS LOG TESTS
+ * Append-only segments, value references, indexed queries and compaction
+ */
+
+class MemoryLogStorage implements LogStorage {
+  entries = new Map<string, LogEntryRecord>()
+  values = new Map<string, LogValueRecord>()
+  manifests = new Map<string, LogManifest>()
+  writes: LogWrite[] = []
+  segmentReads = 0
+
+  async writeLog(write: LogWrite) {
+    this.writes.push(write)
+    for (const record of write.entries) this.entries.set(`${record.docId}/${record.kind}/${record.seq}`, record)
+    for (const record of write.values) this.values.set(`${record.docId}/${record.hash}`, record)
+    if (write.manifest) this.manifests.set(`${write.docId}/${write.kind}`, write.manifest)
+    for (const [key, record] of this.entries) {
+      if (record.docId === write.docId && record.kind === write.kind && record.seq < (write.deleteBelowSeq ?? 0)) {
+        this.entries.delete(key)
+      }
+    }
+    for (const hash of write.deleteValues ?? []) this.values.delete(`${write.docId}/${hash}`)
+  }
+
+  async readLog(docId: string, kind: LogKind) {
+    const manifest = this.manifests.get(`${docId}/${kind}`) ?? null
+    const from = (manifest?.openSegment ?? 0) * LOG_SEGMENT_SIZE
+    return { manifest, open: this.range(docId, kind, from, from + LOG_SEGMENT_SIZE) }
+  }
+
+  async readLogEntries(docId: string, kind: LogKind, fromSeq: number, toSeq: number) {
+    this.segmentReads++
+    return this.range(docId, kind, fromSeq, toSeq)
+  }
+
+  async readLogValues(docId: string, hashes: string[]) {
+    return hashes.map(hash => this.values.get(`${docId}/${hash}`)).filter((r): r is LogValueRecord => r !== undefined)
+  }
+
+  private range(docId: string, kind: LogKind, from: number, to: number) {
+    return Array.from(this.entries.values())
+      .filter(r => r.docId === docId && r.kind === kind && r.seq >= from && r.seq < to)
+      .sort((a, b) => a.seq - b.seq)
+  }
+}
+
+const DAY = 24 * 60 * 60 * 1000
+const START = Date.parse('2024-01-01T00:00:00Z')
+
+const entry = (i: number, path = `rooms.r${i % 8}.status`, extra: Partial<ChangeLogEntry> = {}): ChangeLogEntry => ({
+  timestamp: new Date(START + i * 60_000).toISOString(),
+  user: 'user',
+  action: 'update',
+  path,
+  oldValue: i - 1,
+  newValue: i,
+  ...extra,
+})
+
+describe('SegmentedLog', () => {
+  // Appends to log and applies each write to storage, as the store does
+  const appender = (log: SegmentedLog, storage = new MemoryLogStorage()) => async (e: ChangeLogEntry) => {
+    const write = await log.append(e, storage)
+    await storage.writeLog(write)
+    return write
+  }
+
+  test('appending writes one entry and nothing else', async () => {
+    const write = await appender(new SegmentedLog('doc', 'changeLog'))(entry(1))
+
+    expect(write.entries).toHaveLength(1)
+    expect(write.entries[0].seq).toBe(0)
+    expect(write.values).toHaveLength(0)
+    expect(write.manifest).toBeUndefined()
+  })
+
+  test('stores large values once, by content hash', async () => {
+    const append = appender(new SegmentedLog('doc', 'changeLog'))
+    const big = { description: 'x'.repeat(200), tags: ['a', 'b'] }
+    const first = await append(entry(1, 'a', { oldValue: big, newValue: 'short' }))
+    const second = await append(entry(2, 'b', { oldValue: { ...big }, newValue: null }))
+
+    expect(first.values).toEqual([{ docId: 'doc', hash: hashJsonValue(big), value: big }])
+    expect(first.entries[0].entry.oldValue).toEqual({ $ref: hashJsonValue(big) })
+    expect(first.entries[0].entry.newValue).toBe('short')
+    expect(second.values).toHaveLength(0)
+    expect(hashJsonValue({ a: 1 })).not.toBe(hashJsonValue({ a: 2 }))
+  })
+
+  test('does not reuse a hash whose stored value differs', async () => {
+    const storage = new MemoryLogStorage()
+    const big = { description: 'x'.repeat(200) }
+    const hash = hashJsonValue(big)
+    // Stands in for a different value that hashed the same
+    const other = { description: 'y'.repeat(200) }
+    const existing: LogEntryRecord = { docId: 'doc', kind: 'changeLog', seq: 0, entry: { ...entry(0, 'a'), oldValue: { $ref: hash } } }
+    await storage.writeLog({ docId: 'doc', kind: 'changeLog', entries: [existing], values: [{ docId: 'doc', hash, value: other }] })
+    const log = new SegmentedLog('doc', 'changeLog', null, [existing])
+    const append = appender(log, storage)
+
+    const first = await append(entry(1, 'a', { oldValue: big, newValue: { ...big } }))
+    expect(first.values).toEqual([{ docId: 'doc', hash: `${hash}.1`, value: big }])
+    expect(first.entries[0].entry.oldValue).toEqual({ $ref: `${hash}.1` })
+    expect(first.entries[0].entry.newValue).toEqual({ $ref: `${hash}.1` })
+    expect((await append(entry(2, 'a', { oldValue: { ...big } }))).values).toHaveLength(0)
+
+    const entries = await log.query(storage)
+    expect(entries.map(e => e.oldValue)).toEqual([other, big, big])
+  })
+
+  test('seals full segments and compacts the oldest into monthly summaries', async () => {
+    const log = new SegmentedLog('doc', 'changeLog')
+    const append = appender(log)
+    const writes: LogWrite[] = []
+    const total = (LOG_MAX_SEGMENTS + 2) * LOG_SEGMENT_SIZE
+    for (let i = 0; i < total; i++) {
+      writes.push(await append(entry(i, 'a', { oldValue: { big: 'y'.repeat(100), i } })))
+    }
+    expect(writes.filter(w => w.manifest).length).toBe(LOG_MAX_SEGMENTS + 2)
+    expect(log.segments).toHaveLength(LOG_MAX_SEGMENTS)
+    expect(log.size).toBe(LOG_MAX_SEGMENTS * LOG_SEGMENT_SIZE)
+
+    const compaction = writes.filter(w => w.deleteBelowSeq !== undefined)
+    expect(compaction.map(w => w.deleteBelowSeq)).toEqual([LOG_SEGMENT_SIZE, 2 * LOG_SEGMENT_SIZE])
+    expect(compaction[0].deleteValues).toHaveLength(LOG_SEGMENT_SIZE)
+
+    const [summary] = log.compacted
+    expect(summary).toMatchObject({ month: '2024-01', count: 2 * LOG_SEGMENT_SIZE, actions: { update: 2 * LOG_SEGMENT_SIZE } })
+    expect(summary.paths).toEqual({ a: 2 * LOG_SEGMENT_SIZE })
+  })
+})
+
+describe('CanvasLogStore', () => {
+  test('queries by path and time range, reading only matching segments', async () => {
+    const storage = new MemoryLogStorage()
+    const store = new CanvasLogStore(storage)
+    for (let i = 0; i < 3 * LOG_SEGMENT_SIZE; i++) {
+      // One path appears only in the second segment
+      const path = i === LOG_SEGMENT_SIZE + 5 ? 'garage.door' : `rooms.r${i % 8}.status`
+      await store.append('doc', 'changeLog', entry(i, path))
+    }
+
+    storage.segmentReads = 0
+    const garage = await store.query('doc', 'changeLog', { path: 'garage.door' })
+    expect(garage.map(e => e.newValue)).toEqual([LOG_SEGMENT_SIZE + 5])
+    expect(storage.segmentReads).toBe(1)
+
+    storage.segmentReads = 0
+    const from = START + (2 * LOG_SEGMENT_SIZE + 10) * 60_000
+    const recent = await store.query('doc', 'changeLog', { from, to: from + 60_000 })
+    expect(recent.map(e => e.newValue)).toEqual([2 * LOG_SEGMENT_SIZE + 10, 2 * LOG_SEGMENT_SIZE + 11])
+    expect(storage.segmentReads).toBe(1)
+
+    const rooms = await store.query('doc', 'changeLog', { path: 'rooms', includeDescendants: true, limit: 3 })
+    expect(rooms.map(e => e.newValue)).toEqual([765, 766, 767])
+  })
+
+  test('resumes from storage and resolves stored values', async () => {
+    const storage = new MemoryLogStorage()
+    const big = { notes: 'z'.repeat(100) }
+    await new CanvasLogStore(storage).append('doc', 'changeLog', entry(1, 'a', { oldValue: big }))
+
+    const reopened = new CanvasLogStore(storage)
+    await reopened.append('doc', 'changeLog', entry(2, 'a'))
+    const entries = await reopened.query('doc', 'changeLog')
+
+    expect(entries.map(e => e.newValue)).toEqual([1, 2])
+    expect(entries[0].oldValue).toEqual(big)
+    expect(Array.from(storage.entries.values()).map(r => r.seq)).toEqual([0, 1])
+  })
+
+  test('reloads after a failed write', async () => {
+    const storage = new MemoryLogStorage()
+    const store = new CanvasLogStore(storage)
+    const write = storage.writeLog.bind(storage)
+    storage.writeLog = async () => { throw new Error('quota') }
+    await expect(store.append('doc', 'changeLog', entry(1))).rejects.toThrow('quota')
+
+    storage.writeLog = write
+    await store.append('doc', 'changeLog', entry(2))
+    expect((await store.query('doc', 'changeLog')).map(e => e.newValue)).toEqual([2])
+  })
+})
+
+describe('describeChange', () => {
+  const now = new Date(START)
+  const data = { rooms: { kitchen: { lights: 2, name: 'Kitchen' } } }
+
+  test('records single field updates with both values', () => {
+    const next = setValueAtPath(data, ['rooms', 'kitchen', 'lights'], 3)
+    expect(describeChange(data, next, undefined, now)).toEqual({
+      timestamp: now.toISOString(), user: 'user', action: 'update', path: 'rooms.kitchen.lights', oldValue: 2, newValue: 3,
+    })
+  })
+
+  test('records deletes and renames from structure edits', () => {
+    expect(describeChange(data, {}, { type: 'delete', path: ['rooms', 'kitchen'] }, now))
+      .toMatchObject({ action: 'delete', path: 'rooms.kitchen', oldValue: data.rooms.kitchen })
+    expect(describeChange(data, {}, { type: 'rename', path: ['rooms'], oldKey: 'kitchen', newKey: 'galley' }, now))
+      .toMatchObject({ action: 'update', path: 'rooms.galley', notes: 'Renamed from rooms.kitchen' })
+    expect(describeChange(data, { other: true }, undefined, now)).toMatchObject({ path: '$' })
+  })
+})
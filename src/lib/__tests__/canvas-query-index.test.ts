@@ -0,0 +1,142 @@
+/**
+ * @jest-environment node
+ */
+import fs from 'fs'
+import path from 'path'
+import { readJsonCanvas } from '../jsoncanvas-file'
+import { CanvasQueryIndex, PageRequestError, PathIndex, paginate, parsePageRequest } from '../canvas-query-index'
+
+/**
+ * CANVAS QUERY INDEX TESTS
+ * Path-prefix lookups, confidence thresholds and pagination
+ */
+
+const examplePath = path.join(__dirname, '../../../example-house.jsoncanvas')
+const exampleText = fs.readFileSync(examplePath, 'utf8')
+
+function makeCanvas(fields: number) {
+  const fieldMetadata: Record<string, unknown> = {}
+  for (let i = 0; i < fields; i++) {
+    fieldMetadata[`rooms.room${i % 10}.items.item${i}`] = {
+      confidence: i % 100,
+      lastUpdated: '2024-01-01T00:00:00Z',
+      source: 'ai-generated',
+    }
+  }
+  return readJsonCanvas(
+    JSON.stringify({
+      $schema: 'jsoncanvas/v1.0',
+      $metadata: {
+        ai: {
+          insights: [
+            { id: 'a', timestamp: '2024-01-01T00:00:00Z', type: 'pattern', relatedPaths: ['rooms.room1', 'rooms.room2.items'] },
+            { id: 'b', timestamp: '2024-03-01T00:00:00Z', type: 'discovery', relatedPaths: ['rooms.room1.items.item1'] },
+            { id: 'c', timestamp: '2024-02-01T00:00:00Z', type: 'discovery', relatedPaths: ['systems.hvac'] },
+          ],
+          suggestions: [
+            { id: 's1', timestamp: '2024-01-01T00:00:00Z', priority: 'low', type: 'maintenance', path: 'rooms.room1' },
+            { id: 's2', timestamp: '2024-01-02T00:00:00Z', priority: 'high', type: 'missing-data', path: 'rooms.room1.items' },
+            { id: 's3', timestamp: '2024-01-03T00:00:00Z', priority: 'high', type: 'maintenance' },
+          ],
+          fieldMetadata,
+        },
+        changeLog: [
+          { timestamp: '2024-01-01T00:00:00Z', user: 'ai', action: 'create', path: 'rooms.room1.items.item1' },
+          { timestamp: '2024-01-05T00:00:00Z', user: 'me', action: 'update', path: 'rooms.room1' },
+          { timestamp: '2024-01-03T00:00:00Z', user: 'me', action: 'update', path: 'rooms.room10' },
+        ],
+      },
+      data: {},
+    })
+  )
+}
+
+const ids = (items: { id: string }[]) => items.map(item => item.id)
+
+describe('CanvasQueryIndex', () => {
+  test('finds insights by path prefix, newest first', () => {
+    const index = new CanvasQueryIndex(makeCanvas(0))
+
+    expect(ids(index.insights({ path: 'rooms.room1' }).items)).toEqual(['b', 'a'])
+    expect(ids(index.insights({ path: 'rooms.room1', includeDescendants: false }).items)).toEqual(['a'])
+    expect(ids(index.insights({ path: 'rooms', type: 'discovery' }).items)).toEqual(['b'])
+    expect(ids(index.insights().items)).toEqual(['b', 'c', 'a'])
+    expect(index.insights({ path: 'nowhere' }).total).toBe(0)
+  })
+
+  test('orders suggestions by priority and filters them', () => {
+    const index = new CanvasQueryIndex(makeCanvas(0))
+
+    expect(ids(index.suggestions().items)).toEqual(['s3', 's2', 's1'])
+    expect(ids(index.suggestions({ priority: ['high'] }).items)).toEqual(['s3', 's2'])
+    expect(ids(index.suggestions({ path: 'rooms.room1' }).items)).toEqual(['s2', 's1'])
+    expect(ids(index.suggestions({ type: 'maintenance', priority: ['low', 'medium'] }).items)).toEqual(['s1'])
+  })
+
+  test('returns fields below a confidence threshold, pruning confident subtrees', () => {
+    const index = new CanvasQueryIndex(makeCanvas(1000))
+
+    const page = index.fields({ below: 3, limit: 100 })
+    expect(page.total).toBe(30)
+    expect(page.items[0]).toMatchObject({ confidence: 0, path: 'rooms.room0.items.item0' })
+    expect(page.items.every(field => field.confidence < 3)).toBe(true)
+
+    const scoped = index.fields({ below: 3, path: 'rooms.room1' })
+    expect(scoped.items.map(field => field.path)).toEqual(
+      Array.from({ length: 10 }, (_, i) => `rooms.room1.items.item${i * 100 + 1}`).sort()
+    )
+  })
+
+  test('reads history for a path without matching sibling prefixes', () => {
+    const doc = makeCanvas(0)
+    const index = new CanvasQueryIndex(doc)
+    index.insights()
+    expect(doc.changeLog.isParsed).toBe(false)
+
+    const history = index.history({ path: 'rooms.room1' })
+    expect(history.items.map(item => item.entry.timestamp)).toEqual(['2024-01-05T00:00:00Z', '2024-01-01T00:00:00Z'])
+    expect(history.items.every(item => item.source === 'changeLog')).toBe(true)
+  })
+
+  test('answers queries on the example file', () => {
+    const example = JSON.parse(exampleText)
+    const index = new CanvasQueryIndex(readJsonCanvas(exampleText))
+
+    const kitchen = index.history({ path: 'floors.first.rooms.kitchen' })
+    expect(kitchen.total).toBe(
+      [...example.$metadata.changeLog, ...example.$metadata.ai.learningHistory].filter(
+        (entry: { path: string }) => entry.path.startsWith('floors.first.rooms.kitchen.')
+      ).length
+    )
+    expect(index.suggestions({ priority: ['high'] }).items.every(item => item.priority === 'high')).toBe(true)
+  })
+})
+
+describe('paginate', () => {
+  test('walks pages with cursors', () => {
+    const items = Array.from({ length: 120 }, (_, i) => i)
+    const first = paginate(items, { limit: 50 })
+    const second = paginate(items, { limit: 50, cursor: first.nextCursor })
+    const third = paginate(items, { limit: 50, cursor: second.nextCursor })
+
+    expect(first.items[0]).toBe(0)
+    expect(second.items[0]).toBe(50)
+    expect(third.items).toHaveLength(20)
+    expect(third.nextCursor).toBeNull()
+    expect(() => paginate(items, { cursor: '-1' })).toThrow(PageRequestError)
+  })
+
+  test('reads only positive integer limits from a query string', () => {
+    expect(parsePageRequest(new URLSearchParams('limit=20&cursor=1e'))).toEqual({ limit: 20, cursor: '1e' })
+    expect(parsePageRequest(new URLSearchParams(''))).toEqual({ limit: undefined, cursor: null })
+    for (const limit of ['abc', '0', '-5', '2.5', '', '1e3', ' 7']) {
+      expect(() => parsePageRequest(new URLSearchParams({ limit }))).toThrow(PageRequestError)
+    }
+  })
+
+  test('files an item under each of its paths once', () => {
+    const index = new PathIndex<string>()
+    index.add('x', ['a.b', 'a.b', 'a.c'])
+    expect(index.query('a')).toEqual(['x'])
+  })
+})
@@ -0,0 +1,144 @@
+/**
+ * @jest-environment node
+ */
+import { readDocument, writeBatch } from '../document-db'
+import type { PersistenceBatch } from '../document-db'
+
+/**
+ * DOCUMENT DB TESTS
+ * Batch writes from two contexts sharing one database
+ */
+
+type Operation = () => void
+
+class FakeRequest {
+  result: any
+  error: any = null
+  onsuccess: (() => void) | null = null
+  onerror: (() => void) | null = null
+}
+
+/**
+ * Enough of an IndexedDB transaction for writeBatch and readDocument.
+ * Requests run one after another, each seeing the ones before it, and are
+ * committed together unless the transaction is aborted.
+ */
+class FakeTransaction {
+  oncomplete: (() => void) | null = null
+  onerror: (() => void) | null = null
+  onabort: (() => void) | null = null
+  error: any = null
+  private readonly queue: Operation[] = []
+  private readonly db: FakeDatabase
+  private readonly mode: IDBTransactionMode
+  // The database as this transaction sees it, from when it starts
+  private working = new Map<string, Map<any, any>>()
+  private aborted = false
+
+  constructor(db: FakeDatabase, mode: IDBTransactionMode, gate: Promise<void>) {
+    this.db = db
+    this.mode = mode
+    gate.then(() => setTimeout(() => this.run()))
+  }
+
+  objectStore(name: string) {
+    const records = () => this.working.get(name)!
+    const request = (apply: () => any) => {
+      const req = new FakeRequest()
+      this.queue.push(() => {
+        req.result = apply()
+        req.onsuccess?.()
+      })
+      return req
+    }
+    return {
+      // Values are stored and read as copies, as IndexedDB clones them
+      get: (key: any) => request(() => structuredClone(records().get(key))),
+      put: (value: any, key?: any) => request(() => records().set(key ?? value.id, structuredClone(value))),
+      delete: (key: any) => request(() => records().delete(key)),
+    }
+  }
+
+  abort() {
+    this.aborted = true
+  }
+
+  private run() {
+    this.working = new Map(Array.from(this.db.stores, ([name, records]) => [name, new Map(records)]))
+    while (this.queue.length > 0 && !this.aborted) {
+      this.queue.shift()!()
+    }
+    if (this.aborted) {
+      this.onabort?.()
+      return
+    }
+    if (this.mode === 'readwrite') {
+      this.db.stores = this.working
+      this.db.commits++
+    }
+    this.oncomplete?.()
+  }
+}
+
+class FakeDatabase {
+  stores = new Map<string, Map<any, any>>(
+    ['documents', 'history', 'meta', 'dictionaries', 'logEntries', 'logValues', 'logManifests', 'canvases', 'canvasLogs']
+      .map(name => [name, new Map()])
+  )
+  commits = 0
+  // The next readwrite transaction waits for this, as if it had been opened later
+  hold: Promise<void> | null = null
+  held: (() => void) | null = null
+
+  transaction(_names: string | string[], mode: IDBTransactionMode = 'readonly') {
+    let gate = Promise.resolve()
+    if (mode === 'readwrite' && this.hold) {
+      gate = this.hold
+      this.hold = null
+      this.held?.()
+    }
+    return new FakeTransaction(this, mode, gate)
+  }
+}
+
+const batch = (id: string, data: any, history: any[]): PersistenceBatch => ({
+  documents: [{ id, data, currentHistoryIndex: history.length - 1 }],
+  histories: [{ id, history }],
+  deletedIds: [],
+})
+
+describe('writeBatch', () => {
+  test('re-encodes a batch whose key dictionary another context extended meanwhile', async () => {
+    const db = new FakeDatabase()
+    const idb = db as unknown as IDBDatabase
+    await writeBatch(idb, batch('d', { a: 1 }, [{ a: 1 }]))
+
+    // The first batch, of the document, reads the dictionary; then its write is held back
+    let release!: () => void
+    db.hold = new Promise<void>(resolve => { release = resolve })
+    const holding = new Promise<void>(resolve => { db.held = resolve })
+    const first = writeBatch(idb, { ...batch('d', { a: 1, first: 2 }, [{ a: 1 }]), histories: [] })
+    await holding
+
+    // ...while the second, of the history, reads the same dictionary, adds its own key and commits
+    await writeBatch(idb, { ...batch('d', { a: 1 }, [{ a: 1 }, { a: 1, second: 3 }]), documents: [] })
+    release()
+    await first
+
+    // Both decode with the dictionary that was stored last
+    const stored = await readDocument(idb, 'd')
+    expect(stored?.document.data).toEqual({ a: 1, first: 2 })
+    expect(stored?.history?.history).toEqual([{ a: 1 }, { a: 1, second: 3 }])
+    expect(db.stores.get('dictionaries')!.get('d').keys).toEqual(['a', 'second', 'first'])
+  })
+
+  test('writes at once when nothing else touched the dictionary', async () => {
+    const db = new FakeDatabase()
+    const idb = db as unknown as IDBDatabase
+    await writeBatch(idb, batch('d', { a: 1 }, [{ a: 1 }]))
+    await writeBatch(idb, batch('d', { a: 1, b: 2 }, [{ a: 1 }, { a: 1, b: 2 }]))
+
+    expect(db.commits).toBe(2)
+    expect((await readDocument(idb, 'd'))?.document.data).toEqual({ a: 1, b: 2 })
+  })
+})
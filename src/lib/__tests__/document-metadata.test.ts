@@ -0,0 +1,77 @@
+import { measureJson, createDocumentMetadata, updateDocumentMetadata, ensureDocumentMetadata, formatByteSize } from '../document-metadata'
+
+/**
+ * DOCUMENT METADATA TESTS
+ * Size/node-count bookkeeping must match a full serialization
+ */
+
+describe('measureJson', () => {
+  const blobSize = (value: any) => new Blob([JSON.stringify(value)]).size
+
+  test('matches the byte size of JSON.stringify', () => {
+    const samples = [
+      null,
+      true,
+      -12.5e-7,
+      'plain',
+      'quotes " and \\ backslashes\n',
+      'ünïcödé – 日本語 😀',
+      [],
+      {},
+      [1, [2, [3, { deep: ['x'] }]]],
+      { 'kéy': { nested: [null, false, 'v'] }, empty: {}, list: [] },
+    ]
+
+    samples.forEach(sample => {
+      expect(measureJson(sample as any).size).toBe(blobSize(sample))
+    })
+  })
+
+  test('counts every node including the root', () => {
+    expect(measureJson(1).nodeCount).toBe(1)
+    expect(measureJson({ a: 1, b: [2, 3] }).nodeCount).toBe(5)
+  })
+
+  test('reuses measurements for shared subtrees', () => {
+    const shared = { items: Array.from({ length: 50 }, (_, i) => ({ id: i })) }
+    const before = { shared, title: 'a' }
+    const first = measureJson(before)
+
+    const after = { shared, title: 'longer title' }
+    const second = measureJson(after)
+
+    expect(second.size - first.size).toBe('longer title'.length - 'a'.length)
+    expect(measureJson(shared)).toBe(measureJson(shared))
+  })
+})
+
+describe('document metadata lifecycle', () => {
+  test('update keeps createdAt and moves modifiedAt', () => {
+    const created = createDocumentMetadata({ a: 1 }, 1000)
+    const updated = updateDocumentMetadata(created, { a: 1, b: 2 }, 5000)
+
+    expect(updated.createdAt).toBe(1000)
+    expect(updated.modifiedAt).toBe(5000)
+    expect(updated.size).toBe(JSON.stringify({ a: 1, b: 2 }).length)
+    expect(updated.nodeCount).toBe(3)
+  })
+
+  test('backfills metadata for documents saved without it', () => {
+    const doc = ensureDocumentMetadata({
+      id: '1700000000000',
+      name: 'Old',
+      data: { x: 1 },
+      history: [{ x: 1 }],
+      currentHistoryIndex: 0,
+    })
+
+    expect(doc.metadata.createdAt).toBe(1700000000000)
+    expect(doc.metadata.size).toBe(7)
+  })
+
+  test('formats byte sizes for display', () => {
+    expect(formatByteSize(512)).toBe('512 B')
+    expect(formatByteSize(1536)).toBe('1.5 KB')
+    expect(formatByteSize(2 * 1024 * 1024)).toBe('2.0 MB')
+  })
+})
@@ -0,0 +1,338 @@
+import { DocumentPersistence, assembleDocument, LEGACY_STORAGE_KEYS } from '../document-storage'
+import type { StorageBackend } from '../document-storage'
+import type { PersistenceBatch, StoredDocument, WorkspaceRecord } from '../document-db'
+import type { Document } from '@/components/json-canvas/types'
+import { createDocumentMetadata, toDocumentSummary } from '../document-metadata'
+import { DOCUMENT_MEMORY_BUDGET_BYTES, estimateDocumentBytes, selectEvictions } from '../document-cache'
+import { setValueAtPath } from '../json-utils'
+
+/**
+ * DOCUMENT PERSISTENCE TESTS
+ * Dirty tracking, batching and legacy migration against an in-memory backend
+ */
+
+const makeDoc = (id: string, data: any): Document => ({
+  id,
+  name: `Doc ${id}`,
+  data,
+  history: [data],
+  currentHistoryIndex: 0,
+  metadata: createDocumentMetadata(data, 1700000000000),
+})
+
+const summaries = (docs: Document[]) => docs.map(toDocumentSummary)
+
+class MemoryBackend implements StorageBackend {
+  batches: PersistenceBatch[] = []
+  workspace: WorkspaceRecord | null = null
+  stored = new Map<string, StoredDocument>()
+  reads: string[] = []
+
+  store(docs: Document[], activeDocumentId: string | null) {
+    this.workspace = { documents: summaries(docs), activeDocumentId, migratedFromLocalStorage: true }
+    for (const doc of docs) {
+      this.stored.set(doc.id, {
+        document: { id: doc.id, data: doc.data, currentHistoryIndex: doc.currentHistoryIndex },
+        history: { id: doc.id, history: doc.history },
+      })
+    }
+  }
+
+  async write(batch: PersistenceBatch) {
+    this.batches.push(batch)
+  }
+
+  async readIndex() {
+    return this.workspace
+  }
+
+  async readDocument(id: string) {
+    this.reads.push(id)
+    return this.stored.get(id) ?? null
+  }
+}
+
+describe('DocumentPersistence', () => {
+  beforeEach(() => {
+    jest.useFakeTimers()
+    ;(localStorage.getItem as jest.Mock).mockReset()
+    ;(localStorage.removeItem as jest.Mock).mockReset()
+  })
+
+  afterEach(() => {
+    jest.useRealTimers()
+  })
+
+  test('writes only documents that changed since the last sync', async () => {
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend)
+    const a = makeDoc('a', { value: 1 })
+    const b = makeDoc('b', { value: 2 })
+
+    persistence.sync(summaries([a, b]), [a, b], 'a')
+    await persistence.flush()
+    expect(backend.batches[0].documents.map(d => d.id)).toEqual(['a', 'b'])
+
+    const editedB = { ...b, data: { value: 3 }, history: [...b.history, { value: 3 }], currentHistoryIndex: 1 }
+    persistence.sync(summaries([a, editedB]), [a, editedB], 'a')
+    await persistence.flush()
+
+    expect(backend.batches[1].documents.map(d => d.id)).toEqual(['b'])
+    expect(backend.batches[1].histories.map(h => h.id)).toEqual(['b'])
+    // The index only changes for the edited document's version count
+    expect(backend.batches[1].workspace?.documents.map(entry => entry.versionCount)).toEqual([1, 2])
+  })
+
+  test('undo rewrites current data but not history', async () => {
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend)
+    const doc = { ...makeDoc('a', { v: 2 }), history: [{ v: 1 }, { v: 2 }], currentHistoryIndex: 1 }
+
+    persistence.sync(summaries([doc]), [doc], 'a')
+    await persistence.flush()
+    const undone = { ...doc, data: doc.history[0], currentHistoryIndex: 0 }
+    persistence.sync(summaries([undone]), [undone], 'a')
+    await persistence.flush()
+
+    expect(backend.batches[1].documents).toHaveLength(1)
+    expect(backend.batches[1].histories).toHaveLength(0)
+  })
+
+  test('debounces bursts of changes into a single batch', async () => {
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend, { debounceMs: 200 })
+    let doc = makeDoc('a', { count: 0 })
+
+    for (let i = 1; i <= 10; i++) {
+      doc = { ...doc, data: { count: i } }
+      persistence.sync(summaries([doc]), [doc], 'a')
+      jest.advanceTimersByTime(50)
+    }
+    expect(backend.batches).toHaveLength(0)
+
+    jest.advanceTimersByTime(200)
+    await Promise.resolve()
+    expect(backend.batches).toHaveLength(1)
+    expect(backend.batches[0].documents[0].data).toEqual({ count: 10 })
+  })
+
+  test('records deletions and renames', async () => {
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend)
+    const a = makeDoc('a', {})
+    const b = makeDoc('b', {})
+
+    persistence.sync(summaries([a, b]), [a, b], 'a')
+    await persistence.flush()
+    const renamed = { ...a, name: 'Renamed' }
+    persistence.sync(summaries([renamed]), [renamed], 'a')
+    await persistence.flush()
+
+    const batch = backend.batches[1]
+    expect(batch.deletedIds).toEqual(['b'])
+    expect(batch.documents).toHaveLength(0)
+    expect(batch.workspace?.documents).toEqual([{ id: 'a', name: 'Renamed', metadata: a.metadata, versionCount: 1 }])
+  })
+
+  test('re-queues a failed batch', async () => {
+    const backend = new MemoryBackend()
+    const onError = jest.fn()
+    const persistence = new DocumentPersistence(backend, { onError })
+    const write = jest.spyOn(backend, 'write').mockRejectedValueOnce(new Error('quota'))
+
+    const doc = makeDoc('a', { x: 1 })
+    persistence.sync(summaries([doc]), [doc], 'a')
+    await persistence.flush()
+    expect(onError).toHaveBeenCalled()
+    expect(persistence.hasPendingWrites).toBe(true)
+
+    await persistence.flush()
+    expect(write).toHaveBeenCalledTimes(2)
+    expect(persistence.hasPendingWrites).toBe(false)
+  })
+
+  test('a flush waiting on a failed write does not reject', async () => {
+    const backend = new MemoryBackend()
+    const onError = jest.fn()
+    const persistence = new DocumentPersistence(backend, { onError })
+    jest.spyOn(backend, 'write').mockRejectedValueOnce(new Error('quota'))
+
+    const doc = makeDoc('a', { x: 1 })
+    persistence.sync(summaries([doc]), [doc], 'a')
+    const first = persistence.flush()
+    const second = persistence.flush()
+    await expect(first).resolves.toBeUndefined()
+    await expect(second).resolves.toBeUndefined()
+    expect(onError).toHaveBeenCalledTimes(1)
+    expect(persistence.hasPendingWrites).toBe(false)
+  })
+
+  test('migrates a legacy localStorage workspace once', async () => {
+    const legacyDoc = makeDoc('legacy', { migrated: true })
+    ;(localStorage.getItem as jest.Mock).mockImplementation((key: string) => {
+      if (key === LEGACY_STORAGE_KEYS.DOCUMENTS_META) return JSON.stringify([{ id: 'legacy', name: legacyDoc.name }])
+      if (key === `${LEGACY_STORAGE_KEYS.DOCUMENT_PREFIX}legacy`) return JSON.stringify(legacyDoc)
+      if (key === LEGACY_STORAGE_KEYS.ACTIVE_DOCUMENT_ID) return 'legacy'
+      return null
+    })
+
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend)
+    const workspace = await persistence.load()
+
+    expect(workspace.documents).toEqual([legacyDoc])
+    expect(workspace.activeDocumentId).toBe('legacy')
+    expect(backend.batches[0].workspace?.migratedFromLocalStorage).toBe(true)
+    expect(localStorage.removeItem).toHaveBeenCalledWith(`${LEGACY_STORAGE_KEYS.DOCUMENT_PREFIX}legacy`)
+
+    // Loaded documents are clean
+    persistence.sync(workspace.index, workspace.documents, 'legacy')
+    expect(persistence.hasPendingWrites).toBe(false)
+  })
+
+  test('hydrates only the active document on load', async () => {
+    const docs = [makeDoc('a', { a: 1 }), makeDoc('b', { b: 2 }), makeDoc('c', { c: 3 })]
+    const backend = new MemoryBackend()
+    backend.store(docs, 'b')
+
+    const persistence = new DocumentPersistence(backend)
+    const workspace = await persistence.load()
+
+    expect(backend.reads).toEqual(['b'])
+    expect(workspace.index.map(entry => entry.id)).toEqual(['a', 'b', 'c'])
+    expect(workspace.documents.map(doc => doc.id)).toEqual(['b'])
+    expect(workspace.activeDocumentId).toBe('b')
+
+    const c = await persistence.loadDocument(workspace.index[2])
+    expect(c?.document.data).toEqual({ c: 3 })
+    expect(c?.canvas).toBeNull()
+    persistence.sync(workspace.index, [...workspace.documents, c!.document], 'c')
+    await persistence.flush()
+    // Only the active document changed in the workspace record
+    expect(backend.batches).toHaveLength(1)
+    expect(backend.batches[0].documents).toHaveLength(0)
+  })
+
+  test('writes canvas records with the document and keeps stored logs', async () => {
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend)
+    const doc = makeDoc('a', { a: 1 })
+    const metadata = { title: 'Plan' }
+    const logs = { changeLog: new Uint8Array([91, 93]), learningHistory: null }
+
+    persistence.saveCanvas({ id: 'a', schema: 'jsoncanvas/v1', metadata, logs })
+    persistence.sync(summaries([doc]), [doc], 'a')
+    expect(persistence.isPersisted(doc)).toBe(false)
+    // A later metadata update does not drop the logs queued with the import
+    persistence.saveCanvas({ id: 'a', schema: 'jsoncanvas/v1', metadata: { title: 'Renamed' } })
+    await persistence.flush()
+
+    expect(backend.batches).toHaveLength(1)
+    expect(backend.batches[0].documents.map(d => d.id)).toEqual(['a'])
+    expect(backend.batches[0].canvases).toEqual([{ id: 'a', schema: 'jsoncanvas/v1', metadata: { title: 'Renamed' }, logs }])
+    expect(persistence.isPersisted(doc)).toBe(true)
+
+    persistence.saveCanvas({ id: 'a', schema: 'jsoncanvas/v1', metadata: { title: 'Again' } })
+    await persistence.flush()
+    expect(backend.batches[1].canvases?.[0].logs).toBeUndefined()
+  })
+
+  test('returns the stored canvas with a hydrated document', async () => {
+    const doc = makeDoc('a', { a: 1 })
+    const backend = new MemoryBackend()
+    backend.store([doc, makeDoc('b', { b: 2 })], 'b')
+    const canvas = { id: 'a', schema: 'jsoncanvas/v1', metadata: {}, logs: { changeLog: null, learningHistory: null } }
+    backend.stored.set('a', { ...backend.stored.get('a')!, canvas })
+
+    const persistence = new DocumentPersistence(backend)
+    const workspace = await persistence.load()
+    expect(workspace.canvases).toEqual([])
+    const hydrated = await persistence.loadDocument(workspace.index[0])
+    expect(hydrated?.canvas).toEqual(canvas)
+  })
+
+  test('dropping a document from memory does not delete it', async () => {
+    const docs = [makeDoc('a', { a: 1 }), makeDoc('b', { b: 2 })]
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend)
+
+    persistence.sync(summaries(docs), docs, 'a')
+    await persistence.flush()
+    expect(persistence.isPersisted(docs[1])).toBe(true)
+
+    persistence.sync(summaries(docs), [docs[0]], 'a')
+    await persistence.flush()
+    expect(backend.batches).toHaveLength(1)
+  })
+
+  test('an edited document is not persisted until flushed', async () => {
+    const backend = new MemoryBackend()
+    const persistence = new DocumentPersistence(backend)
+    const doc = makeDoc('a', { v: 1 })
+    persistence.sync(summaries([doc]), [doc], 'a')
+    await persistence.flush()
+
+    const edited = { ...doc, data: { v: 2 } }
+    persistence.sync(summaries([edited]), [edited], 'a')
+    expect(persistence.isPersisted(edited)).toBe(false)
+    await persistence.flush()
+    expect(persistence.isPersisted(edited)).toBe(true)
+  })
+})
+
+describe('selectEvictions', () => {
+  test('evicts least recently used documents until under budget', () => {
+    const entries = [
+      { id: 'a', bytes: 400, lastUsed: 3 },
+      { id: 'b', bytes: 400, lastUsed: 1 },
+      { id: 'c', bytes: 400, lastUsed: 2 },
+    ]
+    expect(selectEvictions(entries, 1000, null)).toEqual(['b'])
+    expect(selectEvictions(entries, 500, null)).toEqual(['b', 'c'])
+    expect(selectEvictions(entries, 2000, null)).toEqual([])
+  })
+
+  test('never evicts the pinned document', () => {
+    const entries = [
+      { id: 'active', bytes: 5000, lastUsed: 0 },
+      { id: 'other', bytes: 10, lastUsed: 1 },
+    ]
+    expect(selectEvictions(entries, 100, 'active')).toEqual(['other'])
+  })
+
+  test('counts history shared between entries once', () => {
+    // About 1 MB, edited 40 times; each entry shares all but one item with the last
+    const items = Array.from({ length: 1000 }, (_, i) => ({ label: `item ${i}`, text: 'x'.repeat(1000) }))
+    const docs = ['a', 'b', 'c'].map(id => {
+      let data: any = { items }
+      const history = [data]
+      for (let i = 0; i < 40; i++) {
+        data = setValueAtPath(data, ['items', i, 'label'], `edited ${i}`)
+        history.push(data)
+      }
+      return { ...makeDoc(id, data), history, currentHistoryIndex: 40 }
+    })
+
+    const single = JSON.stringify(docs[0].data).length
+    const bytes = estimateDocumentBytes(docs[0])
+    expect(bytes).toBeLessThan(1.1 * single)
+    expect(estimateDocumentBytes(docs[0])).toBe(bytes)
+
+    const entries = docs.map((doc, i) => ({ id: doc.id, bytes: estimateDocumentBytes(doc), lastUsed: i }))
+    expect(selectEvictions(entries, DOCUMENT_MEMORY_BUDGET_BYTES, 'c')).toEqual([])
+  })
+})
+
+describe('assembleDocument', () => {
+  test('falls back when history is missing', () => {
+    const doc = assembleDocument(
+      { id: '2', name: 'Second' },
+      { document: { id: '2', data: { b: 2 }, currentHistoryIndex: 3 }, history: null }
+    )
+
+    expect(doc.name).toBe('Second')
+    expect(doc.history).toEqual([{ b: 2 }])
+    expect(doc.currentHistoryIndex).toBe(0)
+    expect(doc.metadata.size).toBe(JSON.stringify({ b: 2 }).length)
+  })
+})
@@ -0,0 +1,98 @@
+import {
+  buildFieldMetadataIndex, lookupFieldMetadata, childFieldMetadata, setFieldMetadata,
+  applyStructureEdit, fieldMetadataToRecord, averageConfidence, EMPTY_FIELD_METADATA,
+} from '../field-metadata-index'
+import type { FieldAIData } from '../jsoncanvas-types'
+
+/**
+ * FIELD METADATA INDEX TESTS
+ * Path trie lookups, subtree aggregates and re-keying on structural edits
+ */
+
+const field = (confidence: number, source: FieldAIData['source'] = 'ai-generated'): FieldAIData => ({
+  confidence,
+  source,
+  lastUpdated: '2024-01-01T00:00:00Z',
+})
+
+const record = () => ({
+  'floors.first.rooms.kitchen': field(90, 'user-input'),
+  'floors.first.rooms.kitchen.appliances.0': field(70),
+  'floors.first.rooms.kitchen.appliances.1': field(40),
+  'floors.first.rooms.kitchen.appliances[2].brand': field(60, 'ai-verified'),
+  "floors.first.rooms['living room']": field(80),
+  'floors.*.rooms': field(10), // not a single location, skipped
+})
+
+describe('lookup', () => {
+  test('finds entries by path, with numeric segments matching array indices', () => {
+    const index = buildFieldMetadataIndex(record())
+    expect(lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'kitchen'])?.field?.confidence).toBe(90)
+    expect(lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'kitchen', 'appliances', 1])?.field?.confidence).toBe(40)
+    expect(lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'living room'])?.field?.confidence).toBe(80)
+    expect(lookupFieldMetadata(index, ['floors', 'second'])).toBeUndefined()
+    expect(childFieldMetadata(undefined, 'x')).toBeUndefined()
+  })
+
+  test('aggregates each subtree', () => {
+    const index = buildFieldMetadataIndex(record())
+    const kitchen = lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'kitchen'])!
+    expect(kitchen.summary).toMatchObject({ fields: 4, unverified: 2, minConfidence: 40 })
+    expect(averageConfidence(kitchen.summary)).toBe(65)
+    expect(index.summary.fields).toBe(5)
+    expect(averageConfidence(EMPTY_FIELD_METADATA.summary)).toBeNull()
+  })
+
+  test('round-trips to a record', () => {
+    const expected: Record<string, FieldAIData> = record()
+    delete expected['floors.*.rooms']
+    const roundTripped = fieldMetadataToRecord(buildFieldMetadataIndex(record()))
+    expect(buildFieldMetadataIndex(roundTripped)).toEqual(buildFieldMetadataIndex(expected))
+    expect(Object.keys(roundTripped)).toContain('floors.first.rooms.kitchen.appliances.2.brand')
+  })
+})
+
+describe('updates', () => {
+  test('copy only the edited path and refresh aggregates', () => {
+    const index = buildFieldMetadataIndex(record())
+    const next = setFieldMetadata(index, ['floors', 'first', 'rooms', 'kitchen', 'appliances', 1], field(95, 'ai-verified'))
+
+    const kitchen = lookupFieldMetadata(next, ['floors', 'first', 'rooms', 'kitchen'])!
+    expect(kitchen.summary).toMatchObject({ fields: 4, unverified: 1, minConfidence: 60 })
+    expect(lookupFieldMetadata(next, ['floors', 'first', 'rooms', 'living room']))
+      .toBe(lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'living room']))
+    expect(lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'kitchen'])!.summary.minConfidence).toBe(40)
+  })
+
+  test('clearing the last entry prunes empty branches', () => {
+    let index = buildFieldMetadataIndex({ 'a.b.c': field(50) })
+    index = setFieldMetadata(index, ['a', 'b', 'c'], null)
+    expect(index).toBe(EMPTY_FIELD_METADATA)
+  })
+})
+
+describe('structure edits', () => {
+  const appliances = ['floors', 'first', 'rooms', 'kitchen', 'appliances']
+  const confidenceAt = (index: any, i: number) => lookupFieldMetadata(index, [...appliances, i])?.summary.minConfidence
+
+  test('renaming a property moves its subtree', () => {
+    const index = applyStructureEdit(buildFieldMetadataIndex(record()), {
+      type: 'rename', path: ['floors', 'first', 'rooms'], oldKey: 'kitchen', newKey: 'galley',
+    })
+    expect(lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'kitchen'])).toBeUndefined()
+    expect(lookupFieldMetadata(index, ['floors', 'first', 'rooms', 'galley'])?.summary.fields).toBe(4)
+  })
+
+  test('deleting an array item shifts later items down', () => {
+    const index = applyStructureEdit(buildFieldMetadataIndex(record()), { type: 'delete', path: [...appliances, 0] })
+    expect([confidenceAt(index, 0), confidenceAt(index, 1)]).toEqual([40, 60])
+    expect(lookupFieldMetadata(index, [...appliances, 2])).toBeUndefined()
+  })
+
+  test('deleting a property or the root drops metadata', () => {
+    const base = buildFieldMetadataIndex(record())
+    const index = applyStructureEdit(base, { type: 'delete', path: ['floors', 'first', 'rooms', 'kitchen'] })
+    expect(index.summary.fields).toBe(1)
+    expect(applyStructureEdit(base, { type: 'delete', path: [] })).toBe(EMPTY_FIELD_METADATA)
+  })
+})
@@ -0,0 +1,146 @@
+import { shareStructure, findSingleLeafChange, pushHistory, measureHistoryMemory, HISTORY_LIMIT, HISTORY_COALESCE_MS } from '../history'
+import { setValueAtPath, deleteAtPath, renamePropertyAtPath, addItemAtPath } from '../json-utils'
+
+/**
+ * HISTORY TESTS
+ * Structural sharing between snapshots, edit coalescing and memory accounting
+ */
+
+const makeData = () => ({
+  profile: { name: 'Ada', tags: ['a', 'b'] },
+  items: Array.from({ length: 20 }, (_, i) => ({ id: i, label: `item ${i}` })),
+})
+
+describe('path-copying edits', () => {
+  test('share every subtree off the edited path', () => {
+    const data = makeData()
+    const next = setValueAtPath(data, ['profile', 'name'], 'Grace') as any
+
+    expect(next.profile.name).toBe('Grace')
+    expect(data.profile.name).toBe('Ada')
+    expect(next.items).toBe(data.items)
+    expect(next.profile.tags).toBe(data.profile.tags)
+  })
+
+  test('keep the previous error behaviour', () => {
+    expect(() => setValueAtPath(makeData(), ['missing', 'x'], 1)).toThrow('Property not found: missing')
+    expect(() => deleteAtPath(makeData(), [])).toThrow('Cannot delete root element')
+    expect(() => addItemAtPath(makeData(), ['profile'], 1)).toThrow('Cannot add item to non-array')
+  })
+
+  test('delete and rename copy only the parent', () => {
+    const data = makeData()
+    const deleted = deleteAtPath(data, ['items', 0]) as any
+    expect(deleted.items).toHaveLength(19)
+    expect(deleted.items[0]).toBe(data.items[1])
+    expect(deleted.profile).toBe(data.profile)
+
+    const renamed = renamePropertyAtPath(data, ['profile'], 'name', 'fullName') as any
+    expect(Object.keys(renamed.profile)).toEqual(['tags', 'fullName'])
+    expect(renamed.items).toBe(data.items)
+  })
+})
+
+describe('shareStructure', () => {
+  test('reuses deeply equal subtrees from the previous snapshot', () => {
+    const prev = makeData()
+    const next = JSON.parse(JSON.stringify(prev))
+    next.profile.name = 'Grace'
+
+    const shared = shareStructure(prev, next) as any
+    expect(shared).toEqual(next)
+    expect(shared.items).toBe(prev.items)
+    expect(shared.profile.tags).toBe(prev.profile.tags)
+    expect(shared.profile).not.toBe(prev.profile)
+  })
+
+  test('returns the previous value when nothing changed', () => {
+    const prev = makeData()
+    expect(shareStructure(prev, JSON.parse(JSON.stringify(prev)))).toBe(prev)
+  })
+
+  test('treats key order as a change', () => {
+    const prev = { a: 1, b: 2 }
+    const shared = shareStructure(prev, { b: 2, a: 1 })
+    expect(shared).not.toBe(prev)
+    expect(Object.keys(shared as object)).toEqual(['b', 'a'])
+  })
+})
+
+describe('findSingleLeafChange', () => {
+  test('finds the one edited primitive', () => {
+    const prev = makeData()
+    const next = setValueAtPath(prev, ['items', 3, 'label'], 'x')
+    expect(findSingleLeafChange(prev, next)).toEqual(['items', 3, 'label'])
+  })
+
+  test('returns null for structural changes', () => {
+    const prev = makeData()
+    expect(findSingleLeafChange(prev, deleteAtPath(prev, ['items', 0]))).toBeNull()
+    expect(findSingleLeafChange(prev, setValueAtPath(prev, ['profile', 'tags'], 'none'))).toBeNull()
+  })
+})
+
+describe('pushHistory', () => {
+  test('coalesces rapid edits to the same field', () => {
+    const v0 = makeData()
+    const v1 = setValueAtPath(v0, ['profile', 'name'], 'G')
+    const v2 = setValueAtPath(v1, ['profile', 'name'], 'Gr')
+
+    const first = pushHistory([v0], 0, v1, null, 1000)
+    expect(first.history).toEqual([v0, v1])
+
+    const second = pushHistory(first.history, first.currentHistoryIndex, v2, first.lastEdit, 1000 + HISTORY_COALESCE_MS / 2)
+    expect(second.history).toHaveLength(2)
+    expect(second.history[1]).toBe(v2)
+    expect(second.history[0]).toBe(v0)
+  })
+
+  test('starts a new entry after the window or on another field', () => {
+    const v0 = makeData()
+    const v1 = setValueAtPath(v0, ['profile', 'name'], 'G')
+    const first = pushHistory([v0], 0, v1, null, 0)
+
+    const late = pushHistory(first.history, 1, setValueAtPath(v1, ['profile', 'name'], 'Gr'), first.lastEdit, HISTORY_COALESCE_MS + 1)
+    expect(late.history).toHaveLength(3)
+
+    const other = pushHistory(first.history, 1, setValueAtPath(v1, ['items', 0, 'id'], 99), first.lastEdit, 10)
+    expect(other.history).toHaveLength(3)
+  })
+
+  test('drops redo entries and caps the length', () => {
+    let history: any[] = [0]
+    let index = 0
+    for (let i = 1; i <= HISTORY_LIMIT + 10; i++) {
+      ;({ history, currentHistoryIndex: index } = pushHistory(history, index, { step: i }))
+    }
+    expect(history).toHaveLength(HISTORY_LIMIT)
+    expect(index).toBe(HISTORY_LIMIT - 1)
+
+    const branched = pushHistory(history, 10, { step: 'new' })
+    expect(branched.history).toHaveLength(12)
+    expect(branched.currentHistoryIndex).toBe(11)
+  })
+})
+
+describe('measureHistoryMemory', () => {
+  test('counts shared subtrees once', () => {
+    let data: any = makeData()
+    const history = [data]
+    for (let i = 0; i < 10; i++) {
+      data = setValueAtPath(data, ['items', i, 'label'], `edited ${i}`)
+      history.push(data)
+    }
+
+    const memory = measureHistoryMemory(history)
+    const single = JSON.stringify(history[0]).length
+    expect(memory.entries).toBe(11)
+    expect(memory.unsharedBytes).toBeGreaterThan(10 * single)
+    expect(memory.bytes).toBeLessThan(3 * single)
+  })
+
+  test('equals the serialized size for a single snapshot', () => {
+    const data = makeData()
+    expect(measureHistoryMemory([data]).bytes).toBe(JSON.stringify(data).length)
+  })
+})
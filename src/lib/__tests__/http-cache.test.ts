@@ -0,0 +1,132 @@
+/**
+ * @jest-environment node
+ */
+import { brotliDecompressSync, gunzipSync } from 'node:zlib'
+import { compress, encodedEtag, etagMatches, negotiateEncoding } from '../http-cache'
+import { DocumentStore } from '../document-store'
+
+/**
+ * HTTP CACHE TESTS
+ * ETags, conditional requests and content encoding for document routes
+ */
+
+const makeDocument = (id: string): any => ({
+  id,
+  name: 'Doc',
+  data: { a: 1 },
+  history: [{ a: 1 }],
+  currentHistoryIndex: 0,
+  metadata: { size: 7, nodeCount: 2, createdAt: 0, modifiedAt: 0 },
+})
+
+describe('negotiateEncoding', () => {
+  test('prefers brotli when both are accepted equally', () => {
+    expect(negotiateEncoding('gzip, deflate, br')).toBe('br')
+    expect(negotiateEncoding('*')).toBe('br')
+  })
+
+  test('follows q-values', () => {
+    expect(negotiateEncoding('br;q=0.5, gzip')).toBe('gzip')
+    expect(negotiateEncoding('br;q=0, gzip;q=0')).toBeNull()
+    expect(negotiateEncoding('gzip;q=0, *;q=0.1')).toBe('br')
+  })
+
+  test('is null without a supported encoding', () => {
+    expect(negotiateEncoding(null)).toBeNull()
+    expect(negotiateEncoding('identity, deflate')).toBeNull()
+  })
+})
+
+describe('compress', () => {
+  test('round-trips both encodings', () => {
+    const body = new TextEncoder().encode(JSON.stringify({ items: Array.from({ length: 500 }, (_, i) => i) }))
+    expect(Buffer.from(gunzipSync(compress(body, 'gzip')))).toEqual(Buffer.from(body))
+    expect(Buffer.from(brotliDecompressSync(compress(body, 'br')))).toEqual(Buffer.from(body))
+  })
+})
+
+describe('etags', () => {
+  test('encoded representations get their own tag', () => {
+    expect(encodedEtag('"e-1-json"', 'br')).toBe('"e-1-json-br"')
+    expect(encodedEtag('"e-1-json"', null)).toBe('"e-1-json"')
+  })
+
+  test('If-None-Match uses the weak comparison', () => {
+    expect(etagMatches('"a", "b"', '"b"')).toBe(true)
+    expect(etagMatches('W/"b"', '"b"')).toBe(true)
+    expect(etagMatches('*', '"b"')).toBe(true)
+    expect(etagMatches('"a"', '"b"')).toBe(false)
+    expect(etagMatches(null, '"b"')).toBe(false)
+  })
+})
+
+describe('DocumentStore', () => {
+  test('each write is a new version with a new ETag', () => {
+    const store = new DocumentStore()
+    const first = store.put(makeDocument('d'))
+    const second = store.put(makeDocument('d'))
+    expect(second.version).toBe(first.version + 1)
+    expect(store.etag(second, 'json')).not.toBe(store.etag(first, 'json'))
+    expect(store.etag(second, 'json')).not.toBe(store.etag(second, 'json-current'))
+  })
+
+  test('bumps the version of a document on every write, and only of that document', () => {
+    const store = new DocumentStore()
+    expect([1, 2, 3].map(() => store.put(makeDocument('d')).version)).toEqual([1, 2, 3])
+    expect(store.put(makeDocument('e')).version).toBe(1)
+    expect(store.get('d')?.version).toBe(3)
+  })
+
+  test('matches If-Match against the stored version only', () => {
+    const store = new DocumentStore()
+    const stale = store.put(makeDocument('d'))
+    const stored = store.put(makeDocument('d'))
+    const current = store.etag(stored, 'json')
+
+    expect(store.ifMatch(stored, '*')).toBe(true)
+    expect(store.ifMatch(stored, current)).toBe(true)
+    // Any representation or encoding of the stored version names it
+    expect(store.ifMatch(stored, encodedEtag(store.etag(stored, 'json-current'), 'br'))).toBe(true)
+    expect(store.ifMatch(stored, `"other", ${current}`)).toBe(true)
+    // If-Match compares strongly, so weak tags never match
+    expect(store.ifMatch(stored, `W/${current}`)).toBe(false)
+    expect(store.ifMatch(stored, store.etag(stale, 'json'))).toBe(false)
+    expect(store.ifMatch(stored, `"${store.epoch}-20-json"`)).toBe(false)
+    // Tags from before a restart name a version of another epoch
+    expect(store.ifMatch(stored, new DocumentStore().etag(stored, 'json'))).toBe(false)
+  })
+
+  test('builds each body once per version', () => {
+    const store = new DocumentStore()
+    const stored = store.put(makeDocument('d'))
+    const encode = jest.fn(() => new Uint8Array([1]))
+    expect(store.body(stored, 'json', encode)).toBe(store.body(stored, 'json', encode))
+    expect(encode).toHaveBeenCalledTimes(1)
+    store.body(store.put(makeDocument('d')), 'json', encode)
+    expect(encode).toHaveBeenCalledTimes(2)
+  })
+
+  test('keeps the bodies of the last representation asked for', () => {
+    const store = new DocumentStore()
+    const stored = store.put(makeDocument('d'))
+    const encode = jest.fn(() => new Uint8Array([1]))
+    const json = store.body(stored, 'json', encode)
+    const br = store.body(stored, 'json', encode, 'br')
+    expect(store.body(stored, 'json', encode)).toBe(json)
+    expect(store.body(stored, 'json', encode, 'br')).toBe(br)
+    expect(encode).toHaveBeenCalledTimes(2)
+
+    store.body(stored, 'json-current', encode)
+    expect(stored.bodies?.encodings.size).toBe(1)
+    expect(store.body(stored, 'json', encode)).not.toBe(json)
+    expect(encode).toHaveBeenCalledTimes(4)
+  })
+
+  test('deletes', () => {
+    const store = new DocumentStore()
+    store.put(makeDocument('d'))
+    expect(store.delete('d')).toBe(true)
+    expect(store.get('d')).toBeUndefined()
+    expect(store.delete('d')).toBe(false)
+  })
+})
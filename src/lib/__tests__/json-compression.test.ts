@@ -0,0 +1,63 @@
+import { KeyDictionary, packKeys, unpackKeys, decodePayload } from '../json-compression'
+
+/**
+ * AT-REST ENCODING TESTS
+ * Key dictionary packing and payload decoding
+ */
+
+describe('Key dictionary packing', () => {
+  const sample = {
+    rooms: [
+      { name: 'Kitchen', size: 12, tags: ['tile'] },
+      { name: 'Office', size: 9, tags: [] },
+    ],
+    '10': 'numeric-looking key',
+    '2': 'another',
+    nested: { name: { name: null } },
+  }
+
+  test('round-trips values and preserves key order', () => {
+    const dictionary = new KeyDictionary()
+    const packed = packKeys(sample, dictionary)
+    const restored = unpackKeys(JSON.parse(JSON.stringify(packed)), dictionary)
+
+    expect(restored).toEqual(sample)
+    expect(Object.keys(restored as object)).toEqual(Object.keys(sample))
+  })
+
+  test('stores each key name once', () => {
+    const dictionary = new KeyDictionary()
+    packKeys(sample, dictionary)
+
+    expect(dictionary.keys.filter(key => key === 'name')).toHaveLength(1)
+    expect(new Set(dictionary.keys).size).toBe(dictionary.keys.length)
+  })
+
+  test('dictionary is append-only across payloads', () => {
+    const dictionary = new KeyDictionary()
+    const first = JSON.stringify(packKeys({ a: 1, b: 2 }, dictionary))
+    packKeys({ c: 3, a: 4 }, dictionary)
+
+    expect(dictionary.keys).toEqual(['a', 'b', 'c'])
+    const reloaded = new KeyDictionary([...dictionary.keys])
+    expect(unpackKeys(JSON.parse(first), reloaded)).toEqual({ a: 1, b: 2 })
+    expect(reloaded.changed).toBe(false)
+  })
+
+  test('rejects tokens missing from the dictionary', () => {
+    expect(() => unpackKeys({ '~z': 1 }, new KeyDictionary(['a']))).toThrow('Unknown key token')
+  })
+})
+
+describe('decodePayload', () => {
+  test('reads plain JSON strings written before compression', async () => {
+    await expect(decodePayload('{"legacy":true}', new KeyDictionary())).resolves.toEqual({ legacy: true })
+  })
+
+  test('reads uncompressed key-packed payloads', async () => {
+    const dictionary = new KeyDictionary()
+    const body = JSON.stringify(packKeys({ user: { name: 'Ada' } }, dictionary))
+
+    await expect(decodePayload({ encoding: 'json', body }, dictionary)).resolves.toEqual({ user: { name: 'Ada' } })
+  })
+})
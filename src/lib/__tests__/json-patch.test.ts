@@ -0,0 +1,193 @@
+import { JsonPatchError, applyPatch, changedSubtree, diffJson, toPointer } from '../json-patch'
+import { addItemAtPath, addPropertyAtPath, deleteAtPath, renamePropertyAtPath, setValueAtPath } from '../json-utils'
+
+/**
+ * JSON PATCH TESTS
+ * Patches and changed subtrees between a document and an edited copy,
+ * and applying patches
+ */
+
+const makeData = (): any => ({
+  name: 'House',
+  rooms: [
+    { name: 'Kitchen', items: ['stove', 'sink'] },
+    { name: 'Hall', items: [] },
+  ],
+  owner: { first: 'Ada', 'a/b': 1 },
+})
+
+describe('toPointer', () => {
+  test('escapes ~ and /', () => {
+    expect(toPointer([])).toBe('')
+    expect(toPointer(['owner', 'a/b', '~x', 0])).toBe('/owner/a~1b/~0x/0')
+  })
+})
+
+describe('diffJson', () => {
+  test('is empty for the same document', () => {
+    const data = makeData()
+    expect(diffJson(data, data)).toEqual([])
+    expect(diffJson(data, makeData())).toEqual([])
+  })
+
+  test('describes each json-utils edit', () => {
+    const data = makeData()
+    expect(diffJson(data, setValueAtPath(data, ['rooms', 1, 'name'], 'Porch'))).toEqual([
+      { op: 'replace', path: '/rooms/1/name', value: 'Porch' },
+    ])
+    expect(diffJson(data, addPropertyAtPath(data, ['owner'], 'last', 'Lovelace'))).toEqual([
+      { op: 'add', path: '/owner/last', value: 'Lovelace' },
+    ])
+    expect(diffJson(data, addItemAtPath(data, ['rooms', 0, 'items'], 'oven'))).toEqual([
+      { op: 'add', path: '/rooms/0/items/2', value: 'oven' },
+    ])
+    expect(diffJson(data, deleteAtPath(data, ['rooms', 0]))).toEqual([{ op: 'remove', path: '/rooms/0' }])
+    expect(diffJson(data, renamePropertyAtPath(data, ['owner'], 'first', 'given'))).toEqual([
+      { op: 'remove', path: '/owner/first' },
+      { op: 'add', path: '/owner/given', value: 'Ada' },
+    ])
+  })
+
+  test('does not descend into shared subtrees', () => {
+    const data = makeData()
+    const shared = { get items(): never { throw new Error('visited') } }
+    data.rooms[1] = shared
+    const next = setValueAtPath(data, ['name'], 'Home')
+    expect(diffJson(data, next)).toEqual([{ op: 'replace', path: '/name', value: 'Home' }])
+  })
+
+  test('removes array items highest index first', () => {
+    expect(diffJson([1, 2, 3, 4], [1])).toEqual([
+      { op: 'remove', path: '/3' },
+      { op: 'remove', path: '/2' },
+      { op: 'remove', path: '/1' },
+    ])
+  })
+
+  test('replaces an array whose middle was both removed from and added to', () => {
+    expect(diffJson({ a: [1, 2, 3] }, { a: [1, 9, 8, 3] })).toEqual([
+      { op: 'replace', path: '/a', value: [1, 9, 8, 3] },
+    ])
+  })
+
+  test('compares only what JSON shows', () => {
+    expect(diffJson({ a: 1 }, { a: 1, b: undefined } as any)).toEqual([])
+    expect(diffJson([1], [1, undefined] as any)).toEqual([{ op: 'add', path: '/1', value: null }])
+    expect(diffJson({ a: 1 }, 'x')).toEqual([{ op: 'replace', path: '', value: 'x' }])
+  })
+})
+
+describe('changedSubtree', () => {
+  const subtree = (before: any, after: any) => changedSubtree(before, after, diffJson(before, after))
+
+  test('is the edited value for replacements and additions', () => {
+    const data = makeData()
+    expect(subtree(data, setValueAtPath(data, ['rooms', 1, 'name'], 'Porch'))).toEqual({
+      path: ['rooms', 1, 'name'],
+      value: 'Porch',
+    })
+    expect(subtree(data, addItemAtPath(data, ['rooms'], { name: 'Study' }))).toEqual({
+      path: ['rooms', 2],
+      value: { name: 'Study' },
+    })
+  })
+
+  test('is the container for removals and renames', () => {
+    const data = makeData()
+    const deleted = deleteAtPath(data, ['rooms', 0]) as any
+    expect(subtree(data, deleted)).toEqual({ path: ['rooms'], value: deleted.rooms })
+    const renamed = renamePropertyAtPath(data, ['owner'], 'first', 'given') as any
+    expect(subtree(data, renamed)).toEqual({ path: ['owner'], value: renamed.owner })
+  })
+
+  test('is null when nothing changed', () => {
+    const data = makeData()
+    expect(subtree(data, data)).toBeNull()
+  })
+})
+
+describe('applyPatch', () => {
+  // Examples from RFC 6902, Appendix A
+  const applied: [string, any, any, any][] = [
+    ['adds an object member', { foo: 'bar' }, [{ op: 'add', path: '/baz', value: 'qux' }], { baz: 'qux', foo: 'bar' }],
+    ['adds an array element', { foo: ['bar', 'baz'] }, [{ op: 'add', path: '/foo/1', value: 'qux' }], { foo: ['bar', 'qux', 'baz'] }],
+    ['removes an object member', { baz: 'qux', foo: 'bar' }, [{ op: 'remove', path: '/baz' }], { foo: 'bar' }],
+    ['removes an array element', { foo: ['bar', 'qux', 'baz'] }, [{ op: 'remove', path: '/foo/1' }], { foo: ['bar', 'baz'] }],
+    ['replaces a value', { baz: 'qux', foo: 'bar' }, [{ op: 'replace', path: '/baz', value: 'boo' }], { baz: 'boo', foo: 'bar' }],
+    [
+      'moves a value',
+      { foo: { bar: 'baz', waldo: 'fred' }, qux: { corge: 'grault' } },
+      [{ op: 'move', from: '/foo/waldo', path: '/qux/thud' }],
+      { foo: { bar: 'baz' }, qux: { corge: 'grault', thud: 'fred' } },
+    ],
+    ['moves an array element', { foo: ['all', 'grass', 'cows', 'eat'] }, [{ op: 'move', from: '/foo/1', path: '/foo/3' }], { foo: ['all', 'cows', 'eat', 'grass'] }],
+    ['adds a nested member object', { foo: 'bar' }, [{ op: 'add', path: '/child', value: { grandchild: {} } }], { foo: 'bar', child: { grandchild: {} } }],
+    ['appends with -', { foo: ['bar'] }, [{ op: 'add', path: '/foo/-', value: ['abc', 'def'] }], { foo: ['bar', ['abc', 'def']] }],
+    ['tests a value', { baz: 'qux', foo: ['a', 2, 'c'] }, [{ op: 'test', path: '/baz', value: 'qux' }, { op: 'test', path: '/foo/1', value: 2 }], { baz: 'qux', foo: ['a', 2, 'c'] }],
+    ['uses ~ escapes', { '/': 9, '~1': 10 }, [{ op: 'test', path: '/~01', value: 10 }, { op: 'copy', from: '/~1', path: '/x' }], { '/': 9, '~1': 10, x: 9 }],
+    ['replaces the whole document', { a: 1 }, [{ op: 'replace', path: '', value: [1] }], [1]],
+  ]
+  for (const [name, document, patch, expected] of applied) {
+    test(name, () => {
+      expect(applyPatch(document, patch)).toEqual(expected)
+    })
+  }
+
+  const rejected: [string, any, any][] = [
+    ['a missing target', { baz: 'qux' }, [{ op: 'remove', path: '/foo' }]],
+    ['a missing parent', { foo: 'bar' }, [{ op: 'add', path: '/baz/bat', value: 'qux' }]],
+    ['a failed test', { baz: 'qux' }, [{ op: 'test', path: '/baz', value: 'bar' }]],
+    ['an index past the end', { foo: [1] }, [{ op: 'add', path: '/foo/2', value: 2 }]],
+    ['a leading zero', { foo: [1, 2] }, [{ op: 'replace', path: '/foo/01', value: 2 }]],
+    ['a move into itself', { a: { b: {} } }, [{ op: 'move', from: '/a', path: '/a/b/c' }]],
+    ['an unknown op', { a: 1 }, [{ op: 'merge', path: '/a', value: 2 }]],
+    ['a path that is not a pointer', { a: 1 }, [{ op: 'remove', path: 'a' }]],
+    ['a missing value', { a: 1 }, [{ op: 'replace', path: '/a' }]],
+  ]
+  for (const [name, document, patch] of rejected) {
+    test(`rejects ${name}`, () => {
+      expect(() => applyPatch(document, patch)).toThrow(JsonPatchError)
+    })
+  }
+
+  test('names the failing operation and leaves the document as it was', () => {
+    const data = makeData()
+    const before = JSON.stringify(data)
+    let error: any
+    try {
+      applyPatch(data, [
+        { op: 'replace', path: '/name', value: 'Home' },
+        { op: 'remove', path: '/rooms/5' },
+      ])
+    } catch (e) {
+      error = e
+    }
+    expect(error).toBeInstanceOf(JsonPatchError)
+    expect(error.index).toBe(1)
+    expect(JSON.stringify(data)).toBe(before)
+  })
+
+  test('shares unedited subtrees with the input', () => {
+    const data = makeData()
+    const next: any = applyPatch(data, [{ op: 'add', path: '/rooms/0/items/-', value: 'oven' }])
+    expect(next.rooms[0].items).toEqual(['stove', 'sink', 'oven'])
+    expect(data.rooms[0].items).toEqual(['stove', 'sink'])
+    expect(next.rooms[1]).toBe(data.rooms[1])
+    expect(next.owner).toBe(data.owner)
+  })
+
+  test('keeps copies independent', () => {
+    const next: any = applyPatch({ a: { b: 1 } }, [
+      { op: 'add', path: '/a/c', value: 2 },
+      { op: 'copy', from: '/a', path: '/d' },
+      { op: 'replace', path: '/d/b', value: 9 },
+    ])
+    expect(next).toEqual({ a: { b: 1, c: 2 }, d: { b: 9, c: 2 } })
+  })
+
+  test('undoes diffJson', () => {
+    const data = makeData()
+    const edited = renamePropertyAtPath(addItemAtPath(deleteAtPath(data, ['rooms', 0]), ['rooms'], { name: 'Study' }), ['owner'], 'first', 'given')
+    expect(applyPatch(data, diffJson(data, edited))).toEqual(edited)
+  })
+})
@@ -0,0 +1,116 @@
+/**
+ * @jest-environment node
+ */
+import fs from 'fs'
+import path from 'path'
+import { readJsonCanvas, writeJsonCanvas } from '../jsoncanvas-file'
+import {
+  decodeJsonBinary,
+  encodeJsonBinary,
+  isJsonCanvasBinary,
+  readJsonCanvasBinary,
+  writeJsonCanvasBinary,
+} from '../jsoncanvas-binary'
+
+/**
+ * BINARY .JSONCANVAS TESTS
+ * Lossless round trips, lazy log sections and size/parse benchmarks
+ */
+
+const examplePath = path.join(__dirname, '../../../example-house.jsoncanvas')
+const exampleText = fs.readFileSync(examplePath, 'utf8')
+
+function canvasJson(bytes: Uint8Array) {
+  return JSON.parse(Buffer.from(writeJsonCanvas(readJsonCanvasBinary(bytes))).toString('utf8'))
+}
+
+describe('encodeJsonBinary', () => {
+  test('round-trips values exactly', () => {
+    const value = {
+      nil: null,
+      flags: [true, false],
+      numbers: [0, 1, 127, 128, -1, -129, 1.5, -0.25, Number.MAX_SAFE_INTEGER, -Number.MAX_SAFE_INTEGER, 2 ** 60, 1e-300],
+      text: ['', 'plain', 'ünïcödé 😀', 'repeated', 'repeated'],
+      nested: { z: 1, a: { deep: [[], {}] } },
+    }
+    const bytes = encodeJsonBinary(value)
+
+    expect(isJsonCanvasBinary(bytes)).toBe(true)
+    expect(JSON.stringify(decodeJsonBinary(bytes))).toBe(JSON.stringify(value))
+  })
+
+  test('keeps __proto__ as an own key', () => {
+    const value = JSON.parse('{"__proto__": {"polluted": true}, "safe": 1}')
+    const decoded = decodeJsonBinary(encodeJsonBinary(value)) as Record<string, unknown>
+
+    expect(Object.keys(decoded)).toEqual(['__proto__', 'safe'])
+    expect(({} as Record<string, unknown>).polluted).toBeUndefined()
+    expect(Object.getPrototypeOf(decoded)).toBe(Object.prototype)
+  })
+
+  test('rejects other input', () => {
+    expect(() => decodeJsonBinary(new TextEncoder().encode('{"a": 1}'))).toThrow('Invalid JCB file')
+    expect(() => decodeJsonBinary(encodeJsonBinary([1, 2, 3]).subarray(0, 8))).toThrow('Invalid JCB file')
+  })
+})
+
+describe('binary .jsoncanvas documents', () => {
+  test('round-trip the example file', () => {
+    const bytes = writeJsonCanvasBinary(readJsonCanvas(exampleText))
+
+    expect(bytes.length).toBeLessThan(Buffer.byteLength(exampleText))
+    expect(canvasJson(bytes)).toEqual(JSON.parse(exampleText))
+  })
+
+  test('decode logs only when read', () => {
+    const doc = readJsonCanvasBinary(writeJsonCanvasBinary(readJsonCanvas(exampleText)))
+    const example = JSON.parse(exampleText)
+
+    expect(doc.data).toEqual(example.data)
+    expect(doc.changeLog.isParsed).toBe(false)
+    expect(doc.changeLog.get()).toEqual(example.$metadata.changeLog)
+    expect(doc.learningHistory.get()).toEqual(example.$metadata.ai.learningHistory)
+  })
+
+  test('copy untouched logs and re-encode appended ones', () => {
+    const first = readJsonCanvasBinary(writeJsonCanvasBinary(readJsonCanvas(exampleText)))
+    first.data = { replaced: 'with a string the old table never saw' }
+    const entry = { id: 'appended', timestamp: '2024-06-01T00:00:00Z', type: 'user', action: 'modify', path: 'replaced' }
+    first.changeLog = first.changeLog.withAppended([entry as never])
+
+    const second = readJsonCanvasBinary(writeJsonCanvasBinary(first))
+
+    expect(first.learningHistory.isParsed).toBe(false)
+    expect(second.data).toEqual({ replaced: 'with a string the old table never saw' })
+    expect(second.changeLog.get().at(-1)).toEqual(entry)
+    expect(second.learningHistory.get()).toEqual(JSON.parse(exampleText).$metadata.ai.learningHistory)
+  })
+
+  test('is less than half the size of JSON and reads without decoding the logs', () => {
+    const rooms = ['kitchen', 'living room', 'bedroom', 'bathroom', 'garage', 'office']
+    const doc = readJsonCanvas(exampleText)
+    doc.data = {
+      items: Array.from({ length: 5000 }, (_, i) => ({
+        id: `item-${i}`,
+        name: `Item number ${i}`,
+        room: rooms[i % rooms.length],
+        category: i % 3 === 0 ? 'furniture' : 'electronics',
+        price: Math.round(i * 13.37 * 100) / 100,
+        quantity: i % 7,
+        purchased: `2023-${String((i % 12) + 1).padStart(2, '0')}-15`,
+        tags: ['household', rooms[i % rooms.length]],
+        warranty: i % 5 === 0 ? null : { years: i % 4, provider: 'Manufacturer' },
+      })),
+    }
+
+    const json = writeJsonCanvas(doc)
+    const binary = writeJsonCanvasBinary(doc)
+
+    const read = readJsonCanvasBinary(binary)
+    expect(read.changeLog.isParsed).toBe(false)
+    expect(read.learningHistory.isParsed).toBe(false)
+
+    expect(binary.length).toBeLessThan(json.length / 2)
+    expect(canvasJson(binary)).toEqual(JSON.parse(Buffer.from(json).toString('utf8')))
+  })
+})
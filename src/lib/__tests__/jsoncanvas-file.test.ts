@@ -0,0 +1,127 @@
+/**
+ * @jest-environment node
+ */
+import fs from 'fs'
+import path from 'path'
+import { readJsonCanvas, writeJsonCanvas, createJsonCanvas, toCanvasRecord, fromCanvasRecord } from '../jsoncanvas-file'
+
+/**
+ * .JSONCANVAS FILE TESTS
+ * Section scanning, lazy log parsing and verbatim round trips
+ */
+
+const examplePath = path.join(__dirname, '../../../example-house.jsoncanvas')
+const exampleText = fs.readFileSync(examplePath, 'utf8')
+const example = JSON.parse(exampleText)
+
+describe('readJsonCanvas', () => {
+  test('parses data and metadata but not the logs', () => {
+    const doc = readJsonCanvas(fs.readFileSync(examplePath))
+
+    expect(doc.data).toEqual(example.data)
+    expect(doc.metadata.title).toBe(example.$metadata.title)
+    expect(doc.metadata.ai?.insights).toEqual(example.$metadata.ai.insights)
+    expect(doc.metadata).not.toHaveProperty('changeLog')
+    expect(doc.metadata.ai).not.toHaveProperty('learningHistory')
+
+    expect(doc.changeLog.isParsed).toBe(false)
+    expect(doc.changeLog.byteLength).toBeGreaterThan(0)
+    expect(doc.changeLog.get()).toEqual(example.$metadata.changeLog)
+    expect(doc.learningHistory.get()).toEqual(example.$metadata.ai.learningHistory)
+  })
+
+  test('skips strings containing brackets, quotes and multi-byte text', () => {
+    const text = JSON.stringify({
+      $schema: 'jsoncanvas/v1.0',
+      $metadata: {
+        changeLog: [{ notes: 'closing } and ] and an escaped \\" quote, ünïcödé 😀' }],
+        title: 'After the log',
+      },
+      data: { room: 'Küche' },
+    })
+    const doc = readJsonCanvas(text)
+
+    expect(doc.metadata.title).toBe('After the log')
+    expect(doc.data).toEqual({ room: 'Küche' })
+    expect(doc.changeLog.get()[0]).toEqual({ notes: 'closing } and ] and an escaped \\" quote, ünïcödé 😀' })
+  })
+
+  test('rejects plain JSON', () => {
+    expect(() => readJsonCanvas('{"data": {}}')).toThrow('Invalid .jsoncanvas file')
+    expect(() => readJsonCanvas('{"$schema": "jsoncanvas/v1.0"}')).toThrow('missing "data"')
+  })
+})
+
+describe('writeJsonCanvas', () => {
+  test('round-trips without parsing untouched logs', () => {
+    const doc = readJsonCanvas(exampleText)
+    doc.data = { ...(doc.data as object), edited: true }
+
+    const written = JSON.parse(Buffer.from(writeJsonCanvas(doc)).toString('utf8'))
+
+    expect(doc.changeLog.isParsed).toBe(false)
+    expect(doc.learningHistory.isParsed).toBe(false)
+    expect(written.$metadata).toEqual(example.$metadata)
+    expect(written.data).toEqual({ ...example.data, edited: true })
+  })
+
+  test('re-serializes a modified log', () => {
+    const doc = readJsonCanvas(exampleText)
+    const entry = { timestamp: '2025-02-01T00:00:00Z', user: 'me', action: 'update' as const, path: 'house_info.style' }
+    doc.changeLog.set([...doc.changeLog.get(), entry])
+
+    const written = JSON.parse(Buffer.from(writeJsonCanvas(doc)).toString('utf8'))
+    expect(written.$metadata.changeLog).toEqual([...example.$metadata.changeLog, entry])
+  })
+
+  test('appends to a log without parsing it', () => {
+    const doc = readJsonCanvas(exampleText)
+    const entry = { timestamp: '2025-02-01T00:00:00Z', user: 'me', action: 'update' as const, path: 'house_info.style' }
+    const changeLog = doc.changeLog.withAppended([entry])
+
+    const written = JSON.parse(Buffer.from(writeJsonCanvas({ ...doc, changeLog })).toString('utf8'))
+    expect(doc.changeLog.isParsed).toBe(false)
+    expect(written.$metadata.changeLog).toEqual([...example.$metadata.changeLog, entry])
+
+    const empty = readJsonCanvas('{"$schema": "jsoncanvas/v1.0", "$metadata": {"changeLog": [ ]}, "data": {}}')
+    const appended = JSON.parse(Buffer.from(writeJsonCanvas({ ...empty, changeLog: empty.changeLog.withAppended([entry]) })).toString('utf8'))
+    expect(appended.$metadata.changeLog).toEqual([entry])
+  })
+
+  test('wraps plain data as a new file', () => {
+    const doc = createJsonCanvas({ a: 1 }, 'New')
+    const written = JSON.parse(Buffer.from(writeJsonCanvas(doc)).toString('utf8'))
+
+    expect(written.$schema).toBe('jsoncanvas/v1.0')
+    expect(written.$metadata.title).toBe('New')
+    expect(written.$metadata).not.toHaveProperty('changeLog')
+    expect(written.data).toEqual({ a: 1 })
+  })
+})
+
+describe('canvas records', () => {
+  test('store the logs as bytes and restore an equivalent file', () => {
+    const doc = readJsonCanvas(fs.readFileSync(examplePath))
+    const record = toCanvasRecord('doc-1', doc, true)
+
+    expect(doc.changeLog.isParsed).toBe(false)
+    expect(record).not.toHaveProperty('data')
+    expect(record.logs?.changeLog?.byteLength).toBe(doc.changeLog.byteLength)
+    expect(toCanvasRecord('doc-1', doc, false)).not.toHaveProperty('logs')
+
+    const restored = fromCanvasRecord(record, doc.data)
+    expect(restored.changeLog.isParsed).toBe(false)
+    const written = JSON.parse(Buffer.from(writeJsonCanvas(restored)).toString('utf8'))
+    expect(written).toEqual(example)
+  })
+
+  test('restore without stored logs as a file without them', () => {
+    const doc = createJsonCanvas({ a: 1 }, 'New')
+    const restored = fromCanvasRecord(toCanvasRecord('doc-1', doc, false), doc.data)
+
+    expect(restored.changeLog.present).toBe(false)
+    expect(restored.changeLog.get()).toEqual([])
+    const written = JSON.parse(Buffer.from(writeJsonCanvas(restored)).toString('utf8'))
+    expect(written.$metadata).not.toHaveProperty('changeLog')
+  })
+})
@@ -0,0 +1,152 @@
+import { compileJsonPath, queryJsonPath, comparePaths, formatJsonPath } from '../jsonpath'
+import { setValueAtPath, addItemAtPath, deleteAtPath } from '../json-utils'
+
+/**
+ * JSONPATH TESTS
+ * Expression syntax, filters, caching and incremental re-evaluation
+ */
+
+const house = () => ({
+  floors: {
+    first: {
+      rooms: {
+        kitchen: {
+          appliances: [
+            { name: 'fridge', type: 'smart', maintenance_frequency: 180 },
+            { name: 'oven', type: 'standard', maintenance_frequency: 30 },
+            { name: 'hood', connected: true },
+          ],
+        },
+        hall: { lights: [{ name: 'lamp', type: 'standard' }] },
+      },
+    },
+    second: {
+      rooms: {
+        bath: { fixtures: [{ name: 'filter', maintenance_frequency: 60 }] },
+      },
+    },
+  },
+})
+
+const paths = (data: any, expression: string) =>
+  queryJsonPath(data, expression).map(match => formatJsonPath(match.path))
+
+describe('syntax', () => {
+  test('dotted, bracketed and bare spec paths agree', () => {
+    const data = house()
+    const expected = ['floors.first.rooms.kitchen', 'floors.first.rooms.hall', 'floors.second.rooms.bath']
+    expect(paths(data, 'floors.*.rooms.*')).toEqual(expected)
+    expect(paths(data, '$.floors.*.rooms.*')).toEqual(expected)
+    expect(paths(data, "$['floors'][*]['rooms'][*]")).toEqual(expected)
+  })
+
+  test('root, indices, negative indices, slices and unions', () => {
+    const data = house()
+    const appliances = '$.floors.first.rooms.kitchen.appliances'
+    expect(queryJsonPath(data, '$')[0].value).toBe(data)
+    expect(paths(data, `${appliances}[0].name`)).toEqual([`${appliances.slice(2)}.0.name`])
+    expect(queryJsonPath(data, `${appliances}[-1].name`)[0].value).toBe('hood')
+    expect(queryJsonPath(data, `${appliances}[1:].name`).map(m => m.value)).toEqual(['oven', 'hood'])
+    expect(queryJsonPath(data, `${appliances}[::2].name`).map(m => m.value)).toEqual(['fridge', 'hood'])
+    expect(queryJsonPath(data, `${appliances}[0,2].name`).map(m => m.value)).toEqual(['fridge', 'hood'])
+    expect(queryJsonPath(data, `${appliances}.1.name`)[0].value).toBe('oven')
+    expect(paths(data, "$.floors['first','second']")).toEqual(['floors.first', 'floors.second'])
+  })
+
+  test('descendants are visited once, in document order', () => {
+    const names = queryJsonPath(house(), '$..name').map(m => m.value)
+    expect(names).toEqual(['fridge', 'oven', 'hood', 'lamp', 'filter'])
+    expect(queryJsonPath(house(), '$..*..name')).toHaveLength(5)
+  })
+
+  test('results reference the document rather than copying it', () => {
+    const data = house()
+    const [match] = queryJsonPath(data, '$.floors.first.rooms.kitchen')
+    expect(match.value).toBe(data.floors.first.rooms.kitchen)
+  })
+
+  test('rejects malformed expressions', () => {
+    expect(() => compileJsonPath('$.floors[')).toThrow('Invalid JSONPath')
+    expect(() => compileJsonPath("$[?(@.a == 'x)]")).toThrow('unterminated string')
+    expect(() => compileJsonPath('$[?(@.a == )]')).toThrow('expected a value')
+  })
+})
+
+describe('filters', () => {
+  test('evaluate the criteria used by the example file', () => {
+    const data = house()
+    expect(queryJsonPath(data, '$..[?(@.maintenance_frequency && @.maintenance_frequency < 90)]').map(m => (m.value as any).name))
+      .toEqual(['oven', 'filter'])
+    expect(queryJsonPath(data, "$..[?(@.type == 'smart' || @.connected == true)]").map(m => (m.value as any).name))
+      .toEqual(['fridge', 'hood'])
+  })
+
+  test('support negation, parentheses and length', () => {
+    const data = house()
+    expect(queryJsonPath(data, "$..appliances[?(!(@.type == 'smart'))].name").map(m => m.value)).toEqual(['oven', 'hood'])
+    expect(paths(data, '$..rooms[?(@.appliances.length > 2)]')).toEqual(['floors.first.rooms.kitchen'])
+  })
+})
+
+describe('compiled expressions', () => {
+  test('are cached by expression text', () => {
+    expect(compileJsonPath('$..name')).toBe(compileJsonPath('$..name'))
+  })
+
+  test('matchesPath tests a single node', () => {
+    const data = house()
+    const smart = compileJsonPath("$..[?(@.type == 'smart')]")
+    expect(smart.matchesPath(data, ['floors', 'first', 'rooms', 'kitchen', 'appliances', 0])).toBe(true)
+    expect(smart.matchesPath(data, ['floors', 'first', 'rooms', 'kitchen', 'appliances', 1])).toBe(false)
+  })
+
+  test('update matches a full evaluation after edits', () => {
+    const compiled = compileJsonPath('$..[?(@.maintenance_frequency && @.maintenance_frequency < 90)]')
+    let data: any = house()
+    let matches = compiled.evaluate(data)
+
+    const edits: [(d: any) => any, (string | number)[]][] = [
+      [d => setValueAtPath(d, ['floors', 'first', 'rooms', 'kitchen', 'appliances', 0, 'maintenance_frequency'], 10),
+        ['floors', 'first', 'rooms', 'kitchen', 'appliances', 0, 'maintenance_frequency']],
+      [d => setValueAtPath(d, ['floors', 'second', 'rooms', 'bath', 'fixtures', 0, 'maintenance_frequency'], 365),
+        ['floors', 'second', 'rooms', 'bath', 'fixtures', 0, 'maintenance_frequency']],
+      [d => addItemAtPath(d, ['floors', 'first', 'rooms', 'hall', 'lights'], { maintenance_frequency: 7 }),
+        ['floors', 'first', 'rooms', 'hall', 'lights']],
+      [d => deleteAtPath(d, ['floors', 'first', 'rooms', 'kitchen', 'appliances', 1]),
+        ['floors', 'first', 'rooms', 'kitchen', 'appliances']],
+      [d => deleteAtPath(d, ['floors', 'second']), ['floors', 'second']],
+    ]
+
+    for (const [edit, changedPath] of edits) {
+      data = edit(data)
+      matches = compiled.update(data, matches, changedPath)
+      expect(matches).toEqual(compiled.evaluate(data))
+    }
+    expect(matches.map(m => formatJsonPath(m.path))).toEqual([
+      'floors.first.rooms.kitchen.appliances.0',
+      'floors.first.rooms.hall.lights.1',
+    ])
+  })
+})
+
+describe('path helpers', () => {
+  test('comparePaths follows document order', () => {
+    const data = house()
+    expect(comparePaths(data, ['floors', 'second'], ['floors', 'first'])).toBeGreaterThan(0)
+    expect(comparePaths(data, ['floors'], ['floors', 'first'])).toBeLessThan(0)
+  })
+
+  test('formatJsonPath quotes awkward names', () => {
+    expect(formatJsonPath([])).toBe('$')
+    expect(formatJsonPath(['a', 0, 'b c', 'd.e'])).toBe("a.0['b c']['d.e']")
+  })
+
+  test('formatJsonPath output compiles back to the same path', () => {
+    const names = ["o'brien", 'back\\slash', "both\\'", 'say "hi"', 'line\nbreak', 'ünï 😀', '$ref', '@', '', ' ']
+    for (const name of names) {
+      const path = ['outer', name, 0]
+      const data = { outer: { [name]: ['value'], other: ['other'] } }
+      expect(compileJsonPath(formatJsonPath(path)).evaluate(data).map(match => match.path)).toEqual([path])
+    }
+  })
+})
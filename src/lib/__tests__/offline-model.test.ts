@@ -0,0 +1,185 @@
+import {
+  OfflineModel,
+  OfflineModelError,
+  offlineModelOptionsFromEnv,
+  parseFailures,
+  parseLatency,
+  sampleLatency,
+  seededRandom,
+  synthesizeFromSchema,
+} from '../offline-model'
+
+/**
+ * OFFLINE MODEL TESTS
+ * Schema-shaped deterministic answers, simulated latency and injected failures
+ */
+
+// The JSON schemas Genkit derives from the flows' zod output schemas
+const FLOW_OUTPUT_SCHEMAS = {
+  convertTextToJson: {
+    type: 'object',
+    properties: {
+      generatedJson: { type: 'string', description: 'The AI-generated JSON string.' },
+      notes: { type: 'string' },
+    },
+    required: ['generatedJson'],
+  },
+  formatJson: {
+    type: 'object',
+    properties: {
+      formattedJson: { type: 'string', description: 'The beautified and corrected JSON string.' },
+      correctionsMade: { type: 'string' },
+    },
+    required: ['formattedJson'],
+  },
+  generateJsonPatch: {
+    type: 'object',
+    properties: {
+      patchOperations: { type: 'string', description: 'A JSON string representing an array of JSON Patch operations (RFC 6902).' },
+      explanation: { type: 'string' },
+    },
+    required: ['patchOperations'],
+  },
+  enhanceJsonField: {
+    type: 'object',
+    properties: { enhancedContent: { type: 'string' } },
+    required: ['enhancedContent'],
+  },
+}
+
+function noWait() {
+  const waits: number[] = []
+  return { waits, sleep: async (ms: number) => void waits.push(ms) }
+}
+
+describe('synthesizeFromSchema', () => {
+  test('answers each flow with the fields it requires', () => {
+    for (const schema of Object.values(FLOW_OUTPUT_SCHEMAS)) {
+      const value = synthesizeFromSchema(schema, seededRandom(7), 'Product: Widget, price 10') as Record<string, unknown>
+      for (const field of schema.required) expect(typeof value[field]).toBe('string')
+    }
+
+    const converted = synthesizeFromSchema(FLOW_OUTPUT_SCHEMAS.convertTextToJson, seededRandom(7)) as any
+    expect(() => JSON.parse(converted.generatedJson)).not.toThrow()
+    const formatted = synthesizeFromSchema(FLOW_OUTPUT_SCHEMAS.formatJson, seededRandom(7)) as any
+    expect(() => JSON.parse(formatted.formattedJson)).not.toThrow()
+    const patch = synthesizeFromSchema(FLOW_OUTPUT_SCHEMAS.generateJsonPatch, seededRandom(7)) as any
+    expect(JSON.parse(patch.patchOperations)).toEqual([])
+  })
+
+  test('respects enums, bounds and nested arrays', () => {
+    const schema = {
+      type: 'object',
+      properties: {
+        priority: { type: 'string', enum: ['high', 'medium', 'low'] },
+        confidence: { type: 'number', minimum: 0, maximum: 1 },
+        count: { type: 'integer', minimum: 3, maximum: 5 },
+        tags: { type: 'array', items: { type: 'string', maxLength: 8 }, minItems: 1 },
+        parent: { anyOf: [{ type: 'null' }, { type: 'object', properties: { id: { type: 'string' } } }] },
+      },
+    }
+    for (let seed = 0; seed < 50; seed++) {
+      const value = synthesizeFromSchema(schema, seededRandom(seed)) as any
+      expect(['high', 'medium', 'low']).toContain(value.priority)
+      expect(value.confidence).toBeGreaterThanOrEqual(0)
+      expect(value.confidence).toBeLessThanOrEqual(1)
+      expect(Number.isInteger(value.count) && value.count >= 3 && value.count <= 5).toBe(true)
+      expect(value.tags.length).toBeGreaterThanOrEqual(1)
+      value.tags.forEach((tag: string) => expect(tag.length).toBeLessThanOrEqual(8))
+      expect(typeof value.parent.id).toBe('string')
+    }
+  })
+})
+
+describe('OfflineModel', () => {
+  test('answers the same prompt the same way', async () => {
+    const { sleep } = noWait()
+    const first = await new OfflineModel({ seed: 3 }, sleep).generate('Convert: a, b', FLOW_OUTPUT_SCHEMAS.convertTextToJson)
+    const second = await new OfflineModel({ seed: 3 }, sleep).generate('Convert: a, b', FLOW_OUTPUT_SCHEMAS.convertTextToJson)
+    const other = await new OfflineModel({ seed: 3 }, sleep).generate('Convert: c, d', FLOW_OUTPUT_SCHEMAS.convertTextToJson)
+
+    expect(second.text).toBe(first.text)
+    expect(other.text).not.toBe(first.text)
+    expect(JSON.parse(JSON.parse(first.text).generatedJson)).toHaveProperty('source', 'offline')
+  })
+
+  test('streams at the token rate after the first-token latency', async () => {
+    const { waits, sleep } = noWait()
+    const model = new OfflineModel({ latency: { kind: 'fixed', ms: 200 }, tokensPerSecond: 100 }, sleep)
+    const chunks: string[] = []
+    const result = await model.generate('Describe the house', FLOW_OUTPUT_SCHEMAS.enhanceJsonField, chunk => chunks.push(chunk))
+
+    expect(chunks.join('')).toBe(result.text)
+    expect(chunks.length).toBeGreaterThan(1)
+    expect(waits[0]).toBe(200)
+    const streaming = waits.slice(1).reduce((sum, ms) => sum + ms, 0)
+    const streamedTokens = chunks.slice(1).reduce((sum, chunk) => sum + Math.ceil(chunk.length / 4), 0)
+    expect(streaming).toBeCloseTo((streamedTokens / 100) * 1000, 6)
+    expect(result.latencyMs).toBeCloseTo(200 + streaming, 6)
+  })
+
+  test('injects failures at the configured rates, reproducibly', async () => {
+    const run = async () => {
+      const model = new OfflineModel({ seed: 11, failures: { unavailable: 0.2, malformed: 0.1 } }, noWait().sleep)
+      const outcomes: string[] = []
+      for (let i = 0; i < 500; i++) {
+        try {
+          const { text } = await model.generate(`record ${i}`, FLOW_OUTPUT_SCHEMAS.formatJson)
+          JSON.parse(text)
+          outcomes.push('ok')
+        } catch (error) {
+          outcomes.push(error instanceof OfflineModelError ? error.status : 'malformed')
+        }
+      }
+      return outcomes
+    }
+    const outcomes = await run()
+    const share = (kind: string) => outcomes.filter(outcome => outcome === kind).length / outcomes.length
+
+    expect(share('UNAVAILABLE')).toBeGreaterThan(0.14)
+    expect(share('UNAVAILABLE')).toBeLessThan(0.26)
+    expect(share('malformed')).toBeGreaterThan(0.05)
+    expect(share('malformed')).toBeLessThan(0.15)
+    expect(await run()).toEqual(outcomes)
+  })
+
+  test('a retried prompt gets a fresh draw', async () => {
+    const model = new OfflineModel({ failures: { 'rate-limited': 0.5 } }, noWait().sleep)
+    let attempts = 0
+    for (;;) {
+      attempts++
+      try {
+        await model.generate('retry me', FLOW_OUTPUT_SCHEMAS.enhanceJsonField)
+        break
+      } catch (error) {
+        expect((error as OfflineModelError).status).toBe('RESOURCE_EXHAUSTED')
+        expect(attempts).toBeLessThan(30)
+      }
+    }
+  })
+})
+
+describe('configuration', () => {
+  test('parses latency and failure specs from the environment', () => {
+    const options = offlineModelOptionsFromEnv({
+      OFFLINE_MODEL_SEED: '42',
+      OFFLINE_MODEL_LATENCY: 'lognormal:300:0.5',
+      OFFLINE_MODEL_TOKENS_PER_SECOND: '80',
+      OFFLINE_MODEL_FAILURES: 'unavailable=0.02, timeout=0.01',
+    })
+    expect(options).toMatchObject({
+      seed: 42,
+      latency: { kind: 'lognormal', median: 300, sigma: 0.5 },
+      tokensPerSecond: 80,
+      failures: { unavailable: 0.02, timeout: 0.01 },
+    })
+    expect(parseLatency('150')).toEqual({ kind: 'fixed', ms: 150 })
+    expect(() => parseLatency('uniform:300:100')).toThrow('Invalid latency')
+    expect(() => parseFailures('crash=0.5')).toThrow('Invalid failure')
+
+    const random = seededRandom(5)
+    const samples = Array.from({ length: 2000 }, () => sampleLatency(options.latency, random)).sort((a, b) => a - b)
+    expect(samples[1000]).toBeGreaterThan(270)
+    expect(samples[1000]).toBeLessThan(330)
+  })
+})
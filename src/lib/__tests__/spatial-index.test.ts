@@ -0,0 +1,129 @@
+import { RoomSpatialIndex, distanceToRect } from '../spatial-index'
+import type { Rect } from '../spatial-index'
+import type { SpatialRoom } from '../jsoncanvas-types'
+
+/**
+ * SPATIAL INDEX TESTS
+ * Grid queries checked against a linear scan, and incremental moves
+ */
+
+// Deterministic pseudo-random numbers so failures reproduce
+function random(seed: number) {
+  return () => {
+    seed = (seed * 1103515245 + 12345) % 2147483648
+    return seed / 2147483648
+  }
+}
+
+function makeRooms(count: number, next: () => number): SpatialRoom[] {
+  return Array.from({ length: count }, (_, i) => ({
+    id: `room-${i}`,
+    name: `Room ${i}`,
+    x: Math.round(next() * 5000),
+    y: Math.round(next() * 3000),
+    width: 50 + Math.round(next() * 400),
+    height: 50 + Math.round(next() * 300),
+    floor: 1 + (i % 3),
+  }))
+}
+
+const ids = (rooms: SpatialRoom[]) => rooms.map(room => room.id)
+
+function scanRect(rooms: SpatialRoom[], floor: number, rect: Rect) {
+  return rooms.filter(
+    room =>
+      (room.floor ?? 1) === floor &&
+      room.x <= rect.x + rect.width &&
+      rect.x <= room.x + room.width &&
+      room.y <= rect.y + rect.height &&
+      rect.y <= room.y + room.height
+  )
+}
+
+function scanNearest(rooms: SpatialRoom[], floor: number, x: number, y: number) {
+  let best: SpatialRoom | undefined
+  let bestDistance = Infinity
+  for (const room of rooms) {
+    if ((room.floor ?? 1) !== floor) continue
+    const distance = distanceToRect(room, x, y)
+    if (distance <= bestDistance) {
+      best = room
+      bestDistance = distance
+    }
+  }
+  return best
+}
+
+describe('RoomSpatialIndex', () => {
+  const spec: SpatialRoom[] = [
+    { id: 'kitchen', name: 'Kitchen', x: 0, y: 0, width: 400, height: 300, floor: 1, type: 'kitchen' },
+    { id: 'living', name: 'Living Room', x: 400, y: 0, width: 500, height: 400, floor: 1, type: 'living' },
+    { id: 'bedroom', name: 'Bedroom', x: 0, y: 0, width: 300, height: 300, floor: 2 },
+  ]
+
+  test('answers point queries per floor', () => {
+    const index = new RoomSpatialIndex(spec)
+
+    expect(index.floors()).toEqual([1, 2])
+    expect(index.roomAt(1, 100, 100)?.id).toBe('kitchen')
+    expect(index.roomAt(1, 600, 350)?.id).toBe('living')
+    expect(index.roomAt(2, 100, 100)?.id).toBe('bedroom')
+    expect(index.roomAt(1, 1000, 1000)).toBeUndefined()
+    // The shared wall belongs to both; the later room is on top
+    expect(ids(index.roomsAt(1, 400, 100))).toEqual(['kitchen', 'living'])
+    expect(index.roomAt(1, 400, 100)?.id).toBe('living')
+  })
+
+  test('finds the nearest room from outside the plan', () => {
+    const index = new RoomSpatialIndex(spec)
+
+    expect(index.nearestRoom(1, 200, 320)?.id).toBe('kitchen')
+    expect(index.nearestRoom(1, 5000, 200)?.id).toBe('living')
+    expect(index.nearestRoom(1, 5000, 200, 100)).toBeUndefined()
+    expect(index.nearestRoom(3, 0, 0)).toBeUndefined()
+  })
+
+  test('matches a linear scan on a large plan', () => {
+    const next = random(7)
+    const rooms = makeRooms(3000, next)
+    const index = new RoomSpatialIndex(rooms)
+
+    for (let i = 0; i < 200; i++) {
+      const floor = 1 + (i % 3)
+      const rect = { x: next() * 5500 - 250, y: next() * 3500 - 250, width: next() * 800, height: next() * 600 }
+      expect(ids(index.roomsInRect(floor, rect))).toEqual(ids(scanRect(rooms, floor, rect)))
+
+      const x = next() * 7000 - 1000
+      const y = next() * 5000 - 1000
+      const nearest = index.nearestRoom(floor, x, y)!
+      expect(distanceToRect(nearest, x, y)).toBe(distanceToRect(scanNearest(rooms, floor, x, y)!, x, y))
+    }
+
+    // A viewport around the whole plan returns every room on the floor
+    expect(index.roomsInRect(1, { x: -1e6, y: -1e6, width: 2e6, height: 2e6 })).toHaveLength(1000)
+  })
+
+  test('updates incrementally when rooms move, change floor or are removed', () => {
+    const next = random(11)
+    const rooms = makeRooms(500, next)
+    const index = new RoomSpatialIndex(rooms)
+
+    for (let i = 0; i < 300; i++) {
+      const at = Math.floor(next() * rooms.length)
+      const moved = { ...rooms[at], x: rooms[at].x + (next() - 0.5) * 600, y: rooms[at].y + (next() - 0.5) * 600 }
+      if (i % 10 === 0) moved.floor = 1 + ((moved.floor ?? 1) % 3)
+      rooms[at] = moved
+      index.update(moved)
+    }
+    const removed = rooms.splice(0, 50)
+    removed.forEach(room => expect(index.remove(room.id)).toBe(true))
+
+    expect(index.size).toBe(450)
+    for (const floor of [1, 2, 3]) {
+      const all = { x: -1e4, y: -1e4, width: 3e4, height: 3e4 }
+      expect(ids(index.roomsInRect(floor, all)).sort()).toEqual(ids(scanRect(rooms, floor, all)).sort())
+      const rect = { x: 1000, y: 1000, width: 1500, height: 800 }
+      expect(ids(index.roomsInRect(floor, rect)).sort()).toEqual(ids(scanRect(rooms, floor, rect)).sort())
+    }
+  })
+})
@@ -0,0 +1,138 @@
+import { TreemapEngine, diffByReference } from '../treemap-layout'
+import type { TreemapLayout } from '../treemap-layout'
+import { LocalTreemapBackend, TreemapClient } from '../treemap-worker-client'
+import { replaceAtPath } from '../json-utils'
+import type { JsonValue } from '@/components/json-canvas/types'
+
+/**
+ * TREEMAP LAYOUT TESTS
+ * Squarified splits, subtree memoization and incremental updates
+ */
+
+function rect(layout: TreemapLayout, i: number) {
+  const [x, y, width, height] = layout.rects.subarray(i * 4, i * 4 + 4)
+  return { x, y, width, height }
+}
+
+function makeHouse(rooms: number, items: number): JsonValue {
+  const house: Record<string, JsonValue> = {}
+  for (let r = 0; r < rooms; r++) {
+    house[`room${r}`] = {
+      name: `Room ${r}`,
+      items: Array.from({ length: items }, (_, i) => ({ name: `Item ${r}-${i}`, price: i * 10, notes: 'x'.repeat(i % 20) })),
+    }
+  }
+  return { house }
+}
+
+describe('TreemapEngine', () => {
+  test('splits a node among its children in proportion to weight', () => {
+    const engine = new TreemapEngine()
+    const layout = engine.layoutValue({ a: [1, 2, 3, 4, 5, 6], b: [1, 2], c: [1, 2, 3, 4] }, 600, 400, {
+      weight: 'count',
+      padding: 0,
+    })
+
+    expect(Array.from(layout.keys.slice(0, 2))).toEqual(['', 'a'])
+    const children = [1, 2, 3].map(i => layout.keys.indexOf(['a', 'b', 'c'][i - 1]))
+    const areas = children.map(i => rect(layout, i).width * rect(layout, i).height)
+    expect(areas[0] / 240000).toBeCloseTo(0.5, 3)
+    expect(areas[1] / 240000).toBeCloseTo(1 / 6, 3)
+    expect(areas[2] / 240000).toBeCloseTo(1 / 3, 3)
+
+    // Every node lies inside its parent, and parents come first
+    for (let i = 1; i < layout.count; i++) {
+      const parent = layout.parents[i]
+      expect(parent).toBeLessThan(i)
+      const child = rect(layout, i)
+      const outer = rect(layout, parent)
+      expect(child.x).toBeGreaterThanOrEqual(outer.x - 1e-3)
+      expect(child.y).toBeGreaterThanOrEqual(outer.y - 1e-3)
+      expect(child.x + child.width).toBeLessThanOrEqual(outer.x + outer.width + 1e-3)
+      expect(child.y + child.height).toBeLessThanOrEqual(outer.y + outer.height + 1e-3)
+      expect(layout.depths[i]).toBe(layout.depths[parent] + 1)
+    }
+  })
+
+  test('weighs by UTF-8 bytes of the JSON text', () => {
+    const engine = new TreemapEngine()
+    const value = { küche: 'é'.repeat(10), bath: 'e'.repeat(10), emoji: ['😀'] }
+    const layout = engine.layoutValue(value, 600, 400, { padding: 0 })
+
+    expect(layout.weights[0]).toBe(new TextEncoder().encode(JSON.stringify(value)).length)
+    expect(layout.weights[layout.keys.indexOf('küche')]).toBe(22)
+    expect(layout.weights[layout.keys.indexOf('bath')]).toBe(12)
+  })
+
+  test('keeps rectangles close to square', () => {
+    const engine = new TreemapEngine()
+    const weights = Array.from({ length: 40 }, (_, i) => 'x'.repeat(10 + ((i * 37) % 90)))
+    const layout = engine.layoutValue(weights, 1000, 600, { padding: 0 })
+
+    let worst = 0
+    for (let i = 1; i < layout.count; i++) {
+      const { width, height } = rect(layout, i)
+      worst = Math.max(worst, width / height, height / width)
+    }
+    expect(worst).toBeLessThan(4)
+  })
+
+  test('does not subdivide rectangles smaller than minRoomSize', () => {
+    const engine = new TreemapEngine()
+    const layout = engine.layoutValue(makeHouse(50, 20), 800, 500, { minRoomSize: 120 })
+
+    for (let i = 0; i < layout.count; i++) {
+      const parent = layout.parents[i]
+      if (parent < 0) continue
+      const { width, height } = rect(layout, parent)
+      expect(Math.min(width, height)).toBeGreaterThanOrEqual(120)
+    }
+  })
+
+  test('re-lays out only the ancestors of an edited node', () => {
+    const engine = new TreemapEngine()
+    const house = makeHouse(30, 30)
+    engine.set('doc', house)
+    const before = engine.layout('doc', 1600, 1000, { weight: 'count', minRoomSize: 0 })
+
+    const stats = { ...engine.stats }
+    engine.patch('doc', [{ path: ['house', 'room7', 'items', 3, 'name'], value: 'Renamed' }])
+    const after = engine.layout('doc', 1600, 1000, { weight: 'count', minRoomSize: 0 })
+
+    // root, house, room7, items and the item itself
+    expect(engine.stats.hashed - stats.hashed).toBe(5)
+    expect(engine.stats.laidOut - stats.laidOut).toBe(5)
+    expect(after.rects).toEqual(before.rects)
+  })
+})
+
+describe('diffByReference', () => {
+  test('returns only the subtrees that changed', () => {
+    const prev = makeHouse(5, 5)
+    const edited = replaceAtPath(prev, ['house', 'room2', 'items', 1, 'price'], 999)
+
+    expect(diffByReference(prev, edited)).toEqual([{ path: ['house', 'room2', 'items', 1, 'price'], value: 999 }])
+    expect(diffByReference(prev, prev)).toEqual([])
+
+    const added = replaceAtPath(prev, ['house', 'room9'], { name: 'New' })
+    expect(diffByReference(prev, added)).toEqual([{ path: ['house'], value: (added as any).house }])
+  })
+})
+
+describe('TreemapClient', () => {
+  test('keeps the backend copy in step through patches', async () => {
+    const backend = new LocalTreemapBackend()
+    const client = new TreemapClient(backend)
+    let data = makeHouse(10, 10)
+    client.update('doc', data)
+
+    data = replaceAtPath(data, ['house', 'room1', 'items', 0, 'notes'], 'a much longer note than before')
+    data = replaceAtPath(data, ['house', 'room4'], { name: 'Emptied' })
+    client.update('doc', data)
+
+    const layout = await client.layout('doc', 900, 600)
+    const fresh = new TreemapEngine().layoutValue(data, 900, 600)
+    expect(layout.keys).toEqual(fresh.keys)
+    expect(layout.rects).toEqual(fresh.rects)
+  })
+})
@@ -0,0 +1,487 @@
+import type { JsonPrimitive, JsonStructureEdit, JsonValue } from '@/components/json-canvas/types'
+import type { ChangeLogEntry, LearningEvent } from './jsoncanvas-types'
+import { findSingleLeafChange } from './history'
+import { getValueAtPath } from './json-utils'
+import { formatJsonPath } from './jsonpath'
+
+/**
+ * Append-only storage for the .jsoncanvas change log and learning history.
+ *
+ * Entries are numbered in sequence and grouped into fixed-size segments.
+ * Appending persists one entry record; nothing already written is rewritten.
+ * When a segment fills up it is sealed and described by a small index (time
+ * range, paths, action counts), which queries use to skip segments without
+ * reading them. Once there are more than LOG_MAX_SEGMENTS sealed segments,
+ * the oldest are folded into monthly summaries and their entries dropped.
+ *
+ * oldValue/newValue are stored once per document under a content hash and
+ * referenced from entries, except for values short enough to keep inline.
+ * A hash already in use is only reused once the stored value is confirmed
+ * to be the same; a different value gets the next free `<hash>.<n>` key.
+ */
+
+export const LOG_SEGMENT_SIZE = 256
+export const LOG_MAX_SEGMENTS = 64
+
+// Serialized values up to this length are cheaper inline than as a reference
+const INLINE_VALUE_LENGTH = 64
+// Paths kept per monthly summary, by entry count
+const SUMMARY_PATH_LIMIT = 50
+
+export type LogKind = 'changeLog' | 'learningHistory'
+export type LogEntry = ChangeLogEntry | LearningEvent
+
+export interface LogValueRef {
+  $ref: string
+}
+
+// Only primitives are ever stored inline, so any object is a reference
+export type StoredLogValue = JsonPrimitive | LogValueRef
+
+type WithStoredValues<T> = T extends LogEntry
+  ? Omit<T, 'oldValue' | 'newValue'> & { oldValue?: StoredLogValue; newValue?: StoredLogValue }
+  : never
+
+export type StoredLogEntry = WithStoredValues<LogEntry>
+
+export interface LogEntryRecord {
+  docId: string
+  kind: LogKind
+  seq: number
+  entry: StoredLogEntry
+}
+
+export interface LogValueRecord {
+  docId: string
+  // Content hash, with a .n suffix for a value whose hash was taken
+  hash: string
+  value: JsonValue
+}
+
+export interface LogSegmentIndex {
+  segment: number
+  count: number
+  // Epoch milliseconds of the earliest and latest entry
+  from: number
+  to: number
+  // Entry count per path
+  paths: Record<string, number>
+  actions: Record<string, number>
+  // Hashes of every value the segment's entries reference
+  values: string[]
+}
+
+export interface LogSummary {
+  month: string // YYYY-MM
+  count: number
+  from: number
+  to: number
+  actions: Record<string, number>
+  // Entry counts for the most frequently changed paths
+  paths: Record<string, number>
+}
+
+export interface LogManifest {
+  docId: string
+  kind: LogKind
+  // Segment number of the open segment; earlier ones are sealed or compacted
+  openSegment: number
+  sealed: LogSegmentIndex[]
+  summaries: LogSummary[]
+}
+
+/** Records to persist for one append, applied in a single transaction. */
+export interface LogWrite {
+  docId: string
+  kind: LogKind
+  entries: LogEntryRecord[]
+  values: LogValueRecord[]
+  // Only present when a segment was sealed
+  manifest?: LogManifest
+  // Entries with a lower seq were compacted and can be deleted
+  deleteBelowSeq?: number
+  deleteValues?: string[]
+}
+
+export interface LogQuery {
+  path?: string
+  // Also match entries for paths below path
+  includeDescendants?: boolean
+  // Epoch milliseconds, inclusive
+  from?: number
+  to?: number
+  // Keep only the most recent entries
+  limit?: number
+}
+
+export interface LogStorage {
+  writeLog(write: LogWrite): Promise<void>
+  // The manifest (null for a new log) and the entries of the open segment
+  readLog(docId: string, kind: LogKind): Promise<{ manifest: LogManifest | null; open: LogEntryRecord[] }>
+  readLogEntries(docId: string, kind: LogKind, fromSeq: number, toSeq: number): Promise<LogEntryRecord[]>
+  readLogValues(docId: string, hashes: string[]): Promise<LogValueRecord[]>
+}
+
+/**
+ * 64-bit content hash of a value's JSON text, as 16 hex digits. Two
+ * independent 32-bit FNV-1a style hashes; not cryptographic.
+ */
+export function hashJsonValue(value: JsonValue): string {
+  return hashJsonText(JSON.stringify(value))
+}
+
+function hashJsonText(text: string): string {
+  let h1 = 0x811c9dc5
+  let h2 = 0x01000193 ^ text.length
+  for (let i = 0; i < text.length; i++) {
+    const code = text.charCodeAt(i)
+    h1 = Math.imul(h1 ^ code, 0x01000193)
+    h2 = Math.imul(h2 ^ code, 0x5bd1e995)
+    h2 ^= h2 >>> 15
+  }
+  return (h1 >>> 0).toString(16).padStart(8, '0') + (h2 >>> 0).toString(16).padStart(8, '0')
+}
+
+function isValueRef(value: StoredLogValue | undefined): value is LogValueRef {
+  return typeof value === 'object' && value !== null
+}
+
+function entryAction(entry: LogEntry | StoredLogEntry): string {
+  return 'action' in entry ? entry.action : entry.event
+}
+
+function entryTime(entry: LogEntry | StoredLogEntry): number {
+  const time = Date.parse(entry.timestamp)
+  return Number.isNaN(time) ? 0 : time
+}
+
+function isDescendantPath(path: string, base: string): boolean {
+  if (base === '$' || base === '') return true
+  return path.startsWith(`${base}.`) || path.startsWith(`${base}[`)
+}
+
+function indexSegment(segment: number, records: LogEntryRecord[]): LogSegmentIndex {
+  const paths: Record<string, number> = {}
+  const values = new Set<string>()
+  const actions: Record<string, number> = {}
+  let from = Infinity
+  let to = -Infinity
+  for (const { entry } of records) {
+    const time = entryTime(entry)
+    from = Math.min(from, time)
+    to = Math.max(to, time)
+    paths[entry.path] = (paths[entry.path] ?? 0) + 1
+    const action = entryAction(entry)
+    actions[action] = (actions[action] ?? 0) + 1
+    if (isValueRef(entry.oldValue)) values.add(entry.oldValue.$ref)
+    if (isValueRef(entry.newValue)) values.add(entry.newValue.$ref)
+  }
+  return { segment, count: records.length, from, to, paths, actions, values: Array.from(values) }
+}
+
+function monthOf(time: number): string {
+  return new Date(time).toISOString().slice(0, 7)
+}
+
+/**
+ * Fold a segment's index into the summary for the month it started in.
+ */
+function foldIntoSummaries(summaries: LogSummary[], index: LogSegmentIndex): LogSummary[] {
+  const month = monthOf(index.from)
+  const existing = summaries.find(summary => summary.month === month)
+  const summary: LogSummary = existing
+    ? { ...existing, actions: { ...existing.actions }, paths: { ...existing.paths } }
+    : { month, count: 0, from: index.from, to: index.to, actions: {}, paths: {} }
+
+  summary.count += index.count
+  summary.from = Math.min(summary.from, index.from)
+  summary.to = Math.max(summary.to, index.to)
+  for (const [action, count] of Object.entries(index.actions)) {
+    summary.actions[action] = (summary.actions[action] ?? 0) + count
+  }
+  for (const [path, count] of Object.entries(index.paths)) {
+    summary.paths[path] = (summary.paths[path] ?? 0) + count
+  }
+  const top = Object.entries(summary.paths).sort((a, b) => b[1] - a[1]).slice(0, SUMMARY_PATH_LIMIT)
+  summary.paths = Object.fromEntries(top)
+
+  return summaries
+    .filter(other => other.month !== month)
+    .concat(summary)
+    .sort((a, b) => a.month.localeCompare(b.month))
+}
+
+/**
+ * One document's log of one kind. Holds the manifest and the open segment
+ * in memory; sealed segments are read from storage only when queried.
+ */
+export class SegmentedLog {
+  readonly docId: string
+  readonly kind: LogKind
+  private openSegment: number
+  private sealed: LogSegmentIndex[]
+  private summaries: LogSummary[]
+  private open: LogEntryRecord[]
+  // Every value hash referenced by a live entry
+  private liveValues = new Set<string>()
+
+  constructor(docId: string, kind: LogKind, manifest: LogManifest | null = null, open: LogEntryRecord[] = []) {
+    this.docId = docId
+    this.kind = kind
+    this.openSegment = manifest?.openSegment ?? 0
+    this.sealed = manifest?.sealed ?? []
+    this.summaries = manifest?.summaries ?? []
+    this.open = open.slice().sort((a, b) => a.seq - b.seq)
+
+    for (const index of this.sealed) {
+      index.values.forEach(hash => this.liveValues.add(hash))
+    }
+    indexSegment(this.openSegment, this.open).values.forEach(hash => this.liveValues.add(hash))
+  }
+
+  /** Number of entries not yet compacted into summaries. */
+  get size(): number {
+    return this.sealed.reduce((total, index) => total + index.count, 0) + this.open.length
+  }
+
+  get segments(): readonly LogSegmentIndex[] {
+    return this.sealed
+  }
+
+  get compacted(): readonly LogSummary[] {
+    return this.summaries
+  }
+
+  manifest(): LogManifest {
+    return { docId: this.docId, kind: this.kind, openSegment: this.openSegment, sealed: this.sealed, summaries: this.summaries }
+  }
+
+  /**
+   * Add an entry and return the records to persist: the entry itself, any
+   * values not stored before, and on sealing a segment the new manifest.
+   * Values whose hash is already in use are read back from storage to rule
+   * out a collision. Appends to one log must not overlap.
+   */
+  async append(entry: LogEntry, storage: LogStorage): Promise<LogWrite> {
+    // Values added by this append, by key, as JSON text
+    const added = new Map<string, string>()
+    const values: LogValueRecord[] = []
+    const storeValue = async (value: JsonValue | undefined): Promise<StoredLogValue | undefined> => {
+      if (value === undefined) return undefined
+      if (value === null || (typeof value !== 'object' && JSON.stringify(value).length <= INLINE_VALUE_LENGTH)) {
+        return value
+      }
+      const text = JSON.stringify(value)
+      const hash = hashJsonText(text)
+      for (let probe = 0; ; probe++) {
+        const key = probe === 0 ? hash : `${hash}.${probe}`
+        const pending = added.get(key)
+        if (pending !== undefined) {
+          if (pending === text) return { $ref: key }
+          continue
+        }
+        if (this.liveValues.has(key)) {
+          const [existing] = await storage.readLogValues(this.docId, [key])
+          if (existing && JSON.stringify(existing.value) !== text) continue
+          // A record that has gone missing is written again
+          if (existing) return { $ref: key }
+        }
+        added.set(key, text)
+        values.push({ docId: this.docId, hash: key, value })
+        return { $ref: key }
+      }
+    }
+
+    const { oldValue, newValue, ...rest } = entry
+    const stored = { ...rest } as StoredLogEntry
+    const storedOld = await storeValue(oldValue)
+    const storedNew = await storeValue(newValue)
+    if (storedOld !== undefined) stored.oldValue = storedOld
+    if (storedNew !== undefined) stored.newValue = storedNew
+    values.forEach(record => this.liveValues.add(record.hash))
+
+    const record: LogEntryRecord = {
+      docId: this.docId,
+      kind: this.kind,
+      seq: this.openSegment * LOG_SEGMENT_SIZE + this.open.length,
+      entry: stored,
+    }
+    this.open.push(record)
+
+    const write: LogWrite = { docId: this.docId, kind: this.kind, entries: [record], values }
+    if (this.open.length >= LOG_SEGMENT_SIZE) {
+      this.seal(write)
+    }
+    return write
+  }
+
+  private seal(write: LogWrite): void {
+    this.sealed = this.sealed.concat(indexSegment(this.openSegment, this.open))
+    this.openSegment++
+    this.open = []
+
+    if (this.sealed.length > LOG_MAX_SEGMENTS) {
+      const dropped = this.sealed.slice(0, this.sealed.length - LOG_MAX_SEGMENTS)
+      this.sealed = this.sealed.slice(dropped.length)
+      for (const index of dropped) {
+        this.summaries = foldIntoSummaries(this.summaries, index)
+      }
+
+      const stillUsed = new Set(this.sealed.flatMap(index => index.values))
+      const unused = new Set(dropped.flatMap(index => index.values).filter(hash => !stillUsed.has(hash)))
+      unused.forEach(hash => this.liveValues.delete(hash))
+
+      write.deleteBelowSeq = (dropped[dropped.length - 1].segment + 1) * LOG_SEGMENT_SIZE
+      write.deleteValues = Array.from(unused)
+    }
+    write.manifest = this.manifest()
+  }
+
+  /**
+   * Entries matching the query, oldest first, with values resolved. Sealed
+   * segments whose index rules them out are not read.
+   */
+  async query(storage: LogStorage, query: LogQuery = {}): Promise<LogEntry[]> {
+    const from = query.from ?? -Infinity
+    const to = query.to ?? Infinity
+    const matchesPath = (path: string) =>
+      query.path === undefined || path === query.path || (query.includeDescendants === true && isDescendantPath(path, query.path))
+
+    const candidates = this.sealed.filter(index => index.to >= from && index.from <= to && Object.keys(index.paths).some(matchesPath))
+    const sealedRecords = await Promise.all(candidates.map(index =>
+      storage.readLogEntries(this.docId, this.kind, index.segment * LOG_SEGMENT_SIZE, (index.segment + 1) * LOG_SEGMENT_SIZE)
+    ))
+
+    let records = sealedRecords.flat().concat(this.open).filter(({ entry }) => {
+      const time = entryTime(entry)
+      return time >= from && time <= to && matchesPath(entry.path)
+    })
+    records.sort((a, b) => a.seq - b.seq)
+    if (query.limit !== undefined) records = records.slice(Math.max(0, records.length - query.limit))
+
+    return resolveLogValues(storage, this.docId, records.map(record => record.entry))
+  }
+}
+
+/**
+ * Replace value references with the stored values.
+ */
+export async function resolveLogValues(storage: LogStorage, docId: string, entries: StoredLogEntry[]): Promise<LogEntry[]> {
+  const hashes = new Set<string>()
+  for (const entry of entries) {
+    if (isValueRef(entry.oldValue)) hashes.add(entry.oldValue.$ref)
+    if (isValueRef(entry.newValue)) hashes.add(entry.newValue.$ref)
+  }
+  const values = new Map<string, JsonValue>()
+  if (hashes.size > 0) {
+    for (const record of await storage.readLogValues(docId, Array.from(hashes))) {
+      values.set(record.hash, record.value)
+    }
+  }
+
+  const resolve = (value: StoredLogValue | undefined) => (isValueRef(value) ? values.get(value.$ref) : value)
+  return entries.map(entry => {
+    const resolved = { ...entry } as unknown as LogEntry
+    if (entry.oldValue !== undefined) resolved.oldValue = resolve(entry.oldValue)
+    if (entry.newValue !== undefined) resolved.newValue = resolve(entry.newValue)
+    return resolved
+  })
+}
+
+/**
+ * Describe a user edit from prev to next as a change log entry. Single
+ * field edits record both values; whole-document replacements record none.
+ */
+export function describeChange(
+  prev: JsonValue,
+  next: JsonValue,
+  edit?: JsonStructureEdit,
+  now: Date = new Date()
+): ChangeLogEntry {
+  const base = { timestamp: now.toISOString(), user: 'user' }
+
+  if (edit?.type === 'delete') {
+    return { ...base, action: 'delete', path: formatJsonPath(edit.path), oldValue: getValueAtPath(prev, edit.path) }
+  }
+  if (edit?.type === 'rename') {
+    return {
+      ...base,
+      action: 'update',
+      path: formatJsonPath([...edit.path, edit.newKey]),
+      notes: `Renamed from ${formatJsonPath([...edit.path, edit.oldKey])}`,
+    }
+  }
+
+  const path = findSingleLeafChange(prev, next)
+  if (path) {
+    return {
+      ...base,
+      action: 'update',
+      path: formatJsonPath(path),
+      oldValue: getValueAtPath(prev, path),
+      newValue: getValueAtPath(next, path),
+    }
+  }
+  return { ...base, action: 'update', path: '$' }
+}
+
+/**
+ * Opens logs on demand and serializes appends to each one, so that records
+ * reach storage in sequence order.
+ */
+export class CanvasLogStore {
+  private readonly storage: LogStorage
+  private logs = new Map<string, Promise<SegmentedLog>>()
+  private tails = new Map<string, Promise<void>>()
+
+  constructor(storage: LogStorage) {
+    this.storage = storage
+  }
+
+  append(docId: string, kind: LogKind, entry: LogEntry): Promise<void> {
+    const key = `${docId}\u0000${kind}`
+    const run = (this.tails.get(key) ?? Promise.resolve())
+      .catch(() => undefined)
+      .then(async () => {
+        const log = await this.open(docId, kind)
+        try {
+          await this.storage.writeLog(await log.append(entry, this.storage))
+        } catch (error) {
+          // Memory is now ahead of storage; reload from storage next time
+          this.logs.delete(key)
+          throw error
+        }
+      })
+    this.tails.set(key, run)
+    return run
+  }
+
+  async query(docId: string, kind: LogKind, query?: LogQuery): Promise<LogEntry[]> {
+    const key = `${docId}\u0000${kind}`
+    await this.tails.get(key)?.catch(() => undefined)
+    return (await this.open(docId, kind)).query(this.storage, query)
+  }
+
+  async summaries(docId: string, kind: LogKind): Promise<readonly LogSummary[]> {
+    return (await this.open(docId, kind)).compacted
+  }
+
+  /** Drop cached state for a deleted document. Its records are removed with the document. */
+  forget(docId: string): void {
+    for (const kind of ['changeLog', 'learningHistory'] as LogKind[]) {
+      this.logs.delete(`${docId}\u0000${kind}`)
+      this.tails.delete(`${docId}\u0000${kind}`)
+    }
+  }
+
+  private open(docId: string, kind: LogKind): Promise<SegmentedLog> {
+    const key = `${docId}\u0000${kind}`
+    let log = this.logs.get(key)
+    if (!log) {
+      log = this.storage.readLog(docId, kind).then(({ manifest, open }) => new SegmentedLog(docId, kind, manifest, open))
+      log.catch(() => this.logs.delete(key))
+      this.logs.set(key, log)
+    }
+    return log
+  }
+}
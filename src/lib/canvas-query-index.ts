@@ -0,0 +1,251 @@
+import type { AIInsight, AISuggestion, ChangeLogEntry, FieldAIData, LearningEvent } from './jsoncanvas-types'
+import type { JsonCanvasDocument } from './jsoncanvas-file'
+import { buildFieldMetadataIndex, lookupFieldMetadata } from './field-metadata-index'
+import type { FieldMetadataNode } from './field-metadata-index'
+import { formatJsonPath, parseConcretePath } from './jsonpath'
+
+/**
+ * Indexes over a .jsoncanvas document's metadata for the headless API.
+ *
+ * Insights, suggestions and history entries are filed in path tries, so a
+ * query by path prefix visits only the matching subtree. Fields below a
+ * confidence threshold come from the field metadata trie, whose subtree
+ * minimums let the walk skip every branch that has nothing to report.
+ *
+ * Each index is built the first time it is queried, and the history index
+ * is the only one that reads the lazily parsed logs.
+ */
+
+export const DEFAULT_PAGE_SIZE = 50
+export const MAX_PAGE_SIZE = 500
+
+export interface PageRequest {
+  limit?: number
+  // Opaque; the nextCursor of the previous page
+  cursor?: string | null
+}
+
+/** A limit or cursor in a page request that cannot be used. */
+export class PageRequestError extends Error {
+  constructor(message: string) {
+    super(message)
+    this.name = 'PageRequestError'
+  }
+}
+
+export interface Page<T> {
+  items: T[]
+  total: number
+  nextCursor: string | null
+}
+
+export interface InsightQuery extends PageRequest {
+  path?: string
+  // Match insights on paths below path as well as on path itself; default true
+  includeDescendants?: boolean
+  type?: AIInsight['type']
+}
+
+export interface SuggestionQuery extends PageRequest {
+  path?: string
+  includeDescendants?: boolean
+  priority?: AISuggestion['priority'][]
+  type?: AISuggestion['type']
+}
+
+export interface FieldQuery extends PageRequest {
+  // Fields with confidence strictly below this
+  below: number
+  path?: string
+}
+
+export interface HistoryQuery extends PageRequest {
+  path: string
+  includeDescendants?: boolean
+}
+
+export type FieldMatch = FieldAIData & { path: string }
+
+export type HistoryEntry =
+  | { source: 'changeLog'; entry: ChangeLogEntry }
+  | { source: 'learningHistory'; entry: LearningEvent }
+
+const PRIORITY_ORDER: Record<AISuggestion['priority'], number> = { high: 0, medium: 1, low: 2 }
+
+function splitPath(path: string): string[] {
+  if (path === '' || path === '$') return []
+  try {
+    const segments = parseConcretePath(path)
+    if (segments) return segments
+  } catch {
+    // Fall through to the literal form
+  }
+  // Wildcards and the like are filed under their literal segments
+  return path.split('.')
+}
+
+function decodeCursor(cursor: string | null | undefined): number {
+  if (!cursor) return 0
+  const offset = parseInt(cursor, 36)
+  if (!Number.isSafeInteger(offset) || offset < 0) throw new PageRequestError(`Invalid cursor: ${cursor}`)
+  return offset
+}
+
+export function paginate<T>(items: T[], request: PageRequest): Page<T> {
+  const limit = Math.min(Math.max(Math.floor(request.limit ?? DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+  const offset = decodeCursor(request.cursor)
+  const end = offset + limit
+  return {
+    items: items.slice(offset, end),
+    total: items.length,
+    nextCursor: end < items.length ? end.toString(36) : null,
+  }
+}
+
+/** Read limit and cursor from a request's query string. The limit must be a positive integer. */
+export function parsePageRequest(params: URLSearchParams): PageRequest {
+  const limit = params.get('limit')
+  if (limit !== null && !/^[1-9]\d*$/.test(limit)) throw new PageRequestError(`Invalid limit: ${limit}`)
+  return {
+    limit: limit === null ? undefined : Number(limit),
+    cursor: params.get('cursor'),
+  }
+}
+
+interface TrieNode {
+  // Item positions filed at exactly this path
+  items: number[]
+  children: Map<string, TrieNode>
+}
+
+/**
+ * Items filed under one or more paths. Items are kept in the order they
+ * were added, and queries return them in that order.
+ */
+export class PathIndex<T> {
+  private readonly root: TrieNode = { items: [], children: new Map() }
+  private readonly values: T[] = []
+
+  get size(): number {
+    return this.values.length
+  }
+
+  add(item: T, paths: string[]): void {
+    const position = this.values.push(item) - 1
+    for (const path of new Set(paths)) {
+      let node = this.root
+      for (const segment of splitPath(path)) {
+        let child = node.children.get(segment)
+        if (!child) {
+          child = { items: [], children: new Map() }
+          node.children.set(segment, child)
+        }
+        node = child
+      }
+      node.items.push(position)
+    }
+  }
+
+  query(path: string, includeDescendants = true): T[] {
+    let node: TrieNode | undefined = this.root
+    for (const segment of splitPath(path)) {
+      node = node.children.get(segment)
+      if (!node) return []
+    }
+    if (!includeDescendants) return node.items.map(position => this.values[position])
+
+    const positions = new Set<number>()
+    const stack = [node]
+    while (stack.length > 0) {
+      const current = stack.pop()!
+      current.items.forEach(position => positions.add(position))
+      current.children.forEach(child => stack.push(child))
+    }
+    return Array.from(positions)
+      .sort((a, b) => a - b)
+      .map(position => this.values[position])
+  }
+
+  all(): T[] {
+    return this.values.slice()
+  }
+}
+
+function newestFirst(a: { timestamp: string }, b: { timestamp: string }): number {
+  return (Date.parse(b.timestamp) || 0) - (Date.parse(a.timestamp) || 0)
+}
+
+export class CanvasQueryIndex {
+  private readonly doc: JsonCanvasDocument
+  private insightIndex: PathIndex<AIInsight> | null = null
+  private suggestionIndex: PathIndex<AISuggestion> | null = null
+  private fieldIndex: FieldMetadataNode | null = null
+  private historyIndex: PathIndex<HistoryEntry> | null = null
+
+  constructor(doc: JsonCanvasDocument) {
+    this.doc = doc
+  }
+
+  /** Insights related to a path, newest first. */
+  insights(query: InsightQuery = {}): Page<AIInsight> {
+    if (!this.insightIndex) {
+      this.insightIndex = new PathIndex()
+      const insights = (this.doc.metadata.ai?.insights ?? []).slice().sort(newestFirst)
+      for (const insight of insights) this.insightIndex.add(insight, insight.relatedPaths ?? [])
+    }
+    let items = query.path === undefined ? this.insightIndex.all() : this.insightIndex.query(query.path, query.includeDescendants)
+    if (query.type) items = items.filter(insight => insight.type === query.type)
+    return paginate(items, query)
+  }
+
+  /** Suggestions, highest priority first and then newest first. */
+  suggestions(query: SuggestionQuery = {}): Page<AISuggestion> {
+    if (!this.suggestionIndex) {
+      this.suggestionIndex = new PathIndex()
+      const suggestions = (this.doc.metadata.ai?.suggestions ?? [])
+        .slice()
+        .sort((a, b) => (PRIORITY_ORDER[a.priority] ?? 3) - (PRIORITY_ORDER[b.priority] ?? 3) || newestFirst(a, b))
+      for (const suggestion of suggestions) this.suggestionIndex.add(suggestion, suggestion.path ? [suggestion.path] : [''])
+    }
+    let items = query.path === undefined ? this.suggestionIndex.all() : this.suggestionIndex.query(query.path, query.includeDescendants)
+    if (query.priority && query.priority.length > 0) {
+      const priorities = new Set(query.priority)
+      items = items.filter(suggestion => priorities.has(suggestion.priority))
+    }
+    if (query.type) items = items.filter(suggestion => suggestion.type === query.type)
+    return paginate(items, query)
+  }
+
+  /** Fields with confidence below the threshold, least confident first. */
+  fields(query: FieldQuery): Page<FieldMatch> {
+    if (!this.fieldIndex) {
+      this.fieldIndex = buildFieldMetadataIndex(this.doc.metadata.ai?.fieldMetadata as Record<string, FieldAIData> | undefined)
+    }
+    const prefix = query.path === undefined ? [] : splitPath(query.path)
+    const start = lookupFieldMetadata(this.fieldIndex, prefix)
+    const matches: FieldMatch[] = []
+    const visit = (node: FieldMetadataNode, path: string[]) => {
+      // Nothing in this subtree is below the threshold
+      if (node.summary.minConfidence === null || node.summary.minConfidence >= query.below) return
+      if (node.field && node.field.confidence < query.below) matches.push({ ...node.field, path: formatJsonPath(path) })
+      node.children.forEach((child, key) => visit(child, [...path, key]))
+    }
+    if (start) visit(start, prefix)
+    matches.sort((a, b) => a.confidence - b.confidence || (a.path < b.path ? -1 : a.path > b.path ? 1 : 0))
+    return paginate(matches, query)
+  }
+
+  /** Change log and learning history entries for a path, newest first. */
+  history(query: HistoryQuery): Page<HistoryEntry> {
+    if (!this.historyIndex) {
+      const entries: HistoryEntry[] = [
+        ...this.doc.changeLog.get().map(entry => ({ source: 'changeLog' as const, entry })),
+        ...this.doc.learningHistory.get().map(entry => ({ source: 'learningHistory' as const, entry })),
+      ]
+      entries.sort((a, b) => newestFirst(a.entry, b.entry))
+      this.historyIndex = new PathIndex()
+      for (const entry of entries) this.historyIndex.add(entry, [entry.entry.path ?? ''])
+    }
+    return paginate(this.historyIndex.query(query.path, query.includeDescendants), query)
+  }
+}
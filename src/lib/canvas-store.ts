@@ -0,0 +1,95 @@
+import { readJsonCanvas } from './jsoncanvas-file'
+import type { JsonCanvasDocument } from './jsoncanvas-file'
+import { isJsonCanvasBinary, readJsonCanvasBinary } from './jsoncanvas-binary'
+import { CanvasQueryIndex } from './canvas-query-index'
+
+/**
+ * Server-side store of uploaded .jsoncanvas files for the headless API.
+ *
+ * A file is read once on upload (logs stay unparsed) and kept with its
+ * query index, so later requests are answered without reloading it. The
+ * store lives on globalThis so that every route module, and hot reloads
+ * in development, see the same instance.
+ */
+
+export interface StoredCanvas {
+  id: string
+  name: string
+  doc: JsonCanvasDocument
+  index: CanvasQueryIndex
+  size: number
+  createdAt: number
+  updatedAt: number
+}
+
+export interface CanvasSummary {
+  id: string
+  name: string
+  size: number
+  createdAt: number
+  updatedAt: number
+  insights: number
+  suggestions: number
+  fields: number
+}
+
+function newCanvasId(): string {
+  return Date.now().toString() + Math.random().toString(36).slice(2, 11)
+}
+
+export class CanvasStore {
+  private readonly canvases = new Map<string, StoredCanvas>()
+
+  /** Read a text or binary .jsoncanvas file and store it, replacing any canvas with the same id. */
+  put(bytes: Uint8Array, options: { id?: string; name?: string } = {}): StoredCanvas {
+    const doc = isJsonCanvasBinary(bytes) ? readJsonCanvasBinary(bytes) : readJsonCanvas(bytes)
+    const id = options.id ?? newCanvasId()
+    const existing = this.canvases.get(id)
+    const now = Date.now()
+    const title = typeof doc.metadata.title === 'string' ? doc.metadata.title : undefined
+    const stored: StoredCanvas = {
+      id,
+      name: options.name || title || `Canvas ${id.slice(-4)}`,
+      doc,
+      index: new CanvasQueryIndex(doc),
+      size: bytes.length,
+      createdAt: existing?.createdAt ?? now,
+      updatedAt: now,
+    }
+    this.canvases.set(id, stored)
+    return stored
+  }
+
+  get(id: string): StoredCanvas | undefined {
+    return this.canvases.get(id)
+  }
+
+  delete(id: string): boolean {
+    return this.canvases.delete(id)
+  }
+
+  list(): CanvasSummary[] {
+    return Array.from(this.canvases.values(), summarizeCanvas)
+  }
+}
+
+export function summarizeCanvas(canvas: StoredCanvas): CanvasSummary {
+  const ai = canvas.doc.metadata.ai
+  return {
+    id: canvas.id,
+    name: canvas.name,
+    size: canvas.size,
+    createdAt: canvas.createdAt,
+    updatedAt: canvas.updatedAt,
+    insights: ai?.insights?.length ?? 0,
+    suggestions: ai?.suggestions?.length ?? 0,
+    fields: Object.keys(ai?.fieldMetadata ?? {}).length,
+  }
+}
+
+const globalStore = globalThis as typeof globalThis & { __jsonCanvasStore?: CanvasStore }
+
+export function getCanvasStore(): CanvasStore {
+  if (!globalStore.__jsonCanvasStore) globalStore.__jsonCanvasStore = new CanvasStore()
+  return globalStore.__jsonCanvasStore
+}
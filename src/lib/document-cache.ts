@@ -0,0 +1,60 @@
+import type { Document, JsonValue } from '@/components/json-canvas/types'
+import { measureJson } from './document-metadata'
+import { measureHistoryMemory } from './history'
+
+/**
+ * Memory budget for hydrated documents. Inactive documents are evicted
+ * back to storage, least recently used first, once the budget is exceeded.
+ */
+
+// Serialized bytes of data and history across all hydrated documents
+export const DOCUMENT_MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+
+export interface CachedDocumentEntry {
+  id: string
+  bytes: number
+  lastUsed: number
+}
+
+// Memory of each history array; edits replace the array rather than change it
+const historyBytes = new WeakMap<JsonValue[], number>()
+
+/**
+ * Approximate in-memory cost of a document: its history, with subtrees
+ * shared between entries counted once, plus its data if that is not one of
+ * the entries. Measured once per history array.
+ */
+export function estimateDocumentBytes(doc: Document): number {
+  let bytes = historyBytes.get(doc.history)
+  if (bytes === undefined) {
+    bytes = measureHistoryMemory(doc.history).bytes
+    historyBytes.set(doc.history, bytes)
+  }
+  return doc.history.includes(doc.data) ? bytes : bytes + measureJson(doc.data).size
+}
+
+/**
+ * Pick documents to evict, least recently used first, until the rest fit
+ * within the budget. The pinned document (the active one) is never picked,
+ * even if it alone exceeds the budget.
+ */
+export function selectEvictions(
+  entries: CachedDocumentEntry[],
+  budgetBytes: number,
+  pinnedId: string | null
+): string[] {
+  let total = entries.reduce((sum, entry) => sum + entry.bytes, 0)
+  if (total <= budgetBytes) return []
+
+  const candidates = entries
+    .filter(entry => entry.id !== pinnedId)
+    .sort((a, b) => a.lastUsed - b.lastUsed)
+
+  const evicted: string[] = []
+  for (const entry of candidates) {
+    if (total <= budgetBytes) break
+    evicted.push(entry.id)
+    total -= entry.bytes
+  }
+  return evicted
+}
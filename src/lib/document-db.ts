@@ -0,0 +1,362 @@
+import type { DocumentMetadata, JsonValue } from '@/components/json-canvas/types'
+import { KeyDictionary, decodePayload, encodePayload } from './json-compression'
+import type { StoredPayload } from './json-compression'
+import type { WriteStats } from './storage-stats'
+import { LOG_SEGMENT_SIZE } from './canvas-log'
+import type { LogEntryRecord, LogKind, LogManifest, LogValueRecord, LogWrite } from './canvas-log'
+import type { StoredCanvasLogs, StoredCanvasRecord } from './jsoncanvas-file'
+
+/**
+ * IndexedDB schema and batch read/write helpers for document persistence.
+ * These run inside the storage worker, or on the main thread as a fallback
+ * when workers are unavailable. Stored payloads are compressed, see
+ * json-compression.ts.
+ */
+
+export const DOCUMENT_DB_NAME = 'jsonCanvas'
+export const DOCUMENT_DB_VERSION = 4
+
+export const DOCUMENT_DB_STORES = {
+  DOCUMENTS: 'documents',
+  HISTORY: 'history',
+  META: 'meta',
+  // Append-only key dictionaries shared by a document's data and history
+  DICTIONARIES: 'dictionaries',
+  // Segmented change logs, see canvas-log.ts
+  LOG_ENTRIES: 'logEntries',
+  LOG_VALUES: 'logValues',
+  LOG_MANIFESTS: 'logManifests',
+  // .jsoncanvas metadata of documents opened from such files, and the
+  // file's own logs, which are written once and kept apart so that
+  // metadata updates do not rewrite them
+  CANVASES: 'canvases',
+  CANVAS_LOGS: 'canvasLogs',
+} as const
+
+const STORE_KEY_PATHS: Record<string, string | string[] | undefined> = {
+  [DOCUMENT_DB_STORES.DOCUMENTS]: 'id',
+  [DOCUMENT_DB_STORES.HISTORY]: 'id',
+  [DOCUMENT_DB_STORES.META]: undefined,
+  [DOCUMENT_DB_STORES.DICTIONARIES]: 'id',
+  [DOCUMENT_DB_STORES.LOG_ENTRIES]: ['docId', 'kind', 'seq'],
+  [DOCUMENT_DB_STORES.LOG_VALUES]: ['docId', 'hash'],
+  [DOCUMENT_DB_STORES.LOG_MANIFESTS]: ['docId', 'kind'],
+  [DOCUMENT_DB_STORES.CANVASES]: 'id',
+  [DOCUMENT_DB_STORES.CANVAS_LOGS]: 'id',
+}
+
+const LOG_STORES = [DOCUMENT_DB_STORES.LOG_ENTRIES, DOCUMENT_DB_STORES.LOG_VALUES, DOCUMENT_DB_STORES.LOG_MANIFESTS]
+
+export const WORKSPACE_META_KEY = 'workspace'
+
+export interface StoredDocumentRecord {
+  id: string
+  data: JsonValue
+  currentHistoryIndex: number
+}
+
+export interface StoredHistoryRecord {
+  id: string
+  history: JsonValue[]
+}
+
+export interface WorkspaceEntry {
+  id: string
+  name: string
+  // Missing for workspaces written before metadata was tracked
+  metadata?: DocumentMetadata
+  versionCount?: number
+}
+
+export interface WorkspaceRecord {
+  documents: WorkspaceEntry[]
+  activeDocumentId: string | null
+  migratedFromLocalStorage?: boolean
+}
+
+export interface PersistenceBatch {
+  documents: StoredDocumentRecord[]
+  histories: StoredHistoryRecord[]
+  deletedIds: string[]
+  workspace?: WorkspaceRecord
+  canvases?: StoredCanvasRecord[]
+}
+
+export interface StoredDocument {
+  document: StoredDocumentRecord
+  history: StoredHistoryRecord | null
+  // Only for documents opened from a .jsoncanvas file
+  canvas?: StoredCanvasRecord | null
+  decodeMs?: number
+}
+
+interface DictionaryRecord {
+  id: string
+  keys: string[]
+}
+
+export function requestToPromise<T>(request: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result)
+    request.onerror = () => reject(request.error)
+  })
+}
+
+export function transactionDone(transaction: IDBTransaction): Promise<void> {
+  return new Promise((resolve, reject) => {
+    transaction.oncomplete = () => resolve()
+    transaction.onerror = () => reject(transaction.error)
+    transaction.onabort = () => reject(transaction.error || new Error('Transaction aborted'))
+  })
+}
+
+export function openDocumentDatabase(factory: IDBFactory = indexedDB): Promise<IDBDatabase> {
+  return new Promise((resolve, reject) => {
+    const request = factory.open(DOCUMENT_DB_NAME, DOCUMENT_DB_VERSION)
+    request.onupgradeneeded = () => {
+      const db = request.result
+      for (const store of Object.values(DOCUMENT_DB_STORES)) {
+        if (!db.objectStoreNames.contains(store)) {
+          const keyPath = STORE_KEY_PATHS[store]
+          db.createObjectStore(store, keyPath === undefined ? undefined : { keyPath })
+        }
+      }
+    }
+    request.onsuccess = () => resolve(request.result)
+    request.onerror = () => reject(request.error)
+  })
+}
+
+async function readDictionaries(db: IDBDatabase, ids: string[]): Promise<Map<string, KeyDictionary>> {
+  const store = db.transaction(DOCUMENT_DB_STORES.DICTIONARIES, 'readonly').objectStore(DOCUMENT_DB_STORES.DICTIONARIES)
+  const records = await Promise.all(ids.map(id => requestToPromise<DictionaryRecord | undefined>(store.get(id))))
+  return new Map(ids.map((id, i) => [id, new KeyDictionary(records[i]?.keys ?? [])]))
+}
+
+// Tries at writing a batch while other tabs keep changing its key dictionaries
+const WRITE_BATCH_ATTEMPTS = 5
+
+/**
+ * Write one batch of dirty records in a single readwrite transaction.
+ *
+ * Payloads are key-packed and compressed before the transaction opens,
+ * since IndexedDB transactions commit as soon as they go idle. This runs
+ * on whichever thread owns the database connection. Another tab or worker
+ * may extend the same key dictionaries meanwhile, so the write goes ahead
+ * only if they are still as they were read; otherwise the batch is encoded
+ * again against the new ones.
+ */
+export async function writeBatch(db: IDBDatabase, batch: PersistenceBatch): Promise<WriteStats> {
+  for (let attempt = 1; ; attempt++) {
+    const stats = await tryWriteBatch(db, batch)
+    if (stats) return stats
+    if (attempt >= WRITE_BATCH_ATTEMPTS) {
+      throw new Error('Key dictionaries kept changing during the write')
+    }
+  }
+}
+
+// One attempt at writeBatch; null if a dictionary changed since it was read
+async function tryWriteBatch(db: IDBDatabase, batch: PersistenceBatch): Promise<WriteStats | null> {
+  const started = performance.now()
+  const ids = Array.from(new Set([...batch.documents.map(r => r.id), ...batch.histories.map(r => r.id)]))
+  const dictionaries = await readDictionaries(db, ids)
+  const readKeys = new Map(Array.from(dictionaries, ([id, dictionary]) => [id, dictionary.keys.slice()]))
+  let textBytes = 0
+  let storedBytes = 0
+
+  const encode = async (id: string, value: JsonValue) => {
+    const encoded = await encodePayload(value, dictionaries.get(id)!)
+    textBytes += encoded.textBytes
+    storedBytes += encoded.storedBytes
+    return encoded.payload
+  }
+
+  const documentRecords = await Promise.all(batch.documents.map(async record => ({
+    id: record.id,
+    data: await encode(record.id, record.data),
+    currentHistoryIndex: record.currentHistoryIndex,
+  })))
+  const historyRecords = await Promise.all(batch.histories.map(async record => ({
+    id: record.id,
+    history: await encode(record.id, record.history),
+  })))
+  const durationMs = performance.now() - started
+
+  const transaction = db.transaction(Object.values(DOCUMENT_DB_STORES), 'readwrite')
+  const documents = transaction.objectStore(DOCUMENT_DB_STORES.DOCUMENTS)
+  const history = transaction.objectStore(DOCUMENT_DB_STORES.HISTORY)
+  const meta = transaction.objectStore(DOCUMENT_DB_STORES.META)
+  const dictionaryStore = transaction.objectStore(DOCUMENT_DB_STORES.DICTIONARIES)
+
+  const write = () => {
+    for (const record of documentRecords) {
+      documents.put(record)
+    }
+    for (const record of historyRecords) {
+      history.put(record)
+    }
+    dictionaries.forEach((dictionary, id) => {
+      if (dictionary.changed) {
+        dictionaryStore.put({ id, keys: dictionary.keys })
+      }
+    })
+    for (const { logs, ...canvas } of batch.canvases ?? []) {
+      transaction.objectStore(DOCUMENT_DB_STORES.CANVASES).put(canvas)
+      if (logs) {
+        transaction.objectStore(DOCUMENT_DB_STORES.CANVAS_LOGS).put({ id: canvas.id, ...logs })
+      }
+    }
+    for (const id of batch.deletedIds) {
+      documents.delete(id)
+      history.delete(id)
+      dictionaryStore.delete(id)
+      transaction.objectStore(DOCUMENT_DB_STORES.CANVASES).delete(id)
+      transaction.objectStore(DOCUMENT_DB_STORES.CANVAS_LOGS).delete(id)
+      // Every log record key starts with the document id
+      for (const store of LOG_STORES) {
+        transaction.objectStore(store).delete(IDBKeyRange.bound([id], [id, []]))
+      }
+    }
+    if (batch.workspace) {
+      meta.put(batch.workspace, WORKSPACE_META_KEY)
+    }
+  }
+
+  // Check the dictionaries in this transaction, from request callbacks so
+  // that it stays active, and write only once all of them are unchanged
+  let conflict = false
+  let unchecked = ids.length
+  if (unchecked === 0) write()
+  for (const id of ids) {
+    const request = dictionaryStore.get(id) as IDBRequest<DictionaryRecord | undefined>
+    request.onsuccess = () => {
+      if (conflict) return
+      const stored = request.result?.keys ?? []
+      const read = readKeys.get(id)!
+      if (stored.length !== read.length || stored.some((key, i) => key !== read[i])) {
+        conflict = true
+        transaction.abort()
+        return
+      }
+      if (--unchecked === 0) write()
+    }
+  }
+
+  try {
+    await transactionDone(transaction)
+  } catch (error) {
+    if (conflict) return null
+    throw error
+  }
+  return { textBytes, storedBytes, durationMs }
+}
+
+export async function readWorkspaceIndex(db: IDBDatabase): Promise<WorkspaceRecord | null> {
+  const meta = db.transaction(DOCUMENT_DB_STORES.META, 'readonly').objectStore(DOCUMENT_DB_STORES.META)
+  const workspace = await requestToPromise(meta.get(WORKSPACE_META_KEY))
+  return (workspace as WorkspaceRecord | undefined) ?? null
+}
+
+/**
+ * Read and decode one document and its history, or null if it is not stored.
+ */
+export async function readDocument(db: IDBDatabase, id: string): Promise<StoredDocument | null> {
+  const stores = [
+    DOCUMENT_DB_STORES.DOCUMENTS,
+    DOCUMENT_DB_STORES.HISTORY,
+    DOCUMENT_DB_STORES.DICTIONARIES,
+    DOCUMENT_DB_STORES.CANVASES,
+    DOCUMENT_DB_STORES.CANVAS_LOGS,
+  ]
+  const transaction = db.transaction(stores, 'readonly')
+  const [rawDocument, rawHistory, rawDictionary, rawCanvas, rawCanvasLogs] = await Promise.all([
+    requestToPromise<any>(transaction.objectStore(DOCUMENT_DB_STORES.DOCUMENTS).get(id)),
+    requestToPromise<any>(transaction.objectStore(DOCUMENT_DB_STORES.HISTORY).get(id)),
+    requestToPromise<DictionaryRecord | undefined>(transaction.objectStore(DOCUMENT_DB_STORES.DICTIONARIES).get(id)),
+    requestToPromise<StoredCanvasRecord | undefined>(transaction.objectStore(DOCUMENT_DB_STORES.CANVASES).get(id)),
+    requestToPromise<(StoredCanvasLogs & { id: string }) | undefined>(transaction.objectStore(DOCUMENT_DB_STORES.CANVAS_LOGS).get(id)),
+  ])
+  if (!rawDocument) return null
+
+  const started = performance.now()
+  const dictionary = new KeyDictionary(rawDictionary?.keys ?? [])
+  const document: StoredDocumentRecord = {
+    id,
+    data: await decodePayload(rawDocument.data as StoredPayload, dictionary),
+    currentHistoryIndex: rawDocument.currentHistoryIndex as number,
+  }
+  const history: StoredHistoryRecord | null = rawHistory
+    ? { id, history: await decodePayload(rawHistory.history as StoredPayload, dictionary) as JsonValue[] }
+    : null
+
+  const canvas: StoredCanvasRecord | null = rawCanvas
+    ? {
+        ...rawCanvas,
+        logs: { changeLog: rawCanvasLogs?.changeLog ?? null, learningHistory: rawCanvasLogs?.learningHistory ?? null },
+      }
+    : null
+
+  return { document, history, canvas, decodeMs: performance.now() - started }
+}
+
+/**
+ * Apply one log append: the new entry and values, plus the manifest and
+ * compaction deletes when a segment was sealed.
+ */
+export async function writeLog(db: IDBDatabase, write: LogWrite): Promise<void> {
+  const transaction = db.transaction(LOG_STORES, 'readwrite')
+  const entries = transaction.objectStore(DOCUMENT_DB_STORES.LOG_ENTRIES)
+  const values = transaction.objectStore(DOCUMENT_DB_STORES.LOG_VALUES)
+
+  for (const record of write.entries) {
+    entries.put(record)
+  }
+  for (const record of write.values) {
+    values.put(record)
+  }
+  if (write.manifest) {
+    transaction.objectStore(DOCUMENT_DB_STORES.LOG_MANIFESTS).put(write.manifest)
+  }
+  if (write.deleteBelowSeq !== undefined) {
+    entries.delete(IDBKeyRange.bound([write.docId, write.kind, 0], [write.docId, write.kind, write.deleteBelowSeq], false, true))
+  }
+  for (const hash of write.deleteValues ?? []) {
+    values.delete([write.docId, hash])
+  }
+
+  await transactionDone(transaction)
+}
+
+export async function readLogEntries(
+  db: IDBDatabase,
+  docId: string,
+  kind: LogKind,
+  fromSeq: number,
+  toSeq: number
+): Promise<LogEntryRecord[]> {
+  const store = db.transaction(DOCUMENT_DB_STORES.LOG_ENTRIES, 'readonly').objectStore(DOCUMENT_DB_STORES.LOG_ENTRIES)
+  const range = IDBKeyRange.bound([docId, kind, fromSeq], [docId, kind, toSeq], false, true)
+  return requestToPromise<LogEntryRecord[]>(store.getAll(range))
+}
+
+/**
+ * Read a log's manifest and the entries of its open segment.
+ */
+export async function readLog(
+  db: IDBDatabase,
+  docId: string,
+  kind: LogKind
+): Promise<{ manifest: LogManifest | null; open: LogEntryRecord[] }> {
+  const store = db.transaction(DOCUMENT_DB_STORES.LOG_MANIFESTS, 'readonly').objectStore(DOCUMENT_DB_STORES.LOG_MANIFESTS)
+  const manifest = (await requestToPromise<LogManifest | undefined>(store.get([docId, kind]))) ?? null
+  const openFrom = (manifest?.openSegment ?? 0) * LOG_SEGMENT_SIZE
+  const open = await readLogEntries(db, docId, kind, openFrom, openFrom + LOG_SEGMENT_SIZE)
+  return { manifest, open }
+}
+
+export async function readLogValues(db: IDBDatabase, docId: string, hashes: string[]): Promise<LogValueRecord[]> {
+  const store = db.transaction(DOCUMENT_DB_STORES.LOG_VALUES, 'readonly').objectStore(DOCUMENT_DB_STORES.LOG_VALUES)
+  const records = await Promise.all(hashes.map(hash => requestToPromise<LogValueRecord | undefined>(store.get([docId, hash]))))
+  return records.filter((record): record is LogValueRecord => record !== undefined)
+}
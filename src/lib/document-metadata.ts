@@ -0,0 +1,110 @@
+import type { Document, DocumentMetadata, DocumentSummary, JsonValue } from '@/components/json-canvas/types'
+
+/**
+ * Size and node-count bookkeeping for documents.
+ *
+ * Measurements are cached per object, so re-measuring a document after an
+ * edit only walks the subtrees that were replaced; unchanged subtrees are
+ * shared by reference and hit the cache. This relies on JSON values never
+ * being mutated in place once they are part of a document.
+ */
+
+interface JsonMeasure {
+  size: number
+  nodeCount: number
+}
+
+const measureCache = new WeakMap<object, JsonMeasure>()
+
+/**
+ * UTF-8 length of a string without allocating an encoded copy.
+ */
+export function utf8Length(text: string): number {
+  let bytes = 0
+  for (let i = 0; i < text.length; i++) {
+    const code = text.charCodeAt(i)
+    if (code < 0x80) bytes += 1
+    else if (code < 0x800) bytes += 2
+    else if (code >= 0xd800 && code <= 0xdbff && i + 1 < text.length) {
+      const next = text.charCodeAt(i + 1)
+      if (next >= 0xdc00 && next <= 0xdfff) {
+        bytes += 4
+        i++
+      } else {
+        bytes += 3
+      }
+    } else bytes += 3
+  }
+  return bytes
+}
+
+/**
+ * Byte size of JSON.stringify(value) and the number of nodes in it.
+ */
+export function measureJson(value: JsonValue): JsonMeasure {
+  if (value === null || typeof value !== 'object') {
+    return { size: utf8Length(JSON.stringify(value) ?? 'null'), nodeCount: 1 }
+  }
+
+  const cached = measureCache.get(value)
+  if (cached) return cached
+
+  let size = 2 // brackets
+  let nodeCount = 1
+  if (Array.isArray(value)) {
+    for (let i = 0; i < value.length; i++) {
+      const child = measureJson(value[i])
+      size += child.size + (i > 0 ? 1 : 0)
+      nodeCount += child.nodeCount
+    }
+  } else {
+    let first = true
+    for (const key in value) {
+      const child = measureJson(value[key])
+      size += utf8Length(JSON.stringify(key)) + 1 + child.size + (first ? 0 : 1)
+      nodeCount += child.nodeCount
+      first = false
+    }
+  }
+
+  const measure = { size, nodeCount }
+  measureCache.set(value, measure)
+  return measure
+}
+
+export function createDocumentMetadata(data: JsonValue, now: number = Date.now()): DocumentMetadata {
+  const { size, nodeCount } = measureJson(data)
+  return { size, nodeCount, createdAt: now, modifiedAt: now }
+}
+
+export function updateDocumentMetadata(
+  metadata: DocumentMetadata,
+  data: JsonValue,
+  modifiedAt: number = Date.now()
+): DocumentMetadata {
+  const { size, nodeCount } = measureJson(data)
+  return { ...metadata, size, nodeCount, modifiedAt }
+}
+
+/**
+ * Fill in metadata for documents saved before it existed. Document ids
+ * start with their creation timestamp, so that is the best creation time
+ * available.
+ */
+export function ensureDocumentMetadata(doc: Omit<Document, 'metadata'> & { metadata?: DocumentMetadata }): Document {
+  if (doc.metadata) return doc as Document
+  const now = Date.now()
+  const idTimestamp = parseInt(doc.id, 10)
+  const createdAt = idTimestamp > 0 && idTimestamp <= now ? idTimestamp : now
+  return { ...doc, metadata: { ...createDocumentMetadata(doc.data, now), createdAt } }
+}
+
+export function toDocumentSummary(doc: Document): DocumentSummary {
+  return { id: doc.id, name: doc.name, metadata: doc.metadata, versionCount: doc.history.length }
+}
+
+export function formatByteSize(bytes: number): string {
+  if (bytes < 1024) return `${bytes} B`
+  if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`
+  return `${(bytes / (1024 * 1024)).toFixed(1)} MB`
+}
@@ -0,0 +1,433 @@
+import type { Document, DocumentSummary } from '@/components/json-canvas/types'
+import { ensureDocumentMetadata, toDocumentSummary } from './document-metadata'
+import type {
+  PersistenceBatch,
+  StoredDocument,
+  StoredDocumentRecord,
+  StoredHistoryRecord,
+  WorkspaceEntry,
+  WorkspaceRecord,
+} from './document-db'
+import type { StoredCanvasRecord } from './jsoncanvas-file'
+
+/**
+ * Keys used by the original localStorage autosave. They are only read once,
+ * to migrate an existing workspace into IndexedDB.
+ */
+export const LEGACY_STORAGE_KEYS = {
+  DOCUMENTS_META: 'jsonCanvas_documentsMeta',
+  DOCUMENT_PREFIX: 'jsonCanvas_document_',
+  ACTIVE_DOCUMENT_ID: 'jsonCanvas_activeDocumentId',
+}
+
+export interface StorageBackend {
+  write(batch: PersistenceBatch): Promise<void>
+  readIndex(): Promise<WorkspaceRecord | null>
+  readDocument(id: string): Promise<StoredDocument | null>
+}
+
+export interface LoadedWorkspace {
+  // Every document in the workspace, in order
+  index: DocumentSummary[]
+  // The documents that were hydrated to build the index; always includes the active one
+  documents: Document[]
+  activeDocumentId: string | null
+  migratedFromLocalStorage: boolean
+  // Canvas records of the hydrated documents that have one
+  canvases: StoredCanvasRecord[]
+}
+
+export interface HydratedDocument {
+  document: Document
+  canvas: StoredCanvasRecord | null
+}
+
+interface LegacyWorkspace {
+  documents: Document[]
+  activeDocumentId: string | null
+}
+
+interface DocumentPersistenceOptions {
+  debounceMs?: number
+  onError?: (error: unknown) => void
+}
+
+/**
+ * Tracks which documents changed since the last save and writes only those.
+ *
+ * Callers hand over the workspace index and the hydrated documents on every
+ * change; documents are compared by reference, so an untouched document
+ * costs nothing. Documents that are in the index but not hydrated are left
+ * alone. Pending writes are debounced and flushed as a single batch.
+ * Documents opened from .jsoncanvas files also have a canvas record, queued
+ * with saveCanvas and written in the same batch as the document.
+ */
+export class DocumentPersistence {
+  private readonly backend: StorageBackend
+  private readonly debounceMs: number
+  private readonly onError?: (error: unknown) => void
+
+  private lastSeen = new Map<string, Document>()
+  private knownIds = new Set<string>()
+  private lastWorkspace: WorkspaceRecord | null = null
+
+  private dirtyData = new Map<string, Document>()
+  private dirtyHistory = new Map<string, Document>()
+  private deleted = new Set<string>()
+  private dirtyCanvases = new Map<string, StoredCanvasRecord>()
+  private pendingWorkspace: WorkspaceRecord | null = null
+
+  private timer: ReturnType<typeof setTimeout> | null = null
+  private inFlight: Promise<void> | null = null
+
+  constructor(backend: StorageBackend, options: DocumentPersistenceOptions = {}) {
+    this.backend = backend
+    this.debounceMs = options.debounceMs ?? 500
+    this.onError = options.onError
+  }
+
+  get hasPendingWrites(): boolean {
+    return (
+      this.dirtyData.size > 0 ||
+      this.dirtyHistory.size > 0 ||
+      this.deleted.size > 0 ||
+      this.dirtyCanvases.size > 0 ||
+      this.pendingWorkspace !== null
+    )
+  }
+
+  /**
+   * Load the workspace index and the active document, migrating from
+   * localStorage on first run. Other documents stay in storage until
+   * loadDocument is called for them. Loaded documents are treated as clean.
+   */
+  async load(): Promise<LoadedWorkspace> {
+    const record = await this.backend.readIndex()
+
+    if (!record?.documents.length && !record?.migratedFromLocalStorage) {
+      const legacy = readLegacyWorkspace()
+      if (legacy && legacy.documents.length > 0) {
+        const index = legacy.documents.map(toDocumentSummary)
+        await this.backend.write({
+          ...buildFullBatch(legacy.documents),
+          workspace: { documents: index, activeDocumentId: legacy.activeDocumentId, migratedFromLocalStorage: true },
+        })
+        clearLegacyWorkspace(legacy.documents.map(doc => doc.id))
+        const workspace = {
+          index,
+          documents: legacy.documents,
+          activeDocumentId: legacy.activeDocumentId ?? index[0].id,
+          migratedFromLocalStorage: true,
+          canvases: [],
+        }
+        this.prime(workspace.index, workspace.documents, workspace.activeDocumentId)
+        return workspace
+      }
+    }
+
+    const entries = record?.documents ?? []
+    const activeDocumentId = entries.some(entry => entry.id === record?.activeDocumentId)
+      ? record!.activeDocumentId
+      : entries[0]?.id ?? null
+
+    // Entries written before metadata was tracked are hydrated once so the
+    // sidebar has something to show; the next save backfills their metadata.
+    const toHydrate = entries.filter(entry => entry.id === activeDocumentId || !entry.metadata)
+    const stored = await Promise.all(toHydrate.map(entry => this.backend.readDocument(entry.id)))
+    const documents: Document[] = []
+    const canvases: StoredCanvasRecord[] = []
+    stored.forEach((record, i) => {
+      if (!record) return
+      documents.push(assembleDocument(toHydrate[i], record))
+      if (record.canvas) canvases.push(record.canvas)
+    })
+    const byId = new Map(documents.map(doc => [doc.id, doc]))
+
+    const index: DocumentSummary[] = []
+    for (const entry of entries) {
+      const doc = byId.get(entry.id)
+      if (doc) {
+        index.push(toDocumentSummary(doc))
+      } else if (entry.metadata) {
+        index.push({ id: entry.id, name: entry.name, metadata: entry.metadata, versionCount: entry.versionCount ?? 1 })
+      }
+    }
+
+    const workspace = {
+      index,
+      documents,
+      activeDocumentId: byId.has(activeDocumentId ?? '') ? activeDocumentId : index[0]?.id ?? null,
+      migratedFromLocalStorage: Boolean(record?.migratedFromLocalStorage),
+      canvases,
+    }
+    this.prime(workspace.index, workspace.documents, workspace.activeDocumentId)
+    if (entries.some(entry => !entry.metadata)) {
+      // Compare against what is stored so the backfilled index gets written
+      this.lastWorkspace = { ...this.lastWorkspace!, documents: entries }
+    }
+    return workspace
+  }
+
+  /**
+   * Hydrate a document that is in the index but not in memory.
+   */
+  async loadDocument(entry: DocumentSummary): Promise<HydratedDocument | null> {
+    const stored = await this.backend.readDocument(entry.id)
+    if (!stored) return null
+    const doc = assembleDocument(entry, stored)
+    this.lastSeen.set(doc.id, doc)
+    return { document: doc, canvas: stored.canvas ?? null }
+  }
+
+  /**
+   * Queue a document's canvas record for the next flush. A record without
+   * logs keeps the logs already stored or queued.
+   */
+  saveCanvas(record: StoredCanvasRecord): void {
+    const queued = this.dirtyCanvases.get(record.id)
+    this.dirtyCanvases.set(record.id, queued?.logs && !record.logs ? { ...record, logs: queued.logs } : record)
+    this.schedule()
+  }
+
+  /**
+   * True if this exact document object has been written to storage, so it
+   * can be dropped from memory and hydrated again later without loss.
+   */
+  isPersisted(doc: Document): boolean {
+    return (
+      this.lastSeen.get(doc.id) === doc &&
+      !this.dirtyData.has(doc.id) &&
+      !this.dirtyHistory.has(doc.id) &&
+      !this.dirtyCanvases.has(doc.id)
+    )
+  }
+
+  /**
+   * Record the current workspace. Hydrated documents that differ by
+   * reference from the previous call are queued for the next flush, and
+   * index entries that disappeared are deleted. Documents that were merely
+   * dropped from memory are not touched.
+   */
+  sync(index: DocumentSummary[], documents: Document[], activeDocumentId: string | null): void {
+    const seen = new Map<string, Document>()
+
+    for (const doc of documents) {
+      seen.set(doc.id, doc)
+      const previous = this.lastSeen.get(doc.id)
+      if (!previous || previous.data !== doc.data || previous.currentHistoryIndex !== doc.currentHistoryIndex) {
+        this.dirtyData.set(doc.id, doc)
+      }
+      if (!previous || previous.history !== doc.history) {
+        this.dirtyHistory.set(doc.id, doc)
+      }
+    }
+    this.lastSeen = seen
+
+    const ids = new Set(index.map(entry => entry.id))
+    this.knownIds.forEach(id => {
+      if (!ids.has(id)) {
+        this.dirtyData.delete(id)
+        this.dirtyHistory.delete(id)
+        this.dirtyCanvases.delete(id)
+        this.deleted.add(id)
+      }
+    })
+    ids.forEach(id => this.deleted.delete(id))
+    this.knownIds = ids
+
+    const workspace: WorkspaceRecord = {
+      documents: index.map(toWorkspaceEntry),
+      activeDocumentId,
+      migratedFromLocalStorage: this.lastWorkspace?.migratedFromLocalStorage,
+    }
+    if (!this.lastWorkspace || !sameWorkspace(this.lastWorkspace, workspace)) {
+      this.lastWorkspace = workspace
+      this.pendingWorkspace = workspace
+    }
+
+    if (this.hasPendingWrites) {
+      this.schedule()
+    }
+  }
+
+  /**
+   * Write all pending changes now, in one transaction.
+   */
+  async flush(): Promise<void> {
+    if (this.timer) {
+      clearTimeout(this.timer)
+      this.timer = null
+    }
+    while (this.inFlight) {
+      // The flush that started the write reports its failure and re-queues
+      // its changes, so a failure is not this caller's to rethrow
+      await this.inFlight.catch(() => undefined)
+    }
+    if (!this.hasPendingWrites) return
+
+    const dirtyData = this.dirtyData
+    const dirtyHistory = this.dirtyHistory
+    const deleted = this.deleted
+    const dirtyCanvases = this.dirtyCanvases
+    const workspace = this.pendingWorkspace
+    this.dirtyData = new Map()
+    this.dirtyHistory = new Map()
+    this.deleted = new Set()
+    this.dirtyCanvases = new Map()
+    this.pendingWorkspace = null
+
+    const batch: PersistenceBatch = {
+      documents: Array.from(dirtyData.values(), toDocumentRecord),
+      histories: Array.from(dirtyHistory.values(), toHistoryRecord),
+      deletedIds: Array.from(deleted),
+      workspace: workspace ?? undefined,
+    }
+    if (dirtyCanvases.size > 0) batch.canvases = Array.from(dirtyCanvases.values())
+
+    this.inFlight = this.backend.write(batch)
+    try {
+      await this.inFlight
+    } catch (error) {
+      // Re-queue whatever has not been superseded by a newer change.
+      dirtyData.forEach((doc, id) => {
+        if (!this.dirtyData.has(id) && !this.deleted.has(id)) this.dirtyData.set(id, doc)
+      })
+      dirtyHistory.forEach((doc, id) => {
+        if (!this.dirtyHistory.has(id) && !this.deleted.has(id)) this.dirtyHistory.set(id, doc)
+      })
+      deleted.forEach(id => {
+        if (!this.knownIds.has(id)) this.deleted.add(id)
+      })
+      dirtyCanvases.forEach((record, id) => {
+        if (!this.knownIds.has(id) || this.deleted.has(id)) return
+        const newer = this.dirtyCanvases.get(id)
+        if (!newer) this.dirtyCanvases.set(id, record)
+        else if (record.logs && !newer.logs) this.dirtyCanvases.set(id, { ...newer, logs: record.logs })
+      })
+      if (workspace && !this.pendingWorkspace) this.pendingWorkspace = workspace
+      this.onError?.(error)
+    } finally {
+      this.inFlight = null
+    }
+  }
+
+  dispose(): void {
+    if (this.timer) {
+      clearTimeout(this.timer)
+      this.timer = null
+    }
+  }
+
+  private prime(index: DocumentSummary[], documents: Document[], activeDocumentId: string | null): void {
+    this.lastSeen = new Map(documents.map(doc => [doc.id, doc]))
+    this.knownIds = new Set(index.map(entry => entry.id))
+    // Once a workspace has been loaded, the legacy keys have either been
+    // migrated or never existed, so later writes record migration as done.
+    this.lastWorkspace = {
+      documents: index.map(toWorkspaceEntry),
+      activeDocumentId,
+      migratedFromLocalStorage: true,
+    }
+  }
+
+  private schedule(): void {
+    if (this.timer) {
+      clearTimeout(this.timer)
+    }
+    this.timer = setTimeout(() => {
+      this.timer = null
+      void this.flush()
+    }, this.debounceMs)
+  }
+}
+
+function toWorkspaceEntry(summary: DocumentSummary): WorkspaceEntry {
+  return { id: summary.id, name: summary.name, metadata: summary.metadata, versionCount: summary.versionCount }
+}
+
+function toDocumentRecord(doc: Document): StoredDocumentRecord {
+  return { id: doc.id, data: doc.data, currentHistoryIndex: doc.currentHistoryIndex }
+}
+
+function toHistoryRecord(doc: Document): StoredHistoryRecord {
+  return { id: doc.id, history: doc.history }
+}
+
+function buildFullBatch(documents: Document[]): PersistenceBatch {
+  return {
+    documents: documents.map(toDocumentRecord),
+    histories: documents.map(toHistoryRecord),
+    deletedIds: [],
+  }
+}
+
+function sameWorkspace(a: WorkspaceRecord, b: WorkspaceRecord): boolean {
+  if (a.activeDocumentId !== b.activeDocumentId || a.documents.length !== b.documents.length) {
+    return false
+  }
+  return a.documents.every((entry, i) => {
+    const other = b.documents[i]
+    return (
+      entry.id === other.id &&
+      entry.name === other.name &&
+      entry.metadata === other.metadata &&
+      entry.versionCount === other.versionCount
+    )
+  })
+}
+
+/**
+ * Join a stored document and its history back into a document.
+ */
+export function assembleDocument(entry: WorkspaceEntry, stored: StoredDocument): Document {
+  const { document: record } = stored
+  const history = stored.history?.history ?? [record.data]
+  return ensureDocumentMetadata({
+    id: entry.id,
+    name: entry.name,
+    data: record.data,
+    history,
+    currentHistoryIndex: Math.min(record.currentHistoryIndex, history.length - 1),
+    metadata: entry.metadata,
+  })
+}
+
+/**
+ * Read a workspace saved by the old localStorage autosave, if any.
+ */
+export function readLegacyWorkspace(): LegacyWorkspace | null {
+  try {
+    const metaString = localStorage.getItem(LEGACY_STORAGE_KEYS.DOCUMENTS_META)
+    if (!metaString) return null
+
+    const meta: { id: string; name: string }[] = JSON.parse(metaString)
+    const documents: Document[] = []
+    for (const entry of meta) {
+      const docString = localStorage.getItem(`${LEGACY_STORAGE_KEYS.DOCUMENT_PREFIX}${entry.id}`)
+      if (docString) {
+        documents.push(ensureDocumentMetadata(JSON.parse(docString)))
+      }
+    }
+
+    const activeDocumentId = localStorage.getItem(LEGACY_STORAGE_KEYS.ACTIVE_DOCUMENT_ID)
+    return {
+      documents,
+      activeDocumentId: documents.some(doc => doc.id === activeDocumentId) ? activeDocumentId : null,
+    }
+  } catch (error) {
+    console.warn('Failed to read legacy localStorage workspace:', error)
+    return null
+  }
+}
+
+export function clearLegacyWorkspace(documentIds: string[]): void {
+  try {
+    localStorage.removeItem(LEGACY_STORAGE_KEYS.DOCUMENTS_META)
+    localStorage.removeItem(LEGACY_STORAGE_KEYS.ACTIVE_DOCUMENT_ID)
+    for (const id of documentIds) {
+      localStorage.removeItem(`${LEGACY_STORAGE_KEYS.DOCUMENT_PREFIX}${id}`)
+    }
+  } catch (error) {
+    console.warn('Failed to clear legacy localStorage workspace:', error)
+  }
+}
@@ -0,0 +1,67 @@
+import { openDocumentDatabase, readDocument, readLog, readLogEntries, readLogValues, readWorkspaceIndex, writeBatch, writeLog } from './document-db'
+import type { StorageWorkerRequest, StorageWorkerResponse } from './storage-worker-client'
+
+/**
+ * Owns the IndexedDB connection so that serialization, compression and
+ * the write transaction for each batch happen off the main thread.
+ */
+
+// Typed as Worker so this file compiles against the DOM lib used by the app.
+const ctx = self as unknown as Worker
+
+let dbPromise: Promise<IDBDatabase> | null = null
+
+function getDatabase(): Promise<IDBDatabase> {
+  if (!dbPromise) {
+    dbPromise = openDocumentDatabase().catch(error => {
+      dbPromise = null
+      throw error
+    })
+  }
+  return dbPromise
+}
+
+ctx.onmessage = async (event: MessageEvent<StorageWorkerRequest>) => {
+  const request = event.data
+  let response: StorageWorkerResponse
+
+  try {
+    const db = await getDatabase()
+    switch (request.type) {
+      case 'write':
+        response = { requestId: request.requestId, result: await writeBatch(db, request.batch) }
+        break
+      case 'readIndex':
+        response = { requestId: request.requestId, result: await readWorkspaceIndex(db) }
+        break
+      case 'readDocument':
+        response = { requestId: request.requestId, result: await readDocument(db, request.id) }
+        break
+      case 'writeLog':
+        await writeLog(db, request.write)
+        response = { requestId: request.requestId, result: null }
+        break
+      case 'readLog':
+        response = { requestId: request.requestId, result: await readLog(db, request.docId, request.kind) }
+        break
+      case 'readLogEntries':
+        response = {
+          requestId: request.requestId,
+          result: await readLogEntries(db, request.docId, request.kind, request.fromSeq, request.toSeq),
+        }
+        break
+      case 'readLogValues':
+        response = { requestId: request.requestId, result: await readLogValues(db, request.docId, request.hashes) }
+        break
+      default:
+        throw new Error(`Unknown storage request: ${(request as any).type}`)
+    }
+  } catch (error) {
+    response = {
+      requestId: request.requestId,
+      error: error instanceof Error ? error.message : String(error),
+    }
+  }
+
+  ctx.postMessage(response)
+}
@@ -0,0 +1,98 @@
+import type { Document } from '@/components/json-canvas/types'
+
+/**
+ * Server-side store of documents for the headless API.
+ *
+ * Every write gives a document a new version, and the version together
+ * with the store's epoch (new each time the server starts) makes a strong
+ * ETag without hashing the document. Writers name the version they read,
+ * by ETag or number, to be refused if another write came first.
+ *
+ * The response bodies built for the current version are kept with it, so
+ * reads of an unchanged document are not serialized or compressed again.
+ * Only those of the representation last asked for are kept, so a document
+ * holds its body and a compressed copy or two rather than every variant.
+ * Like the canvas store, the store lives on globalThis so that every route
+ * module, and hot reloads in development, see the same instance.
+ */
+
+export interface StoredDocument {
+  document: Document
+  version: number
+  // Response bodies of this version for the representation last asked for, by content encoding
+  bodies: { representation: string; encodings: Map<string, Uint8Array> } | null
+}
+
+export class DocumentStore {
+  private readonly documents = new Map<string, StoredDocument>()
+  readonly epoch = Date.now().toString(36) + Math.random().toString(36).slice(2, 6)
+
+  get(id: string): StoredDocument | undefined {
+    return this.documents.get(id)
+  }
+
+  /** Store a document, replacing any with the same id, under the next version. */
+  put(document: Document): StoredDocument {
+    const existing = this.documents.get(document.id)
+    const stored: StoredDocument = {
+      document,
+      version: (existing?.version ?? 0) + 1,
+      bodies: null,
+    }
+    this.documents.set(document.id, stored)
+    return stored
+  }
+
+  delete(id: string): boolean {
+    return this.documents.delete(id)
+  }
+
+  /** A strong ETag for one representation (e.g. with or without history) of the stored version. */
+  etag(stored: StoredDocument, representation: string): string {
+    return `"${this.epoch}-${stored.version}-${representation}"`
+  }
+
+  /**
+   * Whether an If-Match header names the stored version: "*", or the
+   * ETag of any of its representations. Uses the strong comparison RFC
+   * 9110 specifies for If-Match, so weak tags never match.
+   */
+  ifMatch(stored: StoredDocument, ifMatch: string): boolean {
+    const prefix = `"${this.epoch}-${stored.version}-`
+    return ifMatch.split(',').some(tag => tag.trim() === '*' || tag.trim().startsWith(prefix))
+  }
+
+  /**
+   * The body for a representation of the stored version in a content
+   * encoding, built by encode on first use. Asking for another
+   * representation drops the bodies kept for the previous one.
+   */
+  body(
+    stored: StoredDocument,
+    representation: string,
+    encode: () => Uint8Array,
+    encoding = 'identity'
+  ): Uint8Array {
+    if (stored.bodies?.representation !== representation) {
+      stored.bodies = { representation, encodings: new Map() }
+    }
+    let body = stored.bodies.encodings.get(encoding)
+    if (!body) {
+      body = encode()
+      stored.bodies.encodings.set(encoding, body)
+    }
+    return body
+  }
+}
+
+/** The document as the API sends it: with its version, to send back with writes */
+export function withVersion(stored: StoredDocument): Document & { version: number } {
+  return { ...stored.document, version: stored.version }
+}
+
+const globalStore = globalThis as typeof globalThis & { __jsonCanvasDocumentStore?: DocumentStore }
+
+export function getDocumentStore(): DocumentStore {
+  if (!globalStore.__jsonCanvasDocumentStore) globalStore.__jsonCanvasDocumentStore = new DocumentStore()
+  return globalStore.__jsonCanvasDocumentStore
+}
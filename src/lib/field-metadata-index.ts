@@ -0,0 +1,223 @@
+import type { JsonPath, JsonStructureEdit } from '@/components/json-canvas/types'
+import type { FieldAIData } from './jsoncanvas-types'
+import { formatJsonPath, parseConcretePath } from './jsonpath'
+
+/**
+ * Path trie over `$metadata.ai.fieldMetadata`.
+ *
+ * Each node holds the metadata for its own path and an aggregate over its
+ * whole subtree, so the tree view can find a node's metadata by walking
+ * one child per level and show subtree confidence without scanning keys.
+ *
+ * Nodes are immutable. Updates copy only the nodes along the edited path,
+ * the same way json-utils edits documents, so a rendered JsonNode receives
+ * a new metadata node only when something under it changed.
+ */
+
+export interface FieldMetadataSummary {
+  // Fields with metadata in this subtree, including the node itself
+  fields: number
+  // Fields whose source is neither 'user-input' nor 'ai-verified'
+  unverified: number
+  minConfidence: number | null
+  totalConfidence: number
+}
+
+export interface FieldMetadataNode {
+  field: FieldAIData | null
+  children: ReadonlyMap<string, FieldMetadataNode>
+  summary: FieldMetadataSummary
+}
+
+export const EMPTY_FIELD_METADATA: FieldMetadataNode = {
+  field: null,
+  children: new Map(),
+  summary: { fields: 0, unverified: 0, minConfidence: null, totalConfidence: 0 },
+}
+
+export function isVerifiedField(field: FieldAIData): boolean {
+  return field.source === 'user-input' || field.source === 'ai-verified'
+}
+
+export function averageConfidence(summary: FieldMetadataSummary): number | null {
+  return summary.fields > 0 ? summary.totalConfidence / summary.fields : null
+}
+
+function makeNode(field: FieldAIData | null, children: ReadonlyMap<string, FieldMetadataNode>): FieldMetadataNode | null {
+  if (!field && children.size === 0) return null
+
+  const summary: FieldMetadataSummary = { fields: 0, unverified: 0, minConfidence: null, totalConfidence: 0 }
+  if (field) {
+    summary.fields = 1
+    summary.unverified = isVerifiedField(field) ? 0 : 1
+    summary.minConfidence = field.confidence
+    summary.totalConfidence = field.confidence
+  }
+  children.forEach(child => {
+    const { fields, unverified, minConfidence, totalConfidence } = child.summary
+    summary.fields += fields
+    summary.unverified += unverified
+    summary.totalConfidence += totalConfidence
+    if (minConfidence !== null && (summary.minConfidence === null || minConfidence < summary.minConfidence)) {
+      summary.minConfidence = minConfidence
+    }
+  })
+  return { field, children, summary }
+}
+
+interface DraftNode {
+  field: FieldAIData | null
+  children: Map<string, DraftNode>
+}
+
+function finalize(draft: DraftNode): FieldMetadataNode | null {
+  const children = new Map<string, FieldMetadataNode>()
+  draft.children.forEach((child, key) => {
+    const node = finalize(child)
+    if (node) children.set(key, node)
+  })
+  return makeNode(draft.field, children)
+}
+
+/**
+ * Build the index from a fieldMetadata record. Keys that do not name a
+ * single location (wildcards, filters) or fail to parse are skipped.
+ */
+export function buildFieldMetadataIndex(record: Record<string, FieldAIData> | undefined): FieldMetadataNode {
+  const root: DraftNode = { field: null, children: new Map() }
+  for (const [key, field] of Object.entries(record ?? {})) {
+    let segments: string[] | null
+    try {
+      segments = parseConcretePath(key)
+    } catch {
+      segments = null
+    }
+    if (!segments || !field || typeof field.confidence !== 'number') continue
+
+    let node = root
+    for (const segment of segments) {
+      let child = node.children.get(segment)
+      if (!child) {
+        child = { field: null, children: new Map() }
+        node.children.set(segment, child)
+      }
+      node = child
+    }
+    node.field = field
+  }
+  return finalize(root) ?? EMPTY_FIELD_METADATA
+}
+
+/**
+ * The inverse of buildFieldMetadataIndex, with keys in dotted form.
+ */
+export function fieldMetadataToRecord(index: FieldMetadataNode): Record<string, FieldAIData> {
+  const record: Record<string, FieldAIData> = {}
+  const visit = (node: FieldMetadataNode, path: string[]) => {
+    if (node.field) record[formatJsonPath(path)] = node.field
+    node.children.forEach((child, key) => {
+      path.push(key)
+      visit(child, path)
+      path.pop()
+    })
+  }
+  visit(index, [])
+  return record
+}
+
+export function childFieldMetadata(node: FieldMetadataNode | undefined, key: string | number): FieldMetadataNode | undefined {
+  return node?.children.get(String(key))
+}
+
+export function lookupFieldMetadata(index: FieldMetadataNode | undefined, path: JsonPath): FieldMetadataNode | undefined {
+  let node = index
+  for (const segment of path) {
+    if (!node) return undefined
+    node = node.children.get(String(segment))
+  }
+  return node
+}
+
+/**
+ * Replace the node at path with update(node), copying its ancestors.
+ */
+function updateAt(
+  node: FieldMetadataNode | undefined,
+  path: JsonPath,
+  depth: number,
+  update: (node: FieldMetadataNode | undefined) => FieldMetadataNode | null
+): FieldMetadataNode | null {
+  if (depth === path.length) return update(node)
+
+  const key = String(path[depth])
+  const child = node?.children.get(key)
+  const nextChild = updateAt(child, path, depth + 1, update)
+  if (nextChild === (child ?? null)) return node ?? null
+
+  const children = new Map(node?.children)
+  if (nextChild) children.set(key, nextChild)
+  else children.delete(key)
+  return makeNode(node?.field ?? null, children)
+}
+
+function updateIndex(
+  index: FieldMetadataNode,
+  path: JsonPath,
+  update: (node: FieldMetadataNode | undefined) => FieldMetadataNode | null
+): FieldMetadataNode {
+  return updateAt(index, path, 0, update) ?? EMPTY_FIELD_METADATA
+}
+
+/**
+ * Re-key the array item children of node. mapIndex returns the new index,
+ * or null to drop the item.
+ */
+function reindex(node: FieldMetadataNode | undefined, mapIndex: (index: number) => number | null): FieldMetadataNode | null {
+  if (!node) return null
+  let changed = false
+  const children = new Map<string, FieldMetadataNode>()
+  node.children.forEach((child, key) => {
+    if (!/^(0|[1-9]\d*)$/.test(key)) {
+      children.set(key, child)
+      return
+    }
+    const next = mapIndex(Number(key))
+    if (next !== Number(key)) changed = true
+    if (next !== null) children.set(String(next), child)
+  })
+  return changed ? makeNode(node.field, children) : node
+}
+
+export function setFieldMetadata(index: FieldMetadataNode, path: JsonPath, field: FieldAIData | null): FieldMetadataNode {
+  return updateIndex(index, path, node => makeNode(field, node?.children ?? new Map()))
+}
+
+/**
+ * Keep the index in step with a structural edit to the document, so that
+ * metadata follows renamed properties and array items that shift.
+ */
+export function applyStructureEdit(index: FieldMetadataNode, edit: JsonStructureEdit): FieldMetadataNode {
+  switch (edit.type) {
+    case 'delete': {
+      if (edit.path.length === 0) return EMPTY_FIELD_METADATA
+      const last = edit.path[edit.path.length - 1]
+      const parentPath = edit.path.slice(0, -1)
+      if (typeof last === 'number') {
+        // Later items move down one place
+        return updateIndex(index, parentPath, node => reindex(node, i => (i === last ? null : i > last ? i - 1 : i)))
+      }
+      return updateIndex(index, edit.path, () => null)
+    }
+    case 'rename': {
+      const { oldKey, newKey } = edit
+      return updateIndex(index, edit.path, node => {
+        const moved = node?.children.get(oldKey)
+        if (!node || !moved || oldKey === newKey) return node ?? null
+        const children = new Map(node.children)
+        children.delete(oldKey)
+        children.set(newKey, moved)
+        return makeNode(node.field, children)
+      })
+    }
+  }
+}
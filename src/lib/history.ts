@@ -0,0 +1,182 @@
+import type { HistoryEdit, JsonObject, JsonPath, JsonValue } from '@/components/json-canvas/types'
+import { measureJson } from './document-metadata'
+
+/**
+ * Undo/redo history built on structural sharing.
+ *
+ * Snapshots are immutable and consecutive snapshots share every subtree
+ * that did not change, so a history entry costs roughly the size of the
+ * path that was edited rather than the whole document.
+ */
+
+export const HISTORY_LIMIT = 50
+
+// Edits to the same field closer together than this share one history entry
+export const HISTORY_COALESCE_MS = 1000
+
+export interface HistoryUpdate {
+  history: JsonValue[]
+  currentHistoryIndex: number
+  lastEdit: HistoryEdit | null
+}
+
+export interface HistoryMemory {
+  entries: number
+  // Bytes with shared subtrees counted once
+  bytes: number
+  // Bytes if every entry were an independent copy
+  unsharedBytes: number
+}
+
+function isContainer(value: JsonValue): value is JsonObject | JsonValue[] {
+  return value !== null && typeof value === 'object'
+}
+
+/**
+ * Return next, reusing subtrees of prev wherever they are deeply equal, so
+ * that values produced by a full replace (e.g. "Edit Entire JSON" or an AI
+ * rewrite) share structure with the snapshot before them. Returns prev
+ * itself if nothing changed.
+ */
+export function shareStructure(prev: JsonValue, next: JsonValue): JsonValue {
+  if (prev === next || !isContainer(prev) || !isContainer(next)) {
+    return prev === next ? prev : next
+  }
+
+  if (Array.isArray(prev) || Array.isArray(next)) {
+    if (!Array.isArray(prev) || !Array.isArray(next)) return next
+    let same = prev.length === next.length
+    const shared = next.map((item, i) => {
+      const value = i < prev.length ? shareStructure(prev[i], item) : item
+      if (value !== prev[i]) same = false
+      return value
+    })
+    return same ? prev : shared
+  }
+
+  const prevObject = prev as JsonObject
+  const nextKeys = Object.keys(next)
+  const prevKeys = Object.keys(prevObject)
+  let same = nextKeys.length === prevKeys.length
+  const shared: JsonObject = {}
+  nextKeys.forEach((key, i) => {
+    const value = Object.prototype.hasOwnProperty.call(prevObject, key)
+      ? shareStructure(prevObject[key], next[key])
+      : next[key]
+    if (value !== prevObject[key] || prevKeys[i] !== key) same = false
+    shared[key] = value
+  })
+  return same ? prev : shared
+}
+
+/**
+ * If prev and next differ in exactly one primitive value (and nothing was
+ * added, removed or reordered), return its path. Relies on unchanged
+ * subtrees being shared by reference, which shareStructure guarantees.
+ */
+export function findSingleLeafChange(prev: JsonValue, next: JsonValue): JsonPath | null {
+  const path: JsonPath = []
+  let a = prev
+  let b = next
+
+  while (a !== b) {
+    if (!isContainer(a) || !isContainer(b)) {
+      return isContainer(a) || isContainer(b) ? null : path
+    }
+    if (Array.isArray(a) !== Array.isArray(b)) return null
+
+    const keysA = Object.keys(a)
+    const keysB = Object.keys(b)
+    if (keysA.length !== keysB.length) return null
+
+    let changedKey: string | null = null
+    for (let i = 0; i < keysA.length; i++) {
+      if (keysA[i] !== keysB[i]) return null
+      if ((a as JsonObject)[keysA[i]] !== (b as JsonObject)[keysB[i]]) {
+        if (changedKey !== null) return null
+        changedKey = keysA[i]
+      }
+    }
+    if (changedKey === null) return null
+
+    path.push(Array.isArray(a) ? Number(changedKey) : changedKey)
+    a = (a as JsonObject)[changedKey]
+    b = (b as JsonObject)[changedKey]
+  }
+  return null
+}
+
+/**
+ * Add a snapshot after the current position, dropping any redo entries.
+ * Consecutive edits to the same primitive field within the coalesce window
+ * replace the top entry instead of adding one. History is capped at
+ * HISTORY_LIMIT entries.
+ */
+export function pushHistory(
+  history: JsonValue[],
+  currentHistoryIndex: number,
+  next: JsonValue,
+  lastEdit: HistoryEdit | null = null,
+  now: number = Date.now()
+): HistoryUpdate {
+  const current = history[currentHistoryIndex]
+  const leafPath = findSingleLeafChange(current, next)
+  const edit = leafPath ? { path: JSON.stringify(leafPath), at: now } : null
+
+  const canCoalesce =
+    edit !== null &&
+    lastEdit !== null &&
+    lastEdit.path === edit.path &&
+    now - lastEdit.at <= HISTORY_COALESCE_MS &&
+    currentHistoryIndex === history.length - 1 &&
+    currentHistoryIndex > 0
+
+  if (canCoalesce) {
+    const coalesced = history.slice(0, currentHistoryIndex)
+    coalesced.push(next)
+    return { history: coalesced, currentHistoryIndex, lastEdit: edit }
+  }
+
+  const appended = history.slice(0, currentHistoryIndex + 1)
+  appended.push(next)
+  const capped = appended.length > HISTORY_LIMIT ? appended.slice(-HISTORY_LIMIT) : appended
+  return { history: capped, currentHistoryIndex: capped.length - 1, lastEdit: edit }
+}
+
+/**
+ * Memory held by a history, counting subtrees shared between snapshots once.
+ * Sizes are serialized JSON bytes, which tracks the heap cost closely enough
+ * to compare snapshots against each other.
+ */
+export function measureHistoryMemory(history: JsonValue[]): HistoryMemory {
+  const visited = new Set<object>()
+  let bytes = 0
+
+  const visit = (value: JsonValue) => {
+    if (!isContainer(value)) {
+      bytes += measureJson(value).size
+      return
+    }
+    if (visited.has(value)) return
+    visited.add(value)
+
+    // Own bytes: brackets, keys, separators and primitive children
+    let own = measureJson(value).size
+    const children = Array.isArray(value) ? value : Object.values(value)
+    for (const child of children) {
+      if (isContainer(child)) own -= measureJson(child).size
+    }
+    bytes += own
+    for (const child of children) {
+      if (isContainer(child)) visit(child)
+    }
+  }
+
+  let unsharedBytes = 0
+  for (const entry of history) {
+    unsharedBytes += measureJson(entry).size
+    visit(entry)
+  }
+
+  return { entries: history.length, bytes, unsharedBytes }
+}
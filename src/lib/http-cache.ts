@@ -0,0 +1,79 @@
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+/**
+ * Conditional requests and content negotiation for API responses.
+ *
+ * Routes that can name the version of what they send give it an ETag and
+ * answer a matching If-None-Match with 304, so polling clients only
+ * download a resource when it has changed. Large bodies are compressed
+ * with brotli or gzip when the client accepts them; each encoding is a
+ * separate representation with its own ETag.
+ */
+
+export type ContentEncoding = 'br' | 'gzip'
+
+// Smaller bodies are sent as they are: compressing them saves less than it costs
+export const COMPRESSION_MIN_BYTES = 1024
+
+// Brotli's default quality (11) takes seconds on a multi-megabyte body
+const BROTLI_QUALITY = 5
+
+// Preferred first when the client accepts both equally
+const ENCODINGS: ContentEncoding[] = ['br', 'gzip']
+
+/**
+ * The encoding to send for an Accept-Encoding header: the accepted
+ * encoding with the highest q-value, brotli on a tie, or null for none.
+ */
+export function negotiateEncoding(acceptEncoding: string | null): ContentEncoding | null {
+  if (!acceptEncoding) return null
+  const weights = new Map<string, number>()
+  for (const part of acceptEncoding.split(',')) {
+    const [name, ...params] = part.trim().toLowerCase().split(';')
+    if (!name) continue
+    const q = params.map(param => param.trim()).find(param => param.startsWith('q='))
+    const weight = q === undefined ? 1 : Number(q.slice(2))
+    weights.set(name, Number.isNaN(weight) ? 0 : weight)
+  }
+
+  let best: ContentEncoding | null = null
+  let bestWeight = 0
+  for (const encoding of ENCODINGS) {
+    const weight = weights.get(encoding) ?? weights.get('*') ?? 0
+    if (weight > bestWeight) {
+      best = encoding
+      bestWeight = weight
+    }
+  }
+  return best
+}
+
+export function compress(body: Uint8Array, encoding: ContentEncoding): Uint8Array {
+  if (encoding === 'br') {
+    return brotliCompressSync(body, {
+      params: {
+        [constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY,
+        [constants.BROTLI_PARAM_SIZE_HINT]: body.byteLength,
+      },
+    })
+  }
+  return gzipSync(body)
+}
+
+/**
+ * The ETag of an encoded representation: the identity ETag with the
+ * encoding appended inside the quotes
+ */
+export function encodedEtag(etag: string, encoding: ContentEncoding | null): string {
+  return encoding ? `${etag.slice(0, -1)}-${encoding}"` : etag
+}
+
+/**
+ * Whether an If-None-Match header names etag. Uses the weak comparison
+ * RFC 9110 specifies for If-None-Match, and "*" matches anything.
+ */
+export function etagMatches(ifNoneMatch: string | null, etag: string): boolean {
+  if (!ifNoneMatch) return false
+  const opaque = (tag: string) => tag.trim().replace(/^W\//, '')
+  return ifNoneMatch.split(',').some(tag => tag.trim() === '*' || opaque(tag) === opaque(etag))
+}
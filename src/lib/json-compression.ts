@@ -0,0 +1,132 @@
+import type { JsonValue } from '@/components/json-canvas/types'
+
+/**
+ * At-rest encoding for stored documents.
+ *
+ * Object keys are replaced with short tokens indexing a per-document key
+ * dictionary, then the JSON text is gzipped with CompressionStream. The
+ * dictionary is append-only so payloads written earlier stay decodable.
+ */
+
+export interface CompressedPayload {
+  encoding: 'gzip' | 'json'
+  // gzip bytes, or the key-packed JSON text when CompressionStream is unavailable
+  body: Uint8Array | string
+}
+
+// Plain JSON strings are what the first IndexedDB version stored.
+export type StoredPayload = string | CompressedPayload
+
+export interface EncodedPayload {
+  payload: CompressedPayload
+  textBytes: number
+  storedBytes: number
+}
+
+const KEY_TOKEN_PREFIX = '~'
+
+export class KeyDictionary {
+  readonly keys: string[]
+  private readonly lookup: Map<string, number>
+  private added = false
+
+  constructor(keys: string[] = []) {
+    this.keys = keys
+    this.lookup = new Map(keys.map((key, i) => [key, i]))
+  }
+
+  /** True if keys were appended since construction. */
+  get changed(): boolean {
+    return this.added
+  }
+
+  token(key: string): string {
+    let index = this.lookup.get(key)
+    if (index === undefined) {
+      index = this.keys.length
+      this.keys.push(key)
+      this.lookup.set(key, index)
+      this.added = true
+    }
+    return KEY_TOKEN_PREFIX + index.toString(36)
+  }
+
+  key(token: string): string {
+    const key = this.keys[parseInt(token.slice(KEY_TOKEN_PREFIX.length), 36)]
+    if (key === undefined) {
+      throw new Error(`Unknown key token: ${token}`)
+    }
+    return key
+  }
+}
+
+/**
+ * Replace every object key with its dictionary token. Tokens are never
+ * integer-like, so key order survives the round trip.
+ */
+export function packKeys(value: JsonValue, dictionary: KeyDictionary): JsonValue {
+  if (value === null || typeof value !== 'object') {
+    return value
+  }
+  if (Array.isArray(value)) {
+    return value.map(item => packKeys(item, dictionary))
+  }
+  const packed: { [key: string]: JsonValue } = {}
+  for (const key in value) {
+    packed[dictionary.token(key)] = packKeys(value[key], dictionary)
+  }
+  return packed
+}
+
+export function unpackKeys(value: JsonValue, dictionary: KeyDictionary): JsonValue {
+  if (value === null || typeof value !== 'object') {
+    return value
+  }
+  if (Array.isArray(value)) {
+    for (let i = 0; i < value.length; i++) {
+      value[i] = unpackKeys(value[i], dictionary)
+    }
+    return value
+  }
+  const unpacked: { [key: string]: JsonValue } = {}
+  for (const token in value) {
+    unpacked[dictionary.key(token)] = unpackKeys(value[token], dictionary)
+  }
+  return unpacked
+}
+
+export function isCompressionSupported(): boolean {
+  return typeof CompressionStream !== 'undefined' && typeof DecompressionStream !== 'undefined'
+}
+
+async function gzip(text: string): Promise<Uint8Array> {
+  const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'))
+  return new Uint8Array(await new Response(stream).arrayBuffer())
+}
+
+async function gunzip(bytes: Uint8Array): Promise<string> {
+  const stream = new Blob([bytes as BlobPart]).stream().pipeThrough(new DecompressionStream('gzip'))
+  return new Response(stream).text()
+}
+
+export async function encodePayload(value: JsonValue, dictionary: KeyDictionary): Promise<EncodedPayload> {
+  const text = JSON.stringify(packKeys(value, dictionary))
+  const textBytes = new TextEncoder().encode(text).length
+
+  if (!isCompressionSupported()) {
+    return { payload: { encoding: 'json', body: text }, textBytes, storedBytes: textBytes }
+  }
+
+  const body = await gzip(text)
+  return { payload: { encoding: 'gzip', body }, textBytes, storedBytes: body.byteLength }
+}
+
+export async function decodePayload(payload: StoredPayload, dictionary: KeyDictionary): Promise<JsonValue> {
+  if (typeof payload === 'string') {
+    return JSON.parse(payload)
+  }
+  const text = payload.encoding === 'gzip'
+    ? await gunzip(payload.body as Uint8Array)
+    : payload.body as string
+  return unpackKeys(JSON.parse(text), dictionary)
+}
@@ -0,0 +1,365 @@
+import type { JsonObject, JsonPath, JsonValue } from '@/components/json-canvas/types'
+
+/**
+ * RFC 6902 JSON Patch from one document to an edited copy of it, and
+ * applying a patch to a document.
+ *
+ * The edits in json-utils copy only the containers along the edited path
+ * and share every other subtree with the input, so a subtree that is the
+ * same object in both documents is unchanged and is not descended into.
+ * Diffing an edit therefore costs the size of the containers along its
+ * path, not of the document. Unshared subtrees are still compared
+ * correctly, just more slowly.
+ *
+ * Only what JSON shows is compared: properties holding undefined or a
+ * function, and anything on a prototype, are treated as absent.
+ */
+
+// diffJson writes only add, remove and replace; applyPatch takes them all
+export type JsonPatchOperation =
+  | { op: 'add'; path: string; value: JsonValue }
+  | { op: 'remove'; path: string }
+  | { op: 'replace'; path: string; value: JsonValue }
+  | { op: 'move'; from: string; path: string }
+  | { op: 'copy'; from: string; path: string }
+  | { op: 'test'; path: string; value: JsonValue }
+
+export class JsonPatchError extends Error {
+  // Position in the patch of the operation that could not be applied
+  readonly index: number
+
+  constructor(index: number, message: string) {
+    super(`Operation ${index}: ${message}`)
+    this.name = 'JsonPatchError'
+    this.index = index
+  }
+}
+
+export interface ChangedSubtree {
+  // Setting the value at path in the original document gives the edited one
+  path: JsonPath
+  value: JsonValue
+}
+
+type Container = JsonObject | JsonValue[]
+
+function isContainer(value: unknown): value is Container {
+  return value !== null && typeof value === 'object'
+}
+
+function isVisible(value: unknown): boolean {
+  return value !== undefined && typeof value !== 'function'
+}
+
+// What JSON.stringify writes for an array element
+function visibleItem(value: JsonValue): JsonValue {
+  return isVisible(value) ? value : null
+}
+
+function visibleKeys(object: JsonObject): string[] {
+  return Object.keys(object).filter(key => isVisible(object[key]))
+}
+
+/**
+ * Encode a path as a JSON Pointer (RFC 6901)
+ */
+export function toPointer(path: JsonPath): string {
+  return path.map(segment => '/' + String(segment).replace(/~/g, '~0').replace(/\//g, '~1')).join('')
+}
+
+function diffArrays(before: JsonValue[], after: JsonValue[], path: JsonPath, patch: JsonPatchOperation[]) {
+  let start = 0
+  const shortest = Math.min(before.length, after.length)
+  while (start < shortest && before[start] === after[start]) start++
+  let end = 0
+  while (end < shortest - start && before[before.length - 1 - end] === after[after.length - 1 - end]) end++
+
+  const removed = before.length - start - end
+  const added = after.length - start - end
+  if (removed === added) {
+    for (let i = start; i < start + added; i++) {
+      diffValues(visibleItem(before[i]), visibleItem(after[i]), [...path, i], patch)
+    }
+    return
+  }
+  if (removed > 0 && added > 0) {
+    // Items both removed and added in the middle: not worth an edit script
+    patch.push({ op: 'replace', path: toPointer(path), value: after })
+    return
+  }
+  // Remove from the highest index down so earlier removals do not shift later ones
+  for (let i = start + removed - 1; i >= start; i--) {
+    patch.push({ op: 'remove', path: toPointer([...path, i]) })
+  }
+  for (let i = start; i < start + added; i++) {
+    patch.push({ op: 'add', path: toPointer([...path, i]), value: visibleItem(after[i]) })
+  }
+}
+
+function diffObjects(before: JsonObject, after: JsonObject, path: JsonPath, patch: JsonPatchOperation[]) {
+  const afterKeys = visibleKeys(after)
+  const kept = new Set(afterKeys)
+  for (const key of visibleKeys(before)) {
+    if (!kept.has(key)) {
+      patch.push({ op: 'remove', path: toPointer([...path, key]) })
+    }
+  }
+  for (const key of afterKeys) {
+    if (Object.prototype.hasOwnProperty.call(before, key) && isVisible(before[key])) {
+      diffValues(before[key], after[key], [...path, key], patch)
+    } else {
+      patch.push({ op: 'add', path: toPointer([...path, key]), value: after[key] })
+    }
+  }
+}
+
+function diffValues(before: JsonValue, after: JsonValue, path: JsonPath, patch: JsonPatchOperation[]) {
+  if (before === after) return
+  if (isContainer(before) && isContainer(after) && Array.isArray(before) === Array.isArray(after)) {
+    if (Array.isArray(before)) {
+      diffArrays(before, after as JsonValue[], path, patch)
+    } else {
+      diffObjects(before as JsonObject, after as JsonObject, path, patch)
+    }
+    return
+  }
+  patch.push({ op: 'replace', path: toPointer(path), value: after })
+}
+
+/**
+ * The JSON Patch that turns before into after. Removals within an array
+ * come highest index first, so the operations apply in order.
+ */
+export function diffJson(before: JsonValue, after: JsonValue): JsonPatchOperation[] {
+  const patch: JsonPatchOperation[] = []
+  diffValues(before, after, [], patch)
+  return patch
+}
+
+/**
+ * The deepest subtree of after that holds every change in patch, with its
+ * path, or null if the patch is empty. An added property or an item
+ * appended to an array is its own subtree; a removal, or an insertion that
+ * shifts later array items, makes its container the subtree.
+ */
+export function changedSubtree(before: JsonValue, after: JsonValue, patch: JsonPatchOperation[]): ChangedSubtree | null {
+  let common: JsonPath | null = null
+  for (const operation of patch) {
+    const scope = scopeOf(before, operation)
+    if (common === null) {
+      common = scope
+    } else {
+      let length = 0
+      while (length < common.length && length < scope.length && common[length] === scope[length]) length++
+      common = common.slice(0, length)
+    }
+  }
+  if (common === null) return null
+
+  let value = after
+  for (const segment of common) {
+    value = Array.isArray(value) ? value[segment as number] : (value as JsonObject)[segment]
+  }
+  return { path: common, value: visibleItem(value) }
+}
+
+function parsePointer(pointer: string): string[] {
+  return pointer === '' ? [] : pointer.slice(1).split('/').map(part => part.replace(/~1/g, '/').replace(/~0/g, '~'))
+}
+
+// The path of the smallest subtree that, set as a whole, carries an operation
+function scopeOf(before: JsonValue, operation: JsonPatchOperation): JsonPath {
+  const path: JsonPath = []
+  let parent: JsonValue | undefined
+  let current: JsonValue | undefined = before
+  for (const key of parsePointer(operation.path)) {
+    parent = current
+    const segment = Array.isArray(parent) ? Number(key) : key
+    path.push(segment)
+    current = isContainer(parent) ? (parent as any)[segment] : undefined
+  }
+  if (operation.op === 'replace') return path
+  // Appending to an array or adding a property only creates the new value
+  if (operation.op === 'add' && !(Array.isArray(parent) && (path[path.length - 1] as number) < parent.length)) {
+    return path
+  }
+  return path.slice(0, -1)
+}
+
+// Array indexes in a pointer are plain decimal numbers, without leading zeros
+const ARRAY_INDEX = /^(0|[1-9][0-9]*)$/
+
+function parsePatchPointer(pointer: unknown): string[] {
+  if (typeof pointer !== 'string' || (pointer !== '' && !pointer.startsWith('/'))) {
+    throw new Error(`Invalid JSON Pointer: ${JSON.stringify(pointer)}`)
+  }
+  return parsePointer(pointer)
+}
+
+function hasChild(container: Container, token: string): boolean {
+  return Array.isArray(container)
+    ? ARRAY_INDEX.test(token) && Number(token) < container.length
+    : Object.prototype.hasOwnProperty.call(container, token)
+}
+
+function valueAt(document: JsonValue, tokens: string[], pointer: string): JsonValue {
+  let value = document
+  for (const token of tokens) {
+    if (!isContainer(value) || !hasChild(value, token)) throw new Error(`Nothing at path: ${pointer}`)
+    value = Array.isArray(value) ? value[Number(token)] : (value as JsonObject)[token]
+  }
+  return value
+}
+
+// Assigning "__proto__" would set the prototype instead of a property
+function setProperty(object: JsonObject, key: string, value: JsonValue) {
+  Object.defineProperty(object, key, { value, writable: true, enumerable: true, configurable: true })
+}
+
+/**
+ * Copy a container the first time the patch writes to it. Copies made by
+ * this patch are changed in place by later operations, so a patch of many
+ * operations on one large array copies it once.
+ */
+function writable(container: Container, owned: WeakSet<object>): Container {
+  if (owned.has(container)) return container
+  const copy = Array.isArray(container) ? container.slice() : { ...container }
+  owned.add(copy)
+  return copy
+}
+
+/**
+ * The document with writable copies of the containers along tokens, and
+ * edit called on the last of them with the final token. Every other
+ * subtree is shared with the input document.
+ */
+function editParent(
+  document: JsonValue,
+  tokens: string[],
+  pointer: string,
+  owned: WeakSet<object>,
+  edit: (parent: Container, token: string) => void
+): JsonValue {
+  if (!isContainer(document)) throw new Error(`Nothing at path: ${pointer}`)
+  const root = writable(document, owned)
+  let parent = root
+  for (const token of tokens.slice(0, -1)) {
+    const child = hasChild(parent, token) ? (parent as any)[Array.isArray(parent) ? Number(token) : token] : undefined
+    if (!isContainer(child)) throw new Error(`Nothing at path: ${pointer}`)
+    const copy = writable(child, owned)
+    if (Array.isArray(parent)) parent[Number(token)] = copy
+    else setProperty(parent as JsonObject, token, copy)
+    parent = copy
+  }
+  edit(parent, tokens[tokens.length - 1])
+  return root
+}
+
+function add(document: JsonValue, pointer: string, value: JsonValue, owned: WeakSet<object>): JsonValue {
+  const tokens = parsePatchPointer(pointer)
+  if (tokens.length === 0) return value
+  return editParent(document, tokens, pointer, owned, (parent, token) => {
+    if (!Array.isArray(parent)) {
+      setProperty(parent as JsonObject, token, value)
+    } else if (token === '-') {
+      parent.push(value)
+    } else if (ARRAY_INDEX.test(token) && Number(token) <= parent.length) {
+      parent.splice(Number(token), 0, value)
+    } else {
+      throw new Error(`Invalid array index: ${pointer}`)
+    }
+  })
+}
+
+function remove(document: JsonValue, pointer: string, owned: WeakSet<object>): JsonValue {
+  const tokens = parsePatchPointer(pointer)
+  if (tokens.length === 0) throw new Error('Cannot remove the whole document')
+  return editParent(document, tokens, pointer, owned, (parent, token) => {
+    if (!hasChild(parent, token)) throw new Error(`Nothing at path: ${pointer}`)
+    if (Array.isArray(parent)) parent.splice(Number(token), 1)
+    else delete (parent as JsonObject)[token]
+  })
+}
+
+function replace(document: JsonValue, pointer: string, value: JsonValue, owned: WeakSet<object>): JsonValue {
+  const tokens = parsePatchPointer(pointer)
+  if (tokens.length === 0) return value
+  return editParent(document, tokens, pointer, owned, (parent, token) => {
+    if (!hasChild(parent, token)) throw new Error(`Nothing at path: ${pointer}`)
+    if (Array.isArray(parent)) parent[Number(token)] = value
+    else setProperty(parent as JsonObject, token, value)
+  })
+}
+
+function jsonEqual(a: JsonValue, b: JsonValue): boolean {
+  if (a === b) return true
+  if (!isContainer(a) || !isContainer(b) || Array.isArray(a) !== Array.isArray(b)) return false
+  if (Array.isArray(a)) {
+    const other = b as JsonValue[]
+    return a.length === other.length && a.every((item, i) => jsonEqual(item, other[i]))
+  }
+  const keys = visibleKeys(a as JsonObject)
+  const other = b as JsonObject
+  return keys.length === visibleKeys(other).length &&
+    keys.every(key => Object.prototype.hasOwnProperty.call(other, key) && jsonEqual((a as JsonObject)[key], other[key]))
+}
+
+function operationValue(operation: any): JsonValue {
+  if (!('value' in operation) || operation.value === undefined) throw new Error(`"${operation.op}" needs a value`)
+  return operation.value
+}
+
+function applyOperation(document: JsonValue, operation: any, owned: WeakSet<object>): JsonValue {
+  if (operation === null || typeof operation !== 'object') throw new Error('Not an operation object')
+  const { op, path } = operation
+  switch (op) {
+    case 'add':
+      return add(document, path, operationValue(operation), owned)
+    case 'remove':
+      return remove(document, path, owned)
+    case 'replace':
+      return replace(document, path, operationValue(operation), owned)
+    case 'move': {
+      const from = parsePatchPointer(operation.from)
+      const to = parsePatchPointer(path)
+      if (from.length < to.length && from.every((token, i) => token === to[i])) {
+        throw new Error(`Cannot move ${operation.from} into itself`)
+      }
+      if (operation.from === path) return document
+      const value = valueAt(document, from, operation.from)
+      return add(remove(document, operation.from, owned), path, value, owned)
+    }
+    case 'copy':
+      return add(document, path, valueAt(document, parsePatchPointer(operation.from), operation.from), owned)
+    case 'test': {
+      const value = valueAt(document, parsePatchPointer(path), path)
+      if (!jsonEqual(value, operationValue(operation))) throw new Error(`Test failed at path: ${path}`)
+      return document
+    }
+    default:
+      throw new Error(`Unknown operation: ${JSON.stringify(op)}`)
+  }
+}
+
+/**
+ * Apply a JSON Patch (RFC 6902) and return the patched document. The
+ * input is not changed: the containers along each edited path are copied
+ * and every other subtree is shared, so a small patch to a large document
+ * costs the size of the edited paths. Throws JsonPatchError, naming the
+ * operation, if any operation cannot be applied; the patch applies in full
+ * or not at all.
+ */
+export function applyPatch(document: JsonValue, patch: JsonPatchOperation[]): JsonValue {
+  let owned = new WeakSet<object>()
+  let result = document
+  patch.forEach((operation, index) => {
+    try {
+      result = applyOperation(result, operation, owned)
+    } catch (error) {
+      throw new JsonPatchError(index, error instanceof Error ? error.message : String(error))
+    }
+    // The copied value is now in two places, so nothing may be changed in place any more
+    if (operation.op === 'copy') owned = new WeakSet()
+  })
+  return result
+}
@@ -1,4 +1,6 @@
-import type { JsonValue, JsonPath } from '@/components/json-canvas/types'
+import type { JsonValue, JsonObject, JsonPath } from '@/components/json-canvas/types'
+import { getCompressionStats } from './storage-stats'
+import type { CompressionStats } from './storage-stats'
 
 /**
  * Fast structural cloning for JSON data without using JSON.stringify/parse
@@ -50,16 +52,43 @@ export function getValueAtPath(data: JsonValue, path: JsonPath): JsonValue | und
   return current
 }
 
+function toArrayIndex(segment: string | number): number {
+  return typeof segment === 'number' ? segment : parseInt(String(segment), 10)
+}
+
+/**
+ * Return a copy of data with the value at path replaced. Only the objects
+ * and arrays along the path are copied; every other subtree is shared with
+ * the input. The path must already be known to exist.
+ */
+export function replaceAtPath(data: JsonValue, path: JsonPath, value: JsonValue, depth = 0): JsonValue {
+  if (depth === path.length) {
+    return value
+  }
+
+  const segment = path[depth]
+  if (Array.isArray(data)) {
+    const index = toArrayIndex(segment)
+    const copy = data.slice()
+    copy[index] = replaceAtPath(data[index], path, value, depth + 1)
+    return copy
+  }
+
+  const object = data as JsonObject
+  const key = String(segment)
+  return { ...object, [key]: replaceAtPath(object[key], path, value, depth + 1) }
+}
+
 /**
- * Safe JSON path setting with proper validation
+ * Safe JSON path setting with proper validation.
+ * Unchanged subtrees are shared with the input rather than cloned.
  */
 export function setValueAtPath(data: JsonValue, path: JsonPath, newValue: JsonValue): JsonValue {
   if (path.length === 0) {
     return newValue
   }
   
-  const cloned = fastCloneJson(data)
-  let current = cloned
+  let current = data
   
   for (let i = 0; i < path.length - 1; i++) {
     const segment = path[i]
@@ -69,7 +98,7 @@ export function setValueAtPath(data: JsonValue, path: JsonPath, newValue: JsonVa
     }
     
     if (Array.isArray(current)) {
-      const index = typeof segment === 'number' ? segment : parseInt(String(segment), 10)
+      const index = toArrayIndex(segment)
       if (isNaN(index) || index < 0 || index >= current.length) {
         throw new Error(`Array index out of bounds: ${index}`)
       }
@@ -85,26 +114,22 @@ export function setValueAtPath(data: JsonValue, path: JsonPath, newValue: JsonVa
   
   const lastSegment = path[path.length - 1]
   if (Array.isArray(current)) {
-    const index = typeof lastSegment === 'number' ? lastSegment : parseInt(String(lastSegment), 10)
+    const index = toArrayIndex(lastSegment)
     if (isNaN(index) || index < 0 || index >= current.length) {
       throw new Error(`Array index out of bounds: ${index}`)
     }
-    current[index] = newValue
-  } else if (typeof current === 'object' && current !== null) {
-    (current as any)[String(lastSegment)] = newValue
-  } else {
+  } else if (typeof current !== 'object' || current === null) {
     throw new Error('Cannot set value on non-object')
   }
   
-  return cloned
+  return replaceAtPath(data, path, newValue)
 }
 
 /**
  * Add property to object at path with validation
  */
 export function addPropertyAtPath(data: JsonValue, path: JsonPath, key: string, value: JsonValue): JsonValue {
-  const cloned = fastCloneJson(data)
-  const parent = path.length === 0 ? cloned : getValueAtPath(cloned, path)
+  const parent = path.length === 0 ? data : getValueAtPath(data, path)
   
   if (typeof parent !== 'object' || parent === null || Array.isArray(parent)) {
     throw new Error('Cannot add property to non-object')
@@ -114,23 +139,20 @@ export function addPropertyAtPath(data: JsonValue, path: JsonPath, key: string,
     throw new Error(`Property '${key}' already exists`)
   }
   
-  (parent as any)[key] = value
-  return cloned
+  return replaceAtPath(data, path, { ...parent, [key]: value })
 }
 
 /**
  * Add item to array at path with validation
  */
 export function addItemAtPath(data: JsonValue, path: JsonPath, value: JsonValue): JsonValue {
-  const cloned = fastCloneJson(data)
-  const target = path.length === 0 ? cloned : getValueAtPath(cloned, path)
+  const target = path.length === 0 ? data : getValueAtPath(data, path)
   
   if (!Array.isArray(target)) {
     throw new Error('Cannot add item to non-array')
   }
   
-  target.push(value)
-  return cloned
+  return replaceAtPath(data, path, [...target, value])
 }
 
 /**
@@ -141,36 +163,36 @@ export function deleteAtPath(data: JsonValue, path: JsonPath): JsonValue {
     throw new Error('Cannot delete root element')
   }
   
-  const cloned = fastCloneJson(data)
   const parentPath = path.slice(0, -1)
-  const parent = parentPath.length === 0 ? cloned : getValueAtPath(cloned, parentPath)
+  const parent = parentPath.length === 0 ? data : getValueAtPath(data, parentPath)
   const lastSegment = path[path.length - 1]
   
   if (Array.isArray(parent)) {
-    const index = typeof lastSegment === 'number' ? lastSegment : parseInt(String(lastSegment), 10)
+    const index = toArrayIndex(lastSegment)
     if (isNaN(index) || index < 0 || index >= parent.length) {
       throw new Error(`Array index out of bounds: ${index}`)
     }
-    parent.splice(index, 1)
+    const copy = parent.slice()
+    copy.splice(index, 1)
+    return replaceAtPath(data, parentPath, copy)
   } else if (typeof parent === 'object' && parent !== null) {
-    delete (parent as any)[String(lastSegment)]
+    const copy = { ...parent }
+    delete copy[String(lastSegment)]
+    return replaceAtPath(data, parentPath, copy)
   } else {
     throw new Error('Cannot delete from non-object/non-array')
   }
-  
-  return cloned
 }
 
 /**
- * Rename property at path
+ * Rename property at path. The renamed property moves to the end of the object.
  */
 export function renamePropertyAtPath(data: JsonValue, path: JsonPath, oldKey: string, newKey: string): JsonValue {
   if (oldKey === newKey) {
     return data
   }
   
-  const cloned = fastCloneJson(data)
-  const target = path.length === 0 ? cloned : getValueAtPath(cloned, path)
+  const target = path.length === 0 ? data : getValueAtPath(data, path)
   
   if (typeof target !== 'object' || target === null || Array.isArray(target)) {
     throw new Error('Cannot rename property on non-object')
@@ -184,11 +206,8 @@ export function renamePropertyAtPath(data: JsonValue, path: JsonPath, oldKey: st
     throw new Error(`Property '${newKey}' already exists`)
   }
   
-  const value = (target as any)[oldKey]
-  delete (target as any)[oldKey]
-  ;(target as any)[newKey] = value
-  
-  return cloned
+  const { [oldKey]: value, ...rest } = target
+  return replaceAtPath(data, path, { ...rest, [newKey]: value })
 }
 
 /**
@@ -326,7 +345,23 @@ export class SafeStorage {
     })
   }
 
-  static getStorageInfo(): { used: number; available: number; total: number } {
+  /**
+   * Storage usage and quota for this origin, plus at-rest compression totals.
+   * Falls back to summing localStorage against a 5MB estimate when the
+   * Storage API is unavailable.
+   */
+  static async getStorageInfo(): Promise<{ used: number; available: number; total: number; compression: CompressionStats }> {
+    const compression = getCompressionStats()
+
+    if (typeof navigator !== 'undefined' && navigator.storage?.estimate) {
+      try {
+        const { usage = 0, quota = 0 } = await navigator.storage.estimate()
+        return { used: usage, available: quota - usage, total: quota, compression }
+      } catch (error) {
+        console.warn('Failed to estimate storage quota:', error)
+      }
+    }
+
     let used = 0
     try {
       const keys = Object.keys(localStorage)
@@ -343,7 +378,8 @@ export class SafeStorage {
     return {
       used,
       available: total - used,
-      total
+      total,
+      compression
     }
   }
 }
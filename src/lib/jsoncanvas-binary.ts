@@ -0,0 +1,456 @@
+import type { JsonValue } from '@/components/json-canvas/types'
+import { JSONCANVAS_SCHEMA } from './jsoncanvas-types'
+import type { CanvasMetadataHead, ChangeLogEntry, LearningEvent } from './jsoncanvas-types'
+import { LazySection } from './jsoncanvas-file'
+import type { ByteRange, JsonCanvasDocument, SectionEncoding } from './jsoncanvas-file'
+
+/**
+ * JCB1, a compact binary encoding of .jsoncanvas documents.
+ *
+ * Layout:
+ *   "JCB1"
+ *   string table   varint count, then (varint byte length, UTF-8 bytes) each
+ *   section index  varint count, then (varint name length, UTF-8 name,
+ *                  varint offset, varint length) each; offsets are relative
+ *                  to the start of the body
+ *   body           one encoded value per section
+ *
+ * Values are a tag byte followed by its payload. Object keys, and string
+ * values that occur more than once, are stored once in the string table and
+ * referenced by index; the table is ordered by frequency so common strings
+ * get one-byte indices. Integers are varints, other numbers float64.
+ *
+ * The section index lets a reader decode `data` without touching the logs,
+ * which stay encoded until first read as with the text format. Decoding
+ * and re-encoding is lossless: JSON.stringify gives identical text.
+ */
+
+export const JCB_MAGIC = 'JCB1'
+export const JCB_MEDIA_TYPE = 'application/vnd.jsoncanvas+jcb'
+export const JCB_EXTENSION = '.jcb'
+
+const TAG_NULL = 0x00
+const TAG_FALSE = 0x01
+const TAG_TRUE = 0x02
+const TAG_UINT = 0x03
+const TAG_NEGINT = 0x04 // stores -value - 1
+const TAG_FLOAT64 = 0x05
+const TAG_STRING_REF = 0x06
+const TAG_STRING = 0x07
+const TAG_ARRAY = 0x08
+const TAG_OBJECT = 0x09
+
+// Section names for the parts of a JsonCanvasDocument
+const SECTION_SCHEMA = '$schema'
+const SECTION_METADATA = '$metadata'
+const SECTION_CHANGE_LOG = '$metadata.changeLog'
+const SECTION_LEARNING_HISTORY = '$metadata.ai.learningHistory'
+const SECTION_DATA = 'data'
+// Section name used by encodeJsonBinary for a bare value
+const SECTION_ROOT = '$'
+
+const encoder = new TextEncoder()
+const decoder = new TextDecoder()
+
+function formatError(message: string): Error {
+  return new Error(`Invalid JCB file: ${message}`)
+}
+
+export function isJsonCanvasBinary(bytes: Uint8Array): boolean {
+  return bytes.length >= 4 && bytes[0] === 0x4a && bytes[1] === 0x43 && bytes[2] === 0x42 && bytes[3] === 0x31
+}
+
+class ByteWriter {
+  private buffer = new Uint8Array(1024)
+  private view = new DataView(this.buffer.buffer)
+  length = 0
+
+  private reserve(bytes: number) {
+    if (this.length + bytes <= this.buffer.length) return
+    let size = this.buffer.length * 2
+    while (size < this.length + bytes) size *= 2
+    const next = new Uint8Array(size)
+    next.set(this.buffer.subarray(0, this.length))
+    this.buffer = next
+    this.view = new DataView(next.buffer)
+  }
+
+  byte(value: number) {
+    this.reserve(1)
+    this.buffer[this.length++] = value
+  }
+
+  // Unsigned varint; uses arithmetic rather than bit operations so values
+  // up to Number.MAX_SAFE_INTEGER work
+  varint(value: number) {
+    this.reserve(8)
+    while (value >= 0x80) {
+      this.buffer[this.length++] = (value % 0x80) | 0x80
+      value = Math.floor(value / 0x80)
+    }
+    this.buffer[this.length++] = value
+  }
+
+  float64(value: number) {
+    this.reserve(8)
+    this.view.setFloat64(this.length, value, true)
+    this.length += 8
+  }
+
+  bytes(value: Uint8Array) {
+    this.reserve(value.length)
+    this.buffer.set(value, this.length)
+    this.length += value.length
+  }
+
+  result(): Uint8Array {
+    return this.buffer.slice(0, this.length)
+  }
+}
+
+class StringTable {
+  readonly strings: string[] = []
+  private readonly lookup = new Map<string, number>()
+
+  add(value: string) {
+    if (!this.lookup.has(value)) {
+      this.lookup.set(value, this.strings.length)
+      this.strings.push(value)
+    }
+  }
+
+  indexOf(value: string): number | undefined {
+    return this.lookup.get(value)
+  }
+}
+
+/**
+ * Build the string table for the values to encode: every key, and every
+ * string value seen at least twice. Strings from an existing table come
+ * first so that sections copied from it verbatim stay valid.
+ */
+function buildStringTable(values: JsonValue[], seed: string[] = []): StringTable {
+  const counts = new Map<string, number>()
+  const keys = new Set<string>()
+  const visit = (value: JsonValue) => {
+    if (typeof value === 'string') {
+      counts.set(value, (counts.get(value) ?? 0) + 1)
+    } else if (Array.isArray(value)) {
+      for (const item of value) visit(item)
+    } else if (value !== null && typeof value === 'object') {
+      for (const key in value) {
+        if (value[key] === undefined) continue
+        keys.add(key)
+        counts.set(key, (counts.get(key) ?? 0) + 1)
+        visit(value[key])
+      }
+    }
+  }
+  values.forEach(visit)
+
+  const table = new StringTable()
+  seed.forEach(value => table.add(value))
+  Array.from(counts)
+    .filter(([value, count]) => count > 1 || keys.has(value))
+    .sort((a, b) => b[1] - a[1])
+    .forEach(([value]) => table.add(value))
+  return table
+}
+
+function writeValue(out: ByteWriter, value: JsonValue, table: StringTable): void {
+  if (value === null) {
+    out.byte(TAG_NULL)
+  } else if (value === true) {
+    out.byte(TAG_TRUE)
+  } else if (value === false) {
+    out.byte(TAG_FALSE)
+  } else if (typeof value === 'number') {
+    if (Number.isSafeInteger(value) && !Object.is(value, -0)) {
+      if (value >= 0) {
+        out.byte(TAG_UINT)
+        out.varint(value)
+      } else {
+        out.byte(TAG_NEGINT)
+        out.varint(-value - 1)
+      }
+    } else {
+      out.byte(TAG_FLOAT64)
+      out.float64(value)
+    }
+  } else if (typeof value === 'string') {
+    const index = table.indexOf(value)
+    if (index !== undefined) {
+      out.byte(TAG_STRING_REF)
+      out.varint(index)
+    } else {
+      const bytes = encoder.encode(value)
+      out.byte(TAG_STRING)
+      out.varint(bytes.length)
+      out.bytes(bytes)
+    }
+  } else if (Array.isArray(value)) {
+    out.byte(TAG_ARRAY)
+    out.varint(value.length)
+    for (const item of value) writeValue(out, item, table)
+  } else {
+    // Like JSON.stringify, drop properties whose value is undefined
+    const keys = Object.keys(value).filter(key => value[key] !== undefined)
+    out.byte(TAG_OBJECT)
+    out.varint(keys.length)
+    for (const key of keys) {
+      out.varint(table.indexOf(key)!)
+      writeValue(out, value[key], table)
+    }
+  }
+}
+
+/** A section to write: a value to encode, or bytes copied from a reader. */
+type SectionSource = { name: string; value: JsonValue } | { name: string; raw: Uint8Array }
+
+function writeSections(sections: SectionSource[], seed: string[] = []): Uint8Array {
+  const table = buildStringTable(
+    sections.flatMap(section => ('value' in section ? [section.value] : [])),
+    seed
+  )
+
+  const body = new ByteWriter()
+  const index: { name: string; offset: number; length: number }[] = []
+  for (const section of sections) {
+    const offset = body.length
+    if ('value' in section) writeValue(body, section.value, table)
+    else body.bytes(section.raw)
+    index.push({ name: section.name, offset, length: body.length - offset })
+  }
+
+  const out = new ByteWriter()
+  out.bytes(encoder.encode(JCB_MAGIC))
+  out.varint(table.strings.length)
+  for (const value of table.strings) {
+    const bytes = encoder.encode(value)
+    out.varint(bytes.length)
+    out.bytes(bytes)
+  }
+  out.varint(index.length)
+  for (const { name, offset, length } of index) {
+    const bytes = encoder.encode(name)
+    out.varint(bytes.length)
+    out.bytes(bytes)
+    out.varint(offset)
+    out.varint(length)
+  }
+  out.bytes(body.result())
+  return out.result()
+}
+
+/**
+ * Parsed header of a JCB file. Strings are decoded on first use, and each
+ * section is decoded when asked for.
+ */
+export class JcbReader implements SectionEncoding {
+  readonly name = 'jcb'
+  readonly bytes: Uint8Array
+  readonly sections = new Map<string, ByteRange>()
+  private readonly stringStarts: Uint32Array
+  private readonly stringEnds: Uint32Array
+  private readonly decoded: (string | undefined)[]
+  private readonly view: DataView
+  private pos = 0
+
+  constructor(bytes: Uint8Array) {
+    if (!isJsonCanvasBinary(bytes)) throw formatError(`missing "${JCB_MAGIC}" header`)
+    this.bytes = bytes
+    this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength)
+    this.pos = 4
+
+    const stringCount = this.varint()
+    this.stringStarts = new Uint32Array(stringCount)
+    this.stringEnds = new Uint32Array(stringCount)
+    this.decoded = new Array(stringCount)
+    for (let i = 0; i < stringCount; i++) {
+      const length = this.varint()
+      this.stringStarts[i] = this.pos
+      this.pos += length
+      this.stringEnds[i] = this.pos
+    }
+
+    const sectionCount = this.varint()
+    const index: [string, number, number][] = []
+    for (let i = 0; i < sectionCount; i++) {
+      const nameLength = this.varint()
+      const name = decoder.decode(bytes.subarray(this.pos, this.pos + nameLength))
+      this.pos += nameLength
+      index.push([name, this.varint(), this.varint()])
+    }
+    const bodyStart = this.pos
+    for (const [name, offset, length] of index) {
+      const start = bodyStart + offset
+      if (start + length > bytes.length) throw formatError(`section "${name}" is truncated`)
+      this.sections.set(name, { start, end: start + length })
+    }
+  }
+
+  get stringCount(): number {
+    return this.decoded.length
+  }
+
+  /** Every string in the table, in order. */
+  strings(): string[] {
+    return Array.from({ length: this.decoded.length }, (_, i) => this.string(i))
+  }
+
+  /** Decode the section with the given name, or undefined if absent. */
+  section(name: string): JsonValue | undefined {
+    const range = this.sections.get(name)
+    return range ? this.decode(this.bytes, range) : undefined
+  }
+
+  decode(bytes: Uint8Array, range: ByteRange): JsonValue {
+    if (bytes !== this.bytes) throw formatError('section belongs to a different file')
+    this.pos = range.start
+    const value = this.value()
+    if (this.pos !== range.end) throw formatError('section length does not match its contents')
+    return value
+  }
+
+  private string(index: number): string {
+    let value = this.decoded[index]
+    if (value === undefined) {
+      if (index >= this.decoded.length) throw formatError(`string ${index} is out of range`)
+      value = decoder.decode(this.bytes.subarray(this.stringStarts[index], this.stringEnds[index]))
+      this.decoded[index] = value
+    }
+    return value
+  }
+
+  private varint(): number {
+    let result = 0
+    let scale = 1
+    for (;;) {
+      if (this.pos >= this.bytes.length) throw formatError('unexpected end of data')
+      const byte = this.bytes[this.pos++]
+      result += (byte & 0x7f) * scale
+      if (byte < 0x80) return result
+      scale *= 0x80
+    }
+  }
+
+  private value(): JsonValue {
+    const tag = this.bytes[this.pos++]
+    switch (tag) {
+      case TAG_NULL:
+        return null
+      case TAG_FALSE:
+        return false
+      case TAG_TRUE:
+        return true
+      case TAG_UINT:
+        return this.varint()
+      case TAG_NEGINT:
+        return -this.varint() - 1
+      case TAG_FLOAT64: {
+        const value = this.view.getFloat64(this.pos, true)
+        this.pos += 8
+        return value
+      }
+      case TAG_STRING_REF:
+        return this.string(this.varint())
+      case TAG_STRING: {
+        const length = this.varint()
+        const value = decoder.decode(this.bytes.subarray(this.pos, this.pos + length))
+        this.pos += length
+        return value
+      }
+      case TAG_ARRAY: {
+        const length = this.varint()
+        const items: JsonValue[] = new Array(length)
+        for (let i = 0; i < length; i++) items[i] = this.value()
+        return items
+      }
+      case TAG_OBJECT: {
+        const length = this.varint()
+        const object: { [key: string]: JsonValue } = {}
+        for (let i = 0; i < length; i++) {
+          const key = this.string(this.varint())
+          const value = this.value()
+          if (key === '__proto__') {
+            // Same as JSON.parse: an own property, not the prototype
+            Object.defineProperty(object, key, { value, enumerable: true, writable: true, configurable: true })
+          } else {
+            object[key] = value
+          }
+        }
+        return object
+      }
+      default:
+        throw formatError(`unknown tag 0x${(tag ?? 0).toString(16)} at byte ${this.pos - 1}`)
+    }
+  }
+}
+
+/** Encode a single JSON value. */
+export function encodeJsonBinary(value: JsonValue): Uint8Array {
+  return writeSections([{ name: SECTION_ROOT, value }])
+}
+
+export function decodeJsonBinary(bytes: Uint8Array): JsonValue {
+  const value = new JcbReader(bytes).section(SECTION_ROOT)
+  if (value === undefined) throw formatError(`missing "${SECTION_ROOT}" section`)
+  return value
+}
+
+/**
+ * Read a binary .jsoncanvas document. `data` and the metadata head are
+ * decoded; the logs are decoded on first access.
+ */
+export function readJsonCanvasBinary(bytes: Uint8Array): JsonCanvasDocument {
+  const reader = new JcbReader(bytes)
+  const schema = reader.section(SECTION_SCHEMA)
+  if (typeof schema !== 'string' || !schema.startsWith('jsoncanvas/')) {
+    throw formatError(`expected "$schema": "${JSONCANVAS_SCHEMA}"`)
+  }
+  const data = reader.section(SECTION_DATA)
+  if (data === undefined) throw formatError('missing "data"')
+
+  const metadata = (reader.section(SECTION_METADATA) ?? {}) as CanvasMetadataHead
+  return {
+    schema,
+    data,
+    metadata,
+    changeLog: new LazySection<ChangeLogEntry[]>(bytes, reader.sections.get(SECTION_CHANGE_LOG) ?? null, 'changeLog', reader),
+    learningHistory: new LazySection<LearningEvent[]>(
+      bytes,
+      reader.sections.get(SECTION_LEARNING_HISTORY) ?? null,
+      'ai.learningHistory',
+      reader
+    ),
+  }
+}
+
+/**
+ * Write a document in the binary encoding. Logs read from a binary file
+ * and not changed since are copied without being decoded; to keep them
+ * valid, the new string table starts with that file's table.
+ */
+export function writeJsonCanvasBinary(doc: JsonCanvasDocument): Uint8Array {
+  const logs: [string, LazySection<unknown[]>][] = [
+    [SECTION_CHANGE_LOG, doc.changeLog],
+    [SECTION_LEARNING_HISTORY, doc.learningHistory],
+  ]
+  const source = logs
+    .map(([, section]) => section.encoding)
+    .find((encoding): encoding is JcbReader => encoding instanceof JcbReader)
+
+  const sections: SectionSource[] = [
+    { name: SECTION_SCHEMA, value: doc.schema },
+    { name: SECTION_METADATA, value: doc.metadata as JsonValue },
+  ]
+  for (const [name, section] of logs) {
+    if (!section.present) continue
+    const raw = source && section.pending.length === 0 ? section.raw(source) : null
+    sections.push(raw ? { name, raw } : { name, value: section.get() as JsonValue })
+  }
+  sections.push({ name: SECTION_DATA, value: doc.data })
+
+  const copied = sections.some(section => 'raw' in section)
+  return writeSections(sections, copied && source ? source.strings() : [])
+}
@@ -0,0 +1,438 @@
+import type { JsonValue } from '@/components/json-canvas/types'
+import { JSONCANVAS_EXTENSION, JSONCANVAS_SCHEMA } from './jsoncanvas-types'
+import type { CanvasMetadataHead, ChangeLogEntry, LearningEvent } from './jsoncanvas-types'
+
+/**
+ * Reader and writer for .jsoncanvas files.
+ *
+ * The file is scanned as UTF-8 bytes to find where each section starts and
+ * ends, without building any values. `data` and the small metadata sections
+ * are then parsed; `$metadata.changeLog` and `$metadata.ai.learningHistory`,
+ * which grow without bound, are kept as byte ranges and only parsed when
+ * asked for. Writing splices untouched ranges back in verbatim, so a file
+ * can be opened, edited and saved without ever parsing its logs.
+ */
+
+export interface ByteRange {
+  start: number
+  end: number
+}
+
+const QUOTE = 0x22
+const BACKSLASH = 0x5c
+const OPEN_BRACE = 0x7b
+const CLOSE_BRACE = 0x7d
+const OPEN_BRACKET = 0x5b
+const CLOSE_BRACKET = 0x5d
+const COLON = 0x3a
+const COMMA = 0x2c
+
+const decoder = new TextDecoder()
+const encoder = new TextEncoder()
+
+function isWhitespace(byte: number): boolean {
+  return byte === 0x20 || byte === 0x0a || byte === 0x0d || byte === 0x09
+}
+
+function formatError(message: string, position?: number): Error {
+  return new Error(`Invalid .jsoncanvas file: ${message}${position === undefined ? '' : ` at byte ${position}`}`)
+}
+
+function skipWhitespace(bytes: Uint8Array, pos: number): number {
+  while (pos < bytes.length && isWhitespace(bytes[pos])) pos++
+  return pos
+}
+
+function skipString(bytes: Uint8Array, pos: number): number {
+  for (pos++; pos < bytes.length; pos++) {
+    const byte = bytes[pos]
+    if (byte === BACKSLASH) pos++
+    else if (byte === QUOTE) return pos + 1
+  }
+  throw formatError('unterminated string')
+}
+
+/**
+ * Return the end of the JSON value starting at pos. Containers are matched
+ * by bracket depth only; their contents are validated when parsed.
+ */
+function skipValue(bytes: Uint8Array, pos: number): number {
+  const first = bytes[pos]
+  if (first === QUOTE) return skipString(bytes, pos)
+
+  if (first === OPEN_BRACE || first === OPEN_BRACKET) {
+    let depth = 0
+    while (pos < bytes.length) {
+      const byte = bytes[pos]
+      if (byte === QUOTE) {
+        pos = skipString(bytes, pos)
+        continue
+      }
+      if (byte === OPEN_BRACE || byte === OPEN_BRACKET) depth++
+      else if (byte === CLOSE_BRACE || byte === CLOSE_BRACKET) {
+        depth--
+        if (depth === 0) return pos + 1
+      }
+      pos++
+    }
+    throw formatError('unterminated object or array')
+  }
+
+  // Number, true, false or null
+  const start = pos
+  while (pos < bytes.length) {
+    const byte = bytes[pos]
+    if (byte === COMMA || byte === CLOSE_BRACE || byte === CLOSE_BRACKET || isWhitespace(byte)) break
+    pos++
+  }
+  if (pos === start) throw formatError('expected a value', start)
+  return pos
+}
+
+/**
+ * Locate the members of the object spanning range, without parsing values.
+ */
+function scanObject(bytes: Uint8Array, range: ByteRange): Map<string, ByteRange> {
+  const members = new Map<string, ByteRange>()
+  let pos = skipWhitespace(bytes, range.start)
+  if (bytes[pos] !== OPEN_BRACE) throw formatError('expected an object', pos)
+  pos = skipWhitespace(bytes, pos + 1)
+  if (bytes[pos] === CLOSE_BRACE) return members
+
+  while (pos < range.end) {
+    if (bytes[pos] !== QUOTE) throw formatError('expected a property name', pos)
+    const keyEnd = skipString(bytes, pos)
+    const key = JSON.parse(decoder.decode(bytes.subarray(pos, keyEnd)))
+
+    pos = skipWhitespace(bytes, keyEnd)
+    if (bytes[pos] !== COLON) throw formatError('expected ":"', pos)
+    const valueStart = skipWhitespace(bytes, pos + 1)
+    const valueEnd = skipValue(bytes, valueStart)
+    members.set(key, { start: valueStart, end: valueEnd })
+
+    pos = skipWhitespace(bytes, valueEnd)
+    if (bytes[pos] === COMMA) {
+      pos = skipWhitespace(bytes, pos + 1)
+    } else if (bytes[pos] === CLOSE_BRACE) {
+      return members
+    } else {
+      throw formatError('expected "," or "}"', pos)
+    }
+  }
+  throw formatError('unterminated object')
+}
+
+function parseRange<T>(bytes: Uint8Array, range: ByteRange): T {
+  return JSON.parse(decoder.decode(bytes.subarray(range.start, range.end)))
+}
+
+/** How the bytes behind a LazySection are encoded. */
+export interface SectionEncoding {
+  readonly name: string
+  decode(bytes: Uint8Array, range: ByteRange): unknown
+}
+
+export const JSON_SECTION_ENCODING: SectionEncoding = { name: 'json', decode: parseRange }
+
+/**
+ * A section kept as raw bytes until first read.
+ *
+ * Values returned by get() must be treated as immutable; pass a new value
+ * to set() to change the section, which makes the writer re-serialize it.
+ * Items added with withAppended() are written after the original bytes
+ * instead, so the section is never parsed.
+ */
+export class LazySection<T extends unknown[]> {
+  private readonly source: Uint8Array
+  private readonly name: string
+  private readonly range: ByteRange | null
+  readonly encoding: SectionEncoding
+  private parsed: T | undefined
+  private modified = false
+  private appended: T[number][] = []
+
+  constructor(source: Uint8Array, range: ByteRange | null, name: string, encoding: SectionEncoding = JSON_SECTION_ENCODING) {
+    this.source = source
+    this.range = range
+    this.name = name
+    this.encoding = encoding
+  }
+
+  /** True if the file had this section or it has been set or appended to since. */
+  get present(): boolean {
+    return this.range !== null || this.modified || this.appended.length > 0
+  }
+
+  get isParsed(): boolean {
+    return this.parsed !== undefined
+  }
+
+  get isModified(): boolean {
+    return this.modified
+  }
+
+  /** Size of the section in the source file, in bytes. */
+  get byteLength(): number {
+    return this.range ? this.range.end - this.range.start : 0
+  }
+
+  get(): T {
+    if (this.parsed === undefined) {
+      if (!this.range) {
+        this.parsed = [] as unknown as T
+      } else {
+        try {
+          this.parsed = this.encoding.decode(this.source, this.range) as T
+        } catch (error) {
+          throw formatError(`${this.name} is not valid ${this.encoding.name.toUpperCase()} (${error instanceof Error ? error.message : String(error)})`)
+        }
+      }
+    }
+    if (this.appended.length === 0) return this.parsed as T
+    return (Array.isArray(this.parsed) ? this.parsed.concat(this.appended) : this.appended.slice()) as T
+  }
+
+  set(value: T): void {
+    this.parsed = value
+    this.modified = true
+    this.appended = []
+  }
+
+  /** A copy of this section with items added at the end. */
+  withAppended(items: T[number][]): LazySection<T> {
+    const copy = new LazySection<T>(this.source, this.range, this.name, this.encoding)
+    copy.parsed = this.parsed
+    copy.modified = this.modified
+    copy.appended = this.appended.concat(items)
+    return copy
+  }
+
+  /** Items to write after raw(), when that is not null. */
+  get pending(): readonly T[number][] {
+    return this.appended
+  }
+
+  /**
+   * The original bytes, or null if the section must be re-serialized
+   * because it changed or is stored in a different encoding.
+   */
+  raw(encoding: SectionEncoding = JSON_SECTION_ENCODING): Uint8Array | null {
+    if (this.modified || !this.range || this.encoding !== encoding) return null
+    return this.source.subarray(this.range.start, this.range.end)
+  }
+}
+
+export interface JsonCanvasDocument {
+  schema: string
+  data: JsonValue
+  // $metadata without changeLog and ai.learningHistory
+  metadata: CanvasMetadataHead
+  changeLog: LazySection<ChangeLogEntry[]>
+  learningHistory: LazySection<LearningEvent[]>
+}
+
+export function isJsonCanvasFileName(name: string): boolean {
+  return name.toLowerCase().endsWith(JSONCANVAS_EXTENSION)
+}
+
+/**
+ * Read a .jsoncanvas file. Only `data` and the small metadata sections are
+ * parsed; the logs are parsed on first access.
+ */
+export function readJsonCanvas(input: Uint8Array | string): JsonCanvasDocument {
+  const bytes = typeof input === 'string' ? encoder.encode(input) : input
+  // Skip a UTF-8 byte order mark
+  const start = bytes[0] === 0xef && bytes[1] === 0xbb && bytes[2] === 0xbf ? 3 : 0
+  const root = scanObject(bytes, { start, end: bytes.length })
+
+  const schemaRange = root.get('$schema')
+  const schema = schemaRange ? parseRange<unknown>(bytes, schemaRange) : undefined
+  if (typeof schema !== 'string' || !schema.startsWith('jsoncanvas/')) {
+    throw formatError(`expected "$schema": "${JSONCANVAS_SCHEMA}"`)
+  }
+  const dataRange = root.get('data')
+  if (!dataRange) {
+    throw formatError('missing "data"')
+  }
+
+  const data = parseRange<JsonValue>(bytes, dataRange)
+
+  const metadata: CanvasMetadataHead = {}
+  let changeLogRange: ByteRange | null = null
+  let learningHistoryRange: ByteRange | null = null
+
+  const metadataRange = root.get('$metadata')
+  if (metadataRange) {
+    scanObject(bytes, metadataRange).forEach((range, key) => {
+      if (key === 'changeLog') {
+        changeLogRange = range
+      } else if (key === 'ai' && bytes[range.start] === OPEN_BRACE) {
+        const ai: Record<string, unknown> = {}
+        scanObject(bytes, range).forEach((aiRange, aiKey) => {
+          if (aiKey === 'learningHistory') {
+            learningHistoryRange = aiRange
+          } else {
+            ai[aiKey] = parseRange(bytes, aiRange)
+          }
+        })
+        metadata.ai = ai as CanvasMetadataHead['ai']
+      } else {
+        metadata[key] = parseRange(bytes, range)
+      }
+    })
+  }
+
+  return {
+    schema,
+    data,
+    metadata,
+    changeLog: new LazySection<ChangeLogEntry[]>(bytes, changeLogRange, 'changeLog'),
+    learningHistory: new LazySection<LearningEvent[]>(bytes, learningHistoryRange, 'ai.learningHistory'),
+  }
+}
+
+function indentJson(value: unknown, indent: string): string {
+  return JSON.stringify(value, null, 2).replace(/\n/g, `\n${indent}`)
+}
+
+/**
+ * Serialize a .jsoncanvas file. Log sections that were not modified are
+ * copied from the source bytes without being parsed or re-encoded.
+ */
+export function writeJsonCanvas(doc: JsonCanvasDocument): Uint8Array {
+  const chunks: Uint8Array[] = []
+  const text = (value: string) => chunks.push(encoder.encode(value))
+  const section = (value: LazySection<unknown[]>, indent: string) => {
+    const raw = value.raw()
+    if (!raw || (value.pending.length > 0 && raw[0] !== OPEN_BRACKET)) {
+      text(indentJson(value.get(), indent))
+      return
+    }
+    if (value.pending.length === 0) {
+      chunks.push(raw)
+      return
+    }
+    // Keep the original bytes up to the closing bracket and add the new items after them
+    let end = raw.length - 1
+    while (end > 0 && isWhitespace(raw[end - 1])) end--
+    chunks.push(raw.subarray(0, end))
+    const items = value.pending.map(item => `\n${indent}  ${indentJson(item, `${indent}  `)}`)
+    text(`${raw[end - 1] === OPEN_BRACKET ? '' : ','}${items.join(',')}\n${indent}]`)
+  }
+
+  text(`{\n  "$schema": ${JSON.stringify(doc.schema)},\n  "$metadata": {`)
+
+  let first = true
+  const member = (key: string, indent: string) => {
+    text(`${first ? '' : ','}\n${indent}${JSON.stringify(key)}: `)
+    first = false
+  }
+
+  for (const [key, value] of Object.entries(doc.metadata)) {
+    if (value === undefined) continue
+    if (key === 'ai') continue
+    member(key, '    ')
+    text(indentJson(value, '    '))
+  }
+
+  if (doc.metadata.ai || doc.learningHistory.present) {
+    member('ai', '    ')
+    text('{')
+    first = true
+    for (const [key, value] of Object.entries(doc.metadata.ai ?? {})) {
+      if (value === undefined) continue
+      member(key, '      ')
+      text(indentJson(value, '      '))
+    }
+    if (doc.learningHistory.present) {
+      member('learningHistory', '      ')
+      section(doc.learningHistory, '      ')
+    }
+    text('\n    }')
+    first = false
+  }
+
+  if (doc.changeLog.present) {
+    member('changeLog', '    ')
+    section(doc.changeLog, '    ')
+  }
+
+  text(`\n  },\n  "data": ${indentJson(doc.data, '  ')}\n}\n`)
+
+  const output = new Uint8Array(chunks.reduce((total, chunk) => total + chunk.length, 0))
+  let offset = 0
+  for (const chunk of chunks) {
+    output.set(chunk, offset)
+    offset += chunk.length
+  }
+  return output
+}
+
+/**
+ * Wrap plain JSON data as a new .jsoncanvas document.
+ */
+export function createJsonCanvas(data: JsonValue, title?: string): JsonCanvasDocument {
+  const now = new Date().toISOString()
+  const empty = new Uint8Array(0)
+  return {
+    schema: JSONCANVAS_SCHEMA,
+    data,
+    metadata: { version: '1.0', created: now, lastModified: now, ...(title ? { title } : {}) },
+    changeLog: new LazySection<ChangeLogEntry[]>(empty, null, 'changeLog'),
+    learningHistory: new LazySection<LearningEvent[]>(empty, null, 'ai.learningHistory'),
+  }
+}
+
+/**
+ * What is kept in browser storage for a document opened from a .jsoncanvas
+ * file, next to the document itself: everything but `data`. The logs are
+ * stored as JSON bytes so that they are still not parsed on load.
+ */
+export interface StoredCanvasRecord {
+  id: string
+  schema: string
+  metadata: CanvasMetadataHead
+  // Left out when only the metadata changed; the stored logs are kept
+  logs?: StoredCanvasLogs
+}
+
+export interface StoredCanvasLogs {
+  changeLog: Uint8Array | null
+  learningHistory: Uint8Array | null
+}
+
+function sectionBytes(section: LazySection<unknown[]>): Uint8Array | null {
+  if (!section.present) return null
+  const raw = section.pending.length === 0 ? section.raw() : null
+  // A copy, since storing a view would store the whole file it points into.
+  // Sections in other encodings are converted to JSON once, here.
+  return raw ? raw.slice() : encoder.encode(JSON.stringify(section.get()))
+}
+
+/**
+ * The record to store for a document's canvas; withLogs adds the log
+ * sections, which only need writing when the canvas is first stored.
+ */
+export function toCanvasRecord(id: string, doc: JsonCanvasDocument, withLogs: boolean): StoredCanvasRecord {
+  const record: StoredCanvasRecord = { id, schema: doc.schema, metadata: doc.metadata }
+  if (withLogs) {
+    record.logs = { changeLog: sectionBytes(doc.changeLog), learningHistory: sectionBytes(doc.learningHistory) }
+  }
+  return record
+}
+
+/**
+ * Rebuild a canvas from its stored record and the document's data. The
+ * logs are parsed on first access, as when read from the file.
+ */
+export function fromCanvasRecord(record: StoredCanvasRecord, data: JsonValue): JsonCanvasDocument {
+  const section = <T extends unknown[]>(bytes: Uint8Array | null | undefined, name: string) =>
+    new LazySection<T>(bytes ?? new Uint8Array(0), bytes ? { start: 0, end: bytes.length } : null, name)
+  return {
+    schema: record.schema,
+    data,
+    metadata: record.metadata,
+    changeLog: section<ChangeLogEntry[]>(record.logs?.changeLog, 'changeLog'),
+    learningHistory: section<LearningEvent[]>(record.logs?.learningHistory, 'ai.learningHistory'),
+  }
+}
@@ -0,0 +1,199 @@
+import type { JsonValue } from '@/components/json-canvas/types'
+
+/**
+ * Types for the .jsoncanvas file format, see JSONCANVAS-FORMAT-SPEC.md.
+ * Paths inside metadata (fieldMetadata keys, relatedPaths, changeLog paths)
+ * are JSONPath-style strings relative to `data`.
+ */
+
+export const JSONCANVAS_SCHEMA = 'jsoncanvas/v1.0'
+export const JSONCANVAS_EXTENSION = '.jsoncanvas'
+
+export interface RoomShape {
+  type: 'rectangle' | 'polygon' | 'circle'
+  coordinates: number[]
+  color?: string
+}
+
+export interface GroupDefinition {
+  id: string
+  name: string
+  description: string
+  criteria: string // JSONPath expression
+  icon?: string
+  color?: string
+}
+
+export interface HierarchyLevel {
+  level: number
+  name: string
+  field: string // JSONPath to the field
+  displayName?: string
+  icon?: string
+}
+
+export interface Relationship {
+  type: 'parent-child' | 'sibling' | 'reference' | 'contains'
+  from: string
+  to: string
+  label?: string
+}
+
+export interface SpatialRoom {
+  id: string
+  name: string
+  x: number
+  y: number
+  width: number
+  height: number
+  floor?: number
+  type?: string
+}
+
+export interface RoomConnection {
+  room1: string
+  room2: string
+  type: 'door' | 'opening' | 'stairs' | 'hallway'
+  bidirectional: boolean
+}
+
+export interface AIInsight {
+  id: string
+  timestamp: string
+  type: 'discovery' | 'pattern' | 'suggestion' | 'verification'
+  title: string
+  description: string
+  confidence: number
+  relatedPaths: string[]
+}
+
+export interface FieldAIData {
+  confidence: number // 0-100
+  lastUpdated: string
+  source: 'ai-generated' | 'ai-enhanced' | 'user-input' | 'ai-verified'
+  notes?: string
+  suggestions?: string[]
+}
+
+export interface LearningEvent {
+  timestamp: string
+  event: 'learned' | 'updated' | 'verified' | 'corrected'
+  path: string
+  oldValue?: JsonValue
+  newValue?: JsonValue
+  method: string
+  confidence: number
+}
+
+export interface AISuggestion {
+  id: string
+  timestamp: string
+  type: 'missing-data' | 'inconsistency' | 'optimization' | 'maintenance'
+  title: string
+  description: string
+  suggestedAction: string
+  path?: string
+  priority: 'low' | 'medium' | 'high'
+  estimatedEffort: 'easy' | 'medium' | 'complex'
+}
+
+export interface QuickAction {
+  id: string
+  name: string
+  description: string
+  action: 'add-item' | 'update-field' | 'ai-enhance' | 'take-photo' | 'custom'
+  params?: Record<string, JsonValue>
+  icon?: string
+  hotkey?: string
+}
+
+export interface ChangeLogEntry {
+  timestamp: string
+  user: string // "ai" or a user identifier
+  action: 'create' | 'update' | 'delete' | 'enhance' | 'verify'
+  path: string
+  oldValue?: JsonValue
+  newValue?: JsonValue
+  notes?: string
+}
+
+export interface CanvasDisplayConfig {
+  primaryLayout: 'spatial-treemap' | 'tabbed-hierarchy' | 'floor-plan' | 'card-grid' | 'timeline'
+  theme: {
+    colorScheme: 'light' | 'dark' | 'auto'
+    accentColor: string
+    confidenceColors: { high: string; medium: string; low: string; verified: string }
+  }
+  layoutConfig: {
+    treemap?: { aspectRatio: number; padding: number; minRoomSize: number; showLabels: boolean }
+    tabs?: { defaultTab: string; tabOrder: string[]; showTabIcons: boolean }
+    floorPlan?: { scale: number; gridSize: number; showGrid: boolean; roomShapes: Record<string, RoomShape> }
+    cardGrid?: { cardsPerRow: number; cardSize: 'small' | 'medium' | 'large'; showPreview: boolean }
+  }
+}
+
+export interface CanvasStructure {
+  grouping: {
+    primary: 'room' | 'system' | 'category' | 'custom'
+    secondary?: 'alphabetical' | 'recent' | 'confidence' | 'size'
+    customGroups?: GroupDefinition[]
+  }
+  hierarchy: {
+    levels: HierarchyLevel[]
+    relationships: Relationship[]
+  }
+  spatial?: {
+    type: 'house' | 'building' | 'facility'
+    bounds: { width: number; height: number }
+    rooms: SpatialRoom[]
+    connections: RoomConnection[]
+  }
+}
+
+export interface CanvasAI {
+  globalConfidence: number
+  lastAIUpdate: string
+  insights: AIInsight[]
+  fieldMetadata: Record<string, FieldAIData>
+  learningHistory: LearningEvent[]
+  suggestions: AISuggestion[]
+}
+
+export interface CanvasUserPreferences {
+  defaultView: string
+  favoriteRooms: string[]
+  hiddenSections: string[]
+  autoSave: boolean
+  showConfidence: boolean
+  enableAISuggestions: boolean
+  quickActions: QuickAction[]
+}
+
+export interface CanvasMetadata {
+  version: '1.0'
+  created: string
+  lastModified: string
+  title?: string
+  description?: string
+  display: CanvasDisplayConfig
+  structure: CanvasStructure
+  ai: CanvasAI
+  userPreferences: CanvasUserPreferences
+  changeLog: ChangeLogEntry[]
+}
+
+export interface JSONCanvasFile {
+  $schema: typeof JSONCANVAS_SCHEMA
+  $metadata: CanvasMetadata
+  data: JsonValue
+}
+
+/**
+ * Metadata as held in memory by the loader: everything except the two
+ * append-only logs, which are loaded on demand. Files in the wild often
+ * omit sections, so every field is optional here.
+ */
+export type CanvasMetadataHead = Partial<Omit<CanvasMetadata, 'changeLog' | 'ai'>> & {
+  ai?: Partial<Omit<CanvasAI, 'learningHistory'>>
+  [key: string]: unknown
+}
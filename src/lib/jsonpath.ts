@@ -0,0 +1,673 @@
+import type { JsonPath, JsonValue } from '@/components/json-canvas/types'
+
+/**
+ * JSONPath evaluation for the paths used throughout .jsoncanvas metadata
+ * (group criteria, hierarchy fields, relationships, insight and change log
+ * paths).
+ *
+ * Supported syntax: an optional leading `$`, `.name`, `['name']`, `[0]`,
+ * `[-1]`, `[start:end:step]`, `*`, `..` (descendants), unions such as
+ * `['a','b']` or `[0,2]`, and filters such as
+ * `[?(@.type == 'smart' || @.connected == true)]`. The spec's bare dotted
+ * paths (`floors.*.rooms`) are accepted too, and a numeric name matches the
+ * array index of the same number.
+ *
+ * Expressions compile to a small automaton that is cached by expression
+ * text. Evaluation is a single walk over the document that follows every
+ * branch of the automaton at once, so `..` never revisits a node, and
+ * results come back in document order without duplicates. Values in the
+ * results are references into the document, never copies.
+ */
+
+export interface JsonPathMatch {
+  path: JsonPath
+  value: JsonValue
+}
+
+type Container = { [key: string]: JsonValue } | JsonValue[]
+
+type Selector =
+  | { type: 'name'; name: string; index: number | null }
+  | { type: 'index'; index: number }
+  | { type: 'wildcard' }
+  | { type: 'slice'; start: number | null; end: number | null; step: number }
+  | { type: 'filter'; test: (value: JsonValue) => boolean }
+
+interface Segment {
+  descendant: boolean
+  selectors: Selector[]
+}
+
+// Bit masks hold the automaton state, so expressions are capped in length
+const MAX_SEGMENTS = 30
+const CACHE_LIMIT = 256
+
+function syntaxError(expression: string, position: number, message: string): Error {
+  return new Error(`Invalid JSONPath "${expression}" at ${position}: ${message}`)
+}
+
+function isContainer(value: JsonValue | undefined): value is Container {
+  return value !== null && typeof value === 'object'
+}
+
+function canonicalIndex(name: string): number | null {
+  return /^(0|[1-9]\d*)$/.test(name) ? Number(name) : null
+}
+
+function childOf(value: JsonValue | undefined, key: string | number): JsonValue | undefined {
+  if (Array.isArray(value)) {
+    const index = typeof key === 'number' ? key : canonicalIndex(key)
+    return index === null ? undefined : value[index]
+  }
+  if (isContainer(value) && Object.prototype.hasOwnProperty.call(value, key)) {
+    return (value as { [key: string]: JsonValue })[key]
+  }
+  return undefined
+}
+
+// --- Filter expressions -----------------------------------------------------
+
+type Operand = (value: JsonValue) => JsonValue | undefined
+
+interface FilterNode {
+  // The value for comparisons, and whether it counts as true on its own
+  value: Operand
+  test: (value: JsonValue) => boolean
+  depth: number
+}
+
+/**
+ * Recursive descent parser for the body of `[?(...)]`, compiled into
+ * closures rather than evaluated as code.
+ */
+class FilterParser {
+  private readonly source: string
+  private readonly expression: string
+  private readonly offset: number
+  private pos = 0
+  depth = 0
+
+  constructor(source: string, expression: string, offset: number) {
+    this.source = source
+    this.expression = expression
+    this.offset = offset
+  }
+
+  parse(): (value: JsonValue) => boolean {
+    const node = this.parseOr()
+    this.skipSpace()
+    if (this.pos < this.source.length) this.fail('unexpected input in filter')
+    return node.test
+  }
+
+  private fail(message: string): never {
+    throw syntaxError(this.expression, this.offset + this.pos, message)
+  }
+
+  private skipSpace() {
+    while (this.pos < this.source.length && /\s/.test(this.source[this.pos])) this.pos++
+  }
+
+  private eat(token: string): boolean {
+    this.skipSpace()
+    if (this.source.startsWith(token, this.pos)) {
+      this.pos += token.length
+      return true
+    }
+    return false
+  }
+
+  private parseOr(): FilterNode {
+    let left = this.parseAnd()
+    while (this.eat('||')) {
+      const a = left
+      const b = this.parseAnd()
+      const test = (v: JsonValue) => a.test(v) || b.test(v)
+      left = { test, value: test, depth: Math.max(a.depth, b.depth) }
+    }
+    return left
+  }
+
+  private parseAnd(): FilterNode {
+    let left = this.parseUnary()
+    while (this.eat('&&')) {
+      const a = left
+      const b = this.parseUnary()
+      const test = (v: JsonValue) => a.test(v) && b.test(v)
+      left = { test, value: test, depth: Math.max(a.depth, b.depth) }
+    }
+    return left
+  }
+
+  private parseUnary(): FilterNode {
+    if (this.eat('!')) {
+      if (this.source[this.pos] === '=') this.fail('unexpected "="')
+      const inner = this.parseUnary()
+      const test = (v: JsonValue) => !inner.test(v)
+      return { test, value: test, depth: inner.depth }
+    }
+    return this.parseComparison()
+  }
+
+  private parseComparison(): FilterNode {
+    const left = this.parseOperand()
+    for (const op of ['==', '!=', '<=', '>=', '<', '>']) {
+      if (this.eat(op)) {
+        const right = this.parseOperand()
+        const compare = (v: JsonValue) => compareValues(op, left.value(v), right.value(v))
+        return { test: compare, value: compare, depth: Math.max(left.depth, right.depth) }
+      }
+    }
+    return left
+  }
+
+  private parseOperand(): FilterNode {
+    this.skipSpace()
+    const char = this.source[this.pos]
+
+    if (char === '(') {
+      this.pos++
+      const inner = this.parseOr()
+      if (!this.eat(')')) this.fail('expected ")"')
+      return inner
+    }
+
+    if (char === '@') {
+      this.pos++
+      const steps = this.parseRelativePath()
+      this.depth = Math.max(this.depth, steps.length)
+      const value: Operand = (v) => {
+        let current: JsonValue | undefined = v
+        for (const step of steps) {
+          if (step === 'length' && (Array.isArray(current) || typeof current === 'string')) {
+            current = current.length
+          } else {
+            current = childOf(current, step)
+          }
+          if (current === undefined) return undefined
+        }
+        return current
+      }
+      // A bare path is an existence test
+      return { value, test: (v) => value(v) !== undefined, depth: steps.length }
+    }
+
+    const literal = this.parseLiteral()
+    return { value: () => literal, test: () => Boolean(literal), depth: 0 }
+  }
+
+  private parseRelativePath(): (string | number)[] {
+    const steps: (string | number)[] = []
+    for (;;) {
+      if (this.source[this.pos] === '.') {
+        this.pos++
+        const match = /^[^\s.[\]()!=<>&|]+/.exec(this.source.slice(this.pos))
+        if (!match) this.fail('expected a property name')
+        steps.push(match[0])
+        this.pos += match[0].length
+      } else if (this.source[this.pos] === '[') {
+        this.pos++
+        this.skipSpace()
+        const char = this.source[this.pos]
+        if (char === '"' || char === "'") {
+          steps.push(this.parseString())
+        } else {
+          const match = /^-?\d+/.exec(this.source.slice(this.pos))
+          if (!match) this.fail('expected a quoted name or index')
+          steps.push(Number(match[0]))
+          this.pos += match[0].length
+        }
+        if (!this.eat(']')) this.fail('expected "]"')
+      } else {
+        return steps
+      }
+    }
+  }
+
+  private parseString(): string {
+    const [value, end] = readQuoted(this.source, this.pos, this.expression, this.offset)
+    this.pos = end
+    return value
+  }
+
+  private parseLiteral(): JsonValue {
+    this.skipSpace()
+    const char = this.source[this.pos]
+    if (char === '"' || char === "'") return this.parseString()
+
+    const rest = this.source.slice(this.pos)
+    const number = /^-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?/.exec(rest)
+    if (number) {
+      this.pos += number[0].length
+      return Number(number[0])
+    }
+    for (const [word, value] of [['true', true], ['false', false], ['null', null]] as const) {
+      if (rest.startsWith(word)) {
+        this.pos += word.length
+        return value
+      }
+    }
+    this.fail('expected a value')
+  }
+}
+
+function compareValues(op: string, a: JsonValue | undefined, b: JsonValue | undefined): boolean {
+  switch (op) {
+    case '==':
+      return a !== undefined && a === b
+    case '!=':
+      return a !== b
+  }
+  const comparable = (typeof a === 'number' && typeof b === 'number') || (typeof a === 'string' && typeof b === 'string')
+  if (!comparable) return false
+  switch (op) {
+    case '<': return a! < b!
+    case '<=': return a! <= b!
+    case '>': return a! > b!
+    default: return a! >= b!
+  }
+}
+
+/**
+ * Read a single- or double-quoted string starting at pos. Returns the value
+ * and the position after the closing quote.
+ */
+function readQuoted(source: string, pos: number, expression: string, offset: number): [string, number] {
+  const quote = source[pos]
+  let value = ''
+  for (let i = pos + 1; i < source.length; i++) {
+    const char = source[i]
+    if (char === '\\') {
+      const next = source[++i]
+      if (next === 'u') {
+        value += String.fromCharCode(parseInt(source.slice(i + 1, i + 5), 16))
+        i += 4
+      } else {
+        value += ({ n: '\n', t: '\t', r: '\r', b: '\b', f: '\f' } as Record<string, string>)[next] ?? next
+      }
+    } else if (char === quote) {
+      return [value, i + 1]
+    } else {
+      value += char
+    }
+  }
+  throw syntaxError(expression, offset + pos, 'unterminated string')
+}
+
+// --- Expression parsing -----------------------------------------------------
+
+function parseSegments(expression: string): { segments: Segment[]; filterDepth: number } {
+  const segments: Segment[] = []
+  let filterDepth = 0
+  let pos = 0
+  const src = expression.trim()
+
+  const parseName = (descendant: boolean) => {
+    if (src[pos] === '*') {
+      pos++
+      segments.push({ descendant, selectors: [{ type: 'wildcard' }] })
+      return
+    }
+    const match = /^[^.[\]\s]+/.exec(src.slice(pos))
+    if (!match) throw syntaxError(expression, pos, 'expected a property name')
+    pos += match[0].length
+    segments.push({ descendant, selectors: [{ type: 'name', name: match[0], index: canonicalIndex(match[0]) }] })
+  }
+
+  const parseBracket = (descendant: boolean) => {
+    pos++ // [
+    const selectors: Selector[] = []
+    for (;;) {
+      while (/\s/.test(src[pos] ?? '')) pos++
+      const char = src[pos]
+
+      if (char === '?') {
+        pos++
+        while (/\s/.test(src[pos] ?? '')) pos++
+        const wrapped = src[pos] === '('
+        const start = wrapped ? pos + 1 : pos
+        const end = findFilterEnd(src, start, wrapped, expression)
+        const parser = new FilterParser(src.slice(start, end), expression, start)
+        selectors.push({ type: 'filter', test: parser.parse() })
+        filterDepth = Math.max(filterDepth, parser.depth)
+        pos = wrapped ? end + 1 : end
+      } else if (char === '*') {
+        pos++
+        selectors.push({ type: 'wildcard' })
+      } else if (char === '"' || char === "'") {
+        const [name, end] = readQuoted(src, pos, expression, 0)
+        pos = end
+        selectors.push({ type: 'name', name, index: null })
+      } else {
+        const match = /^(-?\d+)?\s*(:\s*(-?\d+)?\s*(:\s*(-?\d+)?)?)?/.exec(src.slice(pos))
+        if (!match || match[0].length === 0) throw syntaxError(expression, pos, 'expected a selector')
+        pos += match[0].length
+        if (match[2] !== undefined) {
+          const step = match[5] !== undefined ? Number(match[5]) : 1
+          selectors.push({
+            type: 'slice',
+            start: match[1] !== undefined ? Number(match[1]) : null,
+            end: match[3] !== undefined ? Number(match[3]) : null,
+            step,
+          })
+        } else {
+          selectors.push({ type: 'index', index: Number(match[1]) })
+        }
+      }
+
+      while (/\s/.test(src[pos] ?? '')) pos++
+      if (src[pos] === ',') {
+        pos++
+        continue
+      }
+      if (src[pos] === ']') {
+        pos++
+        break
+      }
+      throw syntaxError(expression, pos, 'expected "," or "]"')
+    }
+    segments.push({ descendant, selectors })
+  }
+
+  if (src[pos] === '$') {
+    pos++
+  } else if (pos < src.length && src[pos] !== '.' && src[pos] !== '[') {
+    // Bare dotted path as used in the spec, e.g. "floors.*.rooms"
+    parseName(false)
+  }
+
+  while (pos < src.length) {
+    if (src.startsWith('..', pos)) {
+      pos += 2
+      if (src[pos] === '[') parseBracket(true)
+      else parseName(true)
+    } else if (src[pos] === '.') {
+      pos++
+      parseName(false)
+    } else if (src[pos] === '[') {
+      parseBracket(false)
+    } else {
+      throw syntaxError(expression, pos, `unexpected "${src[pos]}"`)
+    }
+  }
+
+  if (segments.length > MAX_SEGMENTS) {
+    throw syntaxError(expression, 0, `more than ${MAX_SEGMENTS} segments`)
+  }
+  return { segments, filterDepth }
+}
+
+function findFilterEnd(src: string, start: number, wrapped: boolean, expression: string): number {
+  let depth = 0
+  for (let i = start; i < src.length; i++) {
+    const char = src[i]
+    if (char === '"' || char === "'") {
+      i = readQuoted(src, i, expression, 0)[1] - 1
+    } else if (char === '(') {
+      depth++
+    } else if (char === ')') {
+      if (depth === 0 && wrapped) return i
+      depth--
+    } else if ((char === ']' || char === ',') && depth === 0 && !wrapped) {
+      return i
+    }
+  }
+  throw syntaxError(expression, start, 'unterminated filter')
+}
+
+// --- Evaluation -------------------------------------------------------------
+
+function normalizeIndex(index: number, length: number): number {
+  return index < 0 ? length + index : index
+}
+
+function inSlice(index: number, length: number, selector: { start: number | null; end: number | null; step: number }): boolean {
+  const { step } = selector
+  if (step === 0) return false
+  if (step > 0) {
+    const lower = Math.max(0, Math.min(length, normalizeIndex(selector.start ?? 0, length)))
+    const upper = Math.max(0, Math.min(length, normalizeIndex(selector.end ?? length, length)))
+    return index >= lower && index < upper && (index - lower) % step === 0
+  }
+  const upper = Math.max(-1, Math.min(length - 1, normalizeIndex(selector.start ?? length - 1, length)))
+  const lower = selector.end === null ? -1 : Math.max(-1, Math.min(length - 1, normalizeIndex(selector.end, length)))
+  return index <= upper && index > lower && (upper - index) % -step === 0
+}
+
+function selectorMatches(selector: Selector, key: string | number, value: JsonValue, parent: Container): boolean {
+  switch (selector.type) {
+    case 'wildcard':
+      return true
+    case 'name':
+      return typeof key === 'number' ? selector.index === key : selector.name === key
+    case 'index':
+      return typeof key === 'number' && normalizeIndex(selector.index, (parent as JsonValue[]).length) === key
+    case 'slice':
+      return typeof key === 'number' && inSlice(key, (parent as JsonValue[]).length, selector)
+    case 'filter':
+      return selector.test(value)
+  }
+}
+
+export class CompiledJsonPath {
+  readonly expression: string
+  // How many levels below a node its filters look; an edit can change the
+  // match status of ancestors up to this many levels above it.
+  readonly filterDepth: number
+  private readonly segments: Segment[]
+  private readonly finalBit: number
+  // States that keep descending on their own (pending `..` segments)
+  private readonly descendantMask: number
+
+  constructor(expression: string) {
+    const { segments, filterDepth } = parseSegments(expression)
+    this.expression = expression
+    this.segments = segments
+    this.filterDepth = filterDepth
+    this.finalBit = 1 << segments.length
+    this.descendantMask = segments.reduce((mask, segment, i) => (segment.descendant ? mask | (1 << i) : mask), 0)
+  }
+
+  /** All matches in document order. */
+  evaluate(data: JsonValue): JsonPathMatch[] {
+    const matches: JsonPathMatch[] = []
+    this.walk(data, 1, [], matches)
+    return matches
+  }
+
+  /** The first match, or undefined. */
+  first(data: JsonValue): JsonPathMatch | undefined {
+    return this.evaluate(data)[0]
+  }
+
+  /** Whether the node at path is matched by this expression. */
+  matchesPath(data: JsonValue, path: JsonPath): boolean {
+    const state = this.stateAt(data, path)
+    return state !== null && (state.mask & this.finalBit) !== 0
+  }
+
+  /**
+   * Bring a previous result up to date after the value at changedPath was
+   * replaced. Only the part of the document that the change can affect is
+   * walked again. For insertions or removals in an array, pass the array's
+   * path, since they shift the indices of later items.
+   */
+  update(data: JsonValue, previous: JsonPathMatch[], changedPath: JsonPath): JsonPathMatch[] {
+    let rootPath = changedPath.slice(0, Math.max(0, changedPath.length - this.filterDepth))
+    let state = this.stateAt(data, rootPath)
+    while (state === null) {
+      // The changed node no longer exists; re-walk from its nearest surviving ancestor
+      rootPath = rootPath.slice(0, -1)
+      state = this.stateAt(data, rootPath)
+    }
+
+    const fresh: JsonPathMatch[] = []
+    if (state.mask !== 0) this.walk(state.value, state.mask, rootPath.slice(), fresh)
+
+    const kept: JsonPathMatch[] = []
+    let insertAt = -1
+    for (const match of previous) {
+      if (hasPrefix(match.path, rootPath)) {
+        if (insertAt === -1) insertAt = kept.length
+      } else {
+        kept.push(match)
+      }
+    }
+    if (insertAt === -1) {
+      insertAt = lowerBound(kept, match => comparePaths(data, match.path, rootPath) < 0)
+    }
+    kept.splice(insertAt, 0, ...fresh)
+    return kept
+  }
+
+  private step(mask: number, key: string | number, value: JsonValue, parent: Container): number {
+    let next = 0
+    for (let i = 0; i < this.segments.length; i++) {
+      if (!(mask & (1 << i))) continue
+      const segment = this.segments[i]
+      if (segment.descendant) next |= 1 << i
+      if (segment.selectors.some(selector => selectorMatches(selector, key, value, parent))) {
+        next |= 1 << (i + 1)
+      }
+    }
+    return next
+  }
+
+  private walk(value: JsonValue, mask: number, path: (string | number)[], matches: JsonPathMatch[]): void {
+    if (mask & this.finalBit) matches.push({ path: path.slice(), value })
+    // Nothing left to match below this node
+    if ((mask & ~this.finalBit) === 0 || !isContainer(value)) return
+
+    if (Array.isArray(value)) {
+      for (let i = 0; i < value.length; i++) {
+        const next = this.step(mask, i, value[i], value)
+        if (next === 0) continue
+        path.push(i)
+        this.walk(value[i], next, path, matches)
+        path.pop()
+      }
+    } else {
+      for (const key in value) {
+        const child = value[key]
+        const next = this.step(mask, key, child, value)
+        if (next === 0) continue
+        path.push(key)
+        this.walk(child, next, path, matches)
+        path.pop()
+      }
+    }
+  }
+
+  private stateAt(data: JsonValue, path: JsonPath): { mask: number; value: JsonValue } | null {
+    let mask = 1
+    let value = data
+    for (const segment of path) {
+      if (!isContainer(value)) return null
+      const key = Array.isArray(value) ? Number(segment) : String(segment)
+      const child = childOf(value, key)
+      if (child === undefined) return null
+      if (mask !== 0) mask = this.step(mask, key, child, value)
+      value = child
+    }
+    return { mask, value }
+  }
+}
+
+function hasPrefix(path: JsonPath, prefix: JsonPath): boolean {
+  if (path.length < prefix.length) return false
+  for (let i = 0; i < prefix.length; i++) {
+    if (String(path[i]) !== String(prefix[i])) return false
+  }
+  return true
+}
+
+function lowerBound<T>(items: T[], isBefore: (item: T) => boolean): number {
+  let low = 0
+  let high = items.length
+  while (low < high) {
+    const mid = (low + high) >> 1
+    if (isBefore(items[mid])) low = mid + 1
+    else high = mid
+  }
+  return low
+}
+
+/**
+ * Order two paths as a pre-order walk of data would visit them.
+ */
+export function comparePaths(data: JsonValue, a: JsonPath, b: JsonPath): number {
+  let node: JsonValue | undefined = data
+  for (let i = 0; ; i++) {
+    if (i === a.length || i === b.length) return a.length - b.length
+    if (String(a[i]) === String(b[i])) {
+      node = childOf(node, a[i])
+      continue
+    }
+    if (Array.isArray(node)) return Number(a[i]) - Number(b[i])
+    const keys = isContainer(node) ? Object.keys(node) : []
+    return keys.indexOf(String(a[i])) - keys.indexOf(String(b[i]))
+  }
+}
+
+const cache = new Map<string, CompiledJsonPath>()
+
+/**
+ * Compile an expression, reusing the cached automaton when the same
+ * expression was compiled before.
+ */
+export function compileJsonPath(expression: string): CompiledJsonPath {
+  let compiled = cache.get(expression)
+  if (compiled) {
+    // Refresh its position for least-recently-used eviction
+    cache.delete(expression)
+  } else {
+    compiled = new CompiledJsonPath(expression)
+    if (cache.size >= CACHE_LIMIT) {
+      cache.delete(cache.keys().next().value!)
+    }
+  }
+  cache.set(expression, compiled)
+  return compiled
+}
+
+export function queryJsonPath(data: JsonValue, expression: string): JsonPathMatch[] {
+  return compileJsonPath(expression).evaluate(data)
+}
+
+/**
+ * Split an expression that names exactly one location (such as a
+ * fieldMetadata key, "floors.first.rooms.kitchen" or "$.items[0]") into its
+ * segments, as strings. Returns null for wildcards, descendants, slices,
+ * unions and filters.
+ */
+export function parseConcretePath(expression: string): string[] | null {
+  const { segments } = parseSegments(expression)
+  const result: string[] = []
+  for (const segment of segments) {
+    const selector = segment.selectors[0]
+    if (segment.descendant || segment.selectors.length !== 1) return null
+    if (selector.type === 'name') result.push(selector.name)
+    else if (selector.type === 'index' && selector.index >= 0) result.push(String(selector.index))
+    else return null
+  }
+  return result
+}
+
+/**
+ * Format a concrete path in the dotted style used by .jsoncanvas metadata,
+ * falling back to brackets for names that would not survive a round trip.
+ */
+export function formatJsonPath(path: JsonPath): string {
+  let result = ''
+  for (const segment of path) {
+    if (typeof segment === 'number') {
+      result += result ? `.${segment}` : String(segment)
+    } else if (/^[^.[\]\s'"$@*]+$/.test(segment) && segment !== '') {
+      result += result ? `.${segment}` : segment
+    } else {
+      // JSON escapes backslashes and control characters; the quote is ours
+      result += `['${JSON.stringify(segment).slice(1, -1).replace(/'/g, "\\'")}']`
+    }
+  }
+  return result || '$'
+}
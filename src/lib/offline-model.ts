@@ -0,0 +1,339 @@
+/**
+ * Offline stand-in for the AI model, for benchmarks and tests.
+ *
+ * Answers are generated from the requested output schema, so every flow
+ * gets a value of the shape it asked for, and they are deterministic: the
+ * same prompt always gets the same answer. Latency, token streaming and
+ * failures are drawn from a generator seeded by the prompt and how many
+ * times it has been sent, so a run is reproducible however its requests
+ * interleave, and a retried request can succeed where the first try failed.
+ */
+
+export const OFFLINE_MODEL_NAME = 'offline/json-canvas'
+
+export type LatencyDistribution =
+  | { kind: 'fixed'; ms: number }
+  | { kind: 'uniform'; min: number; max: number }
+  | { kind: 'normal'; mean: number; sd: number }
+  | { kind: 'lognormal'; median: number; sigma: number }
+
+export type OfflineFailure = 'unavailable' | 'rate-limited' | 'timeout' | 'malformed' | 'empty'
+
+export interface OfflineModelOptions {
+  seed: number
+  // Time to the first token
+  latency: LatencyDistribution
+  // Output tokens streamed per second after the first; 0 sends the answer at once
+  tokensPerSecond: number
+  // Chance of each failure per request
+  failures: Partial<Record<OfflineFailure, number>>
+  // How long a 'timeout' failure hangs before it is reported
+  timeoutMs: number
+}
+
+export const DEFAULT_OFFLINE_MODEL_OPTIONS: OfflineModelOptions = {
+  seed: 1,
+  latency: { kind: 'fixed', ms: 0 },
+  tokensPerSecond: 0,
+  failures: {},
+  timeoutMs: 30000,
+}
+
+// Genkit status names, so callers see the same errors a real model gives
+export type OfflineErrorStatus = 'UNAVAILABLE' | 'RESOURCE_EXHAUSTED' | 'DEADLINE_EXCEEDED'
+
+export class OfflineModelError extends Error {
+  readonly status: OfflineErrorStatus
+
+  constructor(status: OfflineErrorStatus, message: string) {
+    super(message)
+    this.name = 'OfflineModelError'
+    this.status = status
+  }
+}
+
+export interface OfflineGeneration {
+  text: string
+  inputTokens: number
+  outputTokens: number
+  // Simulated time spent, whether or not it was actually waited
+  latencyMs: number
+}
+
+/** 32-bit FNV-1a. */
+export function hashString(text: string, seed = 0x811c9dc5): number {
+  let hash = seed >>> 0
+  for (let i = 0; i < text.length; i++) {
+    hash ^= text.charCodeAt(i)
+    hash = Math.imul(hash, 0x01000193)
+  }
+  return hash >>> 0
+}
+
+/** mulberry32: a small, fast generator of floats in [0, 1). */
+export function seededRandom(seed: number): () => number {
+  let state = seed >>> 0
+  return () => {
+    state = (state + 0x6d2b79f5) >>> 0
+    let t = state
+    t = Math.imul(t ^ (t >>> 15), t | 1)
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61)
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296
+  }
+}
+
+/** Roughly four characters to a token, as for English text. */
+export function estimateTokens(text: string): number {
+  return Math.ceil(text.length / 4)
+}
+
+/**
+ * Parse "fixed:MS", "uniform:MIN:MAX", "normal:MEAN:SD" or
+ * "lognormal:MEDIAN:SIGMA"; a bare number is fixed.
+ */
+export function parseLatency(spec: string): LatencyDistribution {
+  const [kind, ...rest] = spec.trim().split(':')
+  const args = rest.map(Number)
+  if (args.some(value => !Number.isFinite(value) || value < 0)) throw new Error(`Invalid latency: ${spec}`)
+  if (rest.length === 0 && Number.isFinite(Number(kind))) return { kind: 'fixed', ms: Number(kind) }
+  switch (kind) {
+    case 'fixed':
+      if (args.length === 1) return { kind, ms: args[0] }
+      break
+    case 'uniform':
+      if (args.length === 2 && args[0] <= args[1]) return { kind, min: args[0], max: args[1] }
+      break
+    case 'normal':
+      if (args.length === 2) return { kind, mean: args[0], sd: args[1] }
+      break
+    case 'lognormal':
+      if (args.length === 2 && args[0] > 0) return { kind, median: args[0], sigma: args[1] }
+      break
+  }
+  throw new Error(`Invalid latency: ${spec}`)
+}
+
+function standardNormal(random: () => number): number {
+  // Box-Muller; 1 - u keeps log away from zero
+  return Math.sqrt(-2 * Math.log(1 - random())) * Math.cos(2 * Math.PI * random())
+}
+
+export function sampleLatency(distribution: LatencyDistribution, random: () => number): number {
+  switch (distribution.kind) {
+    case 'fixed':
+      return distribution.ms
+    case 'uniform':
+      return distribution.min + (distribution.max - distribution.min) * random()
+    case 'normal':
+      return Math.max(0, distribution.mean + distribution.sd * standardNormal(random))
+    case 'lognormal':
+      return distribution.median * Math.exp(distribution.sigma * standardNormal(random))
+  }
+}
+
+const FAILURES: OfflineFailure[] = ['unavailable', 'rate-limited', 'timeout', 'malformed', 'empty']
+
+/** Parse "unavailable=0.02,malformed=0.01" into per-failure probabilities. */
+export function parseFailures(spec: string): Partial<Record<OfflineFailure, number>> {
+  const failures: Partial<Record<OfflineFailure, number>> = {}
+  for (const part of spec.split(',')) {
+    if (!part.trim()) continue
+    const [name, value] = part.split('=').map(item => item.trim())
+    const probability = Number(value)
+    if (!FAILURES.includes(name as OfflineFailure) || !(probability >= 0 && probability <= 1)) {
+      throw new Error(`Invalid failure: ${part} (expected one of ${FAILURES.join(', ')} = probability)`)
+    }
+    failures[name as OfflineFailure] = probability
+  }
+  return failures
+}
+
+/**
+ * Options from OFFLINE_MODEL_SEED, OFFLINE_MODEL_LATENCY,
+ * OFFLINE_MODEL_TOKENS_PER_SECOND, OFFLINE_MODEL_FAILURES and
+ * OFFLINE_MODEL_TIMEOUT_MS, with defaults for any not set.
+ */
+export function offlineModelOptionsFromEnv(env: Record<string, string | undefined>): OfflineModelOptions {
+  const number = (name: string, fallback: number) => {
+    const value = env[name]
+    if (value === undefined || value === '') return fallback
+    const parsed = Number(value)
+    if (!Number.isFinite(parsed) || parsed < 0) throw new Error(`Invalid ${name}: ${value}`)
+    return parsed
+  }
+  return {
+    seed: number('OFFLINE_MODEL_SEED', DEFAULT_OFFLINE_MODEL_OPTIONS.seed),
+    latency: env.OFFLINE_MODEL_LATENCY ? parseLatency(env.OFFLINE_MODEL_LATENCY) : DEFAULT_OFFLINE_MODEL_OPTIONS.latency,
+    tokensPerSecond: number('OFFLINE_MODEL_TOKENS_PER_SECOND', DEFAULT_OFFLINE_MODEL_OPTIONS.tokensPerSecond),
+    failures: env.OFFLINE_MODEL_FAILURES ? parseFailures(env.OFFLINE_MODEL_FAILURES) : {},
+    timeoutMs: number('OFFLINE_MODEL_TIMEOUT_MS', DEFAULT_OFFLINE_MODEL_OPTIONS.timeoutMs),
+  }
+}
+
+type JsonSchema = Record<string, any>
+
+const FALLBACK_WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel']
+
+function promptWords(prompt: string): string[] {
+  const words = prompt.match(/[A-Za-z][A-Za-z0-9]{2,}/g)
+  return words && words.length > 0 ? words : FALLBACK_WORDS
+}
+
+/**
+ * A value that satisfies a JSON schema, as produced by Genkit from a flow's
+ * zod output schema. Strings described as JSON hold JSON text, since the
+ * flows parse those fields; a JSON Patch string is an empty patch.
+ */
+export function synthesizeFromSchema(schema: JsonSchema | undefined, random: () => number, prompt = '', key = ''): unknown {
+  const words = promptWords(prompt)
+  const pick = () => words[Math.floor(random() * words.length)]
+  const phrase = (count: number) => Array.from({ length: count }, pick).join(' ')
+
+  const visit = (schema: JsonSchema | undefined, key: string, depth: number): unknown => {
+    if (!schema || Object.keys(schema).length === 0) return phrase(4)
+    if ('const' in schema) return schema.const
+    if (Array.isArray(schema.enum) && schema.enum.length > 0) return schema.enum[Math.floor(random() * schema.enum.length)]
+    const variants = schema.anyOf ?? schema.oneOf
+    if (Array.isArray(variants) && variants.length > 0) {
+      const variant = variants.find((item: JsonSchema) => item.type !== 'null') ?? variants[0]
+      return visit(variant, key, depth)
+    }
+    if (Array.isArray(schema.allOf)) return visit(Object.assign({}, ...schema.allOf), key, depth)
+
+    const type = Array.isArray(schema.type) ? schema.type.find((item: string) => item !== 'null') ?? 'null' : schema.type
+    switch (type ?? (schema.properties ? 'object' : 'string')) {
+      case 'object': {
+        const value: Record<string, unknown> = {}
+        for (const [name, property] of Object.entries<JsonSchema>(schema.properties ?? {})) {
+          value[name] = visit(property, name, depth + 1)
+        }
+        return value
+      }
+      case 'array': {
+        const min = schema.minItems ?? 0
+        const max = Math.max(min, Math.min(schema.maxItems ?? 3, depth > 3 ? min : 3))
+        const count = min + Math.floor(random() * (max - min + 1))
+        return Array.from({ length: count }, () => visit(schema.items, key, depth + 1))
+      }
+      case 'integer':
+      case 'number': {
+        const min = schema.minimum ?? schema.exclusiveMinimum ?? 0
+        const max = schema.maximum ?? schema.exclusiveMaximum ?? min + 100
+        const value = min + (max - min) * random()
+        return type === 'integer' ? Math.min(Math.ceil(value), Math.floor(max)) : value
+      }
+      case 'boolean':
+        return random() < 0.5
+      case 'null':
+        return null
+      default:
+        return synthesizeString(schema, key, random, pick, phrase)
+    }
+  }
+
+  return visit(schema, key, 0)
+}
+
+function synthesizeString(
+  schema: JsonSchema,
+  key: string,
+  random: () => number,
+  pick: () => string,
+  phrase: (count: number) => string
+): string {
+  const description = `${key} ${schema.description ?? ''}`
+  let text: string
+  if (/patch/i.test(description) && /json/i.test(description)) {
+    text = '[]'
+  } else if (/json/i.test(key) || /JSON (string|object|text)/i.test(schema.description ?? '')) {
+    const items = Array.from({ length: 1 + Math.floor(random() * 3) }, () => ({ name: pick(), value: Math.floor(random() * 1000) }))
+    text = JSON.stringify({ source: 'offline', title: phrase(3), items }, null, 2)
+  } else {
+    text = phrase(6 + Math.floor(random() * 10))
+  }
+  if (schema.maxLength !== undefined) text = text.slice(0, schema.maxLength)
+  while (schema.minLength !== undefined && text.length < schema.minLength) text += ` ${pick()}`
+  return text
+}
+
+function delay(ms: number): Promise<void> {
+  return new Promise(resolve => setTimeout(resolve, ms))
+}
+
+// Prompts whose send count is remembered; older ones start again from zero
+const MAX_TRACKED_PROMPTS = 10000
+
+/**
+ * The stand-in model. generate() answers one request, waiting out the
+ * simulated latency through the sleep function given to the constructor.
+ */
+export class OfflineModel {
+  readonly options: OfflineModelOptions
+  private readonly sleep: (ms: number) => Promise<void>
+  private readonly attempts = new Map<number, number>()
+
+  constructor(options: Partial<OfflineModelOptions> = {}, sleep: (ms: number) => Promise<void> = delay) {
+    this.options = { ...DEFAULT_OFFLINE_MODEL_OPTIONS, ...options }
+    this.sleep = sleep
+  }
+
+  private nextAttempt(promptHash: number): number {
+    const attempt = this.attempts.get(promptHash) ?? 0
+    this.attempts.delete(promptHash)
+    if (this.attempts.size >= MAX_TRACKED_PROMPTS) this.attempts.delete(this.attempts.keys().next().value!)
+    this.attempts.set(promptHash, attempt + 1)
+    return attempt
+  }
+
+  private drawFailure(random: () => number): OfflineFailure | null {
+    const roll = random()
+    let cumulative = 0
+    for (const failure of FAILURES) {
+      cumulative += this.options.failures[failure] ?? 0
+      if (roll < cumulative) return failure
+    }
+    return null
+  }
+
+  async generate(prompt: string, schema?: JsonSchema, onChunk?: (text: string) => void): Promise<OfflineGeneration> {
+    const promptHash = hashString(prompt, hashString(String(this.options.seed)))
+    // Timing and failures vary per attempt; the answer itself does not
+    const timing = seededRandom(hashString(String(this.nextAttempt(promptHash)), promptHash))
+    const content = seededRandom(promptHash)
+    const inputTokens = estimateTokens(prompt)
+
+    const failure = this.drawFailure(timing)
+    let latencyMs = sampleLatency(this.options.latency, timing)
+    if (failure === 'timeout') {
+      await this.sleep(this.options.timeoutMs)
+      throw new OfflineModelError('DEADLINE_EXCEEDED', `Offline model timed out after ${this.options.timeoutMs} ms`)
+    }
+    await this.sleep(latencyMs)
+    if (failure === 'unavailable') throw new OfflineModelError('UNAVAILABLE', 'Offline model unavailable (injected failure)')
+    if (failure === 'rate-limited') throw new OfflineModelError('RESOURCE_EXHAUSTED', 'Offline model rate limit (injected failure)')
+
+    let text = schema ? JSON.stringify(synthesizeFromSchema(schema, content, prompt)) : String(synthesizeFromSchema(undefined, content, prompt))
+    if (failure === 'empty') text = ''
+    // Cut off mid-value, the way a truncated answer arrives
+    if (failure === 'malformed') text = text.slice(0, Math.max(1, Math.floor(text.length / 2)))
+
+    const outputTokens = estimateTokens(text)
+    if (this.options.tokensPerSecond > 0 && outputTokens > 1) {
+      // The first token arrives with the latency; the rest at the token rate
+      const chunkChars = Math.max(4, Math.ceil(text.length / 16))
+      for (let offset = 0; offset < text.length; offset += chunkChars) {
+        const chunk = text.slice(offset, offset + chunkChars)
+        if (offset > 0) {
+          const wait = (estimateTokens(chunk) / this.options.tokensPerSecond) * 1000
+          latencyMs += wait
+          await this.sleep(wait)
+        }
+        onChunk?.(chunk)
+      }
+    } else if (text) {
+      onChunk?.(text)
+    }
+
+    return { text, inputTokens, outputTokens, latencyMs }
+  }
+}
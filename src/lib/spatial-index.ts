@@ -0,0 +1,296 @@
+import type { SpatialRoom } from './jsoncanvas-types'
+
+/**
+ * Uniform-grid index over the rooms of a floor plan (`structure.spatial`).
+ *
+ * Each floor has its own grid of square cells. A room is listed in every
+ * cell its rectangle overlaps, so point, rectangle and nearest-room queries
+ * only look at the cells around the query instead of every room. Moving or
+ * resizing a room touches only the cells under its old and new rectangles.
+ *
+ * Rooms are usually similar in size, which is what a uniform grid handles
+ * well; the cell size defaults to the median room side.
+ */
+
+export interface Rect {
+  x: number
+  y: number
+  width: number
+  height: number
+}
+
+// Rooms without a floor are on the ground floor, matching the spec's examples
+export const DEFAULT_FLOOR = 1
+
+const MIN_CELL_SIZE = 1
+
+interface Entry {
+  room: SpatialRoom
+  floor: number
+  // Insertion order, so overlapping rooms resolve the same way they render
+  order: number
+  // Query stamp, so a room listed in several cells is reported once
+  seen: number
+  cells: number[]
+}
+
+interface FloorGrid {
+  cells: Map<number, Entry[]>
+  // Cell bounds of everything ever added, which caps nearest-room searches
+  minX: number
+  minY: number
+  maxX: number
+  maxY: number
+}
+
+function floorOf(room: SpatialRoom): number {
+  return room.floor ?? DEFAULT_FLOOR
+}
+
+// Cell coordinates packed into one number; safe for |cx|, |cy| < 2^25
+const CELL_OFFSET = 2 ** 25
+function cellKey(cx: number, cy: number): number {
+  return (cx + CELL_OFFSET) * 2 ** 26 + (cy + CELL_OFFSET)
+}
+
+function containsPoint(room: Rect, x: number, y: number): boolean {
+  return x >= room.x && x <= room.x + room.width && y >= room.y && y <= room.y + room.height
+}
+
+function intersects(room: Rect, rect: Rect): boolean {
+  return room.x <= rect.x + rect.width && rect.x <= room.x + room.width && room.y <= rect.y + rect.height && rect.y <= room.y + room.height
+}
+
+/** Distance from a point to the nearest edge of a rectangle, 0 if inside. */
+export function distanceToRect(room: Rect, x: number, y: number): number {
+  const dx = Math.max(room.x - x, 0, x - (room.x + room.width))
+  const dy = Math.max(room.y - y, 0, y - (room.y + room.height))
+  return Math.hypot(dx, dy)
+}
+
+function medianSide(rooms: SpatialRoom[]): number {
+  if (rooms.length === 0) return 100
+  const sides = rooms.map(room => Math.max(room.width, room.height)).sort((a, b) => a - b)
+  return sides[sides.length >> 1]
+}
+
+export class RoomSpatialIndex {
+  readonly cellSize: number
+  private readonly entries = new Map<string, Entry>()
+  private readonly grids = new Map<number, FloorGrid>()
+  private nextOrder = 0
+  private stamp = 0
+
+  constructor(rooms: SpatialRoom[] = [], cellSize?: number) {
+    this.cellSize = Math.max(cellSize ?? medianSide(rooms), MIN_CELL_SIZE)
+    for (const room of rooms) this.insert(room)
+  }
+
+  get size(): number {
+    return this.entries.size
+  }
+
+  /** Floors that have at least one room, in ascending order. */
+  floors(): number[] {
+    return Array.from(this.grids.keys()).sort((a, b) => a - b)
+  }
+
+  get(id: string): SpatialRoom | undefined {
+    return this.entries.get(id)?.room
+  }
+
+  /** Add a room, replacing any room with the same id. */
+  insert(room: SpatialRoom): void {
+    const existing = this.entries.get(room.id)
+    if (existing) {
+      this.update(room)
+      return
+    }
+    const entry: Entry = { room, floor: floorOf(room), order: this.nextOrder++, seen: 0, cells: [] }
+    this.entries.set(room.id, entry)
+    this.addToCells(entry)
+  }
+
+  remove(id: string): boolean {
+    const entry = this.entries.get(id)
+    if (!entry) return false
+    this.removeFromCells(entry)
+    this.entries.delete(id)
+    return true
+  }
+
+  /**
+   * Replace a room after it moved, was resized or changed floor. Only the
+   * cells under the old and new rectangles are touched.
+   */
+  update(room: SpatialRoom): void {
+    const entry = this.entries.get(room.id)
+    if (!entry) {
+      this.insert(room)
+      return
+    }
+    const before = this.cellRange(entry.room)
+    const after = this.cellRange(room)
+    entry.room = room
+    if (floorOf(room) === entry.floor && before.every((value, i) => value === after[i])) return
+    this.removeFromCells(entry)
+    entry.floor = floorOf(room)
+    this.addToCells(entry)
+  }
+
+  /** The topmost room containing the point, i.e. the one added last. */
+  roomAt(floor: number, x: number, y: number): SpatialRoom | undefined {
+    let best: Entry | undefined
+    for (const entry of this.cell(floor, Math.floor(x / this.cellSize), Math.floor(y / this.cellSize))) {
+      if (containsPoint(entry.room, x, y) && (!best || entry.order > best.order)) best = entry
+    }
+    return best?.room
+  }
+
+  /** Every room containing the point, bottom first. */
+  roomsAt(floor: number, x: number, y: number): SpatialRoom[] {
+    return this.cell(floor, Math.floor(x / this.cellSize), Math.floor(y / this.cellSize))
+      .filter(entry => containsPoint(entry.room, x, y))
+      .sort((a, b) => a.order - b.order)
+      .map(entry => entry.room)
+  }
+
+  /** Rooms overlapping the rectangle, such as the visible viewport, bottom first. */
+  roomsInRect(floor: number, rect: Rect): SpatialRoom[] {
+    const grid = this.grids.get(floor)?.cells
+    if (!grid) return []
+    const [minX, minY, maxX, maxY] = this.cellRange(rect)
+    const stamp = ++this.stamp
+    const found: Entry[] = []
+
+    // A viewport larger than the plan covers mostly empty cells, so walk
+    // the occupied ones instead
+    if ((maxX - minX + 1) * (maxY - minY + 1) > grid.size) {
+      grid.forEach(entries => this.collect(entries, rect, stamp, found))
+    } else {
+      for (let cx = minX; cx <= maxX; cx++) {
+        for (let cy = minY; cy <= maxY; cy++) {
+          const entries = grid.get(cellKey(cx, cy))
+          if (entries) this.collect(entries, rect, stamp, found)
+        }
+      }
+    }
+    return found.sort((a, b) => a.order - b.order).map(entry => entry.room)
+  }
+
+  /**
+   * The room closest to the point (0 if the point is inside one), searching
+   * rings of cells outward until no closer room can exist.
+   */
+  nearestRoom(floor: number, x: number, y: number, maxDistance = Infinity): SpatialRoom | undefined {
+    const floorGrid = this.grids.get(floor)
+    if (!floorGrid) return undefined
+    const grid = floorGrid.cells
+
+    const cx = Math.floor(x / this.cellSize)
+    const cy = Math.floor(y / this.cellSize)
+    // Rings beyond the floor's bounds cannot add anything
+    const maxRing = Math.max(cx - floorGrid.minX, floorGrid.maxX - cx, cy - floorGrid.minY, floorGrid.maxY - cy, 0)
+
+    const stamp = ++this.stamp
+    let best: Entry | undefined
+    let bestDistance = maxDistance
+    const visit = (entries: Entry[] | undefined) => {
+      if (!entries) return
+      for (const entry of entries) {
+        if (entry.seen === stamp) continue
+        entry.seen = stamp
+        const distance = distanceToRect(entry.room, x, y)
+        // Ties go to the topmost room
+        if (distance < bestDistance || (distance === bestDistance && (!best || entry.order > best.order))) {
+          best = entry
+          bestDistance = distance
+        }
+      }
+    }
+
+    // Far outside the plan most rings are empty; scanning the occupied cells is cheaper
+    if ((2 * maxRing + 1) ** 2 > grid.size * 4) {
+      grid.forEach(visit)
+      return best?.room
+    }
+
+    for (let ring = 0; ring <= maxRing; ring++) {
+      // Every point in ring r is at least (r - 1) cells away
+      if ((ring - 1) * this.cellSize > bestDistance) break
+      if (ring === 0) {
+        visit(grid.get(cellKey(cx, cy)))
+        continue
+      }
+      for (let i = -ring; i <= ring; i++) {
+        visit(grid.get(cellKey(cx + i, cy - ring)))
+        visit(grid.get(cellKey(cx + i, cy + ring)))
+      }
+      for (let i = -ring + 1; i <= ring - 1; i++) {
+        visit(grid.get(cellKey(cx - ring, cy + i)))
+        visit(grid.get(cellKey(cx + ring, cy + i)))
+      }
+    }
+    return best?.room
+  }
+
+  private collect(entries: Entry[], rect: Rect, stamp: number, found: Entry[]) {
+    for (const entry of entries) {
+      if (entry.seen === stamp) continue
+      entry.seen = stamp
+      if (intersects(entry.room, rect)) found.push(entry)
+    }
+  }
+
+  private cell(floor: number, cx: number, cy: number): Entry[] {
+    return this.grids.get(floor)?.cells.get(cellKey(cx, cy)) ?? []
+  }
+
+  private cellRange(rect: Rect): [number, number, number, number] {
+    const size = this.cellSize
+    return [
+      Math.floor(rect.x / size),
+      Math.floor(rect.y / size),
+      Math.floor((rect.x + Math.max(rect.width, 0)) / size),
+      Math.floor((rect.y + Math.max(rect.height, 0)) / size),
+    ]
+  }
+
+  private addToCells(entry: Entry) {
+    const [minX, minY, maxX, maxY] = this.cellRange(entry.room)
+    let floorGrid = this.grids.get(entry.floor)
+    if (!floorGrid) {
+      floorGrid = { cells: new Map(), minX, minY, maxX, maxY }
+      this.grids.set(entry.floor, floorGrid)
+    }
+    floorGrid.minX = Math.min(floorGrid.minX, minX)
+    floorGrid.minY = Math.min(floorGrid.minY, minY)
+    floorGrid.maxX = Math.max(floorGrid.maxX, maxX)
+    floorGrid.maxY = Math.max(floorGrid.maxY, maxY)
+    const grid = floorGrid.cells
+    for (let cx = minX; cx <= maxX; cx++) {
+      for (let cy = minY; cy <= maxY; cy++) {
+        const key = cellKey(cx, cy)
+        const cell = grid.get(key)
+        if (cell) cell.push(entry)
+        else grid.set(key, [entry])
+        entry.cells.push(key)
+      }
+    }
+  }
+
+  private removeFromCells(entry: Entry) {
+    const grid = this.grids.get(entry.floor)?.cells
+    if (grid) {
+      for (const key of entry.cells) {
+        const cell = grid.get(key)
+        if (!cell) continue
+        const index = cell.indexOf(entry)
+        if (index >= 0) cell.splice(index, 1)
+        if (cell.length === 0) grid.delete(key)
+      }
+      if (grid.size === 0) this.grids.delete(entry.floor)
+    }
+    entry.cells = []
+  }
+}
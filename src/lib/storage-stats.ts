@@ -0,0 +1,59 @@
+/**
+ * Running totals for at-rest compression, reported by SafeStorage.getStorageInfo.
+ */
+
+export interface CompressionStats {
+  // Bytes of key-packed JSON text that went into the compressor
+  textBytes: number
+  // Bytes actually written to IndexedDB
+  storedBytes: number
+  // storedBytes / textBytes; 1 when nothing has been written yet
+  ratio: number
+  compressMs: number
+  decompressMs: number
+  writes: number
+  reads: number
+}
+
+export interface WriteStats {
+  textBytes: number
+  storedBytes: number
+  durationMs: number
+}
+
+const totals = {
+  textBytes: 0,
+  storedBytes: 0,
+  compressMs: 0,
+  decompressMs: 0,
+  writes: 0,
+  reads: 0,
+}
+
+export function recordCompression(stats: WriteStats): void {
+  totals.textBytes += stats.textBytes
+  totals.storedBytes += stats.storedBytes
+  totals.compressMs += stats.durationMs
+  totals.writes += 1
+}
+
+export function recordDecompression(durationMs: number): void {
+  totals.decompressMs += durationMs
+  totals.reads += 1
+}
+
+export function getCompressionStats(): CompressionStats {
+  return {
+    ...totals,
+    ratio: totals.textBytes > 0 ? totals.storedBytes / totals.textBytes : 1,
+  }
+}
+
+export function resetCompressionStats(): void {
+  totals.textBytes = 0
+  totals.storedBytes = 0
+  totals.compressMs = 0
+  totals.decompressMs = 0
+  totals.writes = 0
+  totals.reads = 0
+}
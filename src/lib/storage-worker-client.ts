@@ -0,0 +1,150 @@
+import { openDocumentDatabase, readDocument, readLog, readLogEntries, readLogValues, readWorkspaceIndex, writeBatch, writeLog } from './document-db'
+import type { PersistenceBatch, StoredDocument, WorkspaceRecord } from './document-db'
+import type { StorageBackend } from './document-storage'
+import type { LogEntryRecord, LogKind, LogManifest, LogStorage, LogValueRecord, LogWrite } from './canvas-log'
+import { recordCompression, recordDecompression } from './storage-stats'
+import type { WriteStats } from './storage-stats'
+
+export type StorageWorkerRequest =
+  | { requestId: number; type: 'write'; batch: PersistenceBatch }
+  | { requestId: number; type: 'readIndex' }
+  | { requestId: number; type: 'readDocument'; id: string }
+  | { requestId: number; type: 'writeLog'; write: LogWrite }
+  | { requestId: number; type: 'readLog'; docId: string; kind: LogKind }
+  | { requestId: number; type: 'readLogEntries'; docId: string; kind: LogKind; fromSeq: number; toSeq: number }
+  | { requestId: number; type: 'readLogValues'; docId: string; hashes: string[] }
+
+export type StorageWorkerResponse =
+  | { requestId: number; result: any; error?: undefined }
+  | { requestId: number; error: string; result?: undefined }
+
+type PendingRequest = { resolve: (value: any) => void; reject: (error: Error) => void }
+
+export type BrowserStorageBackend = StorageBackend & LogStorage
+
+/**
+ * Storage backend that forwards every request to the storage worker.
+ */
+export class WorkerStorageBackend implements BrowserStorageBackend {
+  private worker: Worker
+  private nextRequestId = 1
+  private pending = new Map<number, PendingRequest>()
+
+  constructor(worker: Worker) {
+    this.worker = worker
+    this.worker.onmessage = (event: MessageEvent<StorageWorkerResponse>) => {
+      const { requestId, result, error } = event.data
+      const request = this.pending.get(requestId)
+      if (!request) return
+      this.pending.delete(requestId)
+      if (error !== undefined) {
+        request.reject(new Error(error))
+      } else {
+        request.resolve(result)
+      }
+    }
+    this.worker.onerror = (event: ErrorEvent) => {
+      const error = new Error(event.message || 'Storage worker failed')
+      this.pending.forEach(request => request.reject(error))
+      this.pending.clear()
+    }
+  }
+
+  async write(batch: PersistenceBatch): Promise<void> {
+    recordCompression(await this.send<WriteStats>({ requestId: this.nextRequestId++, type: 'write', batch }))
+  }
+
+  readIndex(): Promise<WorkspaceRecord | null> {
+    return this.send<WorkspaceRecord | null>({ requestId: this.nextRequestId++, type: 'readIndex' })
+  }
+
+  async readDocument(id: string): Promise<StoredDocument | null> {
+    const stored = await this.send<StoredDocument | null>({ requestId: this.nextRequestId++, type: 'readDocument', id })
+    if (stored) recordDecompression(stored.decodeMs ?? 0)
+    return stored
+  }
+
+  async writeLog(write: LogWrite): Promise<void> {
+    await this.send<null>({ requestId: this.nextRequestId++, type: 'writeLog', write })
+  }
+
+  readLog(docId: string, kind: LogKind): Promise<{ manifest: LogManifest | null; open: LogEntryRecord[] }> {
+    return this.send({ requestId: this.nextRequestId++, type: 'readLog', docId, kind })
+  }
+
+  readLogEntries(docId: string, kind: LogKind, fromSeq: number, toSeq: number): Promise<LogEntryRecord[]> {
+    return this.send({ requestId: this.nextRequestId++, type: 'readLogEntries', docId, kind, fromSeq, toSeq })
+  }
+
+  readLogValues(docId: string, hashes: string[]): Promise<LogValueRecord[]> {
+    return this.send({ requestId: this.nextRequestId++, type: 'readLogValues', docId, hashes })
+  }
+
+  terminate(): void {
+    this.worker.terminate()
+  }
+
+  private send<T>(request: StorageWorkerRequest): Promise<T> {
+    return new Promise<T>((resolve, reject) => {
+      this.pending.set(request.requestId, { resolve, reject })
+      this.worker.postMessage(request)
+    })
+  }
+}
+
+/**
+ * Fallback backend for environments without module workers. Same database,
+ * but serialization and compression run on the calling thread.
+ */
+export class IndexedDbStorageBackend implements BrowserStorageBackend {
+  private dbPromise: Promise<IDBDatabase> | null = null
+
+  async write(batch: PersistenceBatch): Promise<void> {
+    recordCompression(await writeBatch(await this.getDatabase(), batch))
+  }
+
+  async readIndex(): Promise<WorkspaceRecord | null> {
+    return readWorkspaceIndex(await this.getDatabase())
+  }
+
+  async readDocument(id: string): Promise<StoredDocument | null> {
+    const stored = await readDocument(await this.getDatabase(), id)
+    if (stored) recordDecompression(stored.decodeMs ?? 0)
+    return stored
+  }
+
+  async writeLog(write: LogWrite): Promise<void> {
+    await writeLog(await this.getDatabase(), write)
+  }
+
+  async readLog(docId: string, kind: LogKind): Promise<{ manifest: LogManifest | null; open: LogEntryRecord[] }> {
+    return readLog(await this.getDatabase(), docId, kind)
+  }
+
+  async readLogEntries(docId: string, kind: LogKind, fromSeq: number, toSeq: number): Promise<LogEntryRecord[]> {
+    return readLogEntries(await this.getDatabase(), docId, kind, fromSeq, toSeq)
+  }
+
+  async readLogValues(docId: string, hashes: string[]): Promise<LogValueRecord[]> {
+    return readLogValues(await this.getDatabase(), docId, hashes)
+  }
+
+  private getDatabase(): Promise<IDBDatabase> {
+    if (!this.dbPromise) {
+      this.dbPromise = openDocumentDatabase()
+    }
+    return this.dbPromise
+  }
+}
+
+export function createBrowserStorageBackend(): BrowserStorageBackend {
+  if (typeof Worker !== 'undefined') {
+    try {
+      const worker = new Worker(new URL('./document-storage.worker.ts', import.meta.url), { type: 'module' })
+      return new WorkerStorageBackend(worker)
+    } catch (error) {
+      console.warn('Storage worker unavailable, persisting on the main thread:', error)
+    }
+  }
+  return new IndexedDbStorageBackend()
+}
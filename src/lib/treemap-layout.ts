@@ -0,0 +1,394 @@
+import type { JsonObject, JsonPath, JsonValue } from '@/components/json-canvas/types'
+import { replaceAtPath } from './json-utils'
+import { utf8Length } from './document-metadata'
+
+/**
+ * Squarified treemap layout for the `spatial-treemap` display.
+ *
+ * Every object and array becomes a rectangle, split among its children in
+ * proportion to their weight (UTF-8 JSON byte size or leaf count) using the
+ * squarified algorithm (Bruls, Huizing and van Wijk), which keeps the
+ * rectangles close to square.
+ *
+ * Work is memoized at two levels. Weight and a content hash are cached per
+ * subtree by object identity; documents are edited by path copying, so
+ * after an edit only the ancestors of the changed node are new objects and
+ * need hashing again. The split of a node's rectangle among its children
+ * is cached by content hash and size, so a subtree whose content and
+ * rectangle did not change is not laid out again, wherever it moved to.
+ *
+ * The result is a set of flat typed arrays that a renderer can draw
+ * directly and a worker can transfer without copying.
+ */
+
+export type TreemapWeight = 'bytes' | 'count'
+
+export interface TreemapOptions {
+  // Gap between a rectangle and its children
+  padding: number
+  // Rectangles narrower or shorter than this are drawn but not subdivided
+  minRoomSize: number
+  weight: TreemapWeight
+  maxDepth: number
+}
+
+export const DEFAULT_TREEMAP_OPTIONS: TreemapOptions = {
+  padding: 4,
+  minRoomSize: 24,
+  weight: 'bytes',
+  maxDepth: 16,
+}
+
+/**
+ * Flattened layout in depth-first order, so parents precede children.
+ * Node i occupies rects[4i .. 4i+3] as x, y, width, height.
+ */
+export interface TreemapLayout {
+  count: number
+  rects: Float32Array
+  // Index of the parent node, -1 for the root
+  parents: Int32Array
+  depths: Uint8Array
+  weights: Float64Array
+  // Property name or array index of each node, '' for the root
+  keys: string[]
+}
+
+export interface TreemapPatch {
+  path: JsonPath
+  value: JsonValue
+}
+
+interface NodeInfo {
+  bytes: number
+  count: number
+  hash: string
+  keys: string[]
+  // Per child, in key order
+  childBytes: number[]
+  childCounts: number[]
+}
+
+// Cached child splits; enough for several large documents
+const MAX_MEMO_ENTRIES = 20000
+// Beyond this many changed subtrees a full replace is cheaper to send
+const MAX_PATCHES = 64
+
+function isContainer(value: JsonValue): value is JsonObject | JsonValue[] {
+  return typeof value === 'object' && value !== null
+}
+
+function mixString(h: number, text: string, multiplier: number): number {
+  for (let i = 0; i < text.length; i++) {
+    h = Math.imul(h ^ text.charCodeAt(i), multiplier)
+    h ^= h >>> 13
+  }
+  return h
+}
+
+function primitiveInfo(value: JsonValue): { bytes: number; hash: string } {
+  const text = value === undefined ? 'null' : JSON.stringify(value)
+  const h1 = mixString(0x811c9dc5, text, 0x01000193) >>> 0
+  const h2 = mixString(0x01000193 ^ text.length, text, 0x5bd1e995) >>> 0
+  return { bytes: utf8Length(text), hash: h1.toString(36) + '.' + h2.toString(36) }
+}
+
+/**
+ * Squarify weights into the rectangle (x, y, width, height), writing one
+ * rectangle per weight into out at 4 * index. Weights must be sorted in
+ * descending order; order maps each sorted position to its output index.
+ */
+function squarify(weights: number[], order: number[], x: number, y: number, width: number, height: number, out: Float32Array) {
+  const total = weights.reduce((sum, weight) => sum + weight, 0)
+  if (total <= 0 || width <= 0 || height <= 0) return
+  const scale = (width * height) / total
+
+  let start = 0
+  while (start < weights.length) {
+    const side = Math.min(width, height)
+    // Grow the row while the worst aspect ratio keeps improving
+    let end = start
+    let rowArea = 0
+    let rowMin = Infinity
+    let rowMax = 0
+    let worst = Infinity
+    while (end < weights.length) {
+      const area = weights[end] * scale
+      const nextArea = rowArea + area
+      const nextMin = Math.min(rowMin, area)
+      const nextMax = Math.max(rowMax, area)
+      const nextWorst = Math.max((side * side * nextMax) / (nextArea * nextArea), (nextArea * nextArea) / (side * side * nextMin))
+      if (nextWorst > worst) break
+      rowArea = nextArea
+      rowMin = nextMin
+      rowMax = nextMax
+      worst = nextWorst
+      end++
+    }
+
+    // Lay the row along the shorter side
+    const thickness = rowArea / side
+    let offset = 0
+    for (let i = start; i < end; i++) {
+      const length = (weights[i] * scale) / thickness
+      const at = order[i] * 4
+      if (width >= height) {
+        out[at] = x
+        out[at + 1] = y + offset
+        out[at + 2] = thickness
+        out[at + 3] = length
+      } else {
+        out[at] = x + offset
+        out[at + 1] = y
+        out[at + 2] = length
+        out[at + 3] = thickness
+      }
+      offset += length
+    }
+    if (width >= height) {
+      x += thickness
+      width -= thickness
+    } else {
+      y += thickness
+      height -= thickness
+    }
+    start = end
+  }
+}
+
+/**
+ * The smallest set of patches that turns prev into next, found by
+ * comparing references: subtrees shared between the two are skipped, so
+ * the cost follows the size of the edit. Containers whose keys changed are
+ * replaced whole.
+ */
+export function diffByReference(prev: JsonValue, next: JsonValue): TreemapPatch[] | null {
+  const patches: TreemapPatch[] = []
+  const visit = (a: JsonValue, b: JsonValue, path: JsonPath): boolean => {
+    if (a === b) return true
+    if (isContainer(a) && isContainer(b) && Array.isArray(a) === Array.isArray(b)) {
+      if (Array.isArray(a)) {
+        const items = b as JsonValue[]
+        if (a.length === items.length) {
+          return a.every((item, i) => visit(item, items[i], [...path, i]))
+        }
+      } else {
+        const aKeys = Object.keys(a)
+        const bKeys = Object.keys(b)
+        if (aKeys.length === bKeys.length && aKeys.every((key, i) => key === bKeys[i])) {
+          return aKeys.every(key => visit((a as JsonObject)[key], (b as JsonObject)[key], [...path, key]))
+        }
+      }
+    }
+    patches.push({ path, value: b })
+    return patches.length <= MAX_PATCHES
+  }
+  return visit(prev, next, []) ? patches : null
+}
+
+export interface TreemapStats {
+  // Nodes whose weight and hash were computed
+  hashed: number
+  // Child splits computed, and reused from the memo
+  laidOut: number
+  reused: number
+}
+
+/**
+ * Holds the documents being displayed and the memoized layout state.
+ * Runs in the treemap worker, or on the main thread as a fallback.
+ */
+export class TreemapEngine {
+  readonly stats: TreemapStats = { hashed: 0, laidOut: 0, reused: 0 }
+  private readonly documents = new Map<string, JsonValue>()
+  private readonly info = new WeakMap<object, NodeInfo>()
+  private readonly memo = new Map<string, Float32Array>()
+
+  set(docId: string, data: JsonValue): void {
+    this.documents.set(docId, data)
+  }
+
+  /** Apply edits by path copying, so unchanged subtrees keep their cache entries. */
+  patch(docId: string, patches: TreemapPatch[]): void {
+    let data = this.documents.get(docId)
+    if (data === undefined) throw new Error(`Unknown treemap document: ${docId}`)
+    for (const { path, value } of patches) data = replaceAtPath(data, path, value)
+    this.documents.set(docId, data)
+  }
+
+  delete(docId: string): void {
+    this.documents.delete(docId)
+  }
+
+  layout(docId: string, width: number, height: number, options: Partial<TreemapOptions> = {}): TreemapLayout {
+    const data = this.documents.get(docId)
+    if (data === undefined) throw new Error(`Unknown treemap document: ${docId}`)
+    return this.layoutValue(data, width, height, options)
+  }
+
+  layoutValue(data: JsonValue, width: number, height: number, options: Partial<TreemapOptions> = {}): TreemapLayout {
+    const { padding, minRoomSize, weight, maxDepth } = { ...DEFAULT_TREEMAP_OPTIONS, ...options }
+
+    let capacity = 256
+    let rects = new Float32Array(capacity * 4)
+    let parents = new Int32Array(capacity)
+    let depths = new Uint8Array(capacity)
+    let weights = new Float64Array(capacity)
+    const keys: string[] = []
+    let count = 0
+
+    const grow = () => {
+      capacity *= 2
+      const nextRects = new Float32Array(capacity * 4)
+      nextRects.set(rects)
+      rects = nextRects
+      const nextParents = new Int32Array(capacity)
+      nextParents.set(parents)
+      parents = nextParents
+      const nextDepths = new Uint8Array(capacity)
+      nextDepths.set(depths)
+      depths = nextDepths
+      const nextWeights = new Float64Array(capacity)
+      nextWeights.set(weights)
+      weights = nextWeights
+    }
+
+    // Depth-first with an explicit stack; children are pushed in reverse
+    const rootWeight = isContainer(data)
+      ? weight === 'bytes' ? this.nodeInfo(data).bytes : this.nodeInfo(data).count
+      : weight === 'bytes' ? primitiveInfo(data).bytes : 1
+    const stack: { value: JsonValue; key: string; weight: number; parent: number; depth: number; x: number; y: number; w: number; h: number }[] = [
+      { value: data, key: '', weight: rootWeight, parent: -1, depth: 0, x: 0, y: 0, w: width, h: height },
+    ]
+    while (stack.length > 0) {
+      const node = stack.pop()!
+      if (count === capacity) grow()
+      const index = count++
+      rects[index * 4] = node.x
+      rects[index * 4 + 1] = node.y
+      rects[index * 4 + 2] = node.w
+      rects[index * 4 + 3] = node.h
+      parents[index] = node.parent
+      depths[index] = Math.min(node.depth, 255)
+      weights[index] = node.weight
+      keys.push(node.key)
+
+      if (!isContainer(node.value)) continue
+      const info = this.nodeInfo(node.value)
+      if (node.depth >= maxDepth || node.w < minRoomSize || node.h < minRoomSize || info.keys.length === 0) continue
+
+      const split = this.split(info, node.w, node.h, padding, weight)
+      const container = node.value as Record<string, JsonValue>
+      const childWeights = weight === 'bytes' ? info.childBytes : info.childCounts
+      for (let i = info.keys.length - 1; i >= 0; i--) {
+        const w = split[i * 4 + 2]
+        const h = split[i * 4 + 3]
+        // Drop children too small to see
+        if (w < 1 || h < 1) continue
+        stack.push({
+          value: container[info.keys[i]],
+          key: info.keys[i],
+          weight: childWeights[i],
+          parent: index,
+          depth: node.depth + 1,
+          x: node.x + split[i * 4],
+          y: node.y + split[i * 4 + 1],
+          w,
+          h,
+        })
+      }
+    }
+
+    return {
+      count,
+      rects: rects.slice(0, count * 4),
+      parents: parents.slice(0, count),
+      depths: depths.slice(0, count),
+      weights: weights.slice(0, count),
+      keys,
+    }
+  }
+
+  /** Weight, leaf count and content hash of a container, cached by identity. */
+  private nodeInfo(value: JsonObject | JsonValue[]): NodeInfo {
+    const cached = this.info.get(value)
+    if (cached) return cached
+
+    const keys = Array.isArray(value) ? value.map((_, i) => String(i)) : Object.keys(value)
+    const container = value as Record<string, JsonValue>
+    let bytes = 2 + Math.max(keys.length - 1, 0)
+    let count = 0
+    let h1 = Array.isArray(value) ? 0x9e3779b9 : 0x7f4a7c15
+    let h2 = keys.length
+    const childBytes: number[] = new Array(keys.length)
+    const childCounts: number[] = new Array(keys.length)
+    keys.forEach((key, i) => {
+      const child = container[key]
+      let childHash: string
+      if (isContainer(child)) {
+        const childInfo = this.nodeInfo(child)
+        childBytes[i] = childInfo.bytes
+        childCounts[i] = childInfo.count
+        childHash = childInfo.hash
+      } else {
+        const primitive = primitiveInfo(child)
+        childBytes[i] = primitive.bytes
+        childCounts[i] = 1
+        childHash = primitive.hash
+      }
+      bytes += childBytes[i]
+      count += childCounts[i]
+      if (!Array.isArray(value)) {
+        bytes += utf8Length(key) + 3
+        h1 = mixString(h1, key, 0x01000193)
+        h2 = mixString(h2, key, 0x5bd1e995)
+      }
+      h1 = mixString(h1 ^ 0x3a, childHash, 0x01000193)
+      h2 = mixString(h2 ^ 0x2c, childHash, 0x5bd1e995)
+    })
+
+    const info = { bytes, count, hash: (h1 >>> 0).toString(36) + '.' + (h2 >>> 0).toString(36), keys, childBytes, childCounts }
+    this.info.set(value, info)
+    this.stats.hashed++
+    return info
+  }
+
+  /** Child rectangles of a node, relative to its own top-left corner. */
+  private split(
+    info: NodeInfo,
+    width: number,
+    height: number,
+    padding: number,
+    weight: TreemapWeight
+  ): Float32Array {
+    const memoKey = `${info.hash}|${weight}|${padding}|${width.toFixed(1)}|${height.toFixed(1)}`
+    const cached = this.memo.get(memoKey)
+    if (cached) {
+      // Refresh its place in the eviction order
+      this.memo.delete(memoKey)
+      this.memo.set(memoKey, cached)
+      this.stats.reused++
+      return cached
+    }
+
+    const childWeights = weight === 'bytes' ? info.childBytes : info.childCounts
+    const order = childWeights.map((_, i) => i).sort((a, b) => childWeights[b] - childWeights[a])
+    const split = new Float32Array(info.keys.length * 4)
+    squarify(
+      order.map(i => childWeights[i]),
+      order,
+      padding,
+      padding,
+      width - 2 * padding,
+      height - 2 * padding,
+      split
+    )
+
+    this.memo.set(memoKey, split)
+    if (this.memo.size > MAX_MEMO_ENTRIES) {
+      this.memo.delete(this.memo.keys().next().value!)
+    }
+    this.stats.laidOut++
+    return split
+  }
+}
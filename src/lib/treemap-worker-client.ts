@@ -0,0 +1,156 @@
+import type { JsonValue } from '@/components/json-canvas/types'
+import { TreemapEngine, diffByReference } from './treemap-layout'
+import type { TreemapLayout, TreemapOptions, TreemapPatch } from './treemap-layout'
+
+export type TreemapWorkerRequest =
+  | { type: 'set'; docId: string; data: JsonValue }
+  | { type: 'patch'; docId: string; patches: TreemapPatch[] }
+  | { type: 'delete'; docId: string }
+  | { requestId: number; type: 'layout'; docId: string; width: number; height: number; options?: Partial<TreemapOptions> }
+
+export type TreemapWorkerResponse =
+  | { requestId: number; result: TreemapLayout; error?: undefined }
+  | { requestId: number; error: string; result?: undefined }
+
+export interface TreemapBackend {
+  set(docId: string, data: JsonValue): void
+  patch(docId: string, patches: TreemapPatch[]): void
+  delete(docId: string): void
+  layout(docId: string, width: number, height: number, options?: Partial<TreemapOptions>): Promise<TreemapLayout>
+  terminate(): void
+}
+
+type PendingRequest = { resolve: (value: TreemapLayout) => void; reject: (error: Error) => void }
+
+/**
+ * Backend that runs the layout engine in the treemap worker. Updates are
+ * fire-and-forget; the worker handles messages in order, so a layout
+ * always sees every update sent before it.
+ */
+export class WorkerTreemapBackend implements TreemapBackend {
+  private worker: Worker
+  private nextRequestId = 1
+  private pending = new Map<number, PendingRequest>()
+
+  constructor(worker: Worker) {
+    this.worker = worker
+    this.worker.onmessage = (event: MessageEvent<TreemapWorkerResponse>) => {
+      const { requestId, result, error } = event.data
+      const request = this.pending.get(requestId)
+      if (!request) return
+      this.pending.delete(requestId)
+      if (error !== undefined) {
+        request.reject(new Error(error))
+      } else {
+        request.resolve(result)
+      }
+    }
+    this.worker.onerror = (event: ErrorEvent) => {
+      const error = new Error(event.message || 'Treemap worker failed')
+      this.pending.forEach(request => request.reject(error))
+      this.pending.clear()
+    }
+  }
+
+  set(docId: string, data: JsonValue): void {
+    this.post({ type: 'set', docId, data })
+  }
+
+  patch(docId: string, patches: TreemapPatch[]): void {
+    this.post({ type: 'patch', docId, patches })
+  }
+
+  delete(docId: string): void {
+    this.post({ type: 'delete', docId })
+  }
+
+  layout(docId: string, width: number, height: number, options?: Partial<TreemapOptions>): Promise<TreemapLayout> {
+    const requestId = this.nextRequestId++
+    return new Promise<TreemapLayout>((resolve, reject) => {
+      this.pending.set(requestId, { resolve, reject })
+      this.post({ requestId, type: 'layout', docId, width, height, options })
+    })
+  }
+
+  terminate(): void {
+    this.worker.terminate()
+  }
+
+  private post(request: TreemapWorkerRequest) {
+    this.worker.postMessage(request)
+  }
+}
+
+/**
+ * Fallback backend for environments without module workers. Same engine
+ * and caches, on the calling thread.
+ */
+export class LocalTreemapBackend implements TreemapBackend {
+  readonly engine = new TreemapEngine()
+
+  set(docId: string, data: JsonValue): void {
+    this.engine.set(docId, data)
+  }
+
+  patch(docId: string, patches: TreemapPatch[]): void {
+    this.engine.patch(docId, patches)
+  }
+
+  delete(docId: string): void {
+    this.engine.delete(docId)
+  }
+
+  async layout(docId: string, width: number, height: number, options?: Partial<TreemapOptions>): Promise<TreemapLayout> {
+    return this.engine.layout(docId, width, height, options)
+  }
+
+  terminate(): void {}
+}
+
+/**
+ * Keeps the backend's copy of each document in step with the page. Each
+ * update is diffed by reference against the last one sent, so only the
+ * subtrees that changed cross the thread boundary.
+ */
+export class TreemapClient {
+  private readonly backend: TreemapBackend
+  private readonly sent = new Map<string, JsonValue>()
+
+  constructor(backend: TreemapBackend) {
+    this.backend = backend
+  }
+
+  update(docId: string, data: JsonValue): void {
+    const previous = this.sent.get(docId)
+    if (previous === data) return
+    const patches = previous === undefined ? null : diffByReference(previous, data)
+    if (patches) this.backend.patch(docId, patches)
+    else this.backend.set(docId, data)
+    this.sent.set(docId, data)
+  }
+
+  layout(docId: string, width: number, height: number, options?: Partial<TreemapOptions>): Promise<TreemapLayout> {
+    return this.backend.layout(docId, width, height, options)
+  }
+
+  forget(docId: string): void {
+    if (this.sent.delete(docId)) this.backend.delete(docId)
+  }
+
+  terminate(): void {
+    this.sent.clear()
+    this.backend.terminate()
+  }
+}
+
+export function createTreemapClient(): TreemapClient {
+  if (typeof Worker !== 'undefined') {
+    try {
+      const worker = new Worker(new URL('./treemap.worker.ts', import.meta.url), { type: 'module' })
+      return new TreemapClient(new WorkerTreemapBackend(worker))
+    } catch (error) {
+      console.warn('Treemap worker unavailable, laying out on the main thread:', error)
+    }
+  }
+  return new TreemapClient(new LocalTreemapBackend())
+}
@@ -0,0 +1,49 @@
+import { TreemapEngine } from './treemap-layout'
+import type { TreemapWorkerRequest, TreemapWorkerResponse } from './treemap-worker-client'
+
+/**
+ * Keeps a copy of each displayed document and lays it out off the main
+ * thread. The page sends only the changed subtrees after an edit, so the
+ * engine's per-subtree caches survive across layouts.
+ */
+
+// Typed as Worker so this file compiles against the DOM lib used by the app.
+const ctx = self as unknown as Worker
+
+const engine = new TreemapEngine()
+
+ctx.onmessage = (event: MessageEvent<TreemapWorkerRequest>) => {
+  const request = event.data
+
+  try {
+    switch (request.type) {
+      case 'set':
+        engine.set(request.docId, request.data)
+        return
+      case 'patch':
+        engine.patch(request.docId, request.patches)
+        return
+      case 'delete':
+        engine.delete(request.docId)
+        return
+      case 'layout': {
+        const layout = engine.layout(request.docId, request.width, request.height, request.options)
+        const response: TreemapWorkerResponse = { requestId: request.requestId, result: layout }
+        ctx.postMessage(response, [layout.rects.buffer, layout.parents.buffer, layout.depths.buffer, layout.weights.buffer])
+        return
+      }
+      default:
+        throw new Error(`Unknown treemap request: ${(request as any).type}`)
+    }
+  } catch (error) {
+    if (request.type !== 'layout') {
+      console.error('Treemap worker error:', error)
+      return
+    }
+    const response: TreemapWorkerResponse = {
+      requestId: request.requestId,
+      error: error instanceof Error ? error.message : String(error),
+    }
+    ctx.postMessage(response)
+  }
+}
@@ -10,7 +10,7 @@ import requests
 import json
 import sys
 
-BASE_URL = "http://localhost:9002/api"
+from jsoncanvas import BASE_URL, JSONCanvasClient
 
 def test_endpoint(name, url, method="GET", data=None):
     """Test an API endpoint and print results"""
@@ -48,85 +48,6 @@ def test_endpoint(name, url, method="GET", data=None):
         print()
         return None
 
-class JSONCanvasClient:
-    """Complete Python client for JSON Canvas AI"""
-    
-    def __init__(self, base_url=BASE_URL):
-        self.base_url = base_url
-    
-    def convert_text_to_json(self, text, instructions=""):
-        """Convert text to structured JSON"""
-        response = requests.post(f"{self.base_url}/ai/convert-text", json={
-            "rawText": text,
-            "instructions": instructions
-        })
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success"):
-                return json.loads(result["data"]["generatedJson"])
-        
-        raise Exception(f"API Error: {response.text}")
-    
-    def enhance_field(self, content, prompt):
-        """Enhance a field using AI"""
-        response = requests.post(f"{self.base_url}/ai/enhance-field", json={
-            "fieldContent": content,
-            "userPrompt": prompt
-        })
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success"):
-                return result["data"]["enhancedContent"]
-        
-        raise Exception(f"API Error: {response.text}")
-    
-    def format_json(self, json_string, instructions=""):
-        """Format and fix JSON"""
-        response = requests.post(f"{self.base_url}/ai/format-json", json={
-            "jsonString": json_string,
-            "instructions": instructions
-        })
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success"):
-                return result["data"]["formattedJson"]
-        
-        raise Exception(f"API Error: {response.text}")
-    
-    def create_document(self, data, name=None):
-        """Create a new document"""
-        response = requests.post(f"{self.base_url}/documents", json={
-            "data": data,
-            "name": name
-        })
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success"):
-                return result["data"]
-        
-        raise Exception(f"API Error: {response.text}")
-    
-    def manipulate_json(self, operation, json_data, **kwargs):
-        """Perform JSON manipulation"""
-        payload = {
-            "operation": operation,
-            "jsonData": json_data,
-            **kwargs
-        }
-        
-        response = requests.post(f"{self.base_url}/json/manipulate", json=payload)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success"):
-                return result["data"]["result"]
-        
-        raise Exception(f"API Error: {response.text}")
-
 def run_tests():
     """Run comprehensive test suite"""
     print("🚀 JSON Canvas AI - Python Client Test Suite\n")
@@ -0,0 +1,57 @@
+import itertools
+import threading
+
+import pytest
+
+from jsoncanvas.bench import run_benchmark
+
+
+class FakeClient:
+    """Creates numbered documents"""
+
+    base_url = "http://fake/api"
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.created = set()
+        self.deleted = set()
+        self.lock = threading.Lock()
+
+    def post(self, path, payload, select="data"):
+        with self.lock:
+            document_id = str(next(self.ids))
+            self.created.add(document_id)
+        return document_id
+
+    def delete_document(self, document_id):
+        self.deleted.add(document_id)
+
+
+def test_documents_sweep_deletes_what_it_creates():
+    client = FakeClient()
+
+    run_benchmark(client, endpoints=("documents",), sizes=(1024, 2048), requests=5, warmup=2, progress=None)
+
+    assert len(client.created) == 2 * (2 + 5)
+    assert client.deleted == client.created
+
+
+class InterruptedProgress:
+    """Progress stream that stops the run once the first scenario has been measured"""
+
+    def write(self, text):
+        if text.startswith("p50"):
+            raise KeyboardInterrupt
+
+    def flush(self):
+        pass
+
+
+def test_documents_are_deleted_when_a_run_is_interrupted():
+    client = FakeClient()
+
+    with pytest.raises(KeyboardInterrupt):
+        run_benchmark(client, endpoints=("documents",), sizes=(1024,), requests=5, warmup=2, progress=InterruptedProgress())
+
+    assert len(client.created) == 2 + 5
+    assert client.deleted == client.created
@@ -0,0 +1,103 @@
+import sqlite3
+import time
+
+from jsoncanvas import cache as cache_module
+from jsoncanvas.cache import ResponseCache
+
+
+def stored_bytes(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+def test_lookups_are_counted_once_flushed(tmp_path):
+    cache = ResponseCache(tmp_path / "ai.sqlite3")
+    cache.put("/ai/convert", {"text": "a"}, {"a": 1})
+
+    assert cache.get("/ai/convert", {"text": "a"}) == {"a": 1}
+    assert cache.get("/ai/convert", {"text": "b"}) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_get_does_not_wait_for_another_writer(tmp_path, monkeypatch):
+    path = tmp_path / "ai.sqlite3"
+    cache = ResponseCache(path)
+    cache.put("/ai/convert", {"text": "a"}, {"a": 1})
+    monkeypatch.setattr(cache_module, "FLUSH_EVERY", 1)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+
+    started = time.monotonic()
+    for _ in range(3):
+        assert cache.get("/ai/convert", {"text": "a"}) == {"a": 1}
+    assert time.monotonic() - started < cache_module.LOCK_TIMEOUT / 10
+
+    # The skipped bookkeeping is written once the lock is free
+    writer.execute("ROLLBACK")
+    assert cache.stats()["hits"] == 3
+
+
+def test_expired_entries_are_misses_and_are_deleted(tmp_path, monkeypatch):
+    path = tmp_path / "ai.sqlite3"
+    cache = ResponseCache(path, ttl=60)
+    cache.put("/ai/convert", {"text": "a"}, {"a": 1})
+    now = time.time()
+    monkeypatch.setattr(cache_module.time, "time", lambda: now + 61)
+
+    assert cache.get("/ai/convert", {"text": "a"}) is None
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["expired"], stats["misses"]) == (0, 1, 1)
+    assert stored_bytes(path) == 0
+
+
+def test_running_total_matches_the_table(tmp_path, monkeypatch):
+    path = tmp_path / "ai.sqlite3"
+    cache = ResponseCache(path, max_bytes=100, ttl=60)
+    for i in range(10):
+        cache.put("/ai/convert", {"text": i}, "x" * (i + 10))
+        assert cache.stats()["megabytes"] == round(stored_bytes(path) / 1e6, 3)
+    # Replacing an entry counts only the difference
+    cache.put("/ai/convert", {"text": 9}, "y")
+    with sqlite3.connect(path) as db:
+        total = db.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+    assert total == stored_bytes(path) <= 100
+    assert cache.stats()["evictions"] > 0
+
+    now = time.time()
+    monkeypatch.setattr(cache_module.time, "time", lambda: now + 61)
+    cache.purge()
+    cache.put("/ai/convert", {"text": "new"}, "z")
+    with sqlite3.connect(path) as db:
+        total = db.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+    assert total == stored_bytes(path) == 3
+
+
+def test_running_total_starts_from_files_written_without_it(tmp_path):
+    path = tmp_path / "ai.sqlite3"
+    ResponseCache(path).put("/ai/convert", {"text": "a"}, "abc")
+    with sqlite3.connect(path) as db:
+        db.execute("DELETE FROM counters WHERE name = 'bytes'")
+
+    cache = ResponseCache(path, max_bytes=10)
+    cache.put("/ai/convert", {"text": "b"}, "abcdef")
+
+    # Over max_bytes only with the older entry counted, which is evicted
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("/ai/convert", {"text": "a"}) is None
+    assert cache.get("/ai/convert", {"text": "b"}) == "abcdef"
+
+
+def test_eviction_sees_reads_not_yet_flushed(tmp_path):
+    cache = ResponseCache(tmp_path / "ai.sqlite3", max_bytes=20)
+    cache.put("/ai/convert", {"text": "old"}, "a" * 6)
+    cache.put("/ai/convert", {"text": "new"}, "b" * 6)
+
+    assert cache.get("/ai/convert", {"text": "old"}) is not None
+    cache.put("/ai/convert", {"text": "newest"}, "c" * 6)
+
+    assert cache.get("/ai/convert", {"text": "old"}) == "a" * 6
+    assert cache.get("/ai/convert", {"text": "new"}) is None
@@ -0,0 +1,80 @@
+import json
+
+from jsoncanvas.client import JSONCanvasClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", etag=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {"ETag": etag} if etag else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+
+class ServedClient(JSONCanvasClient):
+    """Answers GETs of /documents/<id> from a dict, with 304 for a matching If-None-Match"""
+
+    def __init__(self, documents, **kwargs):
+        super().__init__("http://fake/api", policies={}, **kwargs)
+        self.served = documents
+        self.statuses = []
+
+    def _open(self, method, path, payload=None, headers=None):
+        document_id = path.rsplit("/", 1)[1]
+        etag = f'"{document_id}-1"'
+        if headers and headers.get("If-None-Match") == etag:
+            self.statuses.append(304)
+            return FakeResponse(304)
+        self.statuses.append(200)
+        body = json.dumps({"success": True, "data": self.served[document_id]}).encode()
+        return FakeResponse(200, body, etag)
+
+
+def document(size):
+    # {"text":"..."} is size bytes of compact JSON
+    return {"text": "x" * (size - 11)}
+
+
+def test_documents_are_kept_up_to_a_byte_budget():
+    client = ServedClient({"a": document(100), "b": document(100), "c": document(100), "big": document(300)},
+                          document_cache_bytes=250)
+
+    for document_id in ["a", "b", "a", "c", "a", "b"]:
+        assert client._get_revalidated(f"/documents/{document_id}") == client.served[document_id]
+
+    # c pushed out b, the least recently used; b coming back pushed out c
+    assert client.statuses == [200, 200, 304, 200, 304, 200]
+    assert client._documents_bytes == 200
+
+    # A document larger than the budget is not kept, nor pushes others out
+    client._get_revalidated("/documents/big")
+    client._get_revalidated("/documents/big")
+    client._get_revalidated("/documents/a")
+    assert client.statuses[-3:] == [200, 200, 304]
+
+
+def test_callers_get_their_own_copy():
+    client = ServedClient({"a": {"list": [1]}})
+
+    client._get_revalidated("/documents/a")["list"].append(2)
+
+    assert client._get_revalidated("/documents/a") == {"list": [1]}
+    assert client.statuses == [200, 304]
+
+
+def test_a_budget_of_zero_keeps_nothing():
+    client = ServedClient({"a": document(100)}, document_cache_bytes=0)
+
+    client._get_revalidated("/documents/a")
+    client._get_revalidated("/documents/a")
+
+    assert client.statuses == [200, 200]
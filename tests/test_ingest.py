@@ -0,0 +1,56 @@
+import io
+import json
+
+from jsoncanvas.client import APIError
+from jsoncanvas.ingest import Record, convert_record, ingest
+
+
+class FakeClient:
+    """Answers convert_text_to_json from a table keyed by record text"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def convert_text_to_json(self, text, instructions=""):
+        self.calls.append(text)
+        answer = self.answers[text]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def record(seq, text):
+    return Record(seq, f"r{seq}", text, None)
+
+
+def test_convert_record_reports_bad_responses():
+    client = FakeClient({
+        "missing field": KeyError("generatedJson"),
+        "not an object": TypeError("string indices must be integers"),
+        "not json": ValueError("Expecting value"),
+        "refused": APIError("Bad request", status=400),
+    })
+
+    errors = {text: convert_record(client, record(0, text), retries=0)["error"] for text in client.answers}
+
+    assert errors == {
+        "missing field": "BadResponse: KeyError: 'generatedJson'",
+        "not an object": "BadResponse: TypeError: string indices must be integers",
+        "not json": "InvalidJSON: Expecting value",
+        "refused": "APIError: Bad request",
+    }
+    # None of these are worth retrying
+    assert len(client.calls) == 4
+
+
+def test_bad_response_does_not_stop_the_run():
+    client = FakeClient({"a": {"a": 1}, "b": KeyError("generatedJson"), "c": {"c": 3}})
+    output = io.StringIO()
+
+    stats = ingest(client, [record(i, text) for i, text in enumerate("abc")], output, concurrency=2, progress=None)
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [line["id"] for line in lines] == ["r0", "r1", "r2"]
+    assert [line["ok"] for line in lines] == [True, False, True]
+    assert stats.errors == {"BadResponse": 1}
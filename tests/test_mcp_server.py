@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("httpx")
+
+from jsoncanvas import path_ops  # noqa: E402
+from jsoncanvas.mcp_server import DocumentCache  # noqa: E402
+
+
+class FakeAPI:
+    def __init__(self, data):
+        self.data = data
+        self.patches = []
+
+    async def get_document(self, document_id):
+        return {"id": document_id, "name": "Doc", "data": self.data, "version": 1}
+
+    async def patch_document(self, document_id, operations, version, name=None):
+        self.patches.append(operations)
+        return {"id": document_id, "name": name or "Doc", "version": version + 1}
+
+
+def test_put_skips_the_request_when_edits_cancel_out():
+    api = FakeAPI({"a": 1})
+    cache = DocumentCache(api)
+
+    async def run():
+        await cache.edit("d", lambda data: path_ops.set_value_at_path(data, ["a"], 2))
+        await cache.edit("d", lambda data: path_ops.set_value_at_path(data, ["a"], 1))
+        unchanged = await cache.put("d")
+        assert unchanged.edits == 0
+        await cache.edit("d", lambda data: path_ops.set_value_at_path(data, ["a"], 3))
+        changed = await cache.put("d")
+        return unchanged, changed
+
+    unchanged, changed = asyncio.run(run())
+
+    assert unchanged.version == 1
+    assert api.patches == [[{"op": "replace", "path": "/a", "value": 3}]]
+    assert changed.version == 2
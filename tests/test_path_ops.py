@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+
+from jsoncanvas import conformance, path_ops
+
+
+def test_has_path_tells_null_from_missing():
+    data = {"a": None, "list": [0], "obj": {}}
+
+    assert path_ops.has_path(data, ["a"])
+    assert path_ops.has_path(data, "list.0")
+    assert not path_ops.has_path(data, ["list", 1])
+    assert not path_ops.has_path(data, ["b"])
+    # Inherited JavaScript methods are not values
+    assert not path_ops.has_path(data, ["obj", "toString"])
+
+
+# Requests to /api/json/manipulate and the route's answers, shared with
+# src/app/__tests__/manipulate-route.test.ts so the two cannot drift apart
+MANIPULATE_CASES = Path(__file__).parents[1] / "src/app/__tests__/fixtures/manipulate-cases.json"
+
+
+def test_manipulate_answers_as_the_route_does():
+    for case in json.loads(MANIPULATE_CASES.read_text(encoding="utf-8")):
+        expected = (case["status"], conformance._canonical(case["response"]))
+        assert conformance.run_local(case["request"]) == expected, case["request"]
+
+
+# The cases of src/lib/__tests__/json-patch.test.ts
+def make_data():
+    return {
+        "name": "House",
+        "rooms": [
+            {"name": "Kitchen", "items": ["stove", "sink"]},
+            {"name": "Hall", "items": []},
+        ],
+        "owner": {"first": "Ada", "a/b": 1},
+    }
+
+
+def test_to_pointer_escapes_tilde_and_slash():
+    assert path_ops.to_pointer([]) == ""
+    assert path_ops.to_pointer(["owner", "a/b", "~x", 0]) == "/owner/a~1b/~0x/0"
+
+
+def test_diff_json_describes_each_edit():
+    data = make_data()
+    edits = [
+        (path_ops.set_value_at_path(data, ["rooms", 1, "name"], "Porch"),
+         [{"op": "replace", "path": "/rooms/1/name", "value": "Porch"}]),
+        (path_ops.add_property_at_path(data, ["owner"], "last", "Lovelace"),
+         [{"op": "add", "path": "/owner/last", "value": "Lovelace"}]),
+        (path_ops.add_item_at_path(data, ["rooms", 0, "items"], "oven"),
+         [{"op": "add", "path": "/rooms/0/items/2", "value": "oven"}]),
+        (path_ops.delete_at_path(data, ["rooms", 0]),
+         [{"op": "remove", "path": "/rooms/0"}]),
+        (path_ops.rename_property_at_path(data, ["owner"], "first", "given"),
+         [{"op": "remove", "path": "/owner/first"}, {"op": "add", "path": "/owner/given", "value": "Ada"}]),
+        (data, []),
+        (make_data(), []),
+    ]
+    for after, patch in edits:
+        assert path_ops.diff_json(data, after) == patch
+
+
+def test_diff_json_of_arrays_and_roots():
+    cases = [
+        ([1, 2, 3, 4], [1], [
+            {"op": "remove", "path": "/3"},
+            {"op": "remove", "path": "/2"},
+            {"op": "remove", "path": "/1"},
+        ]),
+        # The middle was both removed from and added to
+        ({"a": [1, 2, 3]}, {"a": [1, 9, 8, 3]}, [{"op": "replace", "path": "/a", "value": [1, 9, 8, 3]}]),
+        ({"a": 1}, "x", [{"op": "replace", "path": "", "value": "x"}]),
+    ]
+    for before, after, patch in cases:
+        assert path_ops.diff_json(before, after) == patch
+
+
+def test_changed_subtree():
+    data = make_data()
+    deleted = path_ops.delete_at_path(data, ["rooms", 0])
+    renamed = path_ops.rename_property_at_path(data, ["owner"], "first", "given")
+    cases = [
+        # The edited value for replacements and additions
+        (path_ops.set_value_at_path(data, ["rooms", 1, "name"], "Porch"), (["rooms", 1, "name"], "Porch")),
+        (path_ops.add_item_at_path(data, ["rooms"], {"name": "Study"}), (["rooms", 2], {"name": "Study"})),
+        # The container for removals and renames
+        (deleted, (["rooms"], deleted["rooms"])),
+        (renamed, (["owner"], renamed["owner"])),
+        (data, None),
+    ]
+    for after, subtree in cases:
+        assert path_ops.changed_subtree(data, after) == subtree
@@ -0,0 +1,177 @@
+import threading
+
+import pytest
+
+from jsoncanvas.errors import APIError, CircuitOpenError
+from jsoncanvas.resilience import BreakerPolicy, EndpointPolicy, HedgePolicy, Resilience, RetryPolicy
+
+
+class Clock:
+    """A monotonic clock that moves only when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event, route, fields):
+        self.events.append(event)
+
+
+def make(policy):
+    clock, sleeps, events = Clock(), [], Recorder()
+    resilience = Resilience({"/": policy}, events, sleep=sleeps.append, clock=clock)
+    return resilience, clock, sleeps, events
+
+
+def fail(status=500, retry_after=None):
+    def attempt():
+        raise APIError("API Error: failed", status=status, retry_after=retry_after)
+    return attempt
+
+
+def test_breaker_opens_then_lets_one_trial_decide():
+    resilience, clock, _, events = make(EndpointPolicy(breaker=BreakerPolicy(failures=2, reset_after=10)))
+    state = lambda: resilience.snapshot()["GET /documents"]["circuit"]
+
+    for _ in range(2):
+        with pytest.raises(APIError):
+            resilience.call("GET", "/documents", fail())
+    assert state() == "open"
+    with pytest.raises(CircuitOpenError):
+        resilience.call("GET", "/documents", pytest.fail)
+
+    # A failed trial re-opens the breaker at once
+    clock.now = 10
+    assert state() == "half-open"
+    with pytest.raises(APIError):
+        resilience.call("GET", "/documents", fail())
+    assert state() == "open"
+    with pytest.raises(CircuitOpenError):
+        resilience.call("GET", "/documents", pytest.fail)
+
+    # Only one trial at a time; a successful one closes the breaker
+    clock.now = 20
+
+    def trial():
+        with pytest.raises(CircuitOpenError):
+            resilience.call("GET", "/documents", pytest.fail)
+        return "ok"
+
+    assert resilience.call("GET", "/documents", trial) == "ok"
+    assert state() == "closed"
+    assert resilience.call("GET", "/documents", lambda: "again") == "again"
+    assert events.events == ["circuit_open", "rejected", "circuit_open", "rejected", "rejected", "circuit_close"]
+
+
+def test_client_errors_do_not_open_the_breaker():
+    resilience, _, _, _ = make(EndpointPolicy(breaker=BreakerPolicy(failures=1)))
+
+    for _ in range(3):
+        with pytest.raises(APIError):
+            resilience.call("POST", "/json/manipulate", fail(status=400))
+
+    assert resilience.snapshot()["POST /json/manipulate"]["circuit"] == "closed"
+
+
+def test_retries_wait_as_long_as_the_server_asks():
+    resilience, _, sleeps, _ = make(EndpointPolicy(retry=RetryPolicy(attempts=3, backoff=0.5, max_backoff=10)))
+    answers = iter([fail(status=429, retry_after=7), fail(status=503), lambda: "done"])
+
+    assert resilience.call("POST", "/ai/convert", lambda: next(answers)()) == "done"
+
+    # Retry-After wins over backoff; without it the wait is random up to backoff * 2**n
+    assert sleeps[0] == 7
+    assert 0 <= sleeps[1] <= 1.0
+    assert len(sleeps) == 2
+
+
+def test_retry_after_is_taken_at_its_word_up_to_max_backoff():
+    resilience, _, sleeps, _ = make(EndpointPolicy(retry=RetryPolicy(attempts=3, backoff=5, max_backoff=10)))
+    answers = iter([fail(status=503, retry_after=0), fail(status=429, retry_after=3600), lambda: "done"])
+
+    assert resilience.call("POST", "/ai/convert", lambda: next(answers)()) == "done"
+
+    # Retry-After: 0 means now, not a random backoff; an hour is cut to max_backoff
+    assert sleeps == [0, 10]
+
+
+def test_retries_stop_at_attempts_and_skip_bad_requests():
+    resilience, _, sleeps, _ = make(EndpointPolicy(retry=RetryPolicy(attempts=3)))
+
+    with pytest.raises(APIError):
+        resilience.call("GET", "/documents/1", fail())
+    assert len(sleeps) == 2
+    with pytest.raises(APIError):
+        resilience.call("GET", "/documents/1", fail(status=404))
+    assert len(sleeps) == 2
+    assert resilience.snapshot()["GET /documents/:id"]["attempts"] == 4
+
+
+def timed(clock, seconds, value):
+    def attempt():
+        clock.now += seconds
+        return value
+    return attempt
+
+
+def hedged(latency):
+    """Resilience that hedges POST calls after the latency of two earlier calls"""
+    resilience, clock, _, events = make(EndpointPolicy(hedge=HedgePolicy(percentile=50, min_samples=2)))
+    for _ in range(2):
+        resilience.call("POST", "/ai/convert", timed(clock, latency, None))
+    return resilience, events
+
+
+def test_hedge_answers_with_the_faster_request_and_drops_the_slower():
+    resilience, events = hedged(0.01)
+    first_started, release = threading.Event(), threading.Event()
+    calls = iter(["first", "second"])
+
+    def attempt():
+        which = next(calls)
+        if which == "first":
+            first_started.set()
+            release.wait(5)
+        return which
+
+    assert resilience.call("POST", "/ai/convert", attempt) == "second"
+    assert first_started.is_set()
+    release.set()
+    assert events.events == ["hedge", "hedge_win"]
+    metrics = resilience.snapshot()["POST /ai/convert"]
+    assert (metrics["hedges"], metrics["hedgeWins"], metrics["successes"]) == (1, 1, 3)
+
+
+def test_hedge_is_not_sent_for_fast_calls_or_when_asked_not_to():
+    resilience, events = hedged(5.0)
+    assert resilience.call("POST", "/ai/convert", lambda: "fast") == "fast"
+
+    resilience, events = hedged(0.01)
+    release = threading.Event()
+
+    def slow():
+        release.wait(0.2)
+        return "slow"
+
+    assert resilience.call("POST", "/ai/convert", slow, hedge=False) == "slow"
+    assert events.events == []
+
+
+def test_hedge_raises_when_both_requests_fail():
+    resilience, events = hedged(0.01)
+    release = threading.Event()
+
+    def attempt():
+        release.wait(0.2)
+        raise APIError("Bad request", status=400)
+
+    with pytest.raises(APIError, match="Bad request"):
+        resilience.call("POST", "/ai/convert", attempt)
+    assert events.events == ["hedge"]
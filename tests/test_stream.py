@@ -0,0 +1,71 @@
+import json
+import random
+
+import pytest
+
+from jsoncanvas.stream import JSONStreamError, extract, iter_items, select
+
+SCALARS = [None, True, False, 0, -1.5e10, 12345678901234567890, 3.25, "", 'a"b\\c', "ü😀\n", "[{]}"]
+KEYS = ["a", "b", 'c"', "d\\", "[", "{"]
+
+
+def random_value(rng, depth=0):
+    roll = rng.random()
+    if depth > 4 or roll < 0.3:
+        return rng.choice(SCALARS)
+    if roll < 0.65:
+        return {rng.choice(KEYS) + str(i): random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+
+
+def random_body(rng):
+    """A manipulate-style response and its JSON text in one of several layouts"""
+    body = {
+        "success": True,
+        "data": {
+            "result": random_value(rng),
+            "originalData": random_value(rng),
+            "history": [random_value(rng) for _ in range(3)],
+        },
+    }
+    text = json.dumps(body, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1]))
+    return body, text.encode()
+
+
+def split(rng, text):
+    """text in chunks of 1 to 7 bytes, cutting through strings, escapes and UTF-8 sequences"""
+    chunks, start = [], 0
+    while start < len(text):
+        end = start + rng.randint(1, 7)
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def test_decodes_as_json_loads_at_any_chunk_boundary():
+    rng = random.Random(1)
+    for _ in range(500):
+        body, text = random_body(rng)
+        data = body["data"]
+        assert select(split(rng, text), []) == json.loads(text)
+        assert select(split(rng, text), "data.result") == data["result"]
+        # originalData and history are skipped rather than decoded
+        assert extract(split(rng, text), ["success", "data.result"]) == [True, data["result"]]
+        without_history = {key: value for key, value in data.items() if key != "history"}
+        assert select(split(rng, text), "data", exclude=["history"]) == without_history
+        assert list(iter_items(split(rng, text), "data.history")) == data["history"]
+
+
+def test_truncated_input_is_an_error_not_a_shorter_value():
+    rng = random.Random(2)
+    for _ in range(500):
+        body, text = random_body(rng)
+        truncated = text[:rng.randrange(len(text))]
+        with pytest.raises(JSONStreamError):
+            select(split(rng, truncated), [])
+        # A wanted value may be complete before the cut; if not, reading it fails
+        try:
+            result = select(split(rng, truncated), "data.result")
+        except JSONStreamError:
+            continue
+        assert result == body["data"]["result"]
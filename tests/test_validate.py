@@ -0,0 +1,128 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip("jsonschema")
+
+from jsoncanvas.validate import compile_schema, format_checker, read_documents, validate_all, validate_document  # noqa: E402
+
+
+def write_json(path, value):
+    path.write_text(json.dumps(value), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def product_schema(tmp_path):
+    """A schema whose $refs go to a file beside it and to a schema known only by its $id"""
+    write_json(tmp_path / "defs.json", {"definitions": {"price": {"type": "number", "minimum": 0}}})
+    tag = write_json(tmp_path / "elsewhere.json", {"$id": "https://example.com/tag.json", "type": "string", "maxLength": 3})
+    schema = write_json(tmp_path / "product.schema.json", {
+        "type": "object",
+        "properties": {
+            "price": {"$ref": "defs.json#/definitions/price"},
+            "tags": {"type": "array", "items": {"$ref": "https://example.com/tag.json"}},
+        },
+    })
+    return schema, tag
+
+
+def test_refs_resolve_through_the_registry(product_schema):
+    schema, tag = product_schema
+    validator = compile_schema(schema, [tag])
+
+    assert validate_document(validator, {"price": 3, "tags": ["new"]}) == []
+    assert validate_document(validator, {"price": -1, "tags": ["sale"]}) == [
+        {"path": "/price", "message": "Value must be >= 0", "schemaPath": "#/properties/price/minimum"},
+        {"path": "/tags/0", "message": "String must be at most 3 characters long",
+         "schemaPath": "#/properties/tags/items/maxLength"},
+    ]
+
+
+def test_a_ref_that_leads_nowhere_is_refused(product_schema):
+    schema, _ = product_schema
+
+    with pytest.raises(ValueError, match="https://example.com/tag.json"):
+        compile_schema(schema)
+
+
+def test_fallback_format_checks():
+    checker = format_checker()
+    cases = [
+        ("date-time", "2024-02-29T12:00:00Z", True),
+        ("date-time", "2024-02-29 12:00:00.5+01:00", True),
+        ("date-time", "2023-02-29T12:00:00Z", False),
+        ("date-time", "2024-02-29", False),
+        ("uri", "https://example.com/a?b=c", True),
+        ("uri", "example.com/a", False),
+        ("uri-reference", "../a#b", True),
+        ("uri-reference", "a b", False),
+        ("hostname", "api.example.com", True),
+        ("hostname", "-bad.example.com", False),
+        ("json-pointer", "/a~1b/0", True),
+        ("json-pointer", "a/b", False),
+        # Formats only apply to strings
+        ("date-time", 42, True),
+    ]
+    for name, value, conforms in cases:
+        assert checker.conforms(value, name) is conforms, (name, value)
+
+
+def test_messages_match_the_editor(tmp_path):
+    # formatErrorMessage in src/lib/json-schema-validator.ts, with instancePath || 'root'
+    schema = write_json(tmp_path / "schema.json", {
+        "type": "object",
+        "required": ["name", "kind"],
+        "properties": {"name": {"type": "string"}, "kind": {"enum": [1, "a", None, True]}},
+        "patternProperties": {"^x-": {}},
+        "additionalProperties": False,
+    })
+    validator = compile_schema(schema)
+
+    errors = validate_document(validator, {"kind": 2, "extra": 1, "x-note": 1, "other": 2})
+
+    assert sorted(errors, key=lambda error: error["message"]) == [
+        {"path": "root", "message": "Additional property not allowed: extra", "schemaPath": "#/additionalProperties"},
+        {"path": "root", "message": "Additional property not allowed: other", "schemaPath": "#/additionalProperties"},
+        {"path": "root", "message": "Missing required property: name", "schemaPath": "#/required"},
+        # [1, 'a', null, true].join(', ')
+        {"path": "/kind", "message": "Value must be one of: 1, a, , true", "schemaPath": "#/properties/kind/enum"},
+    ]
+
+
+def run(tmp_path, lines, jobs, chunk_size=2):
+    schema = write_json(tmp_path / "schema.json", {"type": "object", "required": ["id"]})
+    data = tmp_path / "records.ndjson"
+    data.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    output = io.StringIO()
+    stats = validate_all(read_documents([str(data)]), schema, output, jobs=jobs, chunk_size=chunk_size,
+                         include_valid=True, progress=None)
+    return stats, [json.loads(line) for line in output.getvalue().splitlines()], str(data)
+
+
+def test_unreadable_records_and_files(tmp_path):
+    stats, results, data = run(tmp_path, ['{"id": 1}', '{"id": ', "{}"], jobs=1)
+
+    assert [result["source"] for result in results] == [f"{data}:1", f"{data}:2", f"{data}:3"]
+    assert results[1]["valid"] is False
+    assert results[1]["errors"][0]["message"].startswith("Invalid JSON: ")
+    assert results[2]["errors"] == [{"path": "root", "message": "Missing required property: id", "schemaPath": "#/required"}]
+    assert (stats.valid, stats.invalid, stats.unreadable) == (1, 1, 1)
+
+    schema = write_json(tmp_path / "schema.json", {})
+    output = io.StringIO()
+    stats = validate_all([("missing.json", str(tmp_path / "missing.json"))], schema, output, jobs=1, progress=None)
+    assert json.loads(output.getvalue())["errors"][0]["message"] == "Cannot read file: No such file or directory"
+    assert stats.unreadable == 1
+
+
+def test_chunks_come_back_in_input_order_from_several_workers(tmp_path):
+    lines = [json.dumps({"id": i}) if i % 3 else json.dumps({"n": i}) for i in range(40)]
+
+    stats, results, data = run(tmp_path, lines, jobs=3, chunk_size=3)
+
+    assert [result["source"] for result in results] == [f"{data}:{i + 1}" for i in range(40)]
+    assert [result["valid"] for result in results] == [bool(i % 3) for i in range(40)]
+    assert stats.summary()["documents"] == 40
+    assert stats.invalid == 14